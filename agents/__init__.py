@@ -10,9 +10,11 @@ from agents.agent1 import (
     ProblemDiscoveryOrchestrator,
     create_problem_discovery_chain,
 )
+from agents.agent2 import QuestionDesignAgent
 
 __all__ = [
     "ProblemDiscoveryAgent",
     "ProblemDiscoveryOrchestrator",
+    "QuestionDesignAgent",
     "create_problem_discovery_chain",
 ]
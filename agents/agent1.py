@@ -8,11 +8,16 @@
 Phase 1: problem_discovery
 """
 
+import asyncio
+import contextlib
+import contextvars
+import functools
 import json
 import os
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Any, Callable
+from typing import Any, AsyncIterator, Callable
 
 from dotenv import load_dotenv
 
@@ -20,20 +25,56 @@ from dotenv import load_dotenv
 _env_path = Path(__file__).parent / ".env"
 load_dotenv(_env_path)
 
-from langchain_core.messages import HumanMessage, SystemMessage
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
+from langchain_core.runnables import Runnable, RunnableConfig
+from langchain_core.utils.json import parse_partial_json
 from langchain_google_genai import ChatGoogleGenerativeAI
 from pydantic import ValidationError
 
 from agents.prompts.problem_discovery import (
+    BATCH_CRITIC_INSTRUCTIONS,
+    BATCH_EXTRACTION_INSTRUCTIONS,
     CRITIC_PROMPT,
+    EXTRACTION_PROMPT,
+    SECTION_CRITIC_PROMPT,
     SYSTEM_PROMPT,
+    WHY_DEEPDIVE_PROMPT,
+    get_batch_user_prompt,
+    get_section_critic_prompt,
     get_user_prompt,
+    get_why_prompt,
 )
+from agents.utils.answers import apply_answers, covers, format_answers
+from agents.utils.batching import BatchProcessError, MicroBatcher, MicroBatchPolicy
+from agents.utils.critic_sections import (
+    CRITIC_SECTIONS,
+    VerdictMemo,
+    combine_verdicts,
+    section_hash,
+    section_payloads,
+    section_references,
+    validate_verdict,
+)
+from agents.utils.latency import (
+    DEGRADE_FAST_MODEL,
+    DEGRADE_LOCAL_CRITIC,
+    DEGRADE_SHORT_HISTORY,
+    Deadline,
+    DeadlineExceededError,
+    HedgedInvoker,
+    LatencyBudgetPolicy,
+)
+from agents.utils.quality import local_quality_check
+from agents.utils.request_context import LANE_BATCH, current_request_context, request_context
+from agents.utils.scheduler import FairScheduler
 from agents.utils.schemas import (
     Context,
+    ConversationMessage,
     CurrentSolution,
     Emotion,
     FirestoreOutput,
+    FollowupAnswer,
     FollowupQuestion,
     Job,
     Pain,
@@ -41,8 +82,21 @@ from agents.utils.schemas import (
     ProblemDiscoveryOutput,
     ProblemDiscoverySheet,
     QualityReport,
+    SessionState,
     UnmetNeed,
 )
+from agents.utils.speculation import SpeculationPolicy, Speculator, answer_key, candidate_answers, state_key
+from agents.utils.tokens import (
+    DEGRADE_INPUT_TRUNCATED,
+    DEGRADE_META_TRIMMED,
+    TokenBudgetExceededError,
+    TokenBudgetLedger,
+    TokenBudgetPolicy,
+    TokenEstimator,
+    TokenReservation,
+    usage_meter,
+)
+from agents.utils.wire import WIRE_FORMATS, WIRE_JSON, expand_compact, schema_for
 
 
 class ProblemDiscoveryAgent:
@@ -56,11 +110,38 @@ class ProblemDiscoveryAgent:
     PHASE_NAME = "problem_discovery"
     PHASE_NUMBER = 1
     
+    # astream() で部分出力を送る最小間隔（生成文字数）
+    STREAM_PARTIAL_MIN_CHARS = 200
+    
+    # 抽出モード
+    EXTRACTION_MONOLITHIC = "monolithic"  # 1回の呼び出しでWhy深掘りまで行う
+    EXTRACTION_SPLIT = "split"            # 抽出とpainごとのWhy深掘りを分けて並列実行
+    
+    # Criticモード
+    CRITIC_FULL = "full"                  # 出力全体を毎回評価する
+    CRITIC_SECTIONAL = "sectional"        # セクション単位で評価をメモ化し、変わったセクションだけを評価する
+    
     def __init__(
         self,
         model_name: str = "gemini-2.5-flash-lite",
         temperature: float = 0.3,
         enable_critic: bool = True,
+        llm: BaseChatModel | None = None,
+        critic_llm: BaseChatModel | None = None,
+        llm_timeout: float = 30.0,
+        enable_hedging: bool = True,
+        hedger: HedgedInvoker | None = None,
+        fast_llm: BaseChatModel | None = None,
+        budget_policy: LatencyBudgetPolicy | None = None,
+        scheduler: FairScheduler | None = None,
+        extraction_mode: str = EXTRACTION_MONOLITHIC,
+        why_top_k: int = 2,
+        wire_format: str = WIRE_JSON,
+        micro_batch: MicroBatchPolicy | None = None,
+        token_ledger: TokenBudgetLedger | None = None,
+        token_policy: TokenBudgetPolicy | None = None,
+        token_estimator: TokenEstimator | None = None,
+        critic_mode: str = CRITIC_FULL,
     ):
         """
         エージェントを初期化
@@ -69,46 +150,440 @@ class ProblemDiscoveryAgent:
             model_name: 使用するLLMモデル名（デフォルト: gemini-2.5-flash-lite）
             temperature: 生成の温度パラメータ（低いほど決定的）
             enable_critic: 品質検査エージェントを有効にするか
+            llm: 抽出用LLM（省略時は model_name の Gemini クライアントを生成）
+            critic_llm: Critic用LLM（省略時は model_name の Gemini クライアントを生成）
+            llm_timeout: LLM呼び出し1回あたりのタイムアウト秒数（アーキテクチャ仕様: 30秒）
+            enable_hedging: 抽出呼び出しでヘッジドリクエストを有効にするか
+            hedger: ヘッジ実行器（複数エージェントでレイテンシ統計を共有する場合に指定）
+            fast_llm: レイテンシ予算が少ないときに切り替える高速モデル（任意）
+            budget_policy: レイテンシ予算モードの劣化ルール
+            scheduler: LLM呼び出しの公平スケジューラ（テナント・レーンは request_context で指定）
+            extraction_mode: "monolithic"（1回で抽出）または "split"（抽出後に上位painのWhy深掘りを並列実行）
+            why_top_k: split モードでWhy深掘りする pain の件数（severity × frequency の上位）
+            wire_format: 抽出時のLLM出力形式。"json"（従来）/ "compact"（短縮キー）/
+                         "compact_positional"（短縮キー＋pains・currentSolutionsを位置配列）
+            micro_batch: 指定時、batch レーンの抽出・Critic呼び出しを短い時間窓でまとめ、
+                         複数件プロンプト1回で処理する（interactive レーンには適用しない）
+            token_ledger: テナント・プロジェクトごとのトークン予算（request_context の ID に計上）
+            token_policy: 実行前のトークン見積もりと入力縮小のルール
+            token_estimator: トークン数の見積もり器（実測で校正したものを共有する場合に指定）
+            critic_mode: "full"（出力全体を評価）または "sectional"（セクションごとの評価を内容ハッシュで
+                         メモ化し、前回から変わったセクションだけをLLMで評価する。マイクロバッチは使わない）
         """
-        self.llm = ChatGoogleGenerativeAI(
+        if extraction_mode not in (self.EXTRACTION_MONOLITHIC, self.EXTRACTION_SPLIT):
+            raise ValueError(f"未対応の extraction_mode です: {extraction_mode}")
+        if wire_format not in WIRE_FORMATS:
+            raise ValueError(f"未対応の wire_format です: {wire_format}")
+        if critic_mode not in (self.CRITIC_FULL, self.CRITIC_SECTIONAL):
+            raise ValueError(f"未対応の critic_mode です: {critic_mode}")
+        
+        self.model_name = model_name
+        self.llm_timeout = llm_timeout
+        self.llm = llm or ChatGoogleGenerativeAI(
             model=model_name,
             temperature=temperature,
+            timeout=llm_timeout,
             convert_system_message_to_human=True,
         )
         self.enable_critic = enable_critic
         
         # Critic用のLLM（より厳格な評価のため低温度）
-        self.critic_llm = ChatGoogleGenerativeAI(
+        self.critic_llm = critic_llm or ChatGoogleGenerativeAI(
             model=model_name,
             temperature=0.1,
+            timeout=llm_timeout,
             convert_system_message_to_human=True,
         )
+        
+        # テールレイテンシ対策（ローリングp90を超えたら複製リクエストを送る）
+        self.hedger = hedger or HedgedInvoker(max_hedges=1 if enable_hedging else 0)
+        
+        # レイテンシ予算モード（予算が少ないときに段階的に品質を落とす）
+        self.fast_llm = fast_llm
+        self.budget_policy = budget_policy or LatencyBudgetPolicy()
+        
+        # 複数テナントでクォータを共有する場合の公平スケジューラ
+        self.scheduler = scheduler
+        
+        # 2段階抽出（長い1回の生成を、短い抽出＋並列のWhy深掘りに分割する）
+        self.extraction_mode = extraction_mode
+        self.why_top_k = why_top_k
+        
+        # 出力トークン削減（短縮キーで出力させ、ローカルでキャメルケースに展開する）
+        self.wire_format = wire_format
+        
+        # 一括処理のマイクロバッチ（システムプロンプトと往復のオーバーヘッドを複数件で共有する）
+        self.micro_batch = micro_batch
+        self._extract_batcher: MicroBatcher | None = None
+        self._critic_batcher: MicroBatcher | None = None
+        if micro_batch is not None:
+            self._extract_batcher = MicroBatcher(self._process_extraction_batch, micro_batch, name="extract-batch")
+            if enable_critic and critic_mode == self.CRITIC_FULL:
+                self._critic_batcher = MicroBatcher(self._process_critic_batch, micro_batch, name="critic-batch")
+        
+        # トークン予算（実行前に見積もり、超える場合は入力を縮めるか拒否する）
+        self.token_ledger = token_ledger
+        self.token_policy = token_policy or TokenBudgetPolicy()
+        self.token_estimator = token_estimator or TokenEstimator()
+        
+        # セクション単位のCritic（往復の2回目以降は変わったセクションだけを評価する）
+        self.critic_mode = critic_mode
+        self.critic_memo = VerdictMemo() if critic_mode == self.CRITIC_SECTIONAL else None
     
-    def run(self, input_data: ProblemDiscoveryInput) -> ProblemDiscoveryOutput:
+    def run(
+        self,
+        input_data: ProblemDiscoveryInput,
+        deadline: Deadline | float | None = None,
+        latency_budget: float | None = None,
+    ) -> ProblemDiscoveryOutput:
         """
         エージェントのメイン実行メソッド
         
         Args:
             input_data: 入力データ（ユーザーの自由記述など）
+            deadline: 締め切り（Deadline または残り秒数）。各LLM呼び出しに残り時間を渡す
+            latency_budget: レイテンシ予算（秒）。指定時は予算に応じて
+                            高速モデル・履歴短縮・ローカル品質検査へ段階的に劣化する
+        
+        Returns:
+            構造化された課題探索結果（適用した劣化は degradations に記録）
+        
+        Raises:
+            TokenBudgetExceededError: 入力を縮めてもトークン予算に収まらない場合（LLMは呼ばない）
+        """
+        input_data, deadline, llm, degradations = self._plan_budget(
+            input_data, Deadline.coerce(deadline), latency_budget
+        )
+        input_data, reservation = self._plan_tokens(input_data, degradations)
+        
+        with self._metered(reservation):
+            # Step 1-4: 情報抽出・Why深掘り・不足判定・problemStatement生成
+            raw_output = self._extract_and_structure(input_data, deadline, llm)
+            
+            # パース
+            output = self._parse_output(raw_output)
+            
+            # Critic（品質検査）が有効な場合
+            if self.enable_critic:
+                if self._should_use_local_critic(deadline, latency_budget):
+                    output = self._run_local_critic(output)
+                    degradations.append(DEGRADE_LOCAL_CRITIC)
+                else:
+                    output = self._run_critic(output, deadline)
+        
+        output.degradations = degradations
+        return output
+    
+    async def arun(
+        self,
+        input_data: ProblemDiscoveryInput,
+        deadline: Deadline | float | None = None,
+        latency_budget: float | None = None,
+    ) -> ProblemDiscoveryOutput:
+        """
+        run() の非同期版
+        
+        キャンセルされた場合は実行中のLLM呼び出しも含めてキャンセルされる。
+        """
+        input_data, deadline, llm, degradations = self._plan_budget(
+            input_data, Deadline.coerce(deadline), latency_budget
+        )
+        input_data, reservation = self._plan_tokens(input_data, degradations)
+        
+        with self._metered(reservation):
+            raw_output = await self._aextract_and_structure(input_data, deadline, llm)
+            output = self._parse_output(raw_output)
             
+            if self.enable_critic:
+                if self._should_use_local_critic(deadline, latency_budget):
+                    output = self._run_local_critic(output)
+                    degradations.append(DEGRADE_LOCAL_CRITIC)
+                else:
+                    output = await self._arun_critic(output, deadline)
+        
+        output.degradations = degradations
+        return output
+    
+    async def astream(
+        self,
+        input_data: ProblemDiscoveryInput,
+        deadline: Deadline | float | None = None,
+        latency_budget: float | None = None,
+    ) -> AsyncIterator[tuple[str, Any]]:
+        """
+        進捗と部分出力を逐次返す arun()
+        
+        Yields:
+            ("progress", {"stage": ...})  処理段階（extract / why / critic）
+            ("partial", dict)             生成途中のJSON（キャメルケース、未完成フィールドを含む）
+            ("result", ProblemDiscoveryOutput)  最終出力
+        
+        抽出はストリーミングで行うためヘッジは使わない（タイムアウトのみ適用）。
+        トークン予算は run() と同じく実績で精算し、途中で中断された場合は使用分だけを計上する。
+        """
+        input_data, deadline, llm, degradations = self._plan_budget(
+            input_data, Deadline.coerce(deadline), latency_budget
+        )
+        input_data, reservation = self._plan_tokens(input_data, degradations)
+        
+        # 中断（切断・例外）された場合も finally で予約を精算・返却する
+        with self._metered(reservation):
+            messages = self._build_extraction_messages(input_data)
+            
+            yield "progress", {"stage": "extract"}
+            content = ""
+            last_partial = None
+            emitted_at = 0
+            try:
+                async with asyncio.timeout(self._call_timeout(deadline)), self._aslot(deadline):
+                    async for chunk in llm.astream(messages):
+                        content += chunk.content if isinstance(chunk.content, str) else ""
+                        if len(content) - emitted_at < self.STREAM_PARTIAL_MIN_CHARS:
+                            continue
+                        partial = parse_partial_json(self._strip_partial_fence(content))
+                        if isinstance(partial, dict):
+                            partial = self._from_wire(partial)
+                        if isinstance(partial, dict) and partial != last_partial:
+                            last_partial, emitted_at = partial, len(content)
+                            yield "partial", partial
+                raw_output = self._decode_extraction(content)
+            except TimeoutError as e:
+                raw_output = self._error_output("timeout", f"LLMタイムアウト: {str(e) or 'streaming'}")
+            
+            if self._why_targets(raw_output):
+                yield "progress", {"stage": "why"}
+                raw_output = await self._adeepen_whys(raw_output, deadline, llm)
+            
+            output = self._parse_output(raw_output)
+            
+            if self.enable_critic:
+                if self._should_use_local_critic(deadline, latency_budget):
+                    output = self._run_local_critic(output)
+                    degradations.append(DEGRADE_LOCAL_CRITIC)
+                else:
+                    yield "progress", {"stage": "critic"}
+                    output = await self._arun_critic(output, deadline)
+        
+        output.degradations = degradations
+        yield "result", output
+    
+    def _plan_budget(
+        self,
+        input_data: ProblemDiscoveryInput,
+        deadline: Deadline | None,
+        latency_budget: float | None,
+    ) -> tuple[ProblemDiscoveryInput, Deadline | None, BaseChatModel, list[str]]:
+        """
+        レイテンシ予算に応じて、実行前に適用する劣化（モデル・履歴）を決める
+        
         Returns:
-            構造化された課題探索結果
+            (入力データ, デッドライン, 抽出に使うLLM, 適用した劣化のリスト)
         """
-        # Step 1-4: 情報抽出・Why深掘り・不足判定・problemStatement生成
-        raw_output = self._extract_and_structure(input_data)
+        degradations: list[str] = []
+        if latency_budget is None:
+            return input_data, deadline, self.llm, degradations
+        
+        budget = Deadline.after(latency_budget)
+        if deadline is None or budget.expires_at < deadline.expires_at:
+            deadline = budget
+        remaining = deadline.remaining()
+        policy = self.budget_policy
         
-        # パース
-        output = self._parse_output(raw_output)
+        llm = self.llm
+        if self.fast_llm is not None and remaining < policy.fast_model_below:
+            llm = self.fast_llm
+            degradations.append(DEGRADE_FAST_MODEL)
         
-        # Critic（品質検査）が有効な場合
+        history = input_data.history or []
+        if remaining < policy.short_history_below and len(history) > policy.short_history_messages:
+            keep = policy.short_history_messages
+            input_data = input_data.model_copy(update={"history": history[-keep:] if keep else []})
+            degradations.append(DEGRADE_SHORT_HISTORY)
+        
+        return input_data, deadline, llm, degradations
+    
+    # ---------- トークン予算 ----------
+    
+    def _estimate_run_tokens(self, input_data: ProblemDiscoveryInput) -> int:
+        """
+        1回の実行で使うトークン数の見積もり（描画済みの抽出プロンプト＋想定出力）
+        
+        split モードのWhy深掘りと Critic の呼び出し分も含める。Critic の入力は
+        抽出出力と同程度、Why深掘りの入力はシステムプロンプト＋想定出力と同程度とみなす。
+        """
+        estimate = self.token_estimator.estimate
+        policy = self.token_policy
+        total = sum(estimate(str(m.content)) for m in self._build_extraction_messages(input_data))
+        total += policy.extraction_output_tokens
+        if self.extraction_mode == self.EXTRACTION_SPLIT:
+            total += self.why_top_k * (estimate(WHY_DEEPDIVE_PROMPT) + 2 * policy.why_output_tokens)
         if self.enable_critic:
-            output = self._run_critic(output)
+            critic_prompt = SECTION_CRITIC_PROMPT if self.critic_mode == self.CRITIC_SECTIONAL else CRITIC_PROMPT
+            total += estimate(critic_prompt) + policy.extraction_output_tokens + policy.critic_output_tokens
+        return total
+    
+    def _plan_tokens(
+        self,
+        input_data: ProblemDiscoveryInput,
+        degradations: list[str],
+    ) -> tuple[ProblemDiscoveryInput, TokenReservation | None]:
+        """
+        実行前にトークン数を見積もり、上限（1回の上限と予算の残りの小さい方）に収まるよう入力を縮める
         
-        return output
+        会話履歴（古い順）→ project_meta → ユーザー記述（末尾）の順に縮め、適用した縮小は
+        degradations に記録する。予算がある場合は見積もりを予約する。
+        1回の上限（token_policy.max_request_tokens）も台帳もなければ見積もり自体を行わない。
+        
+        Raises:
+            TokenBudgetExceededError: 縮めても収まらない場合
+        """
+        scope, limit = "request", self.token_policy.max_request_tokens
+        if self.token_ledger is not None:
+            ledger_scope, remaining = self.token_ledger.remaining()
+            if remaining is not None and (limit is None or remaining < limit):
+                scope, limit = ledger_scope, remaining
+        if limit is None:
+            if self.token_ledger is None:
+                return input_data, None
+            return input_data, self.token_ledger.reserve(self._estimate_run_tokens(input_data))
+        
+        input_data, estimated = self._shrink_to_fit(input_data, limit, degradations)
+        if estimated > limit:
+            raise TokenBudgetExceededError(
+                f"入力を縮めてもトークン上限に収まらないため実行しません（{scope}: 見積もり {estimated} / 上限 {limit}）",
+                scope=scope,
+                estimated=estimated,
+                remaining=limit,
+            )
+        if self.token_ledger is None:
+            return input_data, None
+        return input_data, self.token_ledger.reserve(estimated)
     
-    def _extract_and_structure(self, input_data: ProblemDiscoveryInput) -> dict[str, Any]:
+    def _shrink_to_fit(
+        self,
+        input_data: ProblemDiscoveryInput,
+        limit: int,
+        degradations: list[str],
+    ) -> tuple[ProblemDiscoveryInput, int]:
+        """見積もりが limit 以下になるまで入力を縮め、(入力, 見積もり) を返す"""
+        policy = self.token_policy
+        estimated = self._estimate_run_tokens(input_data)
+        
+        # 1. 会話履歴を古い順に落とす
+        history = list(input_data.history or [])
+        if estimated > limit and len(history) > policy.min_history_messages:
+            while estimated > limit and len(history) > policy.min_history_messages:
+                history.pop(0)
+                input_data = input_data.model_copy(update={"history": history})
+                estimated = self._estimate_run_tokens(input_data)
+            if DEGRADE_SHORT_HISTORY not in degradations:
+                degradations.append(DEGRADE_SHORT_HISTORY)
+        
+        # 2. project_meta の各リストと値を切り詰める
+        if estimated > limit and input_data.project_meta is not None:
+            meta = input_data.project_meta
+            
+            def clip(value: str | None) -> str | None:
+                return value[:policy.meta_value_chars] if value else value
+            
+            trimmed = meta.model_copy(update={
+                "industry": clip(meta.industry),
+                "target_customer": clip(meta.target_customer),
+                "constraints": [clip(v) for v in (meta.constraints or [])[:policy.meta_list_items]],
+                "existing_assets": [clip(v) for v in (meta.existing_assets or [])[:policy.meta_list_items]],
+            })
+            if trimmed != meta:
+                input_data = input_data.model_copy(update={"project_meta": trimmed})
+                estimated = self._estimate_run_tokens(input_data)
+                degradations.append(DEGRADE_META_TRIMMED)
+        
+        # 3. ユーザー記述の末尾を省略（収まる最長の長さを二分探索）
+        text = input_data.user_free_text
+        if estimated > limit and len(text) > policy.min_user_text_chars:
+            def truncated(length: int) -> ProblemDiscoveryInput:
+                return input_data.model_copy(update={"user_free_text": text[:length] + "…（以下省略）"})
+            
+            low, high = policy.min_user_text_chars, len(text) - 1
+            while low < high:
+                mid = (low + high + 1) // 2
+                if self._estimate_run_tokens(truncated(mid)) <= limit:
+                    low = mid
+                else:
+                    high = mid - 1
+            input_data = truncated(low)
+            estimated = self._estimate_run_tokens(input_data)
+            degradations.append(DEGRADE_INPUT_TRUNCATED)
+        
+        return input_data, estimated
+    
+    @contextlib.contextmanager
+    def _metered(self, reservation: TokenReservation | None):
         """
-        Step 1-4: LLMを使用して情報を抽出・構造化
+        with ブロック内のLLM呼び出しの実績トークン数で予約を精算する
+        
+        マイクロバッチ使用時は他の要求と呼び出しを共有するため、見積もりのまま計上する。
+        """
+        if reservation is None:
+            yield
+            return
+        with usage_meter() as meter:
+            completed = False
+            try:
+                yield
+                completed = True
+            finally:
+                actual = meter.total_tokens
+                if self.micro_batch is None and actual > 0:
+                    self.token_ledger.settle(reservation, actual)
+                elif self.micro_batch is None and not completed and not meter.started:
+                    # LLMを1度も呼ばずに中断された（キャンセル・例外）: 予約を返却する
+                    self.token_ledger.settle(reservation, 0)
+    
+    def _should_use_local_critic(self, deadline: Deadline | None, latency_budget: float | None) -> bool:
+        """抽出後の残り時間がLLM Criticに足りない場合は True"""
+        if latency_budget is None or deadline is None:
+            return False
+        return deadline.remaining() < self.budget_policy.llm_critic_below
+    
+    def _invoke(self, llm: BaseChatModel, messages: list[BaseMessage], deadline: Deadline | None = None) -> Any:
+        """
+        LLM呼び出し（スケジューラがあれば実行枠を獲得してから）
+        
+        クライアントには呼び出し開始時点のデッドラインの残り時間をタイムアウトとして渡す
+        （ヘッジ実行器が見限った試行のスレッドが、デッドライン後も応答を待ち続けないように）。
+        """
+        if self.scheduler is None:
+            return llm.invoke(messages, timeout=self._client_timeout(deadline))
+        with self.scheduler.slot(deadline=deadline):
+            return llm.invoke(messages, timeout=self._client_timeout(deadline))
+    
+    async def _ainvoke(self, llm: BaseChatModel, messages: list[BaseMessage], deadline: Deadline | None = None) -> Any:
+        """_invoke() の非同期版"""
+        async with self._aslot(deadline):
+            return await llm.ainvoke(messages, timeout=self._client_timeout(deadline))
+    
+    def _client_timeout(self, deadline: Deadline | None) -> float:
+        """クライアントに渡すタイムアウト。デッドラインを過ぎていれば呼び出さない"""
+        timeout = self._call_timeout(deadline)
+        if timeout <= 0:
+            raise DeadlineExceededError("デッドラインを超過しています")
+        return timeout
+    
+    def _aslot(self, deadline: Deadline | None = None):
+        """スケジューラの実行枠（スケジューラがなければ何もしない。待ちはデッドラインまで）"""
+        if self.scheduler is None:
+            return contextlib.nullcontext()
+        return self.scheduler.aslot(deadline=deadline)
+    
+    def _call_timeout(self, deadline: Deadline | None) -> float:
+        """LLM呼び出し1回に与えるタイムアウト（デッドラインの残り時間で切り詰め）"""
+        if deadline is None:
+            return self.llm_timeout
+        return deadline.clamp(self.llm_timeout)
+    
+    def _build_extraction_messages(self, input_data: ProblemDiscoveryInput) -> list[BaseMessage]:
+        """
+        抽出用のメッセージを構築
         """
         # プロンプト構築
         project_meta_dict = None
@@ -123,44 +598,268 @@ class ProblemDiscoveryAgent:
             user_free_text=input_data.user_free_text,
             project_meta=project_meta_dict,
             history=history_list,
+            output_schema=schema_for(self.wire_format),
         )
         
-        # LLM呼び出し
-        messages = [
-            SystemMessage(content=SYSTEM_PROMPT),
+        # split モードではWhy深掘りを除いた1段目のプロンプトを使う
+        system_prompt = EXTRACTION_PROMPT if self.extraction_mode == self.EXTRACTION_SPLIT else SYSTEM_PROMPT
+        
+        return [
+            SystemMessage(content=system_prompt),
             HumanMessage(content=user_prompt),
         ]
+    
+    def _extract_and_structure(
+        self,
+        input_data: ProblemDiscoveryInput,
+        deadline: Deadline | None = None,
+        llm: BaseChatModel | None = None,
+    ) -> dict[str, Any]:
+        """
+        Step 1-4: LLMを使用して情報を抽出・構造化
+        """
+        llm = llm or self.llm
+        
+        # 一括処理ではマイクロバッチに投入（失敗した場合・高速モデルへの劣化時は単発呼び出し）
+        if self._use_batcher(self._extract_batcher) and llm is self.llm:
+            try:
+                decoded = self._submit_batched(self._extract_batcher, input_data, deadline)
+            except DeadlineExceededError as e:
+                return self._error_output("timeout", f"LLMタイムアウト: {str(e)}")
+            if decoded is not None:
+                return self._deepen_whys(decoded, deadline, llm)
         
-        response = self.llm.invoke(messages)
+        messages = self._build_extraction_messages(input_data)
         
-        # JSON解析
+        # LLM呼び出し（タイムアウト＋ヘッジ付き）
         try:
-            # Markdownコードブロックを除去（Geminiが ```json ... ``` でラップする場合がある）
-            content = response.content.strip() if response.content else ""
-            if content.startswith("```"):
-                # 最初の行（```json など）を除去
-                lines = content.split("\n")
-                if lines[0].startswith("```"):
-                    lines = lines[1:]
-                # 最後の ``` を除去
-                if lines and lines[-1].strip() == "```":
-                    lines = lines[:-1]
-                content = "\n".join(lines)
-            
-            return json.loads(content)
+            response = self.hedger.invoke(
+                lambda: self._invoke(llm, messages, deadline),
+                timeout=self._call_timeout(deadline),
+                is_valid=self._is_valid_response,
+            )
+        except DeadlineExceededError as e:
+            return self._error_output("timeout", f"LLMタイムアウト: {str(e)}")
+        
+        return self._deepen_whys(self._decode_extraction(response.content), deadline, llm)
+    
+    async def _aextract_and_structure(
+        self,
+        input_data: ProblemDiscoveryInput,
+        deadline: Deadline | None = None,
+        llm: BaseChatModel | None = None,
+    ) -> dict[str, Any]:
+        """
+        _extract_and_structure() の非同期版
+        """
+        llm = llm or self.llm
+        
+        if self._use_batcher(self._extract_batcher) and llm is self.llm:
+            try:
+                decoded = await self._asubmit_batched(self._extract_batcher, input_data, deadline)
+            except DeadlineExceededError as e:
+                return self._error_output("timeout", f"LLMタイムアウト: {str(e)}")
+            if decoded is not None:
+                return await self._adeepen_whys(decoded, deadline, llm)
+        
+        messages = self._build_extraction_messages(input_data)
+        
+        try:
+            response = await self.hedger.ainvoke(
+                lambda: self._ainvoke(llm, messages, deadline),
+                timeout=self._call_timeout(deadline),
+                is_valid=self._is_valid_response,
+            )
+        except DeadlineExceededError as e:
+            return self._error_output("timeout", f"LLMタイムアウト: {str(e)}")
+        
+        return await self._adeepen_whys(self._decode_extraction(response.content), deadline, llm)
+    
+    # ---------- 2段階抽出（split モード） ----------
+    
+    def _why_targets(self, raw_output: dict[str, Any]) -> list[dict[str, Any]]:
+        """
+        Why深掘りの対象 pain を選ぶ
+        
+        split モードでのみ、severity × frequency の降順で上位 why_top_k 件を返す
+        （同点は抽出順）。抽出に失敗している場合は空。
+        """
+        if self.extraction_mode != self.EXTRACTION_SPLIT or self.why_top_k <= 0:
+            return []
+        sheet = raw_output.get("problemDiscoverySheet")
+        if not isinstance(sheet, dict):
+            return []
+        pains = [p for p in sheet.get("pains") or [] if isinstance(p, dict) and p.get("pain")]
+        ranked = sorted(pains, key=lambda p: -self._pain_score(p))
+        return ranked[:self.why_top_k]
+    
+    @staticmethod
+    def _pain_score(pain: dict[str, Any]) -> int:
+        """severity × frequency（解釈できない値は1として扱う）"""
+        score = 1
+        for key in ("severity", "frequency"):
+            try:
+                score *= min(5, max(1, int(pain.get(key, 1))))
+            except (TypeError, ValueError):
+                pass
+        return score
+    
+    def _build_why_messages(self, raw_output: dict[str, Any], pain: dict[str, Any]) -> list[BaseMessage]:
+        """pain 1件分のWhy深掘りメッセージを構築"""
+        sheet = raw_output["problemDiscoverySheet"]
+        job = sheet.get("job") if isinstance(sheet.get("job"), dict) else None
+        context = sheet.get("context") if isinstance(sheet.get("context"), dict) else None
+        return [
+            SystemMessage(content=WHY_DEEPDIVE_PROMPT),
+            HumanMessage(content=get_why_prompt(pain, job, context)),
+        ]
+    
+    def _decode_why(self, content: Any) -> dict[str, Any] | None:
+        """Why深掘り応答を unmetNeeds の1要素に変換（解釈できなければ None）"""
+        try:
+            data = json.loads(self._strip_code_fence(content))
+        except (json.JSONDecodeError, TypeError):
+            return None
+        if not isinstance(data, dict) or not data.get("need"):
+            return None
+        why_depth = data.get("whyDepth") or []
+        if not isinstance(why_depth, list):
+            why_depth = [why_depth]
+        return {"need": str(data["need"]), "whyDepth": [str(w) for w in why_depth][:5]}
+    
+    @staticmethod
+    def _merge_whys(raw_output: dict[str, Any], needs: list[dict[str, Any] | None]) -> dict[str, Any]:
+        """
+        Why深掘りの結果を unmetNeeds に統合（pain の順位順）
+        
+        すべて失敗した場合は1段目の出力をそのまま残し、Critic に不足として判定させる。
+        """
+        needs = [n for n in needs if n]
+        if needs:
+            raw_output["problemDiscoverySheet"]["unmetNeeds"] = needs
+        return raw_output
+    
+    def _deepen_whys(
+        self,
+        raw_output: dict[str, Any],
+        deadline: Deadline | None,
+        llm: BaseChatModel,
+    ) -> dict[str, Any]:
+        """
+        上位 pain のWhy深掘りをスレッドで並列実行して統合
+        
+        各呼び出しはタイムアウトのみ適用する（ヘッジは抽出の1段目だけ）。
+        """
+        targets = self._why_targets(raw_output)
+        if not targets:
+            return raw_output
+        
+        def deepen(pain: dict[str, Any]) -> dict[str, Any] | None:
+            messages = self._build_why_messages(raw_output, pain)
+            try:
+                response = self.hedger.invoke(
+                    lambda: self._invoke(llm, messages, deadline),
+                    timeout=self._call_timeout(deadline),
+                    hedge=False,
+                )
+            except DeadlineExceededError:
+                return None
+            return self._decode_why(response.content)
+        
+        # request_context（テナント・レーン）を各スレッドに引き継ぐ
+        with ThreadPoolExecutor(max_workers=len(targets), thread_name_prefix="why-deepdive") as pool:
+            futures = [pool.submit(contextvars.copy_context().run, deepen, pain) for pain in targets]
+            needs = [future.result() for future in futures]
+        return self._merge_whys(raw_output, needs)
+    
+    async def _adeepen_whys(
+        self,
+        raw_output: dict[str, Any],
+        deadline: Deadline | None,
+        llm: BaseChatModel,
+    ) -> dict[str, Any]:
+        """_deepen_whys() の非同期版"""
+        targets = self._why_targets(raw_output)
+        if not targets:
+            return raw_output
+        
+        async def deepen(pain: dict[str, Any]) -> dict[str, Any] | None:
+            messages = self._build_why_messages(raw_output, pain)
+            try:
+                response = await self.hedger.ainvoke(
+                    lambda: self._ainvoke(llm, messages, deadline),
+                    timeout=self._call_timeout(deadline),
+                    hedge=False,
+                )
+            except DeadlineExceededError:
+                return None
+            return self._decode_why(response.content)
+        
+        needs = await asyncio.gather(*(deepen(pain) for pain in targets))
+        return self._merge_whys(raw_output, needs)
+    
+    @staticmethod
+    def _strip_code_fence(content: str) -> str:
+        """Markdownコードブロックを除去（Geminiが ```json ... ``` でラップする場合がある）"""
+        content = content.strip() if content else ""
+        if content.startswith("```"):
+            # 最初の行（```json など）を除去
+            lines = content.split("\n")
+            if lines[0].startswith("```"):
+                lines = lines[1:]
+            # 最後の ``` を除去
+            if lines and lines[-1].strip() == "```":
+                lines = lines[:-1]
+            content = "\n".join(lines)
+        return content
+    
+    @staticmethod
+    def _strip_partial_fence(content: str) -> str:
+        """生成途中の応答から先頭の ```json 行を除去"""
+        content = content.lstrip()
+        if content.startswith("```"):
+            content = content.split("\n", 1)[1] if "\n" in content else ""
+        return content.rstrip("`")
+    
+    def _is_valid_response(self, response: Any) -> bool:
+        """ヘッジ判定用: 応答がJSONとして解釈できるか"""
+        try:
+            json.loads(self._strip_code_fence(response.content))
+            return True
+        except (json.JSONDecodeError, TypeError, AttributeError):
+            return False
+    
+    def _decode_extraction(self, content: Any) -> dict[str, Any]:
+        """
+        LLM応答のJSON解析
+        """
+        try:
+            data = json.loads(self._strip_code_fence(content))
         except json.JSONDecodeError as e:
             # JSONパースエラーの場合、空の構造を返す
-            return {
-                "problemStatement": "",
-                "problemDiscoverySheet": {},
-                "followupQuestions": [],
-                "qualityReport": {
-                    "confidence": 0.0,
-                    "missingFields": ["parse_error"],
-                    "contradictions": [f"JSON解析エラー: {str(e)}"],
-                    "nextAction": "ask_more",
-                },
-            }
+            return self._error_output("parse_error", f"JSON解析エラー: {str(e)}")
+        return self._from_wire(data)
+    
+    def _from_wire(self, data: Any) -> Any:
+        """短縮ワイヤーフォーマットをキャメルケース構造に展開（従来形式ならそのまま）"""
+        if self.wire_format == WIRE_JSON:
+            return data
+        return expand_compact(data)
+    
+    @staticmethod
+    def _error_output(missing_field: str, message: str) -> dict[str, Any]:
+        """抽出に失敗した場合の空の構造"""
+        return {
+            "problemStatement": "",
+            "problemDiscoverySheet": {},
+            "followupQuestions": [],
+            "qualityReport": {
+                "confidence": 0.0,
+                "missingFields": [missing_field],
+                "contradictions": [message],
+                "nextAction": "ask_more",
+            },
+        }
     
     def _parse_output(self, raw_output: dict[str, Any]) -> ProblemDiscoveryOutput:
         """
@@ -168,78 +867,7 @@ class ProblemDiscoveryAgent:
         """
         try:
             # problemDiscoverySheet のパース
-            sheet_data = raw_output.get("problemDiscoverySheet", {})
-            
-            # Job
-            job_data = sheet_data.get("job", {})
-            job = Job(
-                main=job_data.get("main", ""),
-                functional=job_data.get("functional", []),
-                emotional=job_data.get("emotional", []),
-                social=job_data.get("social", []),
-            )
-            
-            # Context
-            context_data = sheet_data.get("context", {})
-            context = Context(
-                who=context_data.get("who", ""),
-                when=context_data.get("when", ""),
-                where=context_data.get("where", ""),
-                trigger=context_data.get("trigger", ""),
-                constraints=context_data.get("constraints", []),
-                stakeholders=context_data.get("stakeholders", []),
-            )
-            
-            # Pains
-            pains = [
-                Pain(
-                    pain=p.get("pain", ""),
-                    impact=p.get("impact", ""),
-                    severity=min(5, max(1, p.get("severity", 1))),
-                    frequency=min(5, max(1, p.get("frequency", 1))),
-                    evidence=p.get("evidence", ""),
-                )
-                for p in sheet_data.get("pains", [])
-            ]
-            
-            # CurrentSolutions
-            current_solutions = [
-                CurrentSolution(
-                    solution=s.get("solution", ""),
-                    why_chosen=s.get("whyChosen", ""),
-                    dissatisfaction=s.get("dissatisfaction", ""),
-                )
-                for s in sheet_data.get("currentSolutions", [])
-            ]
-            
-            # UnmetNeeds
-            unmet_needs = [
-                UnmetNeed(
-                    need=n.get("need", ""),
-                    why_depth=n.get("whyDepth", []),
-                )
-                for n in sheet_data.get("unmetNeeds", [])
-            ]
-            
-            # Emotion
-            emotion_data = sheet_data.get("emotion", {})
-            emotion = Emotion(
-                feelings=emotion_data.get("feelings", []),
-                moment_of_truth=emotion_data.get("momentOfTruth", ""),
-            )
-            
-            # ProblemDiscoverySheet
-            problem_discovery_sheet = ProblemDiscoverySheet(
-                job=job,
-                context=context,
-                pains=pains,
-                current_solutions=current_solutions,
-                unmet_needs=unmet_needs,
-                emotion=emotion,
-                success_criteria=sheet_data.get("successCriteria", []),
-                assumptions=sheet_data.get("assumptions", []),
-                unknowns=sheet_data.get("unknowns", []),
-            )
+            problem_discovery_sheet = self._parse_sheet(raw_output.get("problemDiscoverySheet", {}))
             
             # FollowupQuestions
             followup_questions = [
@@ -247,6 +875,8 @@ class ProblemDiscoveryAgent:
                     question=q.get("question", ""),
                     intent=q.get("intent", ""),
                     type=q.get("type", "open"),
+                    target=q.get("target") or "",
+                    options=[str(o) for o in q.get("options") or []],
                 )
                 for q in raw_output.get("followupQuestions", [])
             ]
@@ -266,7 +896,7 @@ class ProblemDiscoveryAgent:
                 followup_questions=followup_questions,
                 quality_report=quality_report,
             )
-            
+        
         except (ValidationError, KeyError, TypeError) as e:
             # パースエラーの場合、最小限の出力を返す
             return ProblemDiscoveryOutput(
@@ -281,7 +911,89 @@ class ProblemDiscoveryAgent:
                 ),
             )
     
-    def _run_critic(self, output: ProblemDiscoveryOutput) -> ProblemDiscoveryOutput:
+    def _parse_sheet(self, sheet_data: dict[str, Any]) -> ProblemDiscoverySheet:
+        """
+        problemDiscoverySheet（キャメルケースの辞書）をPydanticモデルにパース
+        
+        Raises:
+            ValidationError, KeyError, TypeError: 構造が不正な場合
+        """
+        # Job
+        job_data = sheet_data.get("job", {})
+        job = Job(
+            main=job_data.get("main", ""),
+            functional=job_data.get("functional", []),
+            emotional=job_data.get("emotional", []),
+            social=job_data.get("social", []),
+        )
+        
+        # Context
+        context_data = sheet_data.get("context", {})
+        context = Context(
+            who=context_data.get("who", ""),
+            when=context_data.get("when", ""),
+            where=context_data.get("where", ""),
+            trigger=context_data.get("trigger", ""),
+            constraints=context_data.get("constraints", []),
+            stakeholders=context_data.get("stakeholders", []),
+        )
+        
+        # Pains
+        pains = [
+            Pain(
+                pain=p.get("pain", ""),
+                impact=p.get("impact", ""),
+                severity=min(5, max(1, p.get("severity", 1))),
+                frequency=min(5, max(1, p.get("frequency", 1))),
+                evidence=p.get("evidence", ""),
+            )
+            for p in sheet_data.get("pains", [])
+        ]
+        
+        # CurrentSolutions
+        current_solutions = [
+            CurrentSolution(
+                solution=s.get("solution", ""),
+                why_chosen=s.get("whyChosen", ""),
+                dissatisfaction=s.get("dissatisfaction", ""),
+            )
+            for s in sheet_data.get("currentSolutions", [])
+        ]
+        
+        # UnmetNeeds
+        unmet_needs = [
+            UnmetNeed(
+                need=n.get("need", ""),
+                why_depth=n.get("whyDepth", []),
+            )
+            for n in sheet_data.get("unmetNeeds", [])
+        ]
+        
+        # Emotion
+        emotion_data = sheet_data.get("emotion", {})
+        emotion = Emotion(
+            feelings=emotion_data.get("feelings", []),
+            moment_of_truth=emotion_data.get("momentOfTruth", ""),
+        )
+        
+        # ProblemDiscoverySheet
+        return ProblemDiscoverySheet(
+            job=job,
+            context=context,
+            pains=pains,
+            current_solutions=current_solutions,
+            unmet_needs=unmet_needs,
+            emotion=emotion,
+            success_criteria=sheet_data.get("successCriteria", []),
+            assumptions=sheet_data.get("assumptions", []),
+            unknowns=sheet_data.get("unknowns", []),
+        )
+    
+    def _run_critic(
+        self,
+        output: ProblemDiscoveryOutput,
+        deadline: Deadline | None = None,
+    ) -> ProblemDiscoveryOutput:
         """
         品質検査エージェント（Critic）を実行
         
@@ -293,36 +1005,446 @@ class ProblemDiscoveryAgent:
         - unmetNeeds が pains と論理的につながっているか
         - problemStatement が1文で完結しているか
         """
+        if self.critic_mode == self.CRITIC_SECTIONAL:
+            return self._run_sectional_critic(output, deadline)
+        
+        if self._use_batcher(self._critic_batcher):
+            try:
+                result = self._submit_batched(self._critic_batcher, output, deadline)
+            except DeadlineExceededError:
+                return output
+            if result is not None:
+                return self._apply_critic_result(output, result)
+        
+        messages = self._build_critic_messages(output)
+        
+        try:
+            response = self.hedger.invoke(
+                lambda: self._invoke(self.critic_llm, messages, deadline),
+                timeout=self._call_timeout(deadline),
+                hedge=False,
+            )
+        except DeadlineExceededError:
+            # Criticのタイムアウトは無視して元の出力を返す
+            return output
+        
+        return self._apply_critic_response(output, response.content)
+    
+    async def _arun_critic(
+        self,
+        output: ProblemDiscoveryOutput,
+        deadline: Deadline | None = None,
+    ) -> ProblemDiscoveryOutput:
+        """
+        _run_critic() の非同期版
+        """
+        if self.critic_mode == self.CRITIC_SECTIONAL:
+            return await self._arun_sectional_critic(output, deadline)
+        
+        if self._use_batcher(self._critic_batcher):
+            try:
+                result = await self._asubmit_batched(self._critic_batcher, output, deadline)
+            except DeadlineExceededError:
+                return output
+            if result is not None:
+                return self._apply_critic_result(output, result)
+        
+        messages = self._build_critic_messages(output)
+        
+        try:
+            response = await self.hedger.ainvoke(
+                lambda: self._ainvoke(self.critic_llm, messages, deadline),
+                timeout=self._call_timeout(deadline),
+                hedge=False,
+            )
+        except DeadlineExceededError:
+            return output
+        
+        return self._apply_critic_response(output, response.content)
+    
+    def _run_sectional_critic(
+        self,
+        output: ProblemDiscoveryOutput,
+        deadline: Deadline | None = None,
+    ) -> ProblemDiscoveryOutput:
+        """
+        セクション単位のCritic
+        
+        内容ハッシュがメモにあるセクションは前回までの評価を使い、変わったセクションだけを
+        1回の呼び出しで評価する。すべてのセクションがメモにあればLLMを呼ばない。
+        """
+        keys, verdicts, messages = self._prepare_sectional_critic(output)
+        if messages is not None:
+            try:
+                response = self.hedger.invoke(
+                    lambda: self._invoke(self.critic_llm, messages, deadline),
+                    timeout=self._call_timeout(deadline),
+                    hedge=False,
+                )
+            except DeadlineExceededError:
+                return output
+            verdicts.update(self._decode_section_verdicts(response.content, keys, verdicts))
+        return self._apply_section_verdicts(output, verdicts)
+    
+    async def _arun_sectional_critic(
+        self,
+        output: ProblemDiscoveryOutput,
+        deadline: Deadline | None = None,
+    ) -> ProblemDiscoveryOutput:
+        """
+        _run_sectional_critic() の非同期版
+        """
+        keys, verdicts, messages = self._prepare_sectional_critic(output)
+        if messages is not None:
+            try:
+                response = await self.hedger.ainvoke(
+                    lambda: self._ainvoke(self.critic_llm, messages, deadline),
+                    timeout=self._call_timeout(deadline),
+                    hedge=False,
+                )
+            except DeadlineExceededError:
+                return output
+            verdicts.update(self._decode_section_verdicts(response.content, keys, verdicts))
+        return self._apply_section_verdicts(output, verdicts)
+    
+    def _prepare_sectional_critic(
+        self,
+        output: ProblemDiscoveryOutput,
+    ) -> tuple[dict[str, str], dict[str, dict[str, Any]], list[BaseMessage] | None]:
+        """
+        セクションの内容ハッシュを計算し、メモ済みの評価と変わったセクションの評価用メッセージを返す
+        
+        Returns:
+            (セクション名 → ハッシュ, メモ済みの評価, メッセージ。評価するセクションがなければ None)
+        """
+        payloads = section_payloads(output)
+        keys = {name: section_hash(name, payloads) for name in CRITIC_SECTIONS}
+        verdicts = {}
+        for name, key in keys.items():
+            verdict = self.critic_memo.get(key)
+            if verdict is not None:
+                verdicts[name] = verdict
+        changed = [name for name in CRITIC_SECTIONS if name not in verdicts]
+        if not changed:
+            return keys, verdicts, None
+        
+        user_prompt = get_section_critic_prompt(
+            {name: payloads[name] for name in changed},
+            {name: section_references(name, payloads) for name in changed},
+        )
+        return keys, verdicts, [
+            SystemMessage(content=SECTION_CRITIC_PROMPT),
+            HumanMessage(content=user_prompt),
+        ]
+    
+    def _decode_section_verdicts(
+        self,
+        content: Any,
+        keys: dict[str, str],
+        memoized: dict[str, dict[str, Any]],
+    ) -> dict[str, dict[str, Any]]:
+        """評価したセクションの応答を検証してメモに追加する（解析できないセクションは含めない）"""
+        try:
+            sections = json.loads(self._strip_code_fence(content))["sections"]
+        except (json.JSONDecodeError, KeyError, TypeError, AttributeError):
+            return {}
+        if not isinstance(sections, dict):
+            return {}
+        verdicts = {}
+        for name in CRITIC_SECTIONS:
+            if name in memoized:
+                continue
+            verdict = validate_verdict(sections.get(name))
+            if verdict is not None:
+                self.critic_memo.put(keys[name], verdict)
+                verdicts[name] = verdict
+        return verdicts
+    
+    @staticmethod
+    def _apply_section_verdicts(
+        output: ProblemDiscoveryOutput,
+        verdicts: dict[str, dict[str, Any]],
+    ) -> ProblemDiscoveryOutput:
+        """
+        セクションごとの評価をまとめて qualityReport を更新する
+        
+        評価が揃わないセクションがあれば、Criticのエラーと同様に抽出時の自己評価を残す。
+        """
+        if any(name not in verdicts for name in CRITIC_SECTIONS):
+            return output
+        output.quality_report = combine_verdicts(verdicts)
+        return output
+    
+    def _run_local_critic(self, output: ProblemDiscoveryOutput) -> ProblemDiscoveryOutput:
+        """
+        LLMを使わない品質検査（レイテンシ予算不足時の代替）
+        
+        抽出時の自己評価とローカル構造チェックを保守的に統合する。
+        """
+        local = local_quality_check(output)
+        current = output.quality_report
+        missing_fields = list(dict.fromkeys(current.missing_fields + local.missing_fields))
+        
+        output.quality_report = QualityReport(
+            confidence=min(current.confidence, local.confidence),
+            missing_fields=missing_fields,
+            contradictions=current.contradictions,
+            next_action="proceed" if not missing_fields and current.next_action == "proceed" else "ask_more",
+        )
+        return output
+    
+    @staticmethod
+    def _critic_payload(output: ProblemDiscoveryOutput) -> dict[str, Any]:
+        """
+        Criticに渡す出力（評価対象外の管理用フィールドを除く）
+        
+        degradations と追加質問の target / options は実行・回答適用のための情報で、
+        チェック項目に含まれないため渡さない（トークンの節約と評価の偏りの防止）。
+        """
+        payload = FirestoreOutput.from_output(output)
+        payload.pop("degradations", None)
+        payload["followupQuestions"] = [
+            {key: value for key, value in question.items() if key not in ("target", "options")}
+            for question in payload["followupQuestions"]
+        ]
+        return payload
+    
+    def _build_critic_messages(self, output: ProblemDiscoveryOutput) -> list[BaseMessage]:
+        """
+        Critic用のメッセージを構築
+        """
         # 現在の出力をJSON形式で準備
         current_output_json = json.dumps(
-            FirestoreOutput.from_output(output),
+            self._critic_payload(output),
             ensure_ascii=False,
             indent=2,
         )
         
-        messages = [
+        return [
             SystemMessage(content=CRITIC_PROMPT),
             HumanMessage(content=f"以下の出力を評価してください:\n\n{current_output_json}"),
         ]
-        
-        response = self.critic_llm.invoke(messages)
-        
+    
+    def _apply_critic_response(self, output: ProblemDiscoveryOutput, content: Any) -> ProblemDiscoveryOutput:
+        """
+        Criticの応答で qualityReport を更新
+        """
+        try:
+            critic_result = json.loads(self._strip_code_fence(content))
+        except (json.JSONDecodeError, TypeError, AttributeError):
+            # Criticのエラーは無視して元の出力を返す
+            return output
+        return self._apply_critic_result(output, critic_result)
+    
+    def _apply_critic_result(self, output: ProblemDiscoveryOutput, critic_result: Any) -> ProblemDiscoveryOutput:
+        """
+        Criticの評価結果（qualityReport の辞書）で qualityReport を更新
+        """
         try:
-            critic_result = json.loads(response.content)
-            
-            # qualityReportを更新
             output.quality_report = QualityReport(
                 confidence=min(1.0, max(0.0, float(critic_result.get("confidence", 0.0)))),
                 missing_fields=critic_result.get("missingFields", []),
                 contradictions=critic_result.get("contradictions", []),
                 next_action=critic_result.get("nextAction", "ask_more"),
             )
-        except (json.JSONDecodeError, KeyError, TypeError):
+        except (KeyError, TypeError, AttributeError):
             # Criticのエラーは無視して元の出力を返す
             pass
         
         return output
     
+    # ---------- マイクロバッチ（一括処理） ----------
+    
+    @staticmethod
+    def _use_batcher(batcher: MicroBatcher | None) -> bool:
+        """マイクロバッチを使うか（batch レーンの呼び出しのみ）"""
+        return batcher is not None and current_request_context().lane == LANE_BATCH
+    
+    def _submit_batched(self, batcher: MicroBatcher, item: Any, deadline: Deadline | None) -> Any:
+        """
+        マイクロバッチに投入して結果を待つ（同じテナントの要求だけをまとめる）
+        
+        要素にはデッドラインを添えて投入する（バッチ呼び出しのタイムアウトに使う）。
+        
+        Returns:
+            検証済みの結果。再試行を使い切った・バッチ処理が失敗した場合は None
+        
+        Raises:
+            DeadlineExceededError: デッドラインまでに結果が得られなかった場合
+        """
+        future = batcher.submit((item, deadline), group=current_request_context().flow_key)
+        try:
+            return future.result(timeout=deadline.remaining() if deadline else None)
+        except BatchProcessError:
+            return None
+        except TimeoutError:
+            future.cancel()
+            raise DeadlineExceededError("マイクロバッチの結果待ちがデッドラインを超過しました")
+    
+    async def _asubmit_batched(self, batcher: MicroBatcher, item: Any, deadline: Deadline | None) -> Any:
+        """_submit_batched() の非同期版（キャンセル時はバッチ待ちからも外す）"""
+        future = batcher.submit((item, deadline), group=current_request_context().flow_key)
+        try:
+            return await asyncio.wait_for(
+                asyncio.wrap_future(future),
+                timeout=deadline.remaining() if deadline else None,
+            )
+        except BatchProcessError:
+            return None
+        except TimeoutError:
+            raise DeadlineExceededError("マイクロバッチの結果待ちがデッドラインを超過しました")
+    
+    @staticmethod
+    def _unpack_batch(entries: list[tuple[Any, Deadline | None]]) -> tuple[list[Any], Deadline | None]:
+        """
+        (要素, デッドライン) の列を要素とバッチのデッドラインに分ける
+        
+        1回の呼び出しで全要素に答えるため、最も遅いデッドラインに合わせる
+        （それより早い要素は呼び出し側が結果待ちを打ち切る）。1件でもデッドラインがなければ None。
+        """
+        items = [item for item, _ in entries]
+        deadlines = [deadline for _, deadline in entries]
+        if any(deadline is None for deadline in deadlines):
+            return items, None
+        return items, max(deadlines, key=lambda deadline: deadline.expires_at)
+    
+    def _invoke_batch(self, llm: BaseChatModel, messages: list[BaseMessage], deadline: Deadline | None) -> Any | None:
+        """
+        バッチ呼び出し1回（タイムアウトのみ適用、失敗時は None）
+        
+        タイムアウトは llm_timeout（micro_batch.call_timeout があればその値）をデッドラインで切り詰めたもの。
+        """
+        timeout = self.micro_batch.call_timeout or self.llm_timeout
+        if deadline is not None:
+            timeout = deadline.clamp(timeout)
+        if timeout <= 0:
+            return None
+        try:
+            return self.hedger.invoke(
+                lambda: self._invoke(llm, messages, deadline),
+                timeout=timeout,
+                hedge=False,
+            )
+        except TimeoutError:
+            # デッドライン超過、またはクライアント側のタイムアウトが先に発生した場合
+            return None
+    
+    def _split_batch_response(self, content: Any, ids: list[str], field: str) -> list[Any]:
+        """
+        複数件の応答 {"items": [{"id", field}]} を ID ごとに分割
+        
+        入力の順序で返し、欠けている・解析できない要素は None。
+        """
+        try:
+            data = json.loads(self._strip_code_fence(content))
+        except (json.JSONDecodeError, TypeError, AttributeError):
+            return [None] * len(ids)
+        items = data.get("items") if isinstance(data, dict) else None
+        if not isinstance(items, list):
+            return [None] * len(ids)
+        by_id = {
+            str(item.get("id")): item.get(field)
+            for item in items
+            if isinstance(item, dict)
+        }
+        return [by_id.get(item_id) for item_id in ids]
+    
+    def _validate_extraction(self, data: Any) -> dict[str, Any] | None:
+        """抽出結果1件の検証（キャメルケースに展開し、パースできなければ None）"""
+        if not isinstance(data, dict):
+            return None
+        data = self._from_wire(data)
+        if "parse_error" in self._parse_output(data).quality_report.missing_fields:
+            return None
+        return data
+    
+    @staticmethod
+    def _validate_critic_result(data: Any) -> dict[str, Any] | None:
+        """Critic評価1件の検証（nextAction と confidence が揃っていなければ None）"""
+        if not isinstance(data, dict) or data.get("nextAction") not in ("ask_more", "proceed"):
+            return None
+        try:
+            float(data.get("confidence"))
+        except (TypeError, ValueError):
+            return None
+        return data
+    
+    def _process_extraction_batch(
+        self,
+        entries: list[tuple[ProblemDiscoveryInput, Deadline | None]],
+    ) -> list[dict[str, Any] | None]:
+        """MicroBatcher から呼ばれる: 複数の入力を1回の呼び出しで抽出"""
+        inputs, deadline = self._unpack_batch(entries)
+        if len(inputs) == 1:
+            response = self._invoke_batch(self.llm, self._build_extraction_messages(inputs[0]), deadline)
+            if response is None:
+                return [None]
+            try:
+                data = json.loads(self._strip_code_fence(response.content))
+            except (json.JSONDecodeError, TypeError, AttributeError):
+                return [None]
+            return [self._validate_extraction(data)]
+        
+        ids = [f"item-{i}" for i in range(1, len(inputs) + 1)]
+        items = [
+            {
+                "id": item_id,
+                "user_free_text": input_data.user_free_text,
+                "project_meta": input_data.project_meta.model_dump() if input_data.project_meta else None,
+                "history": [msg.model_dump() for msg in input_data.history] if input_data.history else None,
+            }
+            for item_id, input_data in zip(ids, inputs)
+        ]
+        system_prompt = EXTRACTION_PROMPT if self.extraction_mode == self.EXTRACTION_SPLIT else SYSTEM_PROMPT
+        messages = [
+            SystemMessage(content=system_prompt + BATCH_EXTRACTION_INSTRUCTIONS),
+            HumanMessage(content=get_batch_user_prompt(items, output_schema=schema_for(self.wire_format))),
+        ]
+        response = self._invoke_batch(self.llm, messages, deadline)
+        if response is None:
+            return [None] * len(inputs)
+        return [self._validate_extraction(data) for data in self._split_batch_response(response.content, ids, "output")]
+    
+    def _process_critic_batch(
+        self,
+        entries: list[tuple[ProblemDiscoveryOutput, Deadline | None]],
+    ) -> list[dict[str, Any] | None]:
+        """MicroBatcher から呼ばれる: 複数の出力を1回の呼び出しで評価"""
+        outputs, deadline = self._unpack_batch(entries)
+        if len(outputs) == 1:
+            response = self._invoke_batch(self.critic_llm, self._build_critic_messages(outputs[0]), deadline)
+            if response is None:
+                return [None]
+            try:
+                data = json.loads(self._strip_code_fence(response.content))
+            except (json.JSONDecodeError, TypeError, AttributeError):
+                return [None]
+            return [self._validate_critic_result(data)]
+        
+        ids = [f"item-{i}" for i in range(1, len(outputs) + 1)]
+        prompt_parts = ["以下の各出力を評価してください:", ""]
+        for item_id, output in zip(ids, outputs):
+            prompt_parts.append(f"[item: {item_id}]")
+            prompt_parts.append(json.dumps(self._critic_payload(output), ensure_ascii=False))
+            prompt_parts.append("")
+        messages = [
+            SystemMessage(content=CRITIC_PROMPT + BATCH_CRITIC_INSTRUCTIONS),
+            HumanMessage(content="\n".join(prompt_parts)),
+        ]
+        response = self._invoke_batch(self.critic_llm, messages, deadline)
+        if response is None:
+            return [None] * len(outputs)
+        return [
+            self._validate_critic_result(data)
+            for data in self._split_batch_response(response.content, ids, "qualityReport")
+        ]
+    
+    def close(self) -> None:
+        """マイクロバッチの待機中の要求を処理してからスレッドを終了する"""
+        for batcher in (self._extract_batcher, self._critic_batcher):
+            if batcher is not None:
+                batcher.close()
+    
     def get_user_response(self, output: ProblemDiscoveryOutput) -> dict[str, Any]:
         """
         UI/UXに返すレスポンスを生成（仕様書セクション9に基づく）
@@ -341,6 +1463,8 @@ class ProblemDiscoveryAgent:
                 {
                     "question": q.question,
                     "intent": q.intent,
+                    "type": q.type,
+                    **({"options": q.options} if q.options else {}),
                 }
                 for q in output.followup_questions[:3]  # 最大3問
             ]
@@ -367,30 +1491,155 @@ class ProblemDiscoveryAgent:
 
 # ==================== チェーン定義（LangChain LCEL用） ====================
 
+class ProblemDiscoveryRunnable(Runnable[Any, ProblemDiscoveryOutput]):
+    """
+    ProblemDiscoveryAgent を LCEL の Runnable として公開するラッパー
+    
+    invoke / ainvoke は ProblemDiscoveryAgent.run / arun と同じ処理
+    （パース・エラー処理・Critic）を行い、ProblemDiscoveryOutput を返す。
+    
+    入力:
+        - ProblemDiscoveryInput
+        - dict（ProblemDiscoveryInput のフィールド、または従来チェーンの {"input": 自由記述}）
+        - str（自由記述のみ）
+    
+    config["configurable"]["latency_budget"] でレイテンシ予算（秒）を指定できる。
+    batch / abatch は config["max_concurrency"] を上限に並列実行し、
+    スケジューラ使用時は batch レーンで実行する。
+    """
+    
+    def __init__(self, agent: ProblemDiscoveryAgent):
+        self.agent = agent
+    
+    @property
+    def InputType(self) -> Any:
+        return ProblemDiscoveryInput
+    
+    @property
+    def OutputType(self) -> Any:
+        return ProblemDiscoveryOutput
+    
+    @staticmethod
+    def _coerce_input(input: Any) -> ProblemDiscoveryInput:
+        """Runnable への入力を ProblemDiscoveryInput に正規化"""
+        if isinstance(input, ProblemDiscoveryInput):
+            return input
+        if isinstance(input, str):
+            return ProblemDiscoveryInput(user_free_text=input)
+        if isinstance(input, dict):
+            if "user_free_text" not in input and "input" in input:
+                # 従来の prompt | llm | parser チェーンの入力形式
+                input = {**input, "user_free_text": input["input"]}
+                input.pop("input")
+            return ProblemDiscoveryInput.model_validate(input)
+        raise TypeError(f"未対応の入力型です: {type(input).__name__}")
+    
+    @staticmethod
+    def _latency_budget(config: RunnableConfig | None) -> float | None:
+        return (config or {}).get("configurable", {}).get("latency_budget")
+    
+    def invoke(self, input: Any, config: RunnableConfig | None = None, **kwargs: Any) -> ProblemDiscoveryOutput:
+        budget = self._latency_budget(config)
+        return self._call_with_config(
+            lambda x: self.agent.run(self._coerce_input(x), latency_budget=budget),
+            input,
+            config,
+        )
+    
+    async def ainvoke(self, input: Any, config: RunnableConfig | None = None, **kwargs: Any) -> ProblemDiscoveryOutput:
+        budget = self._latency_budget(config)
+        
+        async def run(x: Any) -> ProblemDiscoveryOutput:
+            return await self.agent.arun(self._coerce_input(x), latency_budget=budget)
+        
+        return await self._acall_with_config(run, input, config)
+    
+    def batch(
+        self,
+        inputs: list[Any],
+        config: RunnableConfig | list[RunnableConfig] | None = None,
+        *,
+        return_exceptions: bool = False,
+        **kwargs: Any,
+    ) -> list[ProblemDiscoveryOutput]:
+        with request_context(lane=LANE_BATCH):
+            return super().batch(inputs, config, return_exceptions=return_exceptions, **kwargs)
+    
+    async def abatch(
+        self,
+        inputs: list[Any],
+        config: RunnableConfig | list[RunnableConfig] | None = None,
+        *,
+        return_exceptions: bool = False,
+        **kwargs: Any,
+    ) -> list[ProblemDiscoveryOutput]:
+        with request_context(lane=LANE_BATCH):
+            return await super().abatch(inputs, config, return_exceptions=return_exceptions, **kwargs)
+    
+    async def astream(
+        self,
+        input: Any,
+        config: RunnableConfig | None = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[Any]:
+        """
+        生成途中の部分出力（キャメルケースの dict）を逐次返し、
+        最後に ProblemDiscoveryOutput を返す
+        """
+        budget = self._latency_budget(config)
+        
+        async def transform(inputs: AsyncIterator[Any]) -> AsyncIterator[Any]:
+            async for x in inputs:
+                async for event, data in self.agent.astream(self._coerce_input(x), latency_budget=budget):
+                    if event in ("partial", "result"):
+                        yield data
+        
+        async def single() -> AsyncIterator[Any]:
+            yield input
+        
+        async for chunk in self._atransform_stream_with_config(single(), transform, config):
+            yield chunk
+
+
 def create_problem_discovery_chain(
     model_name: str = "gemini-2.5-flash-lite",
     temperature: float = 0.3,
-):
+    enable_critic: bool = True,
+    agent: ProblemDiscoveryAgent | None = None,
+) -> ProblemDiscoveryRunnable:
     """
     LangChain Expression Language (LCEL) 用のチェーンを作成
-    """
-    from langchain_core.output_parsers import JsonOutputParser
-    from langchain_core.prompts import ChatPromptTemplate
     
-    prompt = ChatPromptTemplate.from_messages([
-        ("system", SYSTEM_PROMPT),
-        ("human", "{input}"),
-    ])
+    ProblemDiscoveryAgent.run と同じ結果（型付き出力・Critic・エラー処理）を返す。
+    agent を渡した場合はそのエージェント（LLMクライアント・スケジューラ等）を共有し、
+    model_name / temperature / enable_critic は無視する。
     
-    llm = ChatGoogleGenerativeAI(
-        model=model_name,
+    Example:
+        chain = create_problem_discovery_chain()
+        outputs = chain.batch(["自由記述1", "自由記述2"], config={"max_concurrency": 4})
+    """
+    agent = agent or ProblemDiscoveryAgent(
+        model_name=model_name,
         temperature=temperature,
-        convert_system_message_to_human=True,
+        enable_critic=enable_critic,
     )
+    return ProblemDiscoveryRunnable(agent)
+
+
+def create_default_agent() -> ProblemDiscoveryAgent:
+    """
+    サービス・ジョブワーカー用の既定エージェント
     
-    parser = JsonOutputParser()
-    
-    return prompt | llm | parser
+    環境変数 AGENTS_FAKE_LLM=1 の場合はフェイクLLMで動かす（APIキーなしの検証用）。
+    """
+    if os.getenv("AGENTS_FAKE_LLM") == "1":
+        from agents.benchmarks.fake_llm import FakeLatencyChatModel
+        
+        return ProblemDiscoveryAgent(
+            llm=FakeLatencyChatModel(latency=0.2, per_char_latency=0.001),
+            critic_llm=FakeLatencyChatModel(latency=0.1),
+        )
+    return ProblemDiscoveryAgent()
 
 
 # ==================== オーケストレーション ====================
@@ -402,16 +1651,30 @@ class ProblemDiscoveryOrchestrator:
     仕様書セクション8に基づく分岐制御:
     - proceed: 次フェーズ（question_design）へ
     - ask_more: followupQuestionsを表示して再実行
+    
+    speculation を指定すると、追加質問を返したあとユーザーの回答を待つ間に、
+    closed 質問の回答候補ごとの次の抽出を先行実行する（prefetch）。
     """
     
-    def __init__(self, agent: ProblemDiscoveryAgent | None = None):
+    def __init__(
+        self,
+        agent: ProblemDiscoveryAgent | None = None,
+        speculation: SpeculationPolicy | None = None,
+    ):
+        """
+        Args:
+            agent: 課題探索エージェント
+            speculation: 投機実行の設定（省略時は先行実行しない）
+        """
         self.agent = agent or ProblemDiscoveryAgent()
         self.max_iterations = 5  # 最大往復回数
+        self.speculator = Speculator(speculation) if speculation is not None else None
     
     def run(
         self,
         initial_input: ProblemDiscoveryInput,
         on_question: Callable | None = None,
+        latency_budget: float | None = None,
     ) -> tuple[ProblemDiscoveryOutput, str]:
         """
         オーケストレーションを実行
@@ -419,50 +1682,349 @@ class ProblemDiscoveryOrchestrator:
         Args:
             initial_input: 初期入力
             on_question: 追加質問が発生した場合のコールバック
-                        引数: questions (list), 戻り値: ユーザーの回答 (str)
+                        引数: questions (list), 戻り値: ユーザーの回答
+                        (str、または FollowupAnswer のリスト)
+            latency_budget: 1ターンあたりのレイテンシ予算（秒）。ユーザーの回答待ちは含まない
         
         Returns:
             (最終出力, 次のフェーズ名)
         """
-        current_input = initial_input
-        iteration = 0
+        state = self.start(initial_input)
+        state, output, next_phase = self.step(state, latency_budget=latency_budget)
         
-        while iteration < self.max_iterations:
-            # エージェント実行
-            output = self.agent.run(current_input)
-            
-            # 進行可能かチェック
-            if self.agent.should_proceed(output):
-                return output, "question_design_phase"
-            
+        while next_phase == "problem_discovery" and state.iteration < self.max_iterations:
             # 追加質問が必要
             if on_question is None:
                 # コールバックがない場合は現状を返す
-                return output, "problem_discovery"
+                return output, next_phase
             
             # ユーザーに質問
             user_response = on_question(output.followup_questions)
             
             if not user_response:
                 # 回答がない場合は終了
-                return output, "problem_discovery"
+                return output, next_phase
             
-            # 新しい入力を構築（履歴に追加）
-            new_history = list(current_input.history) if current_input.history else []
-            new_history.append({"role": "user", "content": current_input.user_free_text})
-            new_history.append({"role": "assistant", "content": output.problem_statement})
-            new_history.append({"role": "user", "content": user_response})
-            
-            current_input = ProblemDiscoveryInput(
-                user_free_text=user_response,
-                project_meta=current_input.project_meta,
-                history=new_history,
+            state, output, next_phase = self.step(state, user_response, latency_budget=latency_budget)
+        
+        # 進行可能、または最大反復回数に達した場合
+        return output, next_phase
+    
+    # ---------- ステップ実行API（ステートレス・再開可能） ----------
+    
+    def start(self, initial_input: ProblemDiscoveryInput) -> SessionState:
+        """
+        セッションを開始（LLMは呼ばない）
+        
+        返された状態を step() に渡すと最初のエージェント実行が行われる。
+        """
+        return SessionState(
+            user_free_text=initial_input.user_free_text,
+            project_meta=initial_input.project_meta,
+            history=list(initial_input.history or []),
+        )
+    
+    def step(
+        self,
+        state: SessionState,
+        user_answer: str | list[FollowupAnswer] | None = None,
+        latency_budget: float | None = None,
+    ) -> tuple[SessionState, ProblemDiscoveryOutput, str]:
+        """
+        1往復分だけ実行する
+        
+        ユーザーの回答待ちの間はワーカーを占有しないため、Webサービスでは
+        状態を保存して応答し、回答が届いたら任意のインスタンスで step() を呼べばよい。
+        
+        回答が scale / closed の追加質問への構造化回答のみの場合は、LLMを呼ばずに
+        直前のシートへ適用してローカルで再チェックする（_apply_locally）。
+        回答が先行実行済みの候補と一致した場合は、その結果を返す（prefetch）。
+        先行実行の待ちと通常の実行は、ターン全体で1つのレイテンシ予算を共有する。
+        
+        Args:
+            state: start() または前回の step() が返した状態
+            user_answer: 追加質問への回答（初回は不要）。テキスト、または FollowupAnswer のリスト
+            latency_budget: このターンのレイテンシ予算（秒）
+        
+        Returns:
+            (新しい状態, このターンの出力, 次のフェーズ名)
+        """
+        # ターン全体で1つのデッドライン（先行実行の待ちと通常実行で予算を二重に使わない）
+        deadline = Deadline.coerce(latency_budget)
+        local = self._apply_locally(state, user_answer)
+        if local is not None:
+            self._take_speculation(state, None)  # 一致する候補はないため破棄する
+            return self._finish(*local)
+        
+        speculated = self._take_speculation(state, user_answer)
+        if speculated is not None:
+            next_input, future = speculated
+            try:
+                output = future.result(timeout=self._remaining(deadline))
+                return self._finish(self._advance(state, next_input, output), output)
+            except Exception as e:
+                # 先行実行の失敗・予算内に終わらない場合は記録し、残り時間で通常どおり実行する
+                self.speculator.record_unused(e)
+        
+        next_input = self._next_input(state, self._answer_text(state, user_answer))
+        if next_input is None:
+            # 完了済み・最大反復回数到達・回答なしの場合は現状を返す
+            return state, self._restore_output(state), state.next_phase
+        
+        output = self.agent.run(next_input, deadline=deadline, latency_budget=self._remaining(deadline))
+        return self._finish(self._advance(state, next_input, output), output)
+    
+    async def astep(
+        self,
+        state: SessionState,
+        user_answer: str | list[FollowupAnswer] | None = None,
+        latency_budget: float | None = None,
+    ) -> tuple[SessionState, ProblemDiscoveryOutput, str]:
+        """
+        step() の非同期版
+        """
+        deadline = Deadline.coerce(latency_budget)
+        local = self._apply_locally(state, user_answer)
+        if local is not None:
+            self._take_speculation(state, None)
+            return self._finish(*local)
+        
+        speculated = self._take_speculation(state, user_answer)
+        if speculated is not None:
+            next_input, future = speculated
+            try:
+                # 待ちを打ち切っても先行実行のスレッドは止めない（shield）
+                output = await asyncio.wait_for(
+                    asyncio.shield(asyncio.wrap_future(future)), timeout=self._remaining(deadline)
+                )
+                return self._finish(self._advance(state, next_input, output), output)
+            except Exception as e:
+                self.speculator.record_unused(e)
+        
+        next_input = self._next_input(state, self._answer_text(state, user_answer))
+        if next_input is None:
+            return state, self._restore_output(state), state.next_phase
+        
+        output = await self.agent.arun(next_input, deadline=deadline, latency_budget=self._remaining(deadline))
+        return self._finish(self._advance(state, next_input, output), output)
+    
+    # ---------- 投機実行（ユーザーの回答待ちの間の先行実行） ----------
+    
+    def prefetch(self, state: SessionState) -> int:
+        """
+        closed 質問の回答候補ごとに、次の抽出をバックグラウンドで先行実行する
+        
+        ローカル適用（_apply_locally）で即答できる候補は実行しない。
+        候補は選択肢の並び順に、SpeculationPolicy の件数・見積もりトークンの上限まで開始する。
+        先行実行はバッチレーンで行い、トークンは通常の実行と同じくテナントの予算に計上される。
+        step() / astep() が追加質問を返すときに自動で呼ばれる。
+        
+        Returns:
+            開始した先行実行の件数
+        """
+        if self.speculator is None or state.iteration == 0 or state.next_phase != "problem_discovery":
+            return 0
+        session = state_key(state)
+        if self.speculator.pending(session):
+            return 0
+        
+        policy = self.speculator.policy
+        questions = state.followup_questions
+        # 開始待ちを含めて run_timeout で打ち切る
+        deadline = Deadline.after(policy.run_timeout)
+        started, tokens = 0, 0
+        for answers in candidate_answers(questions, policy.max_options):
+            if started >= policy.max_runs:
+                break
+            if self._apply_locally(state, answers) is not None:
+                continue
+            next_input = self._next_input(state, self._answer_text(state, answers))
+            if next_input is None:
+                break
+            if policy.max_tokens is not None:
+                cost = self.agent._estimate_run_tokens(next_input)
+                if tokens + cost > policy.max_tokens:
+                    break
+                tokens += cost
+            # request_context（テナント・プロジェクト）を先行実行のスレッドに引き継ぐ
+            run = functools.partial(contextvars.copy_context().run, self._speculate, next_input, deadline)
+            self.speculator.submit(session, answer_key(questions, answers), next_input, run)
+            started += 1
+        return started
+    
+    def _speculate(self, next_input: ProblemDiscoveryInput, deadline: Deadline) -> ProblemDiscoveryOutput:
+        """
+        先行実行（対話中のリクエストより優先度を下げる）
+        
+        タイムアウト・解析エラーの出力は採用しない（例外にして、回答時に通常どおり実行させる）。
+        """
+        with request_context(lane=LANE_BATCH):
+            output = self.agent.run(next_input, deadline=deadline)
+        failed = {"timeout", "parse_error"} & set(output.quality_report.missing_fields)
+        if failed:
+            raise RuntimeError(f"先行実行が完了しませんでした: {', '.join(sorted(failed))}")
+        return output
+    
+    def _take_speculation(
+        self,
+        state: SessionState,
+        user_answer: str | list[FollowupAnswer] | None,
+    ) -> tuple[ProblemDiscoveryInput, Any] | None:
+        """回答に一致する先行実行を取り出す（一致しない候補はここで破棄される）"""
+        if self.speculator is None or state.iteration == 0:
+            return None
+        return self.speculator.take(state_key(state), answer_key(state.followup_questions, user_answer))
+    
+    @staticmethod
+    def _remaining(deadline: Deadline | None) -> float | None:
+        """ターンのデッドラインの残り時間（秒）。デッドラインがなければ None"""
+        return deadline.remaining() if deadline is not None else None
+    
+    def _finish(
+        self,
+        new_state: SessionState,
+        output: ProblemDiscoveryOutput,
+    ) -> tuple[SessionState, ProblemDiscoveryOutput, str]:
+        """ターンの結果を返す前に、次の回答候補の先行実行を開始する"""
+        self.prefetch(new_state)
+        return new_state, output, new_state.next_phase
+    
+    @staticmethod
+    def _answer_text(state: SessionState, user_answer: str | list[FollowupAnswer] | None) -> str | None:
+        """構造化回答を質問と回答の組のテキストにする（LLM入力・会話履歴用）"""
+        if isinstance(user_answer, list):
+            return format_answers(state.followup_questions, user_answer) or None
+        return user_answer
+    
+    def _apply_locally(
+        self,
+        state: SessionState,
+        user_answer: str | list[FollowupAnswer] | None,
+    ) -> tuple[SessionState, ProblemDiscoveryOutput] | None:
+        """
+        構造化回答をLLMを呼ばずに直前のシートへ適用する
+        
+        品質レポートは直前のレポート（Critic）とローカルチェックを保守的に統合する
+        （_merge_local_report）。未回答の追加質問が残る場合は、それだけを聞き直す（ask_more）。
+        自由回答を含む場合、解釈できない回答がある場合、またはすべて回答しても
+        不足・矛盾が残る場合は None（LLMでの再抽出に回す）。
+        """
+        if not isinstance(user_answer, list) or not user_answer or state.iteration == 0:
+            return None
+        next_input = self._next_input(state, self._answer_text(state, user_answer))
+        if next_input is None:
+            return None
+        
+        sheet, unapplied = apply_answers(state.sheet, state.followup_questions, user_answer)
+        if unapplied:
+            return None
+        try:
+            parsed_sheet = self.agent._parse_sheet(sheet)
+        except (ValidationError, KeyError, TypeError, AttributeError):
+            return None
+        
+        output = ProblemDiscoveryOutput(
+            problem_statement=state.problem_statement,
+            problem_discovery_sheet=parsed_sheet,
+        )
+        answered = {answer.question_index for answer in user_answer}
+        questions = state.followup_questions
+        remaining = [q for i, q in enumerate(questions) if i not in answered]
+        output.quality_report = self._merge_local_report(
+            state.quality_report,
+            local_quality_check(output),
+            [questions[i].target for i in answered if questions[i].target],
+            unanswered=bool(remaining),
+        )
+        if not self.agent.should_proceed(output):
+            if not remaining:
+                return None
+            output.followup_questions = remaining
+        return self._advance(state, next_input, output), output
+    
+    @staticmethod
+    def _merge_local_report(
+        prior: QualityReport,
+        local: QualityReport,
+        answered_targets: list[str],
+        unanswered: bool,
+    ) -> QualityReport:
+        """
+        直前の品質レポートとローカルチェックを保守的に統合する
+        
+        - 直前の missingFields は、回答した target で埋まったものだけを外す
+        - 直前の contradictions はローカルでは解消を確認できないため残す
+        - 未回答の追加質問が残る、または不足・矛盾が残る場合は proceed にしない
+        """
+        missing_fields = [
+            field for field in prior.missing_fields
+            if not any(covers(target, field) for target in answered_targets)
+        ]
+        missing_fields = list(dict.fromkeys(missing_fields + local.missing_fields))
+        resolved = not missing_fields and not prior.contradictions
+        proceed = resolved and not unanswered and local.next_action == "proceed"
+        return QualityReport(
+            # 直前の指摘がすべて解消した場合のみ、ローカルチェックの確信度を採る
+            confidence=local.confidence if resolved else min(prior.confidence, local.confidence),
+            missing_fields=missing_fields,
+            contradictions=prior.contradictions,
+            next_action="proceed" if proceed else "ask_more",
+        )
+    
+    def _next_input(self, state: SessionState, user_answer: str | None) -> ProblemDiscoveryInput | None:
+        """状態と回答から次のエージェント入力を構築。実行不要なら None"""
+        if state.next_phase != "problem_discovery" or state.iteration >= self.max_iterations:
+            return None
+        
+        if state.iteration == 0:
+            return ProblemDiscoveryInput(
+                user_free_text=state.user_free_text,
+                project_meta=state.project_meta,
+                history=state.history,
             )
-            
-            iteration += 1
         
-        # 最大反復回数に達した場合
-        return output, "problem_discovery"
+        if not user_answer:
+            return None
+        
+        # 新しい入力を構築（履歴に追加）
+        new_history = list(state.history)
+        new_history.append(ConversationMessage(role="user", content=state.user_free_text))
+        new_history.append(ConversationMessage(role="assistant", content=state.problem_statement))
+        new_history.append(ConversationMessage(role="user", content=user_answer))
+        
+        return ProblemDiscoveryInput(
+            user_free_text=user_answer,
+            project_meta=state.project_meta,
+            history=new_history,
+        )
+    
+    def _advance(
+        self,
+        state: SessionState,
+        current_input: ProblemDiscoveryInput,
+        output: ProblemDiscoveryOutput,
+    ) -> SessionState:
+        """エージェント出力を反映した新しい状態を作成"""
+        return SessionState(
+            iteration=state.iteration + 1,
+            user_free_text=current_input.user_free_text,
+            project_meta=current_input.project_meta,
+            history=list(current_input.history or []),
+            problem_statement=output.problem_statement,
+            sheet=SessionState.compact_sheet(output),
+            followup_questions=output.followup_questions,
+            quality_report=output.quality_report,
+            next_phase="question_design_phase" if self.agent.should_proceed(output) else "problem_discovery",
+        )
+    
+    def _restore_output(self, state: SessionState) -> ProblemDiscoveryOutput:
+        """状態から直近の出力を復元"""
+        return ProblemDiscoveryOutput(
+            problem_statement=state.problem_statement,
+            problem_discovery_sheet=self.agent._parse_sheet(state.sheet),
+            followup_questions=state.followup_questions,
+            quality_report=state.quality_report,
+        )
 
 
 # ==================== 使用例 ====================
@@ -611,6 +2173,8 @@ def print_pretty_output(output: ProblemDiscoveryOutput):
     print(f"  次アクション: {output.quality_report.next_action}")
     if output.quality_report.missing_fields:
         print(f"  不足情報: {', '.join(output.quality_report.missing_fields)}")
+    if output.degradations:
+        print(f"  適用した劣化: {', '.join(output.degradations)}")
     print()
     
     # 追加質問があれば表示
@@ -0,0 +1,323 @@
+"""
+質問設計エージェント (Question Design Agent)
+=====================================
+
+Phase 1（課題探索）の出力をもとに、課題理解を深めるための質問シートを設計するエージェント。
+
+情報ギャップの検出（仕様書 Step 1）と質問シートの品質判定（Step 4）はローカルで行い、
+LLMには検出したギャップと関連フィールドだけを渡して質問文を生成させる。
+補えていないギャップが残った場合は、そのギャップだけを再度LLMに渡す。
+
+Phase 2: question_design
+"""
+
+import contextlib
+import json
+from pathlib import Path
+from typing import Any
+
+from dotenv import load_dotenv
+
+# .envファイルを読み込み（agents/.env を優先）
+_env_path = Path(__file__).parent / ".env"
+load_dotenv(_env_path)
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
+from langchain_google_genai import ChatGoogleGenerativeAI
+from pydantic import ValidationError
+
+from agents.prompts.question_design import QUESTION_DESIGN_PROMPT, get_question_design_prompt
+from agents.utils.gaps import check_question_sheet, detect_gaps, intent_map, normalize_questions
+from agents.utils.latency import Deadline, DeadlineExceededError, HedgedInvoker
+from agents.utils.question_schemas import (
+    DesignedQuestion,
+    Gap,
+    QuestionDesignFirestoreOutput,
+    QuestionDesignInput,
+    QuestionDesignOutput,
+    QuestionQualityReport,
+)
+from agents.utils.scheduler import FairScheduler
+
+
+class QuestionDesignAgent:
+    """
+    質問設計エージェント
+    
+    リーンスタートアップ伴走エージェントのPhase 2として、
+    Phase 1 の理解の仮説を確かめ・補うための質問シートを作成します。
+    """
+    
+    PHASE_NAME = "question_design"
+    PHASE_NUMBER = 2
+    
+    def __init__(
+        self,
+        model_name: str = "gemini-2.5-flash-lite",
+        temperature: float = 0.5,
+        llm: BaseChatModel | None = None,
+        llm_timeout: float = 30.0,
+        hedger: HedgedInvoker | None = None,
+        scheduler: FairScheduler | None = None,
+        max_questions: int = 10,
+        max_attempts: int = 2,
+    ):
+        """
+        エージェントを初期化
+        
+        Args:
+            model_name: 使用するLLMモデル名（デフォルト: gemini-2.5-flash-lite）
+            temperature: 生成の温度パラメータ
+            llm: 質問生成用LLM（省略時は model_name の Gemini クライアントを生成）
+            llm_timeout: LLM呼び出し1回あたりのタイムアウト秒数
+            hedger: ヘッジ実行器（Phase 1 とレイテンシ統計を共有する場合に指定）
+            scheduler: LLM呼び出しの公平スケジューラ
+            max_questions: 質問シートの最大件数（仕様書: 10問）
+            max_attempts: 補えていないギャップがある場合の最大呼び出し回数（初回を含む）
+        """
+        if max_questions < 1:
+            raise ValueError(f"max_questions は1以上を指定してください: {max_questions}")
+        if max_attempts < 1:
+            raise ValueError(f"max_attempts は1以上を指定してください: {max_attempts}")
+        
+        self.model_name = model_name
+        self.llm_timeout = llm_timeout
+        self.llm = llm or ChatGoogleGenerativeAI(
+            model=model_name,
+            temperature=temperature,
+            timeout=llm_timeout,
+            convert_system_message_to_human=True,
+        )
+        self.hedger = hedger or HedgedInvoker(max_hedges=0)
+        self.scheduler = scheduler
+        self.max_questions = max_questions
+        self.max_attempts = max_attempts
+    
+    def run(
+        self,
+        input_data: QuestionDesignInput,
+        deadline: Deadline | float | None = None,
+    ) -> QuestionDesignOutput:
+        """
+        エージェントのメイン実行メソッド
+        
+        Args:
+            input_data: Phase 1 の出力（problemStatement / problemDiscoverySheet）
+            deadline: 締め切り（Deadline または残り秒数）
+        
+        Returns:
+            質問シート・意図の対応・品質レポート
+        """
+        deadline = Deadline.coerce(deadline)
+        gaps = detect_gaps(input_data.problem_discovery_sheet)
+        pending = gaps
+        questions: list[DesignedQuestion] = []
+        issues: list[str] = []
+        
+        for _ in range(self.max_attempts):
+            messages = self._build_messages(input_data, pending)
+            try:
+                response = self.hedger.invoke(
+                    lambda: self._invoke(messages, deadline),
+                    timeout=self._call_timeout(deadline),
+                    hedge=False,
+                )
+            except DeadlineExceededError as e:
+                if not questions:
+                    return self._error_output(gaps, "timeout", f"LLMタイムアウト: {e}")
+                break
+            generated = self._decode_questions(response.content)
+            if generated is None:
+                if not questions:
+                    return self._error_output(gaps, "parse_error", "質問シートのJSON解析エラー")
+                break
+            questions, pending = self._merge(questions, generated, gaps, issues)
+            if not pending:
+                break
+        
+        return self._finalize(questions, gaps, issues)
+    
+    async def arun(
+        self,
+        input_data: QuestionDesignInput,
+        deadline: Deadline | float | None = None,
+    ) -> QuestionDesignOutput:
+        """
+        run() の非同期版
+        """
+        deadline = Deadline.coerce(deadline)
+        gaps = detect_gaps(input_data.problem_discovery_sheet)
+        pending = gaps
+        questions: list[DesignedQuestion] = []
+        issues: list[str] = []
+        
+        for _ in range(self.max_attempts):
+            messages = self._build_messages(input_data, pending)
+            try:
+                response = await self.hedger.ainvoke(
+                    lambda: self._ainvoke(messages, deadline),
+                    timeout=self._call_timeout(deadline),
+                    hedge=False,
+                )
+            except DeadlineExceededError as e:
+                if not questions:
+                    return self._error_output(gaps, "timeout", f"LLMタイムアウト: {e}")
+                break
+            generated = self._decode_questions(response.content)
+            if generated is None:
+                if not questions:
+                    return self._error_output(gaps, "parse_error", "質問シートのJSON解析エラー")
+                break
+            questions, pending = self._merge(questions, generated, gaps, issues)
+            if not pending:
+                break
+        
+        return self._finalize(questions, gaps, issues)
+    
+    # ---------- LLM呼び出し ----------
+    
+    def _invoke(self, messages: list[BaseMessage], deadline: Deadline | None = None) -> Any:
+        """LLM呼び出し（スケジューラがあれば実行枠を獲得してから。クライアントにも残り時間を渡す）"""
+        if self.scheduler is None:
+            return self.llm.invoke(messages, timeout=self._client_timeout(deadline))
+        with self.scheduler.slot(deadline=deadline):
+            return self.llm.invoke(messages, timeout=self._client_timeout(deadline))
+    
+    async def _ainvoke(self, messages: list[BaseMessage], deadline: Deadline | None = None) -> Any:
+        """_invoke() の非同期版"""
+        slot = self.scheduler.aslot(deadline=deadline) if self.scheduler is not None else contextlib.nullcontext()
+        async with slot:
+            return await self.llm.ainvoke(messages, timeout=self._client_timeout(deadline))
+    
+    def _call_timeout(self, deadline: Deadline | None) -> float:
+        """LLM呼び出し1回に与えるタイムアウト（デッドラインの残り時間で切り詰め）"""
+        if deadline is None:
+            return self.llm_timeout
+        return deadline.clamp(self.llm_timeout)
+    
+    def _client_timeout(self, deadline: Deadline | None) -> float:
+        """クライアントに渡すタイムアウト。デッドラインを過ぎていれば呼び出さない"""
+        timeout = self._call_timeout(deadline)
+        if timeout <= 0:
+            raise DeadlineExceededError("デッドラインを超過しています")
+        return timeout
+    
+    def _build_messages(self, input_data: QuestionDesignInput, gaps: list[Gap]) -> list[BaseMessage]:
+        """
+        質問生成用のメッセージを構築（ギャップと関連フィールドのみを含める）
+        """
+        project_meta = input_data.project_meta.model_dump() if input_data.project_meta else None
+        user_prompt = get_question_design_prompt(
+            input_data.problem_statement,
+            [gap.model_dump() for gap in gaps],
+            project_meta,
+        )
+        return [
+            SystemMessage(content=QUESTION_DESIGN_PROMPT.format(max_questions=self.max_questions)),
+            HumanMessage(content=user_prompt),
+        ]
+    
+    @staticmethod
+    def _decode_questions(content: Any) -> list[DesignedQuestion] | None:
+        """LLM応答から質問を取り出す。解析できなければ None"""
+        if not isinstance(content, str):
+            return None
+        text = content.strip()
+        if text.startswith("```"):
+            text = text.split("\n", 1)[1] if "\n" in text else ""
+            text = text.rsplit("```", 1)[0]
+        try:
+            data = json.loads(text)
+            items = data["questionSheet"] if isinstance(data, dict) else data
+            return [
+                DesignedQuestion(
+                    question=str(item.get("question", "")),
+                    category=str(item.get("category", "")),
+                    intent=str(item.get("intent", "")),
+                    priority=str(item.get("priority", "")),
+                    related_field=str(item.get("relatedField", "")),
+                )
+                for item in items
+            ]
+        except (json.JSONDecodeError, KeyError, TypeError, AttributeError, ValidationError):
+            return None
+    
+    # ---------- ローカル判定 ----------
+    
+    def _merge(
+        self,
+        questions: list[DesignedQuestion],
+        generated: list[DesignedQuestion],
+        gaps: list[Gap],
+        issues: list[str],
+    ) -> tuple[list[DesignedQuestion], list[Gap]]:
+        """
+        生成した質問を追加して整え、まだ補えていないギャップを返す
+        
+        件数が上限に達した場合は、再度の生成を行わない（空のリストを返す）。
+        """
+        merged, dropped = normalize_questions(questions + generated, gaps, self.max_questions)
+        issues.extend(dropped)
+        if len(merged) >= self.max_questions:
+            return merged, []
+        missing = set(check_question_sheet(merged, gaps).missing_fields)
+        return merged, [gap for gap in gaps if gap.field in missing]
+    
+    def _finalize(
+        self,
+        questions: list[DesignedQuestion],
+        gaps: list[Gap],
+        issues: list[str],
+    ) -> QuestionDesignOutput:
+        return QuestionDesignOutput(
+            question_sheet=questions,
+            question_intent_map=intent_map(questions, gaps),
+            quality_report=check_question_sheet(questions, gaps, issues),
+            gaps=gaps,
+        )
+    
+    @staticmethod
+    def _error_output(gaps: list[Gap], missing_field: str, message: str) -> QuestionDesignOutput:
+        """質問生成に失敗した場合の出力"""
+        return QuestionDesignOutput(
+            quality_report=QuestionQualityReport(
+                confidence=0.0,
+                missing_fields=[missing_field],
+                issues=[message],
+                next_action="ask_user",
+            ),
+            gaps=gaps,
+        )
+    
+    # ---------- 出力 ----------
+    
+    def get_user_response(self, input_data: QuestionDesignInput, output: QuestionDesignOutput) -> dict[str, Any]:
+        """
+        UI/UXに返すレスポンスを生成（仕様書セクション9に基づく）
+        """
+        return {
+            "understanding": input_data.problem_statement,
+            "status": output.quality_report.next_action,
+            "questions": [
+                {
+                    "question": q.question,
+                    "intent": q.intent,
+                    "category": q.category,
+                }
+                for q in output.question_sheet
+            ],
+            "message": "現時点でこう理解しています。もう少しだけ教えてください。",
+        }
+    
+    def to_firestore(self, output: QuestionDesignOutput) -> dict[str, Any]:
+        """
+        Firestoreに保存する形式に変換（{projectId}/phase/question_design）
+        """
+        return QuestionDesignFirestoreOutput.from_output(output)
+    
+    def should_proceed(self, output: QuestionDesignOutput) -> bool:
+        """
+        次フェーズ（problem_definition）に進めるかどうかを判定（仕様書セクション8に基づく）
+        """
+        return output.quality_report.next_action == "proceed"
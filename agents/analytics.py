@@ -0,0 +1,346 @@
+"""
+課題探索結果の列指向アナリティクス
+=====================================
+
+保存済みの Phase 1 出力（FirestoreOutput 形式）を、文字列を整数IDに
+インターンした NumPy の列配列へ展開し、集計をベクトル演算で行う。
+
+- pains の重大度 × 頻度ランキング（top-k）と類似 pain のクラスタリング
+- ProjectMeta.industry ごとの統計
+- qualityReport.confidence のヒストグラム
+- unmetNeeds / missingFields の頻度
+
+Pydantic モデルのツリーをループで走査する代わりに、1セッションあたり
+数十バイトの固定長列として保持するため、10万セッション以上を1プロセスで扱える。
+
+    builder = DiscoveryColumnsBuilder()
+    for record, meta in stored_outputs:
+        builder.add(record, project_meta=meta)
+    columns = builder.build()
+    columns.top_pains(k=20)
+"""
+
+import unicodedata
+import zlib
+from array import array
+from typing import Any, Iterable, Optional, Union
+
+import numpy as np
+
+from agents.utils.schemas import FirestoreOutput, ProblemDiscoveryOutput, ProjectMeta
+
+UNKNOWN_INDUSTRY = "(未設定)"
+
+# next_action のコード
+NEXT_ACTION_CODES = {"ask_more": 0, "proceed": 1}
+
+
+def normalize_text(text: str) -> str:
+    """集計キー用の正規化（NFKC・小文字化・空白の圧縮）"""
+    return " ".join(unicodedata.normalize("NFKC", text or "").lower().split())
+
+
+class StringInterner:
+    """文字列 ⇔ 連番ID の対応表"""
+    
+    def __init__(self):
+        self._index: dict[str, int] = {}
+        self.values: list[str] = []
+    
+    def intern(self, value: str) -> int:
+        code = self._index.get(value)
+        if code is None:
+            code = len(self.values)
+            self._index[value] = code
+            self.values.append(value)
+        return code
+    
+    def code_of(self, value: str) -> int | None:
+        return self._index.get(value)
+    
+    def __getitem__(self, code: int) -> str:
+        return self.values[code]
+    
+    def __len__(self) -> int:
+        return len(self.values)
+
+
+# ==================== 構築 ====================
+
+def _column(buffer: array, dtype: Any) -> np.ndarray:
+    """array バッファを NumPy 配列にコピー（ビルダー側のバッファは伸長可能なまま残す）"""
+    return np.frombuffer(buffer, dtype=dtype).copy() if len(buffer) else np.zeros(0, dtype=dtype)
+
+
+class DiscoveryColumnsBuilder:
+    """
+    出力を1件ずつ追加して列配列を構築する
+    
+    追加中は array モジュールの固定長バッファに書き込み、
+    build() でその時点のスナップショットを NumPy 配列として取り出す
+    （build() 後も追加を続けられる）。
+    """
+    
+    def __init__(self):
+        self.session_ids = StringInterner()
+        self.industries = StringInterner()
+        self.pain_texts = StringInterner()
+        self.need_texts = StringInterner()
+        self.fields = StringInterner()
+        
+        # セッション列
+        self._s_id = array("i")
+        self._s_industry = array("i")
+        self._s_confidence = array("f")
+        self._s_next_action = array("b")
+        # pain列
+        self._p_session = array("i")
+        self._p_text = array("i")
+        self._p_severity = array("b")
+        self._p_frequency = array("b")
+        # unmetNeed列
+        self._n_session = array("i")
+        self._n_text = array("i")
+        self._n_why_depth = array("b")
+        # missingFields列
+        self._m_session = array("i")
+        self._m_field = array("i")
+    
+    def add(
+        self,
+        output: Union[ProblemDiscoveryOutput, dict[str, Any]],
+        project_meta: Union[ProjectMeta, dict[str, Any], None] = None,
+        session_id: Optional[str] = None,
+    ) -> int:
+        """
+        出力1件を追加し、セッション行番号を返す
+        
+        Args:
+            output: ProblemDiscoveryOutput または FirestoreOutput 形式の辞書
+            project_meta: プロジェクトメタ情報（industry を使用）
+            session_id: セッションID（省略時は行番号）
+        """
+        record = FirestoreOutput.from_output(output) if isinstance(output, ProblemDiscoveryOutput) else output
+        if isinstance(project_meta, ProjectMeta):
+            industry = project_meta.industry
+        else:
+            industry = (project_meta or {}).get("industry")
+        
+        row = len(self._s_id)
+        self._s_id.append(self.session_ids.intern(session_id if session_id is not None else str(row)))
+        self._s_industry.append(self.industries.intern(industry or UNKNOWN_INDUSTRY))
+        
+        quality = record.get("qualityReport") or {}
+        self._s_confidence.append(float(quality.get("confidence", 0.0) or 0.0))
+        self._s_next_action.append(NEXT_ACTION_CODES.get(quality.get("nextAction"), 0))
+        for field in quality.get("missingFields") or []:
+            self._m_session.append(row)
+            self._m_field.append(self.fields.intern(field))
+        
+        sheet = record.get("problemDiscoverySheet") or {}
+        for pain in sheet.get("pains") or []:
+            self._p_session.append(row)
+            self._p_text.append(self.pain_texts.intern(normalize_text(pain.get("pain", ""))))
+            self._p_severity.append(min(5, max(1, int(pain.get("severity", 1) or 1))))
+            self._p_frequency.append(min(5, max(1, int(pain.get("frequency", 1) or 1))))
+        for need in sheet.get("unmetNeeds") or []:
+            self._n_session.append(row)
+            self._n_text.append(self.need_texts.intern(normalize_text(need.get("need", ""))))
+            self._n_why_depth.append(min(127, len(need.get("whyDepth") or [])))
+        return row
+    
+    def extend(self, records: Iterable[tuple[Any, Any]]) -> None:
+        """(output, project_meta) の組をまとめて追加"""
+        for output, project_meta in records:
+            self.add(output, project_meta)
+    
+    def build(self) -> "DiscoveryColumns":
+        return DiscoveryColumns(
+            session_ids=self.session_ids,
+            industries=self.industries,
+            pain_texts=self.pain_texts,
+            need_texts=self.need_texts,
+            fields=self.fields,
+            session_id=_column(self._s_id, np.int32),
+            session_industry=_column(self._s_industry, np.int32),
+            session_confidence=_column(self._s_confidence, np.float32),
+            session_next_action=_column(self._s_next_action, np.int8),
+            pain_session=_column(self._p_session, np.int32),
+            pain_text=_column(self._p_text, np.int32),
+            pain_severity=_column(self._p_severity, np.int8),
+            pain_frequency=_column(self._p_frequency, np.int8),
+            need_session=_column(self._n_session, np.int32),
+            need_text=_column(self._n_text, np.int32),
+            need_why_depth=_column(self._n_why_depth, np.int8),
+            missing_session=_column(self._m_session, np.int32),
+            missing_field=_column(self._m_field, np.int32),
+        )
+
+
+# ==================== 集計 ====================
+
+class DiscoveryColumns:
+    """
+    列指向の課題探索データ
+    
+    セッション単位の列（session_*）と、pain / unmetNeed / missingField の
+    明細列（*_session が行番号で結合キー）からなる。
+    """
+    
+    def __init__(self, **columns: Any):
+        for name, value in columns.items():
+            setattr(self, name, value)
+    
+    @property
+    def n_sessions(self) -> int:
+        return len(self.session_id)
+    
+    def nbytes(self) -> int:
+        """列配列の合計メモリ（バイト）"""
+        return sum(v.nbytes for v in vars(self).values() if isinstance(v, np.ndarray))
+    
+    def _industry_code(self, industry: str | None) -> int | None:
+        if industry is None:
+            return None
+        code = self.industries.code_of(industry)
+        return -1 if code is None else code
+    
+    def _pain_mask(self, industry: str | None) -> np.ndarray | slice:
+        code = self._industry_code(industry)
+        if code is None:
+            return slice(None)
+        return self.session_industry[self.pain_session] == code
+    
+    def pain_scores(self) -> np.ndarray:
+        """pain行ごとの重大度 × 頻度"""
+        return self.pain_severity.astype(np.int16) * self.pain_frequency.astype(np.int16)
+    
+    def top_pains(self, k: int = 10, by: str = "score", industry: str | None = None) -> list[dict[str, Any]]:
+        """
+        同一（正規化後）pain をまとめてランキング
+        
+        Args:
+            k: 上位件数
+            by: "score"（重大度×頻度の合計）/ "count"（出現セッション数）/ "severity"（平均重大度）
+            industry: 指定時はその業界のセッションのみ
+        """
+        mask = self._pain_mask(industry)
+        text = self.pain_text[mask]
+        if len(text) == 0:
+            return []
+        size = len(self.pain_texts)
+        scores = self.pain_scores()[mask]
+        count = np.bincount(text, minlength=size)
+        score_sum = np.bincount(text, weights=scores, minlength=size)
+        severity_sum = np.bincount(text, weights=self.pain_severity[mask], minlength=size)
+        frequency_sum = np.bincount(text, weights=self.pain_frequency[mask], minlength=size)
+        
+        present = count > 0
+        with np.errstate(divide="ignore", invalid="ignore"):
+            mean_severity = np.where(present, severity_sum / count, 0.0)
+            mean_frequency = np.where(present, frequency_sum / count, 0.0)
+        key = {"score": score_sum, "count": count, "severity": mean_severity}[by]
+        
+        k = min(k, int(present.sum()))
+        top = np.argpartition(-key, k - 1)[:k]
+        top = top[np.lexsort((-count[top], -key[top]))]
+        return [
+            {
+                "pain": self.pain_texts[int(code)],
+                "count": int(count[code]),
+                "score": float(score_sum[code]),
+                "meanSeverity": float(mean_severity[code]),
+                "meanFrequency": float(mean_frequency[code]),
+            }
+            for code in top
+        ]
+    
+    def industry_stats(self) -> dict[str, dict[str, float]]:
+        """業界ごとのセッション数・平均信頼度・proceed率・pain スコア"""
+        size = len(self.industries)
+        sessions = np.bincount(self.session_industry, minlength=size)
+        confidence = np.bincount(self.session_industry, weights=self.session_confidence, minlength=size)
+        proceed = np.bincount(self.session_industry, weights=self.session_next_action, minlength=size)
+        pain_industry = self.session_industry[self.pain_session]
+        pains = np.bincount(pain_industry, minlength=size)
+        pain_score = np.bincount(pain_industry, weights=self.pain_scores(), minlength=size)
+        
+        result = {}
+        for code in np.flatnonzero(sessions):
+            n = sessions[code]
+            result[self.industries[int(code)]] = {
+                "sessions": int(n),
+                "meanConfidence": float(confidence[code] / n),
+                "proceedRatio": float(proceed[code] / n),
+                "meanPains": float(pains[code] / n),
+                "meanPainScore": float(pain_score[code] / pains[code]) if pains[code] else 0.0,
+            }
+        return result
+    
+    def confidence_histogram(self, bins: int = 10, industry: str | None = None) -> tuple[np.ndarray, np.ndarray]:
+        """qualityReport.confidence のヒストグラム（counts, edges）"""
+        values = self.session_confidence
+        code = self._industry_code(industry)
+        if code is not None:
+            values = values[self.session_industry == code]
+        return np.histogram(values, bins=bins, range=(0.0, 1.0))
+    
+    def missing_field_counts(self, k: int = 10) -> list[tuple[str, int]]:
+        """不足フィールドの出現回数（上位k件）"""
+        counts = np.bincount(self.missing_field, minlength=len(self.fields))
+        order = np.argsort(-counts, kind="stable")[:k]
+        return [(self.fields[int(c)], int(counts[c])) for c in order if counts[c] > 0]
+    
+    def top_unmet_needs(self, k: int = 10) -> list[dict[str, Any]]:
+        """unmetNeed の出現回数と平均Why深さ"""
+        size = len(self.need_texts)
+        count = np.bincount(self.need_text, minlength=size)
+        depth = np.bincount(self.need_text, weights=self.need_why_depth, minlength=size)
+        order = np.argsort(-count, kind="stable")[:k]
+        return [
+            {"need": self.need_texts[int(c)], "count": int(count[c]), "meanWhyDepth": float(depth[c] / count[c])}
+            for c in order
+            if count[c] > 0
+        ]
+    
+    def cluster_top_pains(
+        self,
+        k: int = 50,
+        threshold: float = 0.5,
+        industry: str | None = None,
+        dim: int = 4096,
+    ) -> list[dict[str, Any]]:
+        """
+        上位 k 件の pain を文字バイグラムのコサイン類似度でまとめる
+        
+        表記ゆれ（「満員でスマホが使えない」「満員電車でスマホを操作できない」など）を
+        1つのクラスタに寄せる。ハッシュしたバイグラムのベクトルで類似度行列を一括計算し、
+        スコア順に貪欲にクラスタへ割り当てる。
+        """
+        top = self.top_pains(k=k, industry=industry)
+        if not top:
+            return []
+        vectors = np.zeros((len(top), dim), dtype=np.float32)
+        for row, item in enumerate(top):
+            text = item["pain"]
+            grams = [text[i:i + 2] for i in range(max(1, len(text) - 1))]
+            np.add.at(vectors[row], [zlib.crc32(g.encode()) % dim for g in grams], 1.0)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors /= np.where(norms == 0, 1.0, norms)
+        similarity = vectors @ vectors.T
+        
+        assigned = np.full(len(top), -1)
+        clusters: list[dict[str, Any]] = []
+        for row in range(len(top)):
+            if assigned[row] >= 0:
+                continue
+            members = np.flatnonzero((similarity[row] >= threshold) & (assigned < 0))
+            assigned[members] = len(clusters)
+            clusters.append({
+                "label": top[row]["pain"],
+                "members": [top[m]["pain"] for m in members],
+                "count": sum(top[m]["count"] for m in members),
+                "score": sum(top[m]["score"] for m in members),
+            })
+        clusters.sort(key=lambda c: -c["score"])
+        return clusters
@@ -0,0 +1,10 @@
+"""
+Agents Benchmarks Package
+=========================
+
+フェイクLLMを使った性能計測スクリプト群（APIキー不要）
+
+フェイクLLM（fake_llm）はテストと AGENTS_FAKE_LLM=1 の検証用サービスでも使う。
+
+    python -m agents.benchmarks.hedging
+"""
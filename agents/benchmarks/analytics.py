@@ -0,0 +1,85 @@
+"""
+列指向アナリティクスのベンチマーク
+Columnar Analytics Benchmark
+
+合成した課題探索結果（既定10万セッション）を列配列に展開し、
+構築時間・メモリ・各集計の所要時間を表示する。
+
+    python -m agents.benchmarks.analytics [--sessions 100000]
+"""
+
+import argparse
+import random
+import time
+
+from agents.analytics import DiscoveryColumnsBuilder
+
+INDUSTRIES = ["製造", "小売", "金融", "医療", "物流", "教育", None]
+PAIN_TEMPLATES = [
+    "{}の確認に時間がかかる",
+    "{}の情報が分散している",
+    "{}を手作業で転記している",
+    "{}の承認が遅い",
+    "{}の引き継ぎができない",
+]
+SUBJECTS = ["在庫", "請求書", "シフト", "顧客情報", "見積", "配送状況", "カルテ", "稟議"]
+FIELDS = ["context.trigger", "job.main", "currentSolutions", "pains[0].impact"]
+
+
+def synthetic_records(n: int, seed: int = 0):
+    """FirestoreOutput 形式の合成データを生成"""
+    rng = random.Random(seed)
+    for _ in range(n):
+        pains = [
+            {
+                "pain": rng.choice(PAIN_TEMPLATES).format(rng.choice(SUBJECTS)),
+                "impact": "残業が増える",
+                "severity": rng.randint(1, 5),
+                "frequency": rng.randint(1, 5),
+                "evidence": "",
+            }
+            for _ in range(rng.randint(1, 4))
+        ]
+        record = {
+            "problemStatement": "",
+            "problemDiscoverySheet": {
+                "pains": pains,
+                "unmetNeeds": [{"need": f"{rng.choice(SUBJECTS)}を一元管理したい", "whyDepth": ["a"] * rng.randint(0, 5)}],
+            },
+            "qualityReport": {
+                "confidence": rng.random(),
+                "missingFields": rng.sample(FIELDS, rng.randint(0, 2)),
+                "nextAction": rng.choice(["proceed", "ask_more"]),
+            },
+        }
+        yield record, {"industry": rng.choice(INDUSTRIES)}
+
+
+def _timed(label: str, fn):
+    t0 = time.perf_counter()
+    result = fn()
+    print(f"  {label:<28} {(time.perf_counter() - t0) * 1000:>9.1f} ms")
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Columnar analytics benchmark")
+    parser.add_argument("--sessions", type=int, default=100_000)
+    args = parser.parse_args()
+    
+    records = list(synthetic_records(args.sessions))
+    print(f"sessions: {args.sessions}")
+    builder = DiscoveryColumnsBuilder()
+    _timed("build (flatten + intern)", lambda: builder.extend(records))
+    columns = _timed("to numpy", builder.build)
+    print(f"  column memory: {columns.nbytes() / 1024 / 1024:.1f} MiB ({len(columns.pain_text)} pain rows)")
+    _timed("top_pains(k=20)", lambda: columns.top_pains(k=20))
+    _timed("top_pains(industry=製造)", lambda: columns.top_pains(k=20, industry="製造"))
+    _timed("industry_stats", columns.industry_stats)
+    _timed("confidence_histogram", columns.confidence_histogram)
+    _timed("missing_field_counts", columns.missing_field_counts)
+    _timed("cluster_top_pains(k=40)", lambda: columns.cluster_top_pains(k=40))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+保存用コーデックのベンチマーク
+Storage Codec Benchmark (size / encode / decode)
+
+合成した課題シート（FirestoreOutput 形式）とセッション状態を、
+インデント付きJSON（従来の保存形式）・コンパクトJSON・コーデック（無圧縮／zlib／zstd）で
+保存した場合の1件あたりのサイズと、符号化・復号の速度を比較する。
+
+    python -m agents.benchmarks.codec [--records 2000]
+"""
+
+import argparse
+import json
+import random
+import time
+from typing import Any, Callable
+
+from agents.benchmarks.search import synthetic_sheet
+from agents.utils import codec
+from agents.utils.schemas import SessionState
+
+
+def synthetic_session(rng: random.Random, record: dict[str, Any]) -> dict[str, Any]:
+    """合成シートを持つセッション状態（SessionState の JSON 形式）"""
+    history = []
+    for i in range(rng.randint(2, 8)):
+        history.append({
+            "role": "user" if i % 2 == 0 else "assistant",
+            "content": record["problemStatement"] if i % 2 == 0 else "いつ、どのような場面で起きますか？",
+        })
+    state = SessionState(
+        iteration=rng.randint(1, 3),
+        user_free_text=record["problemStatement"],
+        project_meta={"industry": "小売", "target_customer": "店舗スタッフ"},
+        history=history,
+        problem_statement=record["problemStatement"],
+        sheet=record["problemDiscoverySheet"],
+    )
+    return state.model_dump(mode="json")
+
+
+def _formats() -> dict[str, tuple[Callable[[Any], bytes], Callable[[bytes], Any]]]:
+    formats = {
+        "json_indent2": (
+            lambda v: json.dumps(v, ensure_ascii=False, indent=2).encode("utf-8"),
+            lambda b: json.loads(b),
+        ),
+        "json_compact": (
+            lambda v: json.dumps(v, ensure_ascii=False, separators=(",", ":")).encode("utf-8"),
+            lambda b: json.loads(b),
+        ),
+    }
+    for compression in codec.available_compressions():
+        formats[f"codec_{compression}"] = (
+            lambda v, c=compression: codec.encode(v, c),
+            codec.decode,
+        )
+    return formats
+
+
+def run_benchmark(records: int = 2000, seed: int = 0) -> dict[str, dict[str, dict[str, float]]]:
+    """データ種別 → 形式 → {bytes, encode_us, decode_us}（いずれも1件あたり）"""
+    rng = random.Random(seed)
+    sheets = [synthetic_sheet(rng)[0] for _ in range(records)]
+    datasets = {
+        "output": sheets,
+        "session": [synthetic_session(rng, sheet) for sheet in sheets],
+    }
+    results: dict[str, dict[str, dict[str, float]]] = {}
+    for name, values in datasets.items():
+        results[name] = {}
+        for label, (encode, decode) in _formats().items():
+            t0 = time.perf_counter()
+            encoded = [encode(v) for v in values]
+            encode_seconds = time.perf_counter() - t0
+            t0 = time.perf_counter()
+            decoded = [decode(b) for b in encoded]
+            decode_seconds = time.perf_counter() - t0
+            if decoded != values:
+                raise AssertionError(f"{label}: 往復で値が一致しません")
+            results[name][label] = {
+                "bytes": sum(len(b) for b in encoded) / records,
+                "encode_us": encode_seconds / records * 1e6,
+                "decode_us": decode_seconds / records * 1e6,
+            }
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="保存形式ごとのサイズと符号化・復号速度を比較")
+    parser.add_argument("--records", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    
+    results = run_benchmark(args.records, args.seed)
+    for name, formats in results.items():
+        baseline = formats["json_indent2"]["bytes"]
+        print(f"[{name}]")
+        print(f"{'format':<16}{'bytes/rec':>11}{'ratio':>8}{'encode':>12}{'decode':>12}")
+        for label, s in formats.items():
+            print(
+                f"{label:<16}{s['bytes']:>11,.0f}{s['bytes'] / baseline:>8.0%}"
+                f"{s['encode_us']:>10.1f}us{s['decode_us']:>10.1f}us"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+セクション単位のCriticのベンチマーク
+Section-scoped Critic Benchmark
+
+オーケストレーターの往復（最大5回）で、毎回1つのセクションだけが変わる出力を
+Criticに評価させ、出力全体を評価する場合（full）とセクション単位でメモ化する場合（sectional）の
+往復ごとのCriticプロンプトの文字数・呼び出し回数・所要時間を比較する。
+
+    python -m agents.benchmarks.critic [--iterations 5] [--sessions 20]
+"""
+
+import argparse
+import copy
+import time
+from typing import Any, Callable
+
+from langchain_core.messages import BaseMessage
+
+from agents.agent1 import ProblemDiscoveryAgent
+from agents.benchmarks.fake_llm import SAMPLE_OUTPUT, FakeLatencyChatModel, default_responder
+
+# 往復ごとに変わるセクション（1回目は全体が新規）
+_EDITS: list[Callable[[dict[str, Any], int], None]] = [
+    lambda out, i: out["problemDiscoverySheet"]["context"].update(trigger=f"乗換駅で満員になる（{i}）"),
+    lambda out, i: out["problemDiscoverySheet"]["pains"][0].update(impact=f"始業が{i}分遅れる"),
+    lambda out, i: out["problemDiscoverySheet"]["currentSolutions"].append({"solution": f"時差出勤{i}"}),
+    lambda out, i: out.update(problemStatement=f"{out['problemStatement']}（{i}）"),
+]
+
+
+def _session_outputs(agent: ProblemDiscoveryAgent, session: int, iterations: int) -> list[Any]:
+    """セッションごとに内容の異なる、1往復ごとに1セクションだけ変わる出力列"""
+    data = copy.deepcopy(SAMPLE_OUTPUT)
+    data["problemDiscoverySheet"]["job"]["main"] = f"{data['problemDiscoverySheet']['job']['main']}（{session}）"
+    outputs = []
+    for i in range(iterations):
+        if i:
+            _EDITS[(i - 1) % len(_EDITS)](data, session * 100 + i)
+        outputs.append(agent._parse_output(copy.deepcopy(data)))
+    return outputs
+
+
+def run_benchmark(
+    iterations: int = 5,
+    sessions: int = 20,
+    latency: float = 0.05,
+    per_char_latency: float = 0.0002,
+) -> dict[str, list[dict[str, float]]]:
+    """モード → 往復ごとの {prompt_chars, calls, seconds}（セッションあたりの平均）"""
+    results: dict[str, list[dict[str, float]]] = {}
+    for mode in (ProblemDiscoveryAgent.CRITIC_FULL, ProblemDiscoveryAgent.CRITIC_SECTIONAL):
+        prompt_chars: list[int] = []
+        
+        def responder(messages: list[BaseMessage]) -> str:
+            prompt_chars.append(sum(len(str(m.content)) for m in messages[1:]))
+            return default_responder(messages)
+        
+        # 入力の長さに比例する遅延を再現する（フェイクLLMの per_char_latency は出力文字数に比例するため）
+        critic = FakeLatencyChatModel(responder=responder, latency=latency)
+        agent = ProblemDiscoveryAgent(llm=FakeLatencyChatModel(), critic_llm=critic, critic_mode=mode)
+        rows = [{"prompt_chars": 0.0, "calls": 0.0, "seconds": 0.0} for _ in range(iterations)]
+        for session in range(sessions):
+            for i, output in enumerate(_session_outputs(agent, session, iterations)):
+                before_chars, before_calls = len(prompt_chars), critic.calls
+                t0 = time.perf_counter()
+                agent._run_critic(output)
+                chars = sum(prompt_chars[before_chars:])
+                time.sleep(chars * per_char_latency)
+                rows[i]["seconds"] += (time.perf_counter() - t0) / sessions
+                rows[i]["prompt_chars"] += chars / sessions
+                rows[i]["calls"] += (critic.calls - before_calls) / sessions
+        results[mode] = rows
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Criticの往復ごとのプロンプトサイズと所要時間を比較")
+    parser.add_argument("--iterations", type=int, default=5)
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.05, help="Critic呼び出しの固定遅延（秒）")
+    parser.add_argument("--per-char-latency", type=float, default=0.0002, help="入力1文字あたりの遅延（秒）")
+    args = parser.parse_args()
+    
+    results = run_benchmark(args.iterations, args.sessions, args.latency, args.per_char_latency)
+    for mode, rows in results.items():
+        print(f"[{mode}]")
+        print(f"{'iteration':<11}{'prompt_chars':>14}{'calls':>8}{'seconds':>10}")
+        for i, row in enumerate(rows, start=1):
+            print(f"{i:<11}{row['prompt_chars']:>14,.0f}{row['calls']:>8.2f}{row['seconds']:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,537 @@
+"""
+ローカル検証用のフェイクLLM
+Fake Chat Model with Simulated Latency
+
+APIキーなしでエージェント・ベンチマーク・サービスを動かすためのモデル。
+応答内容は responder で、遅延は latency / per_char_latency で再現する。
+実際のモデル応答を記録（RecordingChatModel）し、CIで再生（ReplayChatModel）することもできる。
+"""
+
+import asyncio
+import hashlib
+import json
+import math
+import random
+import re
+import threading
+import time
+from pathlib import Path
+from typing import Any, AsyncIterator, Callable, Iterator, Optional, Union
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage, HumanMessage, SystemMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from agents.prompts.problem_discovery import (
+    BATCH_CRITIC_INSTRUCTIONS,
+    BATCH_EXTRACTION_INSTRUCTIONS,
+    COMPACT_OUTPUT_SCHEMA,
+    COMPACT_POSITIONAL_OUTPUT_SCHEMA,
+    CRITIC_PROMPT,
+    EXTRACTION_PROMPT,
+    SECTION_CRITIC_PROMPT,
+    WHY_DEEPDIVE_PROMPT,
+)
+from agents.prompts.question_design import QUESTION_DESIGN_PROMPT
+from agents.utils.wire import to_compact
+
+
+# ==================== 既定の応答 ====================
+
+SAMPLE_OUTPUT: dict[str, Any] = {
+    "problemStatement": "週3日出社が必須の会社員が、混雑した朝の通勤電車内で、仕事のメールを確認したいが、満員で身動きが取れないことが障害になって困っている",
+    "problemDiscoverySheet": {
+        "job": {
+            "main": "通勤中に仕事のメールを確認する",
+            "functional": ["移動時間を業務に活用する"],
+            "emotional": ["始業前に安心したい"],
+            "social": ["返信が早い人だと思われたい"],
+        },
+        "context": {
+            "who": "週3日出社が必須の会社員",
+            "when": "平日の朝",
+            "where": "満員の通勤電車",
+            "trigger": "始業前に届いたメールが気になったとき",
+            "constraints": ["週3日の出社必須"],
+            "stakeholders": ["上司", "取引先"],
+        },
+        "pains": [
+            {
+                "pain": "満員でスマホを操作できない",
+                "impact": "始業後にメール処理が集中する",
+                "severity": 4,
+                "frequency": 5,
+                "evidence": "全然できない",
+            },
+            {
+                "pain": "立ちっぱなしで疲れる",
+                "impact": "始業時点で集中力が落ちている",
+                "severity": 3,
+                "frequency": 5,
+                "evidence": "立っているのも辛い",
+            },
+        ],
+        "currentSolutions": [
+            {
+                "solution": "出社後にまとめてメールを確認する",
+                "whyChosen": "電車内では操作できないため",
+                "dissatisfaction": "朝の時間が圧迫される",
+            }
+        ],
+        "unmetNeeds": [
+            {
+                "need": "移動中でも片手で要点だけ把握したい",
+                "whyDepth": [
+                    "満員でスマホを両手で操作できない",
+                    "つり革と鞄で両手が塞がっている",
+                    "メールは開いて読まないと重要度が分からない",
+                    "始業前に対応の優先順位を決めておきたい",
+                    "出社後すぐに重要な案件へ着手したい",
+                ],
+            },
+            {
+                "need": "通勤の疲労を始業前に持ち越したくない",
+                "whyDepth": [
+                    "立ちっぱなしで体力を消耗する",
+                    "混雑する時間帯にしか乗れない",
+                    "始業時刻が固定されている",
+                    "疲れた状態だと午前中の集中力が落ちる",
+                    "午前中に重要な業務が集中している",
+                ],
+            },
+        ],
+        "emotion": {
+            "feelings": ["焦り", "疲労"],
+            "momentOfTruth": "駅に着いて未読メールの数を見た瞬間",
+        },
+        "successCriteria": ["始業前に重要メールを把握できている"],
+        "assumptions": ["メールの大半は読むだけで済む"],
+        "unknowns": ["通勤時間の長さ"],
+    },
+    "followupQuestions": [
+        {
+            "question": "通勤時間はおおよそ何分ですか？",
+            "intent": "context.when の具体化",
+            "type": "open",
+            "target": "context.when",
+        },
+        {
+            "question": "メールを確認できないことは、どのくらい困っていますか？（1-5）",
+            "intent": "pains[0].severity の確認",
+            "type": "scale",
+            "target": "pains[0].severity",
+        },
+    ],
+    "qualityReport": {
+        "confidence": 0.8,
+        "missingFields": [],
+        "contradictions": [],
+        "nextAction": "proceed",
+    },
+}
+
+SAMPLE_CRITIC_OUTPUT: dict[str, Any] = {
+    "confidence": 0.85,
+    "missingFields": [],
+    "contradictions": [],
+    "nextAction": "proceed",
+}
+
+SAMPLE_SECTION_VERDICT: dict[str, Any] = {
+    "ok": True,
+    "confidence": 0.85,
+    "missingFields": [],
+    "contradictions": [],
+}
+
+# セクション単位のCriticプロンプトのセクション見出し（"## context"）
+_SECTION_LINE = re.compile(r"^## (\w+)$", re.MULTILINE)
+
+
+def _sample_stage1_output() -> dict[str, Any]:
+    """2段階抽出の1段目: unmetNeeds を空にしたサンプル"""
+    output = json.loads(json.dumps(SAMPLE_OUTPUT))
+    output["problemDiscoverySheet"]["unmetNeeds"] = []
+    return output
+
+
+def _sample_why_output(user_prompt: str) -> dict[str, Any]:
+    """Why深掘り: プロンプト中の pain に対応するサンプル（なければ先頭）"""
+    sheet = SAMPLE_OUTPUT["problemDiscoverySheet"]
+    for pain, need in zip(sheet["pains"], sheet["unmetNeeds"]):
+        if pain["pain"] in user_prompt:
+            return need
+    return sheet["unmetNeeds"][0]
+
+
+# 質問設計プロンプトの情報ギャップ行（"- [context.trigger] (when, 欠落) ..."）
+_GAP_LINE = re.compile(r"^- \[(.+?)\] \((\w+), ", re.MULTILINE)
+
+_SAMPLE_QUESTIONS: dict[str, str] = {
+    "who": "この困りごとを一番強く感じているのは、どんな立場の人ですか？",
+    "when": "最近この困りごとが起きたのは、いつ・どんな出来事の後でしたか？",
+    "where": "その困りごとは、主にどこで起きていますか？",
+    "what": "そのとき本当に終わらせたかった作業は何でしたか？",
+    "why": "それが困る一番の理由は何ですか？その理由はなぜ生まれていますか？",
+    "how": "今はその困りごとにどう対処していて、どこに不満がありますか？",
+    "emotion": "その場面で、どんな気持ち（不安・苛立ち・期待など）になりましたか？",
+    # 同じカテゴリの別フィールド
+    "context.trigger": "困りごとが始まる直前には、たいてい何が起きていますか？",
+    "pains": "その作業のどの場面で、一番手間や困難を感じますか？",
+    "impact": "その困りごとのせいで、時間やお金などにどんな影響が出ていますか？",
+    "successCriteria": "どうなっていれば「解決した」と感じられますか？",
+}
+
+
+def _sample_question(field: str, category: str) -> str:
+    """フィールド別（なければカテゴリ別）のサンプル質問"""
+    leaf = field.rsplit(".", 1)[-1]
+    for key in (field, leaf, category):
+        if key in _SAMPLE_QUESTIONS:
+            return _SAMPLE_QUESTIONS[key]
+    return _SAMPLE_QUESTIONS["what"]
+
+
+def _sample_question_sheet(user_prompt: str) -> dict[str, Any]:
+    """質問設計: プロンプト中のギャップ1件につき1問のサンプル"""
+    return {
+        "questionSheet": [
+            {
+                "question": _sample_question(field, category),
+                "category": category,
+                "intent": f"{field} を補う",
+                "priority": "high" if category in ("what", "why") else "medium",
+                "relatedField": field,
+            }
+            for field, category in _GAP_LINE.findall(user_prompt)
+        ]
+    }
+
+
+# マイクロバッチの案件区切り行
+_BATCH_ITEM_LINE = re.compile(r"^\[item: (.+)\]$", re.MULTILINE)
+
+
+def _batch_ids(user_prompt: str) -> list[str]:
+    return _BATCH_ITEM_LINE.findall(user_prompt)
+
+
+def default_responder(messages: list[BaseMessage]) -> str:
+    """システムプロンプトを見て、抽出用・Why深掘り用・Critic用（単発・複数件・セクション単位）・質問設計用のサンプル応答を返す"""
+    system = str(messages[0].content) if messages else ""
+    if system.endswith(BATCH_CRITIC_INSTRUCTIONS):
+        ids = _batch_ids(str(messages[-1].content))
+        return json.dumps(
+            {"items": [{"id": item_id, "qualityReport": SAMPLE_CRITIC_OUTPUT} for item_id in ids]},
+            ensure_ascii=False,
+        )
+    if system.endswith(BATCH_EXTRACTION_INSTRUCTIONS):
+        # 案件ごとに単発と同じ応答を返す（出力スキーマの判定もそのまま使う）
+        user_prompt = str(messages[-1].content)
+        single = default_responder([
+            SystemMessage(content=system[:-len(BATCH_EXTRACTION_INSTRUCTIONS)]),
+            HumanMessage(content=user_prompt),
+        ])
+        ids = _batch_ids(user_prompt)
+        return json.dumps(
+            {"items": [{"id": item_id, "output": json.loads(single)} for item_id in ids]},
+            ensure_ascii=False,
+        )
+    if system.startswith(QUESTION_DESIGN_PROMPT[:40]):
+        return json.dumps(_sample_question_sheet(str(messages[-1].content)), ensure_ascii=False)
+    if system == SECTION_CRITIC_PROMPT:
+        sections = _SECTION_LINE.findall(str(messages[-1].content))
+        return json.dumps({"sections": {name: SAMPLE_SECTION_VERDICT for name in sections}}, ensure_ascii=False)
+    if system.startswith(CRITIC_PROMPT[:40]):
+        return json.dumps(SAMPLE_CRITIC_OUTPUT, ensure_ascii=False)
+    if system == WHY_DEEPDIVE_PROMPT:
+        user_prompt = str(messages[-1].content)
+        return json.dumps(_sample_why_output(user_prompt), ensure_ascii=False)
+    output = _sample_stage1_output() if system == EXTRACTION_PROMPT else SAMPLE_OUTPUT
+    # 短縮スキーマが指定されていれば短縮フォーマットで返す
+    user_prompt = str(messages[-1].content) if messages else ""
+    if COMPACT_POSITIONAL_OUTPUT_SCHEMA in user_prompt:
+        output = to_compact(output, positional=True)
+    elif COMPACT_OUTPUT_SCHEMA in user_prompt:
+        output = to_compact(output)
+    return json.dumps(output, ensure_ascii=False)
+
+
+def _approx_tokens(text: str) -> int:
+    """簡易トークン数（日本語主体のテキストで1トークン≒2文字）"""
+    return max(1, math.ceil(len(text) / 2))
+
+
+# ==================== フェイクモデル ====================
+
+class FakeLatencyChatModel(BaseChatModel):
+    """
+    遅延を再現するフェイクチャットモデル
+    
+    Attributes:
+        responder: メッセージ列から応答テキストを作る関数
+        latency: 固定遅延（秒）または遅延をサンプリングする関数
+        per_char_latency: 出力1文字あたりの生成時間（秒）
+    
+    呼び出し時に timeout（秒）が渡され、遅延がそれを超える場合は TimeoutError を送出する。
+    """
+    
+    responder: Callable[[list[BaseMessage]], str] = default_responder
+    latency: Union[float, Callable[[], float]] = 0.0
+    per_char_latency: float = 0.0
+    model_name: str = "fake-latency"
+    calls: int = 0
+    
+    @property
+    def _llm_type(self) -> str:
+        return "fake-latency-chat-model"
+    
+    @property
+    def _identifying_params(self) -> dict[str, Any]:
+        return {"model_name": self.model_name}
+    
+    def _response_metadata(self) -> dict[str, Any]:
+        # UsageMetadataCallbackHandler はモデル名ごとにトークン数を集計する
+        return {"model_name": self.model_name}
+    
+    def _sample_latency(self, text: str) -> float:
+        base = self.latency() if callable(self.latency) else self.latency
+        return max(0.0, base + self.per_char_latency * len(text))
+    
+    def _respond(self, messages: list[BaseMessage]) -> tuple[str, float, dict[str, int]]:
+        self.calls += 1
+        text = self.responder(messages)
+        prompt = "".join(str(m.content) for m in messages)
+        usage = {
+            "input_tokens": _approx_tokens(prompt),
+            "output_tokens": _approx_tokens(text),
+        }
+        usage["total_tokens"] = usage["input_tokens"] + usage["output_tokens"]
+        return text, self._sample_latency(text), usage
+    
+    def _generate(
+        self,
+        messages: list[BaseMessage],
+        stop: Optional[list[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        text, delay, usage = self._respond(messages)
+        timeout = kwargs.get("timeout")
+        if timeout is not None and delay > timeout:
+            # 実際のクライアントと同様、呼び出し時のタイムアウトで打ち切る
+            time.sleep(timeout)
+            raise TimeoutError(f"フェイクLLMの応答が {timeout:.2f} 秒以内に完了しませんでした")
+        time.sleep(delay)
+        message = AIMessage(content=text, usage_metadata=usage, response_metadata=self._response_metadata())
+        return ChatResult(generations=[ChatGeneration(message=message)])
+    
+    async def _agenerate(
+        self,
+        messages: list[BaseMessage],
+        stop: Optional[list[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        text, delay, usage = self._respond(messages)
+        timeout = kwargs.get("timeout")
+        if timeout is not None and delay > timeout:
+            await asyncio.sleep(timeout)
+            raise TimeoutError(f"フェイクLLMの応答が {timeout:.2f} 秒以内に完了しませんでした")
+        await asyncio.sleep(delay)
+        message = AIMessage(content=text, usage_metadata=usage, response_metadata=self._response_metadata())
+        return ChatResult(generations=[ChatGeneration(message=message)])
+    
+    def _stream(
+        self,
+        messages: list[BaseMessage],
+        stop: Optional[list[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        text, delay, usage = self._respond(messages)
+        pieces = _split_chunks(text)
+        for i, piece in enumerate(pieces):
+            time.sleep(delay / len(pieces))
+            yield ChatGenerationChunk(
+                message=AIMessageChunk(
+                    content=piece,
+                    usage_metadata=usage if i == len(pieces) - 1 else None,
+                    response_metadata=self._response_metadata() if i == len(pieces) - 1 else {},
+                )
+            )
+    
+    async def _astream(
+        self,
+        messages: list[BaseMessage],
+        stop: Optional[list[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        text, delay, usage = self._respond(messages)
+        pieces = _split_chunks(text)
+        for i, piece in enumerate(pieces):
+            await asyncio.sleep(delay / len(pieces))
+            yield ChatGenerationChunk(
+                message=AIMessageChunk(
+                    content=piece,
+                    usage_metadata=usage if i == len(pieces) - 1 else None,
+                    response_metadata=self._response_metadata() if i == len(pieces) - 1 else {},
+                )
+            )
+
+
+def _split_chunks(text: str, size: int = 32) -> list[str]:
+    """ストリーミング用に応答を固定長チャンクへ分割"""
+    return [text[i:i + size] for i in range(0, len(text), size)] or [""]
+
+
+def tail_latency_sampler(
+    base: float = 0.05,
+    jitter: float = 0.01,
+    slow_ratio: float = 0.05,
+    slow_factor: float = 8.0,
+    seed: int | None = None,
+) -> Callable[[], float]:
+    """
+    テールの重い遅延分布を返す（ヘッジングのベンチマーク用）
+    
+    大半は base ± jitter 秒、slow_ratio の確率で base × slow_factor 秒。
+    """
+    rng = random.Random(seed)
+    lock = threading.Lock()
+    
+    def sample() -> float:
+        with lock:
+            value = rng.gauss(base, jitter)
+            if rng.random() < slow_ratio:
+                value *= slow_factor
+        return max(0.0, value)
+    
+    return sample
+
+
+# ==================== 記録・再生 ====================
+
+def recording_key(model_name: str, temperature: float, messages: list[BaseMessage]) -> str:
+    """記録の検索キー（モデル名・温度・メッセージ列のハッシュ）"""
+    payload = json.dumps(
+        [model_name, round(float(temperature), 3), [[m.type, str(m.content)] for m in messages]],
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def load_recordings(path: str | Path) -> dict[str, list[dict[str, Any]]]:
+    """RecordingChatModel が書き出した JSONL を キー → 記録のリスト に読み込む"""
+    recordings: dict[str, list[dict[str, Any]]] = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                recordings.setdefault(record["key"], []).append(record)
+    return recordings
+
+
+_RECORD_LOCK = threading.Lock()
+
+
+class RecordingChatModel(BaseChatModel):
+    """
+    実際のモデルを呼び出し、応答・トークン数・レイテンシを JSONL に追記するラッパー
+    
+    Attributes:
+        inner: 実際に呼び出すモデル
+        path: 記録先の JSONL
+        model_name / temperature: 記録キーに使う設定値
+    """
+    
+    inner: BaseChatModel
+    path: str
+    model_name: str
+    temperature: float
+    
+    @property
+    def _llm_type(self) -> str:
+        return "recording-chat-model"
+    
+    def _generate(
+        self,
+        messages: list[BaseMessage],
+        stop: Optional[list[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        t0 = time.monotonic()
+        # コールバックの二重計上を避けるため内側のモデルは _generate を直接呼ぶ
+        result = self.inner._generate(messages, stop=stop, **kwargs)
+        message = result.generations[0].message
+        record = {
+            "key": recording_key(self.model_name, self.temperature, messages),
+            "model": self.model_name,
+            "temperature": self.temperature,
+            "content": message.content,
+            "usage": getattr(message, "usage_metadata", None),
+            "latency": time.monotonic() - t0,
+        }
+        with _RECORD_LOCK, open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        return result
+
+
+class ReplayChatModel(BaseChatModel):
+    """
+    記録済みの応答を再生するモデル（CI用）
+    
+    同じキーの記録が複数あれば記録順に繰り返し返す。記録されたレイテンシ × time_scale だけ待つ。
+    記録がない呼び出しは KeyError を送出する。
+    """
+    
+    recordings: dict[str, list[dict[str, Any]]]
+    model_name: str
+    temperature: float
+    time_scale: float = 1.0
+    calls: int = 0
+    cursors: dict[str, int] = {}
+    
+    @property
+    def _llm_type(self) -> str:
+        return "replay-chat-model"
+    
+    def _lookup(self, messages: list[BaseMessage]) -> tuple[AIMessage, float]:
+        key = recording_key(self.model_name, self.temperature, messages)
+        records = self.recordings.get(key)
+        if not records:
+            raise KeyError(f"記録された応答がありません: model={self.model_name} temperature={self.temperature}")
+        self.calls += 1
+        index = self.cursors.get(key, 0)
+        self.cursors[key] = index + 1
+        record = records[index % len(records)]
+        message = AIMessage(
+            content=record["content"],
+            usage_metadata=record.get("usage"),
+            response_metadata={"model_name": self.model_name},
+        )
+        return message, record.get("latency", 0.0) * self.time_scale
+    
+    def _generate(
+        self,
+        messages: list[BaseMessage],
+        stop: Optional[list[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        message, delay = self._lookup(messages)
+        time.sleep(delay)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+    
+    async def _agenerate(
+        self,
+        messages: list[BaseMessage],
+        stop: Optional[list[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        message, delay = self._lookup(messages)
+        await asyncio.sleep(delay)
+        return ChatResult(generations=[ChatGeneration(message=message)])
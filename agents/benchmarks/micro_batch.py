@@ -0,0 +1,138 @@
+"""
+マイクロバッチのベンチマーク
+Micro-batching Benchmark (calls / tokens per item)
+
+短い入力を一括処理（batch レーン）で流し、マイクロバッチなし／ありで
+LLM呼び出し回数・1件あたりの入出力トークン・所要時間を比較する。
+--drop-rate を指定すると複数件応答から要素をランダムに欠落させ、
+失敗した要素だけが再試行されることを確認できる。
+
+    python -m agents.benchmarks.micro_batch [--items 32] [--concurrency 16] [--max-items 8]
+    python -m agents.benchmarks.micro_batch --drop-rate 0.2
+"""
+
+import argparse
+import json
+import random
+import time
+from typing import Any
+
+from langchain_core.callbacks import get_usage_metadata_callback
+from langchain_core.messages import BaseMessage
+
+from agents.agent1 import ProblemDiscoveryAgent, create_problem_discovery_chain
+from agents.benchmarks.fake_llm import FakeLatencyChatModel, default_responder
+from agents.utils.batching import MicroBatchPolicy
+from agents.utils.schemas import ProblemDiscoveryInput
+
+SAMPLE_NOTES = [
+    "毎朝の通勤電車が混んでいて、スマホで仕事のメールを確認できない。",
+    "経費精算のたびに紙の領収書を探すのに時間がかかる。",
+    "店舗の在庫を確認するために毎回倉庫まで歩いている。",
+    "子どもの習い事の送迎と仕事の会議がよく重なってしまう。",
+    "問い合わせメールが多すぎて、重要なものを見落とす。",
+    "シフト表の調整を毎週手作業でやっていて疲れる。",
+]
+
+
+def _dropping_responder(drop_rate: float, seed: int):
+    """複数件応答から要素を確率 drop_rate で欠落させる responder"""
+    rng = random.Random(seed)
+    
+    def respond(messages: list[BaseMessage]) -> str:
+        text = default_responder(messages)
+        if drop_rate <= 0:
+            return text
+        data = json.loads(text)
+        if not isinstance(data, dict) or "items" not in data:
+            return text
+        data["items"] = [item for item in data["items"] if rng.random() >= drop_rate]
+        return json.dumps(data, ensure_ascii=False)
+    
+    return respond
+
+
+def run_benchmark(
+    items: int = 32,
+    concurrency: int = 16,
+    max_items: int = 8,
+    max_wait: float = 0.05,
+    latency: float = 0.3,
+    per_char: float = 0.0002,
+    drop_rate: float = 0.0,
+    seed: int = 0,
+) -> dict[str, dict[str, Any]]:
+    """マイクロバッチなし（off）／あり（on）の呼び出し回数・トークン・所要時間を返す"""
+    inputs = [
+        ProblemDiscoveryInput(user_free_text=f"{SAMPLE_NOTES[i % len(SAMPLE_NOTES)]}（案件{i + 1}）")
+        for i in range(items)
+    ]
+    results = {}
+    for label, policy in (("off", None), ("on", MicroBatchPolicy(max_items=max_items, max_wait=max_wait))):
+        responder = _dropping_responder(drop_rate, seed)
+        llm = FakeLatencyChatModel(latency=latency, per_char_latency=per_char, responder=responder)
+        critic_llm = FakeLatencyChatModel(latency=latency, per_char_latency=per_char, responder=responder)
+        agent = ProblemDiscoveryAgent(llm=llm, critic_llm=critic_llm, enable_hedging=False, micro_batch=policy)
+        chain = create_problem_discovery_chain(agent=agent)
+        
+        t0 = time.perf_counter()
+        with get_usage_metadata_callback() as usage:
+            # Runnable.batch は batch レーンで実行される
+            outputs = chain.batch(inputs, config={"max_concurrency": concurrency})
+        elapsed = time.perf_counter() - t0
+        agent.close()
+        
+        input_tokens = sum(m.get("input_tokens", 0) for m in usage.usage_metadata.values())
+        output_tokens = sum(m.get("output_tokens", 0) for m in usage.usage_metadata.values())
+        summary: dict[str, Any] = {
+            "calls": llm.calls + critic_llm.calls,
+            "calls_per_item": (llm.calls + critic_llm.calls) / items,
+            "input_tokens_per_item": input_tokens / items,
+            "output_tokens_per_item": output_tokens / items,
+            "elapsed": elapsed,
+            "parse_ok": sum("parse_error" not in o.quality_report.missing_fields for o in outputs) / items,
+        }
+        if policy is not None:
+            extract_stats = agent._extract_batcher.stats()
+            critic_stats = agent._critic_batcher.stats()
+            summary["items_per_batch"] = extract_stats["itemsPerBatch"]
+            summary["retried"] = extract_stats["retried"] + critic_stats["retried"]
+            summary["gave_up"] = extract_stats["gaveUp"] + critic_stats["gaveUp"]
+        results[label] = summary
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="マイクロバッチなし／ありの呼び出し回数・トークンを比較")
+    parser.add_argument("--items", type=int, default=32)
+    parser.add_argument("--concurrency", type=int, default=16, help="Runnable.batch の max_concurrency")
+    parser.add_argument("--max-items", type=int, default=8, help="1回の呼び出しにまとめる最大件数")
+    parser.add_argument("--max-wait", type=float, default=0.05, help="バッチの時間窓（秒）")
+    parser.add_argument("--latency", type=float, default=0.3, help="フェイクモデルの固定遅延（秒）")
+    parser.add_argument("--per-char", type=float, default=0.0002, help="フェイクモデルの生成1文字あたりの遅延（秒）")
+    parser.add_argument("--drop-rate", type=float, default=0.0, help="複数件応答から要素を欠落させる確率")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    
+    results = run_benchmark(
+        args.items, args.concurrency, args.max_items, args.max_wait,
+        args.latency, args.per_char, args.drop_rate, args.seed,
+    )
+    print(f"{'batching':<10}{'calls':>7}{'calls/item':>12}{'in_tok/item':>13}{'out_tok/item':>14}{'time':>9}{'parse':>7}")
+    for label, s in results.items():
+        print(
+            f"{label:<10}{s['calls']:>7}{s['calls_per_item']:>12.2f}{s['input_tokens_per_item']:>13.0f}"
+            f"{s['output_tokens_per_item']:>14.0f}{s['elapsed']:>8.2f}s{s['parse_ok']:>7.0%}"
+        )
+    on, off = results["on"], results["off"]
+    print(
+        f"1バッチあたり {on['items_per_batch']:.1f} 件, 再試行 {on['retried']} 件, 単発へ切り替え {on['gave_up']} 件"
+    )
+    print(
+        f"呼び出し回数 {(1 - on['calls'] / off['calls']) * 100:.1f}% 削減, "
+        f"入力トークン/件 {(1 - on['input_tokens_per_item'] / off['input_tokens_per_item']) * 100:.1f}% 削減"
+    )
+
+
+if __name__ == "__main__":
+    main()
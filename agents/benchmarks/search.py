@@ -0,0 +1,142 @@
+"""
+課題シート検索のベンチマーク
+Problem Sheet Search Benchmark (n-gram index vs. full scan)
+
+合成した課題シートを SheetIndex に追加し、追加速度・保存／メモリマップ読み込み時間・
+ポスティングのメモリ量・クエリのレイテンシ（p50/p95）を計測する。
+比較として、全シートのテキストを部分文字列で走査した場合の時間も表示する。
+
+    python -m agents.benchmarks.search [--sheets 100000] [--queries 200]
+"""
+
+import argparse
+import random
+import tempfile
+import time
+from typing import Any
+
+from agents.analytics import normalize_text
+from agents.search import SheetIndex, _field_texts
+from agents.utils.latency import summarize_latencies
+
+INDUSTRIES = ["小売", "製造", "医療", "教育", "物流", "金融", "飲食", "不動産"]
+WHO = ["店長", "営業担当者", "看護師", "教師", "ドライバー", "経理担当者", "店舗スタッフ", "現場監督"]
+WHEN = ["毎朝", "月末", "繁忙期", "夜勤中", "週末", "会議の前", "締め日", "出張中"]
+TASKS = [
+    "在庫を確認する", "経費を精算する", "シフトを調整する", "問い合わせに回答する",
+    "配送ルートを決める", "見積もりを作成する", "患者の記録を共有する", "教材を準備する",
+    "発注量を決める", "顧客情報を更新する", "売上を集計する", "点検結果を報告する",
+]
+OBSTACLES = [
+    "紙の書類を探すのに時間がかかる", "システムが分かれていて二重入力になる", "担当者に連絡がつかない",
+    "最新の情報がどこにあるか分からない", "手作業の転記でミスが起きる", "スマホから操作できない",
+    "承認待ちで作業が止まる", "過去の経緯が引き継がれない", "データの形式がばらばら",
+]
+KANA = "アイウエオカキクケコサシスセソタチツテトナニヌネノハヒフヘホマミムメモヤユヨラリルレロワン"
+NEEDS = [
+    "その場で判断できる情報が欲しい", "入力を一度で済ませたい", "待ち時間をなくしたい",
+    "ミスを事前に防ぎたい", "経緯をすぐに把握したい", "外出先でも作業を進めたい",
+]
+
+
+def synthetic_sheet(rng: random.Random) -> tuple[dict[str, Any], dict[str, str]]:
+    """FirestoreOutput 形式の合成シートと project_meta を作る（語彙を増やすため架空の製品名を混ぜる）"""
+    who, when, task = rng.choice(WHO), rng.choice(WHEN), rng.choice(TASKS)
+    product = "".join(rng.choices(KANA, k=4))
+    obstacles = rng.sample(OBSTACLES, 3)
+    record = {
+        "problemStatement": f"{who}が、{when}に、{task}を達成したいが、{obstacles[0]}ことが障害になって困っている",
+        "problemDiscoverySheet": {
+            "job": {"main": f"{product}で{task}"},
+            "pains": [
+                {"pain": f"{product}の{obstacle}", "severity": rng.randint(1, 5), "frequency": rng.randint(1, 5)}
+                for obstacle in obstacles
+            ],
+            "unmetNeeds": [{"need": need, "whyDepth": []} for need in rng.sample(NEEDS, 2)],
+        },
+    }
+    return record, {"industry": rng.choice(INDUSTRIES)}
+
+
+def _scan(texts: list[str], query: str, k: int) -> list[int]:
+    """比較用: 全シートを走査して、クエリの語を含む数で並べる"""
+    terms = normalize_text(query).split()
+    scored = [(sum(term in text for term in terms), row) for row, text in enumerate(texts)]
+    return [row for score, row in sorted(scored, key=lambda x: -x[0])[:k] if score > 0]
+
+
+def run_benchmark(sheets: int = 100_000, queries: int = 200, k: int = 10, seed: int = 0) -> dict[str, Any]:
+    rng = random.Random(seed)
+    index = SheetIndex()
+    texts: list[str] = []
+    
+    t0 = time.perf_counter()
+    for i in range(sheets):
+        record, meta = synthetic_sheet(rng)
+        index.add(record, project_meta=meta, session_id=f"project-{i}")
+        texts.append(" ".join(normalize_text(text) for _, text in _field_texts(record)))
+    build_seconds = time.perf_counter() - t0
+    
+    query_texts = [
+        f"{rng.choice(TASKS)[:4]} {rng.choice(OBSTACLES)[:6]}" for _ in range(queries)
+    ]
+    
+    def measure(target: SheetIndex) -> dict[str, float]:
+        latencies = []
+        for i, query in enumerate(query_texts):
+            industry = INDUSTRIES[i % len(INDUSTRIES)] if i % 2 else None
+            t = time.perf_counter()
+            target.search(query, k=k, industry=industry)
+            latencies.append(time.perf_counter() - t)
+        return summarize_latencies(latencies)
+    
+    unsaved = measure(index)
+    with tempfile.TemporaryDirectory() as tmp:
+        t0 = time.perf_counter()
+        index.save(tmp)
+        save_seconds = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        loaded = SheetIndex.load(tmp)
+        load_seconds = time.perf_counter() - t0
+        mmapped = measure(loaded)
+        stats = loaded.stats()
+    
+    scan_latencies = []
+    for query in query_texts[:10]:
+        t = time.perf_counter()
+        _scan(texts, query, k)
+        scan_latencies.append(time.perf_counter() - t)
+    
+    return {
+        "sheets": sheets,
+        "build_seconds": build_seconds,
+        "save_seconds": save_seconds,
+        "load_seconds": load_seconds,
+        "stats": stats,
+        "query_in_memory": unsaved,
+        "query_mmap": mmapped,
+        "scan": summarize_latencies(scan_latencies),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="課題シート検索（n-gram転置インデックス）の計測")
+    parser.add_argument("--sheets", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    
+    r = run_benchmark(args.sheets, args.queries, args.k, args.seed)
+    stats = r["stats"]
+    print(f"シート数: {r['sheets']:,}  追加: {r['sheets'] / r['build_seconds']:,.0f} 件/秒")
+    print(f"語彙: {stats['terms']:,}  ポスティング: {stats['postings']:,}  メモリ: {stats['postingBytes'] / 1e6:.1f} MB")
+    print(f"保存: {r['save_seconds']:.2f}s  メモリマップ読み込み: {r['load_seconds'] * 1000:.0f}ms")
+    print(f"{'query':<14}{'p50':>10}{'p95':>10}{'p99':>10}")
+    for label in ("query_in_memory", "query_mmap", "scan"):
+        s = r[label]
+        print(f"{label:<14}{s['p50'] * 1000:>8.2f}ms{s['p95'] * 1000:>8.2f}ms{s['p99'] * 1000:>8.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
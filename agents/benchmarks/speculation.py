@@ -0,0 +1,126 @@
+"""
+投機実行（回答待ちの間の先行実行）のベンチマーク
+Speculative Follow-up Benchmark
+
+closed 質問（ローカル適用できない target なし）を含む追加質問に対して、
+ユーザーの考える時間を挟んで回答した場合の回答後の待ち時間を、
+先行実行なし／ありで比較する。一部の回答は自由回答（候補と一致しない）にする。
+
+    python -m agents.benchmarks.speculation [--sessions 20] [--think 1.5] [--free-ratio 0.2]
+"""
+
+import argparse
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from agents.agent1 import ProblemDiscoveryAgent, ProblemDiscoveryOrchestrator
+from agents.benchmarks.fake_llm import FakeLatencyChatModel
+from agents.utils.latency import summarize_latencies
+from agents.utils.schemas import FollowupAnswer, FollowupQuestion, ProblemDiscoveryInput, SessionState
+from agents.utils.speculation import SpeculationPolicy
+
+SAMPLE_INPUT = ProblemDiscoveryInput(
+    user_free_text="毎朝の通勤電車が混んでいて、スマホで仕事のメールを確認したいのに全然できない。",
+)
+
+CLOSED_QUESTIONS = [
+    FollowupQuestion(
+        question="在宅勤務を申請したことはありますか？",
+        intent="代替手段の検討状況",
+        type="closed",
+        options=["ある", "ない"],
+    ),
+    FollowupQuestion(
+        question="片道の通勤時間はどのくらいですか？",
+        intent="困りごとの大きさ",
+        type="closed",
+        options=["30分未満", "30分以上"],
+    ),
+]
+
+
+def _build_orchestrator(speculation: SpeculationPolicy | None, latency: float) -> ProblemDiscoveryOrchestrator:
+    agent = ProblemDiscoveryAgent(
+        llm=FakeLatencyChatModel(latency=latency),
+        critic_llm=FakeLatencyChatModel(latency=latency / 2),
+    )
+    return ProblemDiscoveryOrchestrator(agent, speculation=speculation)
+
+
+def _waiting_state(orchestrator: ProblemDiscoveryOrchestrator, session: int) -> SessionState:
+    """1ターン目を実行し、closed 質問への回答待ちの状態にする"""
+    text = f"{SAMPLE_INPUT.user_free_text}（セッション{session}）"
+    state, _, _ = orchestrator.step(orchestrator.start(ProblemDiscoveryInput(user_free_text=text)))
+    return state.model_copy(update={"next_phase": "problem_discovery", "followup_questions": CLOSED_QUESTIONS})
+
+
+def _session(
+    orchestrator: ProblemDiscoveryOrchestrator,
+    session: int,
+    seed: int,
+    think: float,
+    free_ratio: float,
+) -> float:
+    """1セッション分の回答後の待ち時間（秒）"""
+    rng = random.Random(seed + session)
+    state = _waiting_state(orchestrator, session)
+    orchestrator.prefetch(state)
+    time.sleep(think)
+    if rng.random() < free_ratio:
+        answer = "申請はしていませんが、通勤は1時間ほどです"
+    else:
+        answer = [
+            FollowupAnswer(question_index=i, answer=rng.choice(q.options))
+            for i, q in enumerate(CLOSED_QUESTIONS)
+        ]
+    t0 = time.perf_counter()
+    orchestrator.step(state, answer)
+    return time.perf_counter() - t0
+
+
+def run_benchmark(
+    sessions: int = 20,
+    think: float = 1.5,
+    free_ratio: float = 0.2,
+    latency: float = 0.5,
+    concurrency: int = 4,
+    seed: int = 0,
+) -> dict[str, dict[str, float]]:
+    """条件名 → 回答後の待ち時間の統計（＋先行実行の件数）"""
+    results: dict[str, dict[str, float]] = {}
+    # 同時に回答待ちになるセッションの候補をすべて並行して先行実行できるようにする
+    policy = SpeculationPolicy(max_runs=4)
+    policy.max_workers = concurrency * policy.max_runs
+    for name, speculation in (("no_speculation", None), ("speculation", policy)):
+        orchestrator = _build_orchestrator(speculation, latency)
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            latencies = list(pool.map(
+                lambda session: _session(orchestrator, session, seed, think, free_ratio),
+                range(sessions),
+            ))
+        results[name] = summarize_latencies(latencies)
+        if orchestrator.speculator is not None:
+            results[name].update({f"spec_{k}": float(v) for k, v in orchestrator.speculator.stats().items()})
+            orchestrator.speculator.close()
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="回答待ちの間の先行実行あり／なしで回答後の待ち時間を比較")
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--think", type=float, default=1.5, help="ユーザーの考える時間（秒）")
+    parser.add_argument("--free-ratio", type=float, default=0.2, help="自由回答（候補と不一致）の割合")
+    parser.add_argument("--latency", type=float, default=0.5, help="フェイクLLMの応答時間（秒）")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    
+    results = run_benchmark(args.sessions, args.think, args.free_ratio, args.latency, args.concurrency, args.seed)
+    for name, stats in results.items():
+        line = "  ".join(f"{k}={v:.3f}" for k, v in stats.items())
+        print(f"{name:<16}{line}")
+
+
+if __name__ == "__main__":
+    main()
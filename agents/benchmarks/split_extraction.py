@@ -0,0 +1,79 @@
+"""
+2段階抽出のベンチマーク
+Monolithic vs Split Extraction Benchmark
+
+生成文字数に比例する遅延（per_char_latency）を持つフェイクモデルで、
+1回の呼び出しでWhy深掘りまで行う monolithic と、
+抽出＋painごとのWhy深掘りを並列実行する split の壁時計時間を比較する。
+短縮幅は出力全体に占めるWhy深掘りの割合と、呼び出しごとの固定遅延
+（split では直列に2回かかる）に依存する。
+
+    python -m agents.benchmarks.split_extraction [--requests 20] [--per-char 0.002]
+"""
+
+import argparse
+import asyncio
+import time
+
+from agents.agent1 import ProblemDiscoveryAgent
+from agents.benchmarks.fake_llm import FakeLatencyChatModel
+from agents.utils.latency import summarize_latencies
+from agents.utils.schemas import ProblemDiscoveryInput
+
+SAMPLE_INPUT = ProblemDiscoveryInput(
+    user_free_text="毎朝の通勤電車が混んでいて、スマホで仕事のメールを確認したいのに全然できない。立っているのも辛い。",
+)
+
+
+def _build_agent(mode: str, latency: float, per_char: float) -> ProblemDiscoveryAgent:
+    return ProblemDiscoveryAgent(
+        llm=FakeLatencyChatModel(latency=latency, per_char_latency=per_char),
+        critic_llm=FakeLatencyChatModel(),
+        enable_critic=False,
+        enable_hedging=False,
+        extraction_mode=mode,
+    )
+
+
+async def _measure(agent: ProblemDiscoveryAgent, requests: int) -> list[float]:
+    latencies: list[float] = []
+    for _ in range(requests):
+        t0 = time.perf_counter()
+        output = await agent.arun(SAMPLE_INPUT)
+        latencies.append(time.perf_counter() - t0)
+        assert output.problem_discovery_sheet.unmet_needs, "unmetNeeds が統合されていません"
+    return latencies
+
+
+def run_benchmark(requests: int = 20, latency: float = 0.1, per_char: float = 0.002) -> dict[str, dict[str, float]]:
+    """monolithic / split の壁時計時間の分布を返す"""
+    results = {}
+    for mode in (ProblemDiscoveryAgent.EXTRACTION_MONOLITHIC, ProblemDiscoveryAgent.EXTRACTION_SPLIT):
+        agent = _build_agent(mode, latency, per_char)
+        summary = summarize_latencies(asyncio.run(_measure(agent, requests)))
+        summary["llm_calls"] = agent.llm.calls
+        results[mode] = summary
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="monolithic / split 抽出の壁時計時間を比較")
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.1, help="呼び出しごとの固定遅延（秒）")
+    parser.add_argument("--per-char", type=float, default=0.002, help="生成1文字あたりの遅延（秒）")
+    args = parser.parse_args()
+    
+    results = run_benchmark(args.requests, args.latency, args.per_char)
+    print(f"{'mode':<12}{'calls':>7}{'mean':>9}{'p50':>9}{'p95':>9}{'max':>9}  (ms)")
+    for mode, s in results.items():
+        print(
+            f"{mode:<12}{int(s['llm_calls']):>7}"
+            f"{s['mean'] * 1000:>9.0f}{s['p50'] * 1000:>9.0f}{s['p95'] * 1000:>9.0f}{s['max'] * 1000:>9.0f}"
+        )
+    base = results[ProblemDiscoveryAgent.EXTRACTION_MONOLITHIC]["p50"]
+    split = results[ProblemDiscoveryAgent.EXTRACTION_SPLIT]["p50"]
+    print(f"\np50 短縮率: {(1 - split / base) * 100:.1f}%")
+
+
+if __name__ == "__main__":
+    main()
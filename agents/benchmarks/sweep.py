@@ -0,0 +1,329 @@
+"""
+モデル・設定スイープのベンチマーク
+Model / Configuration Sweep (throughput vs. quality)
+
+固定コーパス（自由記述＋台本化した回答）を model_name × temperature × enable_critic の
+グリッドで最後まで対話させ、設定ごとに以下を比較する。
+
+- 1ターンあたりのレイテンシ（p50 / p95）とセッション全体の所要時間
+- セッションあたりの入出力トークン数（usage_metadata）
+- JSONパース失敗率・エラー率
+- proceed / ask_more の比率、proceed に到達したセッションの平均往復回数
+
+応答の取得方法:
+    --backend fake    フェイクモデル（既定。CIで処理系の動作確認に使う）
+    --backend live    実際の Gemini（--record を付けると応答を JSONL に記録）
+    --backend replay  --record で記録した応答を再生（CIで品質指標を比較する）
+    
+    python -m agents.benchmarks.sweep --models gemini-2.5-flash-lite,gemini-2.5-flash \\
+        --temperatures 0.1,0.3 --critic on,off --backend live --record sweep.jsonl
+    python -m agents.benchmarks.sweep ... --backend replay --record sweep.jsonl --time-scale 0
+"""
+
+import argparse
+import itertools
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+
+from langchain_core.callbacks import get_usage_metadata_callback
+from langchain_core.language_models.chat_models import BaseChatModel
+from pydantic import BaseModel, Field
+
+from agents.agent1 import ProblemDiscoveryAgent, ProblemDiscoveryOrchestrator
+from agents.benchmarks.fake_llm import (
+    FakeLatencyChatModel,
+    RecordingChatModel,
+    ReplayChatModel,
+    load_recordings,
+)
+from agents.utils.latency import summarize_latencies
+from agents.utils.schemas import ProblemDiscoveryInput, ProjectMeta
+
+# Critic は ProblemDiscoveryAgent 内で温度 0.1 固定
+CRITIC_TEMPERATURE = 0.1
+
+DEFAULT_CORPUS: list[dict[str, Any]] = [
+    {
+        "id": "commute",
+        "user_free_text": "毎朝の通勤電車が混んでいて、スマホで仕事のメールを確認したいのに全然できない。",
+        "answers": ["片道50分で、始業前に取引先からの連絡を把握しておきたいです。", "今は出社してからまとめて確認しています。"],
+    },
+    {
+        "id": "inventory",
+        "user_free_text": "店舗の在庫確認に時間がかかる。",
+        "project_meta": {"industry": "小売", "target_customer": "中小規模の店舗"},
+        "answers": ["発注前の毎週月曜に、3店舗の在庫を電話で確認しています。", "欠品に気づくのが遅れて売り逃しが月に数回あります。"],
+    },
+    {
+        "id": "shift",
+        "user_free_text": "アルバイトのシフト調整が大変で、毎月締め切り前は夜まで作業している。",
+        "project_meta": {"industry": "飲食"},
+        "answers": ["希望はLINEで個別に集めて、Excelに手で転記しています。"],
+    },
+    {
+        "id": "invoice",
+        "user_free_text": "請求書の処理が遅れがち。",
+        "project_meta": {"industry": "製造", "constraints": ["既存の会計ソフトは変更できない"]},
+        "answers": ["月末に紙の請求書が100枚ほど届き、経理2名で入力しています。", "入力ミスで支払いが遅れ、取引先から催促が来ることがあります。", "OCRは試したが精度が低くやめました。"],
+    },
+    {
+        "id": "handover",
+        "user_free_text": "看護師の夜勤から日勤への申し送りに毎回30分以上かかり、患者対応が後回しになっている。",
+        "project_meta": {"industry": "医療"},
+        "answers": ["紙のメモと口頭で伝えていて、聞き漏れがあると後で確認の電話が来ます。"],
+    },
+]
+
+
+class SweepConfig(BaseModel):
+    """スイープの1設定"""
+    model_name: str = Field(description="モデル名")
+    temperature: float = Field(description="抽出の温度")
+    enable_critic: bool = Field(description="LLM Critic を使うか")
+    
+    @property
+    def label(self) -> str:
+        return f"{self.model_name} t={self.temperature:g} critic={'on' if self.enable_critic else 'off'}"
+
+
+def build_grid(models: list[str], temperatures: list[float], critic: list[bool]) -> list[SweepConfig]:
+    """設定グリッドを作成"""
+    return [
+        SweepConfig(model_name=m, temperature=t, enable_critic=c)
+        for m, t, c in itertools.product(models, temperatures, critic)
+    ]
+
+
+def load_corpus(path: str | None) -> list[dict[str, Any]]:
+    """JSONL（1行1件: user_free_text / project_meta / answers）を読み込む。省略時は既定コーパス"""
+    if path is None:
+        return DEFAULT_CORPUS
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+# ==================== モデルの用意 ====================
+
+def _model_for(
+    config: SweepConfig,
+    temperature: float,
+    backend: str,
+    record: str | None,
+    recordings: dict[str, list[dict[str, Any]]] | None,
+    time_scale: float,
+    fake_latency: float,
+    fake_per_char: float,
+) -> BaseChatModel:
+    if backend == "fake":
+        return FakeLatencyChatModel(model_name=config.model_name, latency=fake_latency, per_char_latency=fake_per_char)
+    if backend == "replay":
+        return ReplayChatModel(
+            recordings=recordings or {},
+            model_name=config.model_name,
+            temperature=temperature,
+            time_scale=time_scale,
+        )
+    
+    from langchain_google_genai import ChatGoogleGenerativeAI
+    
+    llm = ChatGoogleGenerativeAI(
+        model=config.model_name,
+        temperature=temperature,
+        convert_system_message_to_human=True,
+    )
+    if record:
+        return RecordingChatModel(inner=llm, path=record, model_name=config.model_name, temperature=temperature)
+    return llm
+
+
+def build_agent(config: SweepConfig, backend: str = "fake", **model_options: Any) -> ProblemDiscoveryAgent:
+    """設定に対応するエージェント（ヘッジは記録の再現性のため無効）"""
+    return ProblemDiscoveryAgent(
+        model_name=config.model_name,
+        temperature=config.temperature,
+        enable_critic=config.enable_critic,
+        llm=_model_for(config, config.temperature, backend, **model_options),
+        critic_llm=_model_for(config, CRITIC_TEMPERATURE, backend, **model_options),
+        enable_hedging=False,
+    )
+
+
+# ==================== 実行 ====================
+
+def run_session(orchestrator: ProblemDiscoveryOrchestrator, item: dict[str, Any]) -> dict[str, Any]:
+    """コーパス1件を、台本の回答が尽きるか proceed するまで対話させる"""
+    project_meta = item.get("project_meta")
+    initial_input = ProblemDiscoveryInput(
+        user_free_text=item["user_free_text"],
+        project_meta=ProjectMeta(**project_meta) if project_meta else None,
+    )
+    answers = list(item.get("answers") or [])
+    turns: list[dict[str, Any]] = []
+    error = None
+    
+    started = time.perf_counter()
+    with get_usage_metadata_callback() as usage:
+        state = orchestrator.start(initial_input)
+        answer = None
+        while True:
+            t0 = time.perf_counter()
+            try:
+                state, output, next_phase = orchestrator.step(state, answer)
+            except Exception as e:  # 記録なし・API エラーなどは設定ごとのエラー率として集計
+                error = f"{type(e).__name__}: {e}"
+                break
+            turns.append({
+                "latency": time.perf_counter() - t0,
+                "nextAction": output.quality_report.next_action,
+                "parseError": "parse_error" in output.quality_report.missing_fields,
+            })
+            if next_phase != "problem_discovery" or state.iteration >= orchestrator.max_iterations or not answers:
+                break
+            answer = answers.pop(0)
+    
+    tokens = {"input": 0, "output": 0}
+    for metadata in usage.usage_metadata.values():
+        tokens["input"] += metadata.get("input_tokens", 0)
+        tokens["output"] += metadata.get("output_tokens", 0)
+    
+    return {
+        "id": item.get("id"),
+        "turns": turns,
+        "proceeded": bool(turns) and state.next_phase != "problem_discovery",
+        "iterations": state.iteration,
+        "elapsed": time.perf_counter() - started,
+        "tokens": tokens,
+        "error": error,
+    }
+
+
+def summarize(sessions: list[dict[str, Any]]) -> dict[str, Any]:
+    """セッション結果を設定ごとの指標に集計"""
+    turns = [t for s in sessions for t in s["turns"]]
+    proceeded = [s for s in sessions if s["proceeded"]]
+    latency = summarize_latencies([t["latency"] for t in turns])
+    n_sessions = max(1, len(sessions))
+    n_turns = max(1, len(turns))
+    return {
+        "sessions": len(sessions),
+        "turns": len(turns),
+        "turnP50": latency["p50"],
+        "turnP95": latency["p95"],
+        "sessionMean": sum(s["elapsed"] for s in sessions) / n_sessions,
+        "inputTokens": sum(s["tokens"]["input"] for s in sessions) / n_sessions,
+        "outputTokens": sum(s["tokens"]["output"] for s in sessions) / n_sessions,
+        "parseFailRate": sum(t["parseError"] for t in turns) / n_turns,
+        "errorRate": sum(1 for s in sessions if s["error"]) / n_sessions,
+        "proceedRatio": sum(t["nextAction"] == "proceed" for t in turns) / n_turns,
+        "sessionProceedRate": len(proceeded) / n_sessions,
+        "avgIterationsToProceed": (
+            sum(s["iterations"] for s in proceeded) / len(proceeded) if proceeded else None
+        ),
+    }
+
+
+def run_sweep(
+    grid: list[SweepConfig],
+    corpus: list[dict[str, Any]],
+    backend: str = "fake",
+    repeats: int = 1,
+    concurrency: int = 4,
+    record: str | None = None,
+    time_scale: float = 1.0,
+    fake_latency: float = 0.05,
+    fake_per_char: float = 0.0,
+) -> list[dict[str, Any]]:
+    """グリッドの各設定でコーパスを repeats 回ずつ実行し、設定ごとの指標を返す"""
+    recordings = load_recordings(record) if backend == "replay" and record else None
+    model_options = {
+        "record": record if backend == "live" else None,
+        "recordings": recordings,
+        "time_scale": time_scale,
+        "fake_latency": fake_latency,
+        "fake_per_char": fake_per_char,
+    }
+    results = []
+    for config in grid:
+        orchestrator = ProblemDiscoveryOrchestrator(build_agent(config, backend, **model_options))
+        items = [item for _ in range(repeats) for item in corpus]
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            sessions = list(pool.map(lambda item: run_session(orchestrator, item), items))
+        results.append({"config": config.model_dump(), "label": config.label, **summarize(sessions)})
+    return results
+
+
+def pick_best(results: list[dict[str, Any]], min_proceed: float, max_parse_fail: float) -> dict[str, Any] | None:
+    """品質条件を満たす設定のうち、ターンの p95 が最小のもの"""
+    eligible = [
+        r for r in results
+        if r["sessionProceedRate"] >= min_proceed and r["parseFailRate"] <= max_parse_fail and r["errorRate"] == 0
+    ]
+    return min(eligible, key=lambda r: r["turnP95"]) if eligible else None
+
+
+def print_table(results: list[dict[str, Any]]) -> None:
+    print(
+        f"{'config':<42}{'p50':>8}{'p95':>8}{'sess':>8}{'in_tok':>8}{'out_tok':>8}"
+        f"{'parse✗':>8}{'err':>6}{'proceed':>9}{'reach':>7}{'iters':>7}"
+    )
+    for r in results:
+        iterations = r["avgIterationsToProceed"]
+        print(
+            f"{r['label']:<42}{r['turnP50'] * 1000:>6.0f}ms{r['turnP95'] * 1000:>6.0f}ms"
+            f"{r['sessionMean']:>7.2f}s{r['inputTokens']:>8.0f}{r['outputTokens']:>8.0f}"
+            f"{r['parseFailRate']:>8.1%}{r['errorRate']:>6.0%}{r['proceedRatio']:>9.1%}"
+            f"{r['sessionProceedRate']:>7.0%}{'-' if iterations is None else f'{iterations:.2f}':>7}"
+        )
+
+
+def _csv(value: str, cast=str) -> list:
+    return [cast(v.strip()) for v in value.split(",") if v.strip()]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="model_name × temperature × enable_critic のスイープ")
+    parser.add_argument("--models", default="gemini-2.5-flash-lite")
+    parser.add_argument("--temperatures", default="0.1,0.3")
+    parser.add_argument("--critic", default="on,off", help="on / off のカンマ区切り")
+    parser.add_argument("--corpus", default=None, help="コーパスの JSONL（省略時は既定の5件）")
+    parser.add_argument("--backend", choices=("fake", "live", "replay"), default="fake")
+    parser.add_argument("--record", default=None, help="live: 記録先 / replay: 記録元の JSONL")
+    parser.add_argument("--time-scale", type=float, default=1.0, help="replay 時に記録レイテンシへ掛ける係数")
+    parser.add_argument("--repeats", type=int, default=1)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--min-proceed", type=float, default=0.8, help="推奨設定の条件: proceed 到達率の下限")
+    parser.add_argument("--max-parse-fail", type=float, default=0.05, help="推奨設定の条件: パース失敗率の上限")
+    parser.add_argument("--json", default=None, help="結果を JSON で書き出すパス")
+    args = parser.parse_args()
+    
+    grid = build_grid(
+        _csv(args.models),
+        _csv(args.temperatures, float),
+        [v == "on" for v in _csv(args.critic)],
+    )
+    results = run_sweep(
+        grid,
+        load_corpus(args.corpus),
+        backend=args.backend,
+        repeats=args.repeats,
+        concurrency=args.concurrency,
+        record=args.record,
+        time_scale=args.time_scale,
+    )
+    print_table(results)
+    
+    best = pick_best(results, args.min_proceed, args.max_parse_fail)
+    if best is None:
+        print("\n品質条件を満たす設定はありません")
+    else:
+        print(f"\n推奨: {best['label']}（品質条件を満たす中でターン p95 が最小）")
+    
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+ワイヤーフォーマットのベンチマーク
+Wire Format Benchmark (output tokens / latency)
+
+抽出呼び出し1回あたりの出力トークン数・出力文字数・レイテンシを
+json（従来）/ compact / compact_positional で比較し、展開後の出力が
+従来形式と同じ ProblemDiscoveryOutput になることも確認する。
+
+    python -m agents.benchmarks.wire_format [--requests 10] [--per-char 0.002]
+    python -m agents.benchmarks.wire_format --live   # 実際の Gemini で計測（GOOGLE_API_KEY が必要）
+"""
+
+import argparse
+import time
+
+from agents.agent1 import ProblemDiscoveryAgent
+from agents.benchmarks.fake_llm import FakeLatencyChatModel
+from agents.utils.latency import summarize_latencies
+from agents.utils.schemas import ProblemDiscoveryInput
+from agents.utils.wire import WIRE_FORMATS, WIRE_JSON
+
+SAMPLE_INPUT = ProblemDiscoveryInput(
+    user_free_text="毎朝の通勤電車が混んでいて、スマホで仕事のメールを確認したいのに全然できない。立っているのも辛い。",
+)
+
+
+def _build_agent(wire_format: str, live: bool, model_name: str, latency: float, per_char: float) -> ProblemDiscoveryAgent:
+    if live:
+        return ProblemDiscoveryAgent(model_name=model_name, enable_critic=False, wire_format=wire_format)
+    return ProblemDiscoveryAgent(
+        llm=FakeLatencyChatModel(latency=latency, per_char_latency=per_char),
+        critic_llm=FakeLatencyChatModel(),
+        enable_critic=False,
+        wire_format=wire_format,
+    )
+
+
+def run_benchmark(
+    requests: int = 10,
+    live: bool = False,
+    model_name: str = "gemini-2.5-flash-lite",
+    latency: float = 0.1,
+    per_char: float = 0.002,
+) -> dict[str, dict[str, float]]:
+    """フォーマットごとの出力トークン・文字数・レイテンシ・パース成功率・従来形式との一致率を返す"""
+    results = {}
+    reference = None
+    for wire_format in WIRE_FORMATS:
+        agent = _build_agent(wire_format, live, model_name, latency, per_char)
+        messages = agent._build_extraction_messages(SAMPLE_INPUT)
+        latencies: list[float] = []
+        output_tokens = input_tokens = output_chars = parsed = matched = 0
+        
+        for _ in range(requests):
+            t0 = time.perf_counter()
+            response = agent.llm.invoke(messages)
+            latencies.append(time.perf_counter() - t0)
+            usage = response.usage_metadata or {}
+            output_tokens += usage.get("output_tokens", 0)
+            input_tokens += usage.get("input_tokens", 0)
+            output_chars += len(response.content)
+            output = agent._parse_output(agent._decode_extraction(response.content))
+            if "parse_error" not in output.quality_report.missing_fields:
+                parsed += 1
+            # 従来形式（先頭の json）の最初の出力と比較
+            dumped = output.model_dump()
+            reference = reference or dumped
+            matched += dumped == reference
+        
+        summary = summarize_latencies(latencies)
+        summary["output_tokens"] = output_tokens / requests
+        summary["input_tokens"] = input_tokens / requests
+        summary["output_chars"] = output_chars / requests
+        summary["parse_ok"] = parsed / requests
+        summary["match"] = matched / requests
+        results[wire_format] = summary
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="ワイヤーフォーマット別の出力トークン・レイテンシを比較")
+    parser.add_argument("--requests", type=int, default=10)
+    parser.add_argument("--live", action="store_true", help="フェイクモデルではなく Gemini を使う")
+    parser.add_argument("--model", default="gemini-2.5-flash-lite")
+    parser.add_argument("--latency", type=float, default=0.1, help="フェイクモデルの固定遅延（秒）")
+    parser.add_argument("--per-char", type=float, default=0.002, help="フェイクモデルの生成1文字あたりの遅延（秒）")
+    args = parser.parse_args()
+    
+    results = run_benchmark(args.requests, args.live, args.model, args.latency, args.per_char)
+    print(f"{'format':<20}{'out_tok':>9}{'in_tok':>9}{'chars':>8}{'p50':>9}{'p95':>9}{'parse':>7}{'match':>7}")
+    for wire_format, s in results.items():
+        print(
+            f"{wire_format:<20}{s['output_tokens']:>9.0f}{s['input_tokens']:>9.0f}{s['output_chars']:>8.0f}"
+            f"{s['p50'] * 1000:>7.0f}ms{s['p95'] * 1000:>7.0f}ms{s['parse_ok']:>7.0%}{s['match']:>7.0%}"
+        )
+    base = results[WIRE_JSON]
+    for wire_format, s in results.items():
+        if wire_format != WIRE_JSON:
+            print(
+                f"{wire_format}: 出力トークン {(1 - s['output_tokens'] / base['output_tokens']) * 100:.1f}% 削減, "
+                f"p50 {(1 - s['p50'] / base['p50']) * 100:.1f}% 短縮"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -5,8 +5,9 @@ Agents Chains Package
 LangChain LCEL チェーン定義
 """
 
-from agents.agent1 import create_problem_discovery_chain
+from agents.agent1 import ProblemDiscoveryRunnable, create_problem_discovery_chain
 
 __all__ = [
+    "ProblemDiscoveryRunnable",
     "create_problem_discovery_chain",
 ]
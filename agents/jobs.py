@@ -0,0 +1,700 @@
+"""
+バックグラウンド実行用の永続ジョブキュー（SQLite）
+=====================================
+
+一括再実行やプロンプト変更後の再分析など、長時間かかる課題探索の処理を
+SQLite のキューに積み、ワーカープールで実行する。
+
+- enqueue / lease / heartbeat / complete / fail
+- 失敗時は指数バックオフで再試行し、max_attempts を超えたら dead（デッドレター）
+- 再試行しても回復しない失敗（入力の検証エラー・トークン予算超過など）は即座に dead
+- リースの期限切れ（ワーカーのクラッシュ等）は別のワーカーが引き取る
+- キューはファイルに永続化されるため、プロセスを再起動しても失われない
+- ワーカーはスレッドまたはプロセスで並列実行できる
+
+複数プロセス・複数ノードから同じキューファイルを共有できる（WAL モード）。
+ノード間で共有する場合は、POSIX ロックが正しく動作する共有ストレージに置くこと
+（一般的な NFS 上の SQLite はロックが保証されない）。
+
+    queue = JobQueue("jobs.db")
+    enqueue_problem_discovery(queue, ProblemDiscoveryInput(user_free_text="..."), tenant_id="acme")
+    WorkerPool("jobs.db", workers=4, mode="process").run_until_empty()
+
+CLI:
+    python -m agents.jobs enqueue --db jobs.db inputs.jsonl
+    python -m agents.jobs work --db jobs.db --workers 4 --mode process
+    python -m agents.jobs stats --db jobs.db
+    python -m agents.jobs export --db jobs.db --out results.alsc
+
+結果は agents.utils.codec の形式（共有キー辞書＋圧縮）で保存する。
+export は完了したジョブの出力を同じ形式のレコードファイルに書き出す（codec.read_records で読める）。
+"""
+
+import argparse
+import functools
+import json
+import multiprocessing
+import os
+import random
+import socket
+import sqlite3
+import sys
+import threading
+import time
+from typing import Any, Callable, Iterator, Optional
+
+import httpx
+from pydantic import BaseModel, Field
+
+from agents.agent1 import ProblemDiscoveryAgent, create_default_agent
+from agents.utils import codec
+from agents.utils.request_context import LANE_BATCH, request_context
+from agents.utils.schemas import FirestoreOutput, ProblemDiscoveryInput
+from agents.utils.tokens import TokenBudgetExceededError
+
+# ジョブの状態
+STATUS_QUEUED = "queued"
+STATUS_LEASED = "leased"
+STATUS_DONE = "done"
+STATUS_DEAD = "dead"
+
+# ジョブ種別
+KIND_PROBLEM_DISCOVERY = "problem_discovery"
+
+# 再試行すべき出力（エージェントは例外ではなく qualityReport で失敗を返す）
+RETRYABLE_MISSING_FIELDS = ("timeout", "parse_error")
+
+# 再試行しない例外（pydantic の ValidationError は ValueError のサブクラス）
+NON_RETRYABLE_ERRORS: tuple[type[BaseException], ...] = (TokenBudgetExceededError, ValueError)
+
+# 再試行する例外（一時的な障害）。プロバイダの例外は HTTP ステータスで判定する
+# httpx の接続・タイムアウト例外（TransportError）は組み込みの TimeoutError / ConnectionError を継承しない
+RETRYABLE_ERRORS: tuple[type[BaseException], ...] = (TimeoutError, ConnectionError, httpx.TransportError)
+RETRYABLE_STATUS_CODES = frozenset({408, 429, 500, 502, 503, 504})
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id            INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind          TEXT    NOT NULL,
+    payload       TEXT    NOT NULL,
+    status        TEXT    NOT NULL,
+    attempts      INTEGER NOT NULL DEFAULT 0,
+    max_attempts  INTEGER NOT NULL,
+    run_after     REAL    NOT NULL,
+    lease_owner   TEXT,
+    lease_expires REAL,
+    result        BLOB,
+    last_error    TEXT,
+    created_at    REAL    NOT NULL,
+    updated_at    REAL    NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_ready ON jobs (status, run_after);
+CREATE INDEX IF NOT EXISTS idx_jobs_lease ON jobs (status, lease_expires);
+"""
+
+
+class JobRetryError(RuntimeError):
+    """再試行で回復する見込みのある失敗（タイムアウト・JSON解析エラーなど）"""
+
+
+def is_retryable(error: BaseException) -> bool:
+    """
+    再試行で回復する見込みのある例外か
+    
+    JobRetryError・タイムアウト（DeadlineExceededError・httpx のタイムアウトを含む）・接続断・
+    プロバイダの 429 / 5xx のみ再試行する。ラップされた例外は __cause__ をたどって判定する。
+    それ以外（検証エラー・予算超過・想定外の例外）は再試行しても同じ結果になるため dead にする。
+    """
+    if isinstance(error, NON_RETRYABLE_ERRORS):
+        return False
+    seen: set[int] = set()
+    current: BaseException | None = error
+    while current is not None and id(current) not in seen:
+        seen.add(id(current))
+        if isinstance(current, (JobRetryError,) + RETRYABLE_ERRORS):
+            return True
+        code = getattr(current, "status_code", None) or getattr(current, "code", None)
+        if isinstance(code, int) and code in RETRYABLE_STATUS_CODES:
+            return True
+        current = current.__cause__
+    return False
+
+
+class Job(BaseModel):
+    """リースしたジョブ"""
+    id: int = Field(description="ジョブID")
+    kind: str = Field(description="ジョブ種別")
+    payload: dict[str, Any] = Field(description="ジョブの入力")
+    attempts: int = Field(description="これまでの実行回数（今回を含む）")
+    max_attempts: int = Field(description="最大実行回数")
+    lease_expires: float = Field(description="リースの期限（UNIX時刻）")
+
+
+# ==================== キュー ====================
+
+class JobQueue:
+    """
+    SQLite を使った永続ジョブキュー
+    
+    接続はスレッドごとに作成するため、1インスタンスを複数スレッドで共有できる。
+    時刻はノード間で比較できるよう time.time()（UNIX時刻）を使う。
+    
+    Args:
+        path: キューファイルのパス
+        lease_seconds: リースの有効期間（heartbeat で延長する）
+        max_attempts: 既定の最大実行回数（超えたら dead）
+        backoff_base: 再試行までの待ち時間の基数（秒）。base × 2^(attempts-1)
+        backoff_max: 再試行までの待ち時間の上限（秒）
+    """
+    
+    def __init__(
+        self,
+        path: str,
+        lease_seconds: float = 60.0,
+        max_attempts: int = 5,
+        backoff_base: float = 2.0,
+        backoff_max: float = 300.0,
+    ):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._local = threading.local()
+        self._conn().executescript(_SCHEMA)
+    
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # 自動コミット（トランザクションは BEGIN IMMEDIATE で明示する）
+            conn = sqlite3.connect(self.path, timeout=30.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+        return conn
+    
+    def close(self) -> None:
+        """このスレッドの接続を閉じる"""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+    
+    # ---------- 投入 ----------
+    
+    def enqueue(
+        self,
+        payload: dict[str, Any],
+        kind: str = KIND_PROBLEM_DISCOVERY,
+        max_attempts: int | None = None,
+        delay: float = 0.0,
+    ) -> int:
+        """ジョブを投入してIDを返す"""
+        return self.enqueue_many([payload], kind, max_attempts, delay)[0]
+    
+    def enqueue_many(
+        self,
+        payloads: list[dict[str, Any]],
+        kind: str = KIND_PROBLEM_DISCOVERY,
+        max_attempts: int | None = None,
+        delay: float = 0.0,
+    ) -> list[int]:
+        """複数のジョブを1トランザクションで投入"""
+        now = time.time()
+        conn = self._conn()
+        ids = []
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for payload in payloads:
+                cursor = conn.execute(
+                    "INSERT INTO jobs (kind, payload, status, max_attempts, run_after, created_at, updated_at)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        kind,
+                        json.dumps(payload, ensure_ascii=False),
+                        STATUS_QUEUED,
+                        max_attempts or self.max_attempts,
+                        now + delay,
+                        now,
+                        now,
+                    ),
+                )
+                ids.append(cursor.lastrowid)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return ids
+    
+    # ---------- ワーカー側 ----------
+    
+    def lease(self, worker_id: str, limit: int = 1, kinds: tuple[str, ...] | None = None) -> list[Job]:
+        """
+        実行可能なジョブを最大 limit 件リースする
+        
+        期限切れのリースも再取得の対象になる（最大実行回数に達していれば dead にする）。
+        """
+        now = time.time()
+        conn = self._conn()
+        kind_filter, kind_args = "", ()
+        if kinds:
+            kind_filter = f" AND kind IN ({','.join('?' * len(kinds))})"
+            kind_args = tuple(kinds)
+        
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "UPDATE jobs SET status = ?, last_error = ?, lease_owner = NULL, updated_at = ?"
+                " WHERE status = ? AND lease_expires < ? AND attempts >= max_attempts",
+                (STATUS_DEAD, "リース期限切れ（最大実行回数に到達）", now, STATUS_LEASED, now),
+            )
+            rows = conn.execute(
+                "SELECT id FROM jobs"
+                " WHERE ((status = ? AND run_after <= ?) OR (status = ? AND lease_expires < ?))"
+                f"{kind_filter} ORDER BY run_after, id LIMIT ?",
+                (STATUS_QUEUED, now, STATUS_LEASED, now, *kind_args, limit),
+            ).fetchall()
+            jobs = []
+            expires = now + self.lease_seconds
+            for (job_id,) in rows:
+                conn.execute(
+                    "UPDATE jobs SET status = ?, lease_owner = ?, lease_expires = ?,"
+                    " attempts = attempts + 1, updated_at = ? WHERE id = ?",
+                    (STATUS_LEASED, worker_id, expires, now, job_id),
+                )
+                kind, payload, attempts, max_attempts = conn.execute(
+                    "SELECT kind, payload, attempts, max_attempts FROM jobs WHERE id = ?", (job_id,)
+                ).fetchone()
+                jobs.append(Job(
+                    id=job_id,
+                    kind=kind,
+                    payload=json.loads(payload),
+                    attempts=attempts,
+                    max_attempts=max_attempts,
+                    lease_expires=expires,
+                ))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return jobs
+    
+    def heartbeat(self, job_id: int, worker_id: str) -> bool:
+        """リースを延長する。リースを失っていれば False"""
+        now = time.time()
+        cursor = self._conn().execute(
+            "UPDATE jobs SET lease_expires = ?, updated_at = ?"
+            " WHERE id = ? AND status = ? AND lease_owner = ?",
+            (now + self.lease_seconds, now, job_id, STATUS_LEASED, worker_id),
+        )
+        return cursor.rowcount == 1
+    
+    def complete(self, job_id: int, worker_id: str, result: Any = None) -> bool:
+        """完了を記録する。リースを失っていれば（他ワーカーが再取得済みなら）False"""
+        now = time.time()
+        cursor = self._conn().execute(
+            "UPDATE jobs SET status = ?, result = ?, lease_owner = NULL, lease_expires = NULL, updated_at = ?"
+            " WHERE id = ? AND status = ? AND lease_owner = ?",
+            (STATUS_DONE, codec.encode(result), now, job_id, STATUS_LEASED, worker_id),
+        )
+        return cursor.rowcount == 1
+    
+    def fail(self, job_id: int, worker_id: str, error: str, retry: bool = True) -> str | None:
+        """
+        失敗を記録し、再試行（バックオフ後に queued）または dead にする
+        
+        retry=False（再試行しても回復しない失敗）なら実行回数によらず dead にする。
+        
+        Returns:
+            新しい状態。リースを失っていれば None
+        """
+        now = time.time()
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT attempts, max_attempts FROM jobs WHERE id = ? AND status = ? AND lease_owner = ?",
+                (job_id, STATUS_LEASED, worker_id),
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            attempts, max_attempts = row
+            if not retry or attempts >= max_attempts:
+                status, run_after = STATUS_DEAD, now
+            else:
+                status, run_after = STATUS_QUEUED, now + self.backoff(attempts)
+            conn.execute(
+                "UPDATE jobs SET status = ?, run_after = ?, last_error = ?, lease_owner = NULL,"
+                " lease_expires = NULL, updated_at = ? WHERE id = ?",
+                (status, run_after, error, now, job_id),
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return status
+    
+    def backoff(self, attempts: int) -> float:
+        """attempts 回目の失敗後の待ち時間（指数バックオフ＋ジッター）"""
+        delay = min(self.backoff_max, self.backoff_base * (2 ** max(0, attempts - 1)))
+        return delay * random.uniform(0.5, 1.0)
+    
+    # ---------- 管理 ----------
+    
+    def get(self, job_id: int) -> dict[str, Any] | None:
+        """ジョブ1件の状態"""
+        conn = self._conn()
+        conn.row_factory = sqlite3.Row
+        try:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        finally:
+            conn.row_factory = None
+        if row is None:
+            return None
+        job = dict(row)
+        job["payload"] = json.loads(job["payload"])
+        job["result"] = _load_result(job["result"])
+        return job
+    
+    def iter_done(self, kind: str | None = None) -> Iterator[tuple[int, dict[str, Any], Any]]:
+        """完了したジョブの (ID, payload, 結果) を ID 順に返す"""
+        where, args = "status = ?", [STATUS_DONE]
+        if kind is not None:
+            where += " AND kind = ?"
+            args.append(kind)
+        # エクスポート中も他の接続が書き込めるよう、少しずつ読む
+        last_id = 0
+        while True:
+            rows = self._conn().execute(
+                f"SELECT id, payload, result FROM jobs WHERE {where} AND id > ? ORDER BY id LIMIT 500",
+                (*args, last_id),
+            ).fetchall()
+            if not rows:
+                return
+            for job_id, payload, result in rows:
+                yield job_id, json.loads(payload), _load_result(result)
+            last_id = rows[-1][0]
+    
+    def requeue_dead(self, job_id: int | None = None) -> int:
+        """dead のジョブを再投入（job_id 省略時はすべて）。再投入した件数を返す"""
+        now = time.time()
+        where, args = "status = ?", [STATUS_DEAD]
+        if job_id is not None:
+            where += " AND id = ?"
+            args.append(job_id)
+        cursor = self._conn().execute(
+            f"UPDATE jobs SET status = ?, attempts = 0, run_after = ?, updated_at = ? WHERE {where}",
+            (STATUS_QUEUED, now, now, *args),
+        )
+        return cursor.rowcount
+    
+    def stats(self) -> dict[str, int]:
+        """状態ごとの件数"""
+        counts = {STATUS_QUEUED: 0, STATUS_LEASED: 0, STATUS_DONE: 0, STATUS_DEAD: 0}
+        for status, count in self._conn().execute("SELECT status, COUNT(*) FROM jobs GROUP BY status"):
+            counts[status] = count
+        return counts
+    
+    def pending(self) -> int:
+        """未完了（queued / leased）の件数"""
+        stats = self.stats()
+        return stats[STATUS_QUEUED] + stats[STATUS_LEASED]
+
+
+def _load_result(value: Any) -> Any:
+    """結果列の値を復号する（コーデック形式、または以前の JSON 文字列）"""
+    if value is None:
+        return None
+    if codec.is_encoded(value):
+        return codec.decode(value)
+    return json.loads(value) if value else None
+
+
+# ==================== 課題探索ジョブ ====================
+
+def enqueue_problem_discovery(
+    queue: JobQueue,
+    input_data: ProblemDiscoveryInput,
+    tenant_id: str | None = None,
+    project_id: str | None = None,
+    latency_budget: float | None = None,
+    **options: Any,
+) -> int:
+    """Phase 1 の実行ジョブを投入"""
+    payload = {
+        "input": input_data.model_dump(mode="json"),
+        "tenantId": tenant_id,
+        "projectId": project_id,
+        "latencyBudget": latency_budget,
+    }
+    return queue.enqueue(payload, kind=KIND_PROBLEM_DISCOVERY, **options)
+
+
+_agents: dict[Callable[[], ProblemDiscoveryAgent], ProblemDiscoveryAgent] = {}
+_agents_lock = threading.Lock()
+
+
+def _agent_for(factory: Callable[[], ProblemDiscoveryAgent]) -> ProblemDiscoveryAgent:
+    """ワーカープロセス内でエージェントを1つだけ生成して共有する"""
+    with _agents_lock:
+        if factory not in _agents:
+            _agents[factory] = factory()
+        return _agents[factory]
+
+
+def run_problem_discovery_job(
+    payload: dict[str, Any],
+    agent_factory: Callable[[], ProblemDiscoveryAgent] = create_default_agent,
+) -> dict[str, Any]:
+    """
+    Phase 1 ジョブのハンドラ（batch レーンで実行し、Firestore 形式の出力を返す）
+    
+    タイムアウト・JSON解析エラーの出力は JobRetryError として再試行に回す。
+    """
+    agent = _agent_for(agent_factory)
+    input_data = ProblemDiscoveryInput.model_validate(payload["input"])
+    with request_context(
+        tenant_id=payload.get("tenantId"),
+        project_id=payload.get("projectId"),
+        lane=LANE_BATCH,
+    ):
+        output = agent.run(input_data, latency_budget=payload.get("latencyBudget"))
+    
+    retryable = [f for f in output.quality_report.missing_fields if f in RETRYABLE_MISSING_FIELDS]
+    if retryable:
+        raise JobRetryError(", ".join(retryable + output.quality_report.contradictions))
+    return FirestoreOutput.from_output(output)
+
+
+def export_problem_discovery(
+    queue: JobQueue,
+    path: str,
+    compression: str = codec.COMPRESSION_ZLIB,
+) -> int:
+    """
+    完了した Phase 1 ジョブの出力をレコードファイルに書き出し、件数を返す
+    
+    1レコードは {jobId, tenantId, projectId, projectMeta, output}。
+    codec.read_records(path) で順に読み出せる。
+    """
+    def records() -> Iterator[dict[str, Any]]:
+        for job_id, payload, result in queue.iter_done(KIND_PROBLEM_DISCOVERY):
+            yield {
+                "jobId": job_id,
+                "tenantId": payload.get("tenantId"),
+                "projectId": payload.get("projectId"),
+                "projectMeta": (payload.get("input") or {}).get("project_meta"),
+                "output": result,
+            }
+    
+    return codec.write_records(path, records(), compression)
+
+
+# ==================== ワーカープール ====================
+
+class _Heartbeat:
+    """ハンドラ実行中にリースを定期的に延長するスレッド"""
+    
+    def __init__(self, queue: JobQueue, job: Job, worker_id: str):
+        self._queue = queue
+        self._job = job
+        self._worker_id = worker_id
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+    
+    def _run(self) -> None:
+        interval = max(0.05, self._queue.lease_seconds / 3)
+        try:
+            while not self._stop.wait(interval):
+                if not self._queue.heartbeat(self._job.id, self._worker_id):
+                    return
+        finally:
+            self._queue.close()
+    
+    def __enter__(self) -> "_Heartbeat":
+        self._thread.start()
+        return self
+    
+    def __exit__(self, *exc: Any) -> None:
+        self._stop.set()
+        self._thread.join()
+
+
+def _worker_loop(
+    path: str,
+    worker_id: str,
+    handler: Callable[[dict[str, Any]], Any],
+    stop_event: Any,
+    poll_interval: float,
+    queue_options: dict[str, Any],
+    exit_when_empty: bool,
+) -> None:
+    """ワーカー1つ分の処理ループ（スレッド・プロセス共通）"""
+    queue = JobQueue(path, **queue_options)
+    try:
+        while not stop_event.is_set():
+            jobs = queue.lease(worker_id)
+            if not jobs:
+                if exit_when_empty and queue.pending() == 0:
+                    return
+                stop_event.wait(poll_interval)
+                continue
+            
+            job = jobs[0]
+            with _Heartbeat(queue, job, worker_id):
+                try:
+                    result = handler(job.payload)
+                except Exception as e:
+                    queue.fail(job.id, worker_id, f"{type(e).__name__}: {e}", retry=is_retryable(e))
+                    continue
+            queue.complete(job.id, worker_id, result)
+    finally:
+        queue.close()
+
+
+class WorkerPool:
+    """
+    キューからジョブを取り出して実行するワーカープール
+    
+    Args:
+        path: キューファイルのパス
+        handler: payload を受け取り結果（JSON化できる値）を返す関数。
+                 process モードではトップレベル関数（pickle 可能）であること。
+                 送出した例外は is_retryable() で再試行するか dead にするかを判定する
+        workers: 並列数
+        mode: "thread" または "process"
+        poll_interval: キューが空のときの待ち時間（秒）
+        queue_options: JobQueue に渡すオプション（lease_seconds など）
+    """
+    
+    def __init__(
+        self,
+        path: str,
+        handler: Callable[[dict[str, Any]], Any] = run_problem_discovery_job,
+        workers: int = 4,
+        mode: str = "thread",
+        poll_interval: float = 0.5,
+        queue_options: dict[str, Any] | None = None,
+    ):
+        if mode not in ("thread", "process"):
+            raise ValueError(f"未対応の mode です: {mode}")
+        self.path = path
+        self.handler = handler
+        self.workers = workers
+        self.mode = mode
+        self.poll_interval = poll_interval
+        self.queue_options = dict(queue_options or {})
+        self._runners: list[Any] = []
+        self._stop_event: Any = None
+        # 複数ノードで区別できるワーカーID
+        self._prefix = f"{socket.gethostname()}:{os.getpid()}"
+    
+    def start(self, exit_when_empty: bool = False) -> None:
+        """ワーカーを起動する"""
+        if self.mode == "process":
+            ctx = multiprocessing.get_context("spawn")
+            self._stop_event = ctx.Event()
+            factory = ctx.Process
+        else:
+            self._stop_event = threading.Event()
+            factory = functools.partial(threading.Thread, daemon=True)
+        
+        for i in range(self.workers):
+            runner = factory(
+                target=_worker_loop,
+                args=(
+                    self.path,
+                    f"{self._prefix}:{i}",
+                    self.handler,
+                    self._stop_event,
+                    self.poll_interval,
+                    self.queue_options,
+                    exit_when_empty,
+                ),
+                name=f"job-worker-{i}",
+            )
+            runner.start()
+            self._runners.append(runner)
+    
+    def join(self, timeout: float | None = None) -> None:
+        for runner in self._runners:
+            runner.join(timeout)
+    
+    def stop(self, wait: bool = True) -> None:
+        """新しいジョブの取得を止める（実行中のジョブは完了まで待つ）"""
+        if self._stop_event is not None:
+            self._stop_event.set()
+        if wait:
+            self.join()
+        self._runners = []
+    
+    def run_until_empty(self) -> None:
+        """未完了のジョブがなくなるまで実行して終了する"""
+        self.start(exit_when_empty=True)
+        self.join()
+        self._runners = []
+
+
+# ==================== CLI ====================
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="課題探索ジョブキュー")
+    sub = parser.add_subparsers(dest="command", required=True)
+    
+    p_enqueue = sub.add_parser("enqueue", help="JSONL（1行1件の ProblemDiscoveryInput）を投入")
+    p_enqueue.add_argument("file")
+    p_enqueue.add_argument("--tenant", default=None)
+    p_enqueue.add_argument("--project", default=None)
+    
+    p_work = sub.add_parser("work", help="ワーカーを起動")
+    p_work.add_argument("--workers", type=int, default=4)
+    p_work.add_argument("--mode", choices=("thread", "process"), default="thread")
+    p_work.add_argument("--until-empty", action="store_true", help="キューが空になったら終了")
+    
+    sub.add_parser("stats", help="状態ごとの件数を表示")
+    
+    p_requeue = sub.add_parser("requeue-dead", help="dead のジョブを再投入")
+    p_requeue.add_argument("--id", type=int, default=None)
+    
+    p_export = sub.add_parser("export", help="完了したジョブの出力をレコードファイルに書き出す")
+    p_export.add_argument("--out", required=True)
+    p_export.add_argument("--compression", choices=codec.available_compressions(), default=codec.COMPRESSION_ZLIB)
+    
+    for p in (p_enqueue, p_work, sub.choices["stats"], p_requeue, p_export):
+        p.add_argument("--db", default="jobs.db")
+    args = parser.parse_args(argv)
+    
+    queue = JobQueue(args.db)
+    if args.command == "enqueue":
+        with open(args.file, encoding="utf-8") as f:
+            count = 0
+            for line in f:
+                if line.strip():
+                    input_data = ProblemDiscoveryInput.model_validate_json(line)
+                    enqueue_problem_discovery(queue, input_data, tenant_id=args.tenant, project_id=args.project)
+                    count += 1
+        print(f"{count} 件を投入しました")
+    elif args.command == "work":
+        pool = WorkerPool(args.db, workers=args.workers, mode=args.mode)
+        if args.until_empty:
+            pool.run_until_empty()
+        else:
+            pool.start()
+            try:
+                pool.join()
+            except KeyboardInterrupt:
+                print("停止中（実行中のジョブの完了を待ちます）...", file=sys.stderr)
+                pool.stop()
+    elif args.command == "requeue-dead":
+        print(f"{queue.requeue_dead(args.id)} 件を再投入しました")
+    elif args.command == "export":
+        count = export_problem_discovery(queue, args.out, args.compression)
+        print(f"{count} 件を {args.out} に書き出しました")
+    
+    print(json.dumps(queue.stats(), ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
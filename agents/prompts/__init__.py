@@ -6,17 +6,40 @@ Agents Prompts Package
 """
 
 from agents.prompts.problem_discovery import (
+    BATCH_CRITIC_INSTRUCTIONS,
+    BATCH_EXTRACTION_INSTRUCTIONS,
+    COMPACT_OUTPUT_SCHEMA,
+    COMPACT_POSITIONAL_OUTPUT_SCHEMA,
     CRITIC_PROMPT,
+    EXTRACTION_PROMPT,
     FOLLOWUP_QUESTION_PROMPT,
     OUTPUT_SCHEMA,
+    SECTION_CRITIC_PROMPT,
     SYSTEM_PROMPT,
+    WHY_DEEPDIVE_PROMPT,
+    get_batch_user_prompt,
+    get_section_critic_prompt,
     get_user_prompt,
+    get_why_prompt,
 )
+from agents.prompts.question_design import QUESTION_DESIGN_PROMPT, get_question_design_prompt
 
 __all__ = [
+    "BATCH_CRITIC_INSTRUCTIONS",
+    "BATCH_EXTRACTION_INSTRUCTIONS",
+    "COMPACT_OUTPUT_SCHEMA",
+    "COMPACT_POSITIONAL_OUTPUT_SCHEMA",
     "CRITIC_PROMPT",
+    "EXTRACTION_PROMPT",
     "FOLLOWUP_QUESTION_PROMPT",
     "OUTPUT_SCHEMA",
+    "QUESTION_DESIGN_PROMPT",
+    "SECTION_CRITIC_PROMPT",
     "SYSTEM_PROMPT",
+    "WHY_DEEPDIVE_PROMPT",
+    "get_batch_user_prompt",
+    "get_question_design_prompt",
+    "get_section_critic_prompt",
     "get_user_prompt",
+    "get_why_prompt",
 ]
@@ -3,8 +3,14 @@
 Problem Discovery Agent - Prompts
 """
 
-# システムプロンプト（仕様書セクション6に基づく）
-SYSTEM_PROMPT = """あなたは「課題探索エージェント」です。
+import json
+from typing import Any
+
+# ---------- 抽出プロンプトの共通部分 ----------
+# SYSTEM_PROMPT（一括抽出）と EXTRACTION_PROMPT（2段階抽出の1段目）は同じ部品から組み立てる。
+# 違いは Why深掘りの手順の有無と、unmetNeeds を空にする注意書きのみ。
+
+_EXTRACTION_ROLE = """あなたは「課題探索エージェント」です。
 Jobs-to-be-Done理論とリーンスタートアップの考え方に基づき、
 ユーザーの自由記述から「解決すべきジョブ」と「付帯状況」を構造化してください。
 
@@ -16,36 +22,78 @@ Jobs-to-be-Done理論とリーンスタートアップの考え方に基づき
 - トーンはコーチング的に、否定しない
 
 ## 処理手順
+"""
 
-### Step 1. 情報抽出
-自由記述から以下を抽出してください：
+# 処理手順の各ステップ（見出し, 本文）。番号は _extraction_prompt で振る
+_STEP_EXTRACT = ("情報抽出", """自由記述から以下を抽出してください：
 - 主ジョブ（動詞＋目的語の形式で）
 - 付帯状況（who / when / where / trigger）
 - 困りごと（pains）- severity(1-5)とfrequency(1-5)も推定
 - 現状対策（currentSolutions）
+""")
 
-### Step 2. Why深掘り
-severity × frequency が高い pain 上位2件について、
+_STEP_WHY = ("Why深掘り", """severity × frequency が高い pain 上位2件について、
 「なぜそれが問題なのか」をWhyを最大5段階で掘り下げ、unmetNeedsに格納してください。
+""")
 
-### Step 3. 不足判定
-以下に該当する場合、追加質問を生成してください：
+_STEP_MISSING = ("不足判定", """以下に該当する場合、追加質問を生成してください：
 - job.main が曖昧
 - context.trigger が不明
 - pains が抽象的（影響・頻度・重大度が不明）
 - currentSolutions が存在しない
 
 不足がある場合は qualityReport.nextAction = "ask_more" としてください。
+追加質問には、回答で埋めるフィールド（target。例: pains[0].severity, context.trigger）を付けてください。
+重大度・頻度は scale（1-5）、選択肢で答えられる質問は closed とし、
+closed の options にはそのまま target に書き込める値を並べてください。
+""")
 
-### Step 4. problemStatement生成
-以下のテンプレで1文に要約してください：
+_STEP_STATEMENT = ("problemStatement生成", """以下のテンプレで1文に要約してください：
 「◯◯な人が、△△の状況で、□□を達成したいが、××が障害になって困っている」
+""")
 
-## 出力形式
+_SPLIT_NOTE = """## 注意
+Why深掘り（unmetNeeds）は別の処理で行うため、unmetNeeds は空配列 [] としてください。
+"""
+
+_OUTPUT_FORMAT = """## 出力形式
 出力は指定されたJSONスキーマに厳密に従ってください。
 JSON以外のテキストは一切出力しないでください。
 """
 
+
+def _extraction_prompt(steps: tuple[tuple[str, str], ...], note: str = "") -> str:
+    """共通部分と処理手順から抽出用のシステムプロンプトを組み立てる"""
+    parts = [_EXTRACTION_ROLE]
+    for number, (title, body) in enumerate(steps, 1):
+        parts.append(f"\n### Step {number}. {title}\n{body}")
+    if note:
+        parts.append(f"\n{note}")
+    parts.append(f"\n{_OUTPUT_FORMAT}")
+    return "".join(parts)
+
+
+# システムプロンプト（仕様書セクション6に基づく）
+SYSTEM_PROMPT = _extraction_prompt((_STEP_EXTRACT, _STEP_WHY, _STEP_MISSING, _STEP_STATEMENT))
+
+# 2段階抽出の1段目: Why深掘りを除いた高速抽出
+EXTRACTION_PROMPT = _extraction_prompt((_STEP_EXTRACT, _STEP_MISSING, _STEP_STATEMENT), note=_SPLIT_NOTE)
+
+# 2段階抽出の2段目: pain 1件ごとのWhy深掘り
+WHY_DEEPDIVE_PROMPT = """あなたは「課題探索エージェント」のWhy深掘り担当です。
+与えられた pain 1件について「なぜそれが問題なのか」をWhyで最大5段階掘り下げ、
+その根底にある満たされていないニーズ（unmetNeed）を1文で示してください。
+
+## ルール
+- 各段階は直前の答えに対する「なぜ？」の答えにする
+- ジョブと付帯状況に矛盾しないこと
+- 推測で飛躍しない（根拠が尽きたら5段階未満で止めてよい）
+
+## 出力
+以下のJSONのみを出力してください：
+{"need": "満たされていないニーズ", "whyDepth": ["Why1", "Why2", "Why3", "Why4", "Why5"]}
+"""
+
 # Critic（品質検査）用プロンプト
 CRITIC_PROMPT = """あなたは「品質検査エージェント」です。
 課題探索エージェントの出力をレビューし、品質を評価してください。
@@ -68,6 +116,48 @@ CRITIC_PROMPT = """あなたは「品質検査エージェント」です。
 qualityReportオブジェクトのみをJSON形式で出力してください。
 """
 
+# セクション単位のCritic（内容が変わったセクションだけを評価する）
+SECTION_CRITIC_PROMPT = """あなたは課題探索の出力をセクション単位でレビューする「品質検査エージェント」です。
+入力に含まれるセクションだけを評価してください（含まれないセクションは評価済みです）。
+
+## セクションごとのチェック項目
+- job: job.main が「動詞＋目的語」の形式になっているか
+- context: context.trigger が具体的か
+- pains: 抽象語のみで終わっていないか（影響・頻度・重大度が明確か）
+- currentSolutions: 最低1件あるか
+- unmetNeeds: 参考として示す pains と論理的につながっているか
+- problemStatement: 1文で完結しているか
+
+## 評価基準（セクションごと）
+- ok: チェック項目を満たしていれば true
+- confidence: 0.0-1.0（チェック項目を満たしていれば0.8以上）
+- missingFields: 不足しているフィールド名のリスト（例: "context.trigger"）
+- contradictions: 矛盾がある箇所の説明リスト
+
+## 出力
+以下のJSONのみを出力してください。入力のセクション名をキーにします。
+{"sections": {"<セクション名>": {"ok": true, "confidence": 0.9, "missingFields": [], "contradictions": []}}}
+"""
+
+# マイクロバッチ（複数案件を1回の呼び出しで処理）用の追加指示
+# SYSTEM_PROMPT / EXTRACTION_PROMPT の末尾に付加する
+BATCH_EXTRACTION_INSTRUCTIONS = """
+## 複数案件の一括処理
+入力には互いに独立した複数の案件が「[item: <ID>]」の行で区切られて含まれます。
+案件ごとに上記の手順を独立に適用し（案件間で情報を混ぜない）、以下のJSONのみを出力してください：
+{"items": [{"id": "<ID>", "output": <出力スキーマに従うオブジェクト>}]}
+すべてのIDについて、入力と同じ順序で1件ずつ出力してください。
+"""
+
+# CRITIC_PROMPT の末尾に付加する
+BATCH_CRITIC_INSTRUCTIONS = """
+## 複数案件の一括評価
+入力には互いに独立した複数の出力が「[item: <ID>]」の行で区切られて含まれます。
+出力ごとに独立に評価し、以下のJSONのみを出力してください：
+{"items": [{"id": "<ID>", "qualityReport": <qualityReportオブジェクト>}]}
+すべてのIDについて、入力と同じ順序で1件ずつ出力してください。
+"""
+
 # 追加質問生成用プロンプト
 FOLLOWUP_QUESTION_PROMPT = """以下の不足情報を補うための追加質問を生成してください。
 
@@ -76,7 +166,9 @@ FOLLOWUP_QUESTION_PROMPT = """以下の不足情報を補うための追加質
 
 ## 質問生成ルール
 - 各質問には意図（intent）を明記する
-- 質問タイプは open（自由回答）/ closed（Yes/No）/ scale（段階評価）から選択
+- 質問タイプは open（自由回答）/ closed（選択式）/ scale（1-5の段階評価）から選択
+- 各質問には回答で埋めるフィールド（target。例: pains[0].severity）を付ける
+- closed の options には、そのまま target に書き込める値を並べる（Yes/No ではなく「使っていない」「手作業で対応」など）
 - コーチング的なトーンで、否定しない
 - 1回の往復で最大3問まで
 
@@ -135,7 +227,9 @@ OUTPUT_SCHEMA = """{
     {
       "question": "質問文",
       "intent": "質問の意図",
-      "type": "open|closed|scale"
+      "type": "open|closed|scale",
+      "target": "回答で埋めるフィールド（例: pains[0].severity）",
+      "options": ["closed の選択肢"]
     }
   ],
   "qualityReport": {
@@ -146,9 +240,77 @@ OUTPUT_SCHEMA = """{
   }
 }"""
 
+# 短縮キーの出力スキーマ（出力トークン削減用）
+# キーの対応は agents/utils/wire.py の SHORT_KEYS と一致させること
+_COMPACT_SCHEMA_TEMPLATE = """キーは短縮形です。値の説明の先頭に正式なフィールド名を示します。
+{
+  "ps": "problemStatement: 誰が/いつ/どこで/何を達成したいが/何が障害で困っている",
+  "s": {
+    "j": {"m": "job.main: 動詞＋目的語形式の主ジョブ", "f": ["functional"], "e": ["emotional"], "so": ["social"]},
+    "c": {"w": "who", "t": "when", "wh": "where", "tr": "trigger", "cn": ["constraints"], "sh": ["stakeholders"]},
+    "p": <PAINS>,
+    "cs": <SOLUTIONS>,
+    "u": [{"n": "unmetNeeds.need", "y": ["Why1", "Why2", "Why3", "Why4", "Why5"]}],
+    "em": {"f": ["feelings"], "mt": "momentOfTruth"},
+    "sc": ["successCriteria"],
+    "as": ["assumptions"],
+    "uk": ["unknowns"]
+  },
+  "fq": [{"q": "followupQuestions.question", "i": "intent", "t": "open|closed|scale", "tg": "target（例: pains[0].severity）", "o": ["options"]}],
+  "qr": {"cf": 0.0-1.0, "mf": ["missingFields（値は context.trigger のように正式名で）"], "ct": ["contradictions"], "na": "proceed|ask_more"}
+}"""
+
+COMPACT_OUTPUT_SCHEMA = _COMPACT_SCHEMA_TEMPLATE.replace(
+    "<PAINS>", '[{"p": "pains.pain", "i": "impact", "sv": 1-5, "fr": 1-5, "ev": "evidence"}]'
+).replace(
+    "<SOLUTIONS>", '[{"s": "currentSolutions.solution", "w": "whyChosen", "d": "dissatisfaction"}]'
+)
+
+# pains / currentSolutions を要素順固定の配列で表す版
+COMPACT_POSITIONAL_OUTPUT_SCHEMA = _COMPACT_SCHEMA_TEMPLATE.replace(
+    "<PAINS>", '[["pain", "impact", severity 1-5, frequency 1-5, "evidence"]]'
+).replace(
+    "<SOLUTIONS>", '[["solution", "whyChosen", "dissatisfaction"]]'
+)
 
-def get_user_prompt(user_free_text: str, project_meta: dict | None = None, history: list | None = None) -> str:
+
+def get_user_prompt(
+    user_free_text: str,
+    project_meta: dict | None = None,
+    history: list | None = None,
+    output_schema: str = OUTPUT_SCHEMA,
+) -> str:
     """ユーザープロンプトを構築"""
+    prompt_parts = _input_sections(user_free_text, project_meta, history)
+    
+    # 出力形式の指示
+    prompt_parts.append("## 出力形式")
+    prompt_parts.append("以下のJSONスキーマに従って出力してください：")
+    prompt_parts.append(output_schema)
+    
+    return "\n".join(prompt_parts)
+
+
+def get_batch_user_prompt(items: list[dict], output_schema: str = OUTPUT_SCHEMA) -> str:
+    """
+    マイクロバッチ用のユーザープロンプトを構築（出力スキーマは1回だけ示す）
+    
+    items: id / user_free_text / project_meta / history を持つ辞書のリスト
+    """
+    prompt_parts = []
+    for item in items:
+        prompt_parts.append(f"[item: {item['id']}]")
+        prompt_parts.extend(_input_sections(item["user_free_text"], item.get("project_meta"), item.get("history")))
+    
+    prompt_parts.append("## 各案件の output の形式")
+    prompt_parts.append("以下のJSONスキーマに従ってください：")
+    prompt_parts.append(output_schema)
+    
+    return "\n".join(prompt_parts)
+
+
+def _input_sections(user_free_text: str, project_meta: dict | None, history: list | None) -> list[str]:
+    """会話履歴・プロジェクト情報・課題記述のセクション"""
     prompt_parts = []
     
     # 会話履歴があれば追加
@@ -177,9 +339,52 @@ def get_user_prompt(user_free_text: str, project_meta: dict | None = None, histo
     prompt_parts.append(user_free_text)
     prompt_parts.append("")
     
-    # 出力形式の指示
-    prompt_parts.append("## 出力形式")
-    prompt_parts.append("以下のJSONスキーマに従って出力してください：")
-    prompt_parts.append(OUTPUT_SCHEMA)
+    return prompt_parts
+
+
+def get_why_prompt(pain: dict, job: dict | None = None, context: dict | None = None) -> str:
+    """Why深掘り（pain 1件分）のユーザープロンプトを構築"""
+    prompt_parts = []
+    
+    if job and job.get("main"):
+        prompt_parts.append("## 主ジョブ")
+        prompt_parts.append(job["main"])
+        prompt_parts.append("")
     
+    if context:
+        prompt_parts.append("## 付帯状況")
+        for key, label in (("who", "誰が"), ("when", "いつ"), ("where", "どこで"), ("trigger", "トリガー")):
+            if context.get(key):
+                prompt_parts.append(f"- {label}: {context[key]}")
+        prompt_parts.append("")
+    
+    prompt_parts.append("## 深掘りする pain")
+    prompt_parts.append(f"- pain: {pain.get('pain', '')}")
+    if pain.get("impact"):
+        prompt_parts.append(f"- 影響: {pain['impact']}")
+    prompt_parts.append(f"- 重大度: {pain.get('severity', 1)}/5, 頻度: {pain.get('frequency', 1)}/5")
+    if pain.get("evidence"):
+        prompt_parts.append(f"- 根拠: {pain['evidence']}")
+    
+    return "\n".join(prompt_parts)
+
+
+def get_section_critic_prompt(
+    sections: dict[str, Any],
+    references: dict[str, dict[str, Any]] | None = None,
+) -> str:
+    """
+    セクション単位のCritic用ユーザープロンプトを構築
+    
+    sections: 評価するセクション名 → 内容（キャメルケースの辞書・リスト・文字列）
+    references: セクション名 → 評価の参考として併記する内容（unmetNeeds に対する pains など）
+    """
+    prompt_parts = ["以下のセクションを評価してください:", ""]
+    for name, content in sections.items():
+        prompt_parts.append(f"## {name}")
+        prompt_parts.append(json.dumps(content, ensure_ascii=False))
+        for ref_name, ref_content in (references or {}).get(name, {}).items():
+            prompt_parts.append(f"（参考: {ref_name}）")
+            prompt_parts.append(json.dumps(ref_content, ensure_ascii=False))
+        prompt_parts.append("")
     return "\n".join(prompt_parts)
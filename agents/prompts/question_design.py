@@ -0,0 +1,61 @@
+"""
+質問設計エージェント用のプロンプト定義
+Question Design Agent - Prompts
+"""
+
+# システムプロンプト（仕様書セクション6に基づく）
+# 情報ギャップの検出（Step 1）と品質判定（Step 4）はローカルで行うため、
+# LLMには検出済みのギャップに対する質問の生成（Step 2-3）のみを依頼する
+QUESTION_DESIGN_PROMPT = """あなたは「質問設計エージェント」です。
+
+課題探索フェーズで得られた problemStatement と、そこで検出された情報ギャップをもとに、
+課題理解を深めるための質問シートを作成してください。
+
+## ルール
+- 情報ギャップ1件につき1問以上の質問を作り、relatedField にはギャップのフィールド名をそのまま入れる
+- category は who / when / where / what / why / how / emotion から選ぶ（ギャップのカテゴリに合わせる）
+- 「なぜ」を段階的に深掘りできる質問を含めること
+- 感情・判断基準に関する質問を最低1問含めること
+- 抽象的・曖昧な質問は禁止（例：「詳しく教えてください」）
+- 回答者が具体的な場面を思い出して答えられる聞き方にする
+- 仮説の検証（verify）のギャップは、現在の値が正しいかを確かめる質問にする
+- 本質に近い質問を priority=high にする
+- 最大{max_questions}問まで
+- 詰問感を出さず、伴走するトーンにする
+
+## 出力形式
+以下のJSONのみを出力してください。JSON以外のテキストは一切出力しないでください。
+{{"questionSheet": [{{"question": "質問文", "category": "who|when|where|what|why|how|emotion", "intent": "質問の意図", "priority": "high|medium|low", "relatedField": "ギャップのフィールド名"}}]}}
+"""
+
+_KIND_LABELS = {"missing": "欠落", "unclear": "曖昧", "verify": "仮説の検証"}
+
+
+def get_question_design_prompt(
+    problem_statement: str,
+    gaps: list[dict],
+    project_meta: dict | None = None,
+) -> str:
+    """
+    ユーザープロンプトを構築（Phase 1 の出力全体ではなく、ギャップと関連フィールドのみ）
+    
+    gaps: field / category / kind / reason / current を持つ辞書のリスト
+    """
+    prompt_parts = ["## problemStatement", problem_statement or "（未生成）", ""]
+    
+    if project_meta:
+        prompt_parts.append("## プロジェクト情報")
+        if project_meta.get("industry"):
+            prompt_parts.append(f"- 業界: {project_meta['industry']}")
+        if project_meta.get("target_customer"):
+            prompt_parts.append(f"- 想定顧客: {project_meta['target_customer']}")
+        prompt_parts.append("")
+    
+    prompt_parts.append("## 情報ギャップ")
+    for gap in gaps:
+        line = f"- [{gap['field']}] ({gap['category']}, {_KIND_LABELS.get(gap['kind'], gap['kind'])}) {gap['reason']}"
+        if gap.get("current"):
+            line += f"／現在の値: {gap['current']}"
+        prompt_parts.append(line)
+    
+    return "\n".join(prompt_parts)
@@ -0,0 +1,442 @@
+"""
+過去の課題シートの横断検索（文字n-gram転置インデックス）
+=====================================
+
+「この課題は以前にも見たか？」を全件走査せずに調べるため、保存済みの
+Phase 1 出力の problemStatement / job.main / pains[].pain / unmetNeeds[].need を
+文字バイグラムの転置インデックスにする。形態素解析器に依存せず日本語を扱える。
+
+- 出力が生成されるたびに add() で追加（同じ sessionId の追加は古い行を置き換える）
+- 置き換えで検索対象外になった行が一定数・一定割合を超えたら、ポスティングから取り除いて
+  行番号を詰める（compact()。add() から自動で呼ばれる）
+- BM25 によるランキング。フィールドの重み（FIELD_BOOSTS）は追加時に適用する
+- ProjectMeta.industry による絞り込み
+- ポスティングは NumPy 配列（文書番号 int32 / 重み float16）、バイグラムは
+  2文字のコードポイントを詰めた int64 キーで表すため、語彙の辞書を持たない
+- save() でディレクトリに保存し、load() は .npy をメモリマップで開く（読み込みはほぼ即時）
+
+    index = SheetIndex()
+    index.add(output, project_meta=meta, session_id="project-123")
+    index.search("満員電車 メール", k=10, industry="通信")
+    index.save("sheet_index")
+    index = SheetIndex.load("sheet_index")
+"""
+
+import json
+import math
+import os
+import threading
+from array import array
+from pathlib import Path
+from typing import Any, Iterator, Optional, Union
+
+import numpy as np
+
+from agents.analytics import UNKNOWN_INDUSTRY, StringInterner, normalize_text
+from agents.utils.schemas import FirestoreOutput, ProblemDiscoveryOutput, ProjectMeta
+
+# 保存形式のバージョン
+FORMAT_VERSION = 1
+
+# 検索対象フィールドと重み（job.main の一致を最も重視する）
+FIELD_BOOSTS: dict[str, float] = {
+    "problemStatement": 1.0,
+    "job.main": 2.0,
+    "pains.pain": 1.5,
+    "unmetNeeds.need": 1.2,
+}
+
+# BM25 のパラメータ
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# 自動コンパクションの条件: 検索対象外の行がこの件数以上、かつ全行のこの割合以上
+COMPACT_MIN_DELETED = 1024
+COMPACT_DELETED_RATIO = 0.25
+
+# バイグラムキー: 1文字目のコードポイントを上位に詰める（コードポイントは21ビットに収まる）
+_CHAR_BITS = 21
+
+
+def gram_keys(text: str) -> list[int]:
+    """
+    正規化済みテキストの文字バイグラムを int64 キーにする
+    
+    空白を含むバイグラムは除く。1文字のテキストはその1文字をキーにする。
+    """
+    if len(text) == 1:
+        return [ord(text) << _CHAR_BITS]
+    return [
+        (ord(a) << _CHAR_BITS) | ord(b)
+        for a, b in zip(text, text[1:])
+        if not a.isspace() and not b.isspace()
+    ]
+
+
+def _field_texts(record: dict[str, Any]) -> Iterator[tuple[str, str]]:
+    """FirestoreOutput 形式の辞書から (フィールド名, テキスト) を列挙"""
+    yield "problemStatement", record.get("problemStatement") or ""
+    sheet = record.get("problemDiscoverySheet") or {}
+    yield "job.main", (sheet.get("job") or {}).get("main") or ""
+    for pain in sheet.get("pains") or []:
+        yield "pains.pain", pain.get("pain") or ""
+    for need in sheet.get("unmetNeeds") or []:
+        yield "unmetNeeds.need", need.get("need") or ""
+
+
+def _write_npy(path: Path, values: np.ndarray) -> None:
+    """一時ファイルに書いてから置き換える（メモリマップ中の旧ファイルを壊さない）"""
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as f:
+        np.save(f, values)
+    os.replace(tmp, path)
+
+
+class SheetIndex:
+    """
+    課題シートの文字バイグラム転置インデックス
+    
+    ポスティングは、保存・読み込み済みの部分（キー昇順の CSR 配列、メモリマップ可）と、
+    その後に add() した部分（キーごとの array バッファ）の2段で持つ。
+    文書番号は追加順に増えるため、どちらのポスティングも文書番号順に並ぶ。
+    
+    Args:
+        boosts: フィールドごとの重み（省略時は FIELD_BOOSTS）。追加時に適用されるため、
+                保存したインデックスを読み込んだ場合は保存時の重みが使われる
+    """
+    
+    def __init__(self, boosts: Optional[dict[str, float]] = None):
+        self.boosts = dict(boosts or FIELD_BOOSTS)
+        self.industries = StringInterner()
+        self._lock = threading.Lock()
+        
+        # 文書列
+        self._session_ids: list[str] = []
+        self._rows: dict[str, int] = {}
+        self._length = array("f")
+        self._industry = array("i")
+        self._deleted: set[int] = set()
+        self._total_length = 0.0
+        self._doc_cache: tuple[np.ndarray, np.ndarray, np.ndarray] | None = None
+        
+        # 保存済みポスティング（CSR）
+        self._keys = np.zeros(0, dtype=np.int64)
+        self._offsets = np.zeros(1, dtype=np.int64)
+        self._docs = np.zeros(0, dtype=np.int32)
+        self._weights = np.zeros(0, dtype=np.float16)
+        # 追加分のポスティング: キー → (文書番号, 重み)
+        self._delta: dict[int, tuple[array, array]] = {}
+    
+    @property
+    def n_docs(self) -> int:
+        """登録済みの行数（置き換えられた行を含む。compact() で詰められる）"""
+        return len(self._session_ids)
+    
+    def __len__(self) -> int:
+        """検索対象の文書数"""
+        return self.n_docs - len(self._deleted)
+    
+    # ---------- 追加 ----------
+    
+    def add(
+        self,
+        output: Union[ProblemDiscoveryOutput, dict[str, Any]],
+        project_meta: Union[ProjectMeta, dict[str, Any], None] = None,
+        session_id: Optional[str] = None,
+    ) -> int:
+        """
+        出力1件を追加し、行番号を返す（行番号は compact() で変わる）
+        
+        Args:
+            output: ProblemDiscoveryOutput または FirestoreOutput 形式の辞書
+            project_meta: プロジェクトメタ情報（industry を絞り込みに使用）
+            session_id: セッション（プロジェクト）ID。既にあれば古い行を検索対象から外す
+        """
+        record = FirestoreOutput.from_output(output) if isinstance(output, ProblemDiscoveryOutput) else output
+        if isinstance(project_meta, ProjectMeta):
+            industry = project_meta.industry
+        else:
+            industry = (project_meta or {}).get("industry")
+        
+        # フィールドの重みを掛けたバイグラムの出現回数
+        weights: dict[int, float] = {}
+        for field, text in _field_texts(record):
+            boost = self.boosts.get(field, 0.0)
+            if not boost or not text:
+                continue
+            for key in gram_keys(normalize_text(text)):
+                weights[key] = weights.get(key, 0.0) + boost
+        length = sum(weights.values())
+        
+        with self._lock:
+            row = self.n_docs
+            if session_id is not None and session_id in self._rows:
+                replaced = self._rows[session_id]
+                self._deleted.add(replaced)
+                self._total_length -= self._length[replaced]
+            sid = session_id if session_id is not None else str(row)
+            self._session_ids.append(sid)
+            self._rows[sid] = row
+            self._length.append(length)
+            self._industry.append(self.industries.intern(industry or UNKNOWN_INDUSTRY))
+            self._total_length += length
+            for key, weight in weights.items():
+                postings = self._delta.get(key)
+                if postings is None:
+                    postings = self._delta[key] = (array("i"), array("f"))
+                postings[0].append(row)
+                postings[1].append(weight)
+            self._doc_cache = None
+            if len(self._deleted) >= max(COMPACT_MIN_DELETED, COMPACT_DELETED_RATIO * self.n_docs):
+                self._compact()
+            return self._rows[sid]
+    
+    def compact(self) -> int:
+        """
+        検索対象外の行をポスティング・文書列から取り除き、行番号を詰める
+        
+        保存済み部分と追加分は1つの CSR 配列（メモリ上）にまとめられる。
+        
+        Returns:
+            取り除いた行数
+        """
+        with self._lock:
+            return self._compact()
+    
+    def _compact(self) -> int:
+        """ロック保持中に呼ぶ"""
+        removed = len(self._deleted)
+        if not removed:
+            return 0
+        keep = np.ones(self.n_docs, dtype=bool)
+        keep[list(self._deleted)] = False
+        new_rows = np.cumsum(keep, dtype=np.int32) - 1
+        
+        keys, offsets, docs, weights = self._merged_postings()
+        posting_keys = np.repeat(keys, np.diff(offsets))
+        live = keep[docs]
+        # 行番号の詰め直しは単調なため、ポスティング内の文書番号順は保たれる
+        keys, key_counts = np.unique(posting_keys[live], return_counts=True)
+        self._keys = keys.astype(np.int64)
+        self._offsets = np.zeros(len(keys) + 1, dtype=np.int64)
+        np.cumsum(key_counts, out=self._offsets[1:])
+        self._docs = new_rows[docs[live]].astype(np.int32)
+        self._weights = np.asarray(weights[live], dtype=np.float16)
+        self._delta = {}
+        
+        length = np.array(self._length, dtype=np.float32)[keep]
+        industry = np.array(self._industry, dtype=np.int32)[keep]
+        self._length = array("f", length.tobytes())
+        self._industry = array("i", industry.tobytes())
+        self._session_ids = [sid for sid, kept in zip(self._session_ids, keep) if kept]
+        self._rows = {sid: row for row, sid in enumerate(self._session_ids)}
+        self._total_length = float(length.sum(dtype=np.float64))
+        self._deleted = set()
+        self._doc_cache = None
+        return removed
+    
+    # ---------- 検索 ----------
+    
+    def search(self, query: str, k: int = 10, industry: Optional[str] = None) -> list[dict[str, Any]]:
+        """
+        クエリに近い課題シートを BM25 スコア順に返す
+        
+        Args:
+            query: 検索文字列（2文字以上。空白区切りの複数語も可）
+            k: 上位件数
+            industry: 指定時はその業界のプロジェクトのみ
+        
+        Returns:
+            {"sessionId", "score", "industry", "row"} のリスト
+        """
+        query_keys: dict[int, int] = {}
+        for key in gram_keys(normalize_text(query)):
+            query_keys[key] = query_keys.get(key, 0) + 1
+        if not query_keys or k <= 0:
+            return []
+        
+        with self._lock:
+            n = self.n_docs
+            if n == 0:
+                return []
+            length, industry_codes, deleted = self._doc_columns()
+            # 文書数・平均文書長・文書頻度は検索対象の行だけで数える
+            live = max(len(self), 1)
+            avg_length = max(self._total_length / live, 1e-9)
+            norm = BM25_K1 * (1.0 - BM25_B + BM25_B * length / avg_length)
+            
+            scores = np.zeros(n, dtype=np.float32)
+            for key, query_tf in query_keys.items():
+                docs, weights = self._postings(key)
+                if len(docs) == 0:
+                    continue
+                df = len(docs) - int(np.count_nonzero(deleted[docs])) if self._deleted else len(docs)
+                idf = math.log(1.0 + (live - df + 0.5) / (df + 0.5))
+                # 1つのポスティング内で文書番号は重複しないため、ファンシーインデックスで加算できる
+                scores[docs] += query_tf * idf * weights * (BM25_K1 + 1.0) / (weights + norm[docs])
+            
+            scores[deleted] = 0.0
+            if industry is not None:
+                code = self.industries.code_of(industry)
+                if code is None:
+                    return []
+                scores[industry_codes != code] = 0.0
+            session_ids = self._session_ids
+        
+        hits = np.flatnonzero(scores > 0)
+        if len(hits) > k:
+            hits = hits[np.argpartition(-scores[hits], k - 1)[:k]]
+        hits = hits[np.lexsort((hits, -scores[hits]))]
+        return [
+            {
+                "sessionId": session_ids[row],
+                "score": float(scores[row]),
+                "industry": self.industries[int(industry_codes[row])],
+                "row": int(row),
+            }
+            for row in hits
+        ]
+    
+    def _doc_columns(self) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """ロック保持中に呼ぶ。文書長・業界コード・削除フラグの配列（追加があるまでキャッシュ）"""
+        if self._doc_cache is None:
+            deleted = np.zeros(self.n_docs, dtype=bool)
+            deleted[list(self._deleted)] = True
+            self._doc_cache = (
+                np.array(self._length, dtype=np.float32),
+                np.array(self._industry, dtype=np.int32),
+                deleted,
+            )
+        return self._doc_cache
+    
+    def _postings(self, key: int) -> tuple[np.ndarray, np.ndarray]:
+        """ロック保持中に呼ぶ。保存済み部分と追加分を連結したポスティング"""
+        docs: list[np.ndarray] = []
+        weights: list[np.ndarray] = []
+        i = int(np.searchsorted(self._keys, key))
+        if i < len(self._keys) and self._keys[i] == key:
+            start, end = self._offsets[i], self._offsets[i + 1]
+            docs.append(self._docs[start:end])
+            weights.append(self._weights[start:end].astype(np.float32))
+        delta = self._delta.get(key)
+        if delta is not None:
+            docs.append(np.array(delta[0], dtype=np.int32))
+            weights.append(np.array(delta[1], dtype=np.float32))
+        if not docs:
+            return np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.float32)
+        if len(docs) == 1:
+            return docs[0], weights[0]
+        return np.concatenate(docs), np.concatenate(weights)
+    
+    # ---------- 保存・読み込み ----------
+    
+    def _merged_postings(self) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """ロック保持中に呼ぶ。保存済み部分と追加分を1つの CSR 配列にまとめる"""
+        if not self._delta:
+            return self._keys, self._offsets, self._docs, self._weights
+        
+        delta_keys = np.array(sorted(self._delta), dtype=np.int64)
+        counts = np.array([len(self._delta[int(key)][0]) for key in delta_keys], dtype=np.int64)
+        delta_docs = np.concatenate([np.array(self._delta[int(key)][0], dtype=np.int32) for key in delta_keys])
+        delta_weights = np.concatenate([np.array(self._delta[int(key)][1], dtype=np.float32) for key in delta_keys])
+        
+        # ポスティングごとのキーで安定ソートする（保存済み部分の文書番号が常に小さいため順序が保たれる）
+        posting_keys = np.concatenate([
+            np.repeat(self._keys, np.diff(self._offsets)),
+            np.repeat(delta_keys, counts),
+        ])
+        order = np.argsort(posting_keys, kind="stable")
+        docs = np.concatenate([self._docs, delta_docs])[order]
+        weights = np.concatenate([self._weights.astype(np.float32), delta_weights])[order].astype(np.float16)
+        keys, key_counts = np.unique(posting_keys[order], return_counts=True)
+        offsets = np.zeros(len(keys) + 1, dtype=np.int64)
+        np.cumsum(key_counts, out=offsets[1:])
+        return keys.astype(np.int64), offsets, docs, weights
+    
+    def save(self, path: Union[str, Path]) -> None:
+        """
+        ディレクトリに保存し、以後は保存したファイルをメモリマップで参照する
+        
+        追加分は保存済み部分にまとめられる。
+        """
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            keys, offsets, docs, weights = self._merged_postings()
+            length, industry_codes, deleted = self._doc_columns()
+            _write_npy(path / "keys.npy", keys)
+            _write_npy(path / "offsets.npy", offsets)
+            _write_npy(path / "docs.npy", docs)
+            _write_npy(path / "weights.npy", weights)
+            _write_npy(path / "doc_length.npy", length)
+            _write_npy(path / "doc_industry.npy", industry_codes)
+            _write_npy(path / "doc_deleted.npy", deleted)
+            meta = {
+                "version": FORMAT_VERSION,
+                "boosts": self.boosts,
+                "totalLength": self._total_length,
+                "industries": self.industries.values,
+                "sessionIds": self._session_ids,
+            }
+            tmp = path / "index.json.tmp"
+            tmp.write_text(json.dumps(meta, ensure_ascii=False), encoding="utf-8")
+            os.replace(tmp, path / "index.json")
+            
+            self._keys, self._offsets, self._docs, self._weights = _load_postings(path, mmap=True)
+            self._delta = {}
+    
+    @classmethod
+    def load(cls, path: Union[str, Path], mmap: bool = True) -> "SheetIndex":
+        """
+        save() したインデックスを読み込む
+        
+        Args:
+            mmap: ポスティングをメモリマップで開く（False の場合はメモリに読み込む）
+        
+        Raises:
+            ValueError: 保存形式のバージョンが異なる場合
+        """
+        path = Path(path)
+        meta = json.loads((path / "index.json").read_text(encoding="utf-8"))
+        if meta.get("version") != FORMAT_VERSION:
+            raise ValueError(f"未対応のインデックス形式です: {meta.get('version')}")
+        
+        index = cls(boosts=meta["boosts"])
+        for industry in meta["industries"]:
+            index.industries.intern(industry)
+        index._session_ids = list(meta["sessionIds"])
+        index._rows = {sid: row for row, sid in enumerate(index._session_ids)}
+        length = np.load(path / "doc_length.npy").astype(np.float32)
+        deleted = np.load(path / "doc_deleted.npy")
+        index._length.frombytes(length.tobytes())
+        index._industry.frombytes(np.load(path / "doc_industry.npy").astype(np.int32).tobytes())
+        index._deleted = set(np.flatnonzero(deleted).tolist())
+        # 置き換えられた行の長さを含めて保存された旧いファイルでも正しくなるよう、検索対象の行から数え直す
+        index._total_length = float(length[~deleted].sum(dtype=np.float64))
+        index._keys, index._offsets, index._docs, index._weights = _load_postings(path, mmap)
+        return index
+    
+    def stats(self) -> dict[str, Any]:
+        """文書数・語彙数・ポスティング数・ポスティングのメモリ（バイト）"""
+        with self._lock:
+            delta_postings = sum(len(docs) for docs, _ in self._delta.values())
+            return {
+                "documents": len(self),
+                "rows": self.n_docs,
+                "terms": len(np.union1d(self._keys, np.fromiter(self._delta, dtype=np.int64, count=len(self._delta)))),
+                "postings": len(self._docs) + delta_postings,
+                "postingBytes": int(
+                    self._keys.nbytes + self._offsets.nbytes + self._docs.nbytes + self._weights.nbytes
+                ) + delta_postings * 8,
+                "unsavedPostings": delta_postings,
+            }
+
+
+def _load_postings(path: Path, mmap: bool) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    mode = "r" if mmap else None
+    return (
+        np.load(path / "keys.npy", mmap_mode=mode),
+        np.load(path / "offsets.npy", mmap_mode=mode),
+        np.load(path / "docs.npy", mmap_mode=mode),
+        np.load(path / "weights.npy", mmap_mode=mode),
+    )
@@ -0,0 +1,333 @@
+"""
+課題探索エージェント HTTPサービス (ASGI / FastAPI)
+=====================================
+
+アーキテクチャ仕様の API Gateway (FastAPI on Cloud Run) のうち、
+Phase 1 (problem_discovery) の実行エンドポイントを提供する。
+
+- SSE (Server-Sent Events) による進捗・部分フィールドのストリーミング
+- 有界キューによる流入制御（飽和時は 503 + Retry-After）
+- クライアント切断時は実行中のLLM呼び出しをキャンセル
+- 生成した課題シートを検索インデックスに追加し、過去のシートを横断検索（任意）
+
+起動:
+    uvicorn agents.service:app --port 8000
+
+APIキーなしでローカル検証する場合:
+    AGENTS_FAKE_LLM=1 uvicorn agents.service:app --port 8000
+"""
+
+import asyncio
+import json
+import weakref
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Optional, Union
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+
+from agents.agent1 import ProblemDiscoveryAgent, ProblemDiscoveryOrchestrator, create_default_agent
+from agents.search import SheetIndex
+from agents.utils.request_context import LANE_INTERACTIVE, request_context
+from agents.utils.schemas import (
+    FirestoreOutput,
+    FollowupAnswer,
+    ProblemDiscoveryInput,
+    SessionState,
+)
+from agents.utils.speculation import SpeculationPolicy
+from agents.utils.tokens import TokenBudgetExceededError
+
+# 切断検知のポーリング間隔（秒）
+DISCONNECT_POLL_INTERVAL = 0.5
+
+
+# ==================== リクエストスキーマ ====================
+
+class ProblemDiscoveryRunRequest(ProblemDiscoveryInput):
+    """Phase 1 実行リクエスト"""
+    latency_budget: Optional[float] = Field(default=None, description="レイテンシ予算（秒）")
+
+
+class SessionStepRequest(BaseModel):
+    """ステップ実行リクエスト（状態はクライアント側で保持）"""
+    state: SessionState = Field(description="前回返されたセッション状態")
+    answer: Optional[Union[str, list[FollowupAnswer]]] = Field(
+        default=None,
+        description="追加質問への回答（テキスト、または質問ごとの構造化回答）",
+    )
+    latency_budget: Optional[float] = Field(default=None, description="レイテンシ予算（秒）")
+
+
+# ==================== 流入制御 ====================
+
+class AdmissionController:
+    """
+    有界キューによる流入制御
+    
+    同時実行は max_active 件まで、待機は max_waiting 件まで。
+    それを超えるリクエストは即座に拒否する（呼び出し側で 503 を返す）。
+    """
+    
+    def __init__(self, max_active: int = 8, max_waiting: int = 32):
+        self.max_active = max_active
+        self.max_waiting = max_waiting
+        self._slots = asyncio.Semaphore(max_active)
+        self.admitted = 0
+        self.active = 0
+        self.rejected = 0
+        self.cancelled = 0
+    
+    def try_admit(self) -> Optional["AdmissionTicket"]:
+        """受け付け可能なら入場券を返す。飽和時は None"""
+        if self.admitted >= self.max_active + self.max_waiting:
+            self.rejected += 1
+            return None
+        self.admitted += 1
+        return AdmissionTicket(self)
+    
+    def stats(self) -> dict[str, int]:
+        return {
+            "active": self.active,
+            "waiting": self.admitted - self.active,
+            "maxActive": self.max_active,
+            "maxWaiting": self.max_waiting,
+            "rejected": self.rejected,
+            "cancelled": self.cancelled,
+        }
+
+
+class AdmissionTicket:
+    """受け付け済みリクエストの入場券（release は冪等）"""
+    
+    def __init__(self, controller: AdmissionController):
+        self._controller = controller
+        self._released = False
+    
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """実行枠が空くまで待ってから実行する"""
+        try:
+            async with self._controller._slots:
+                self._controller.active += 1
+                try:
+                    yield
+                finally:
+                    self._controller.active -= 1
+        finally:
+            self.release()
+    
+    def release(self) -> None:
+        if not self._released:
+            self._released = True
+            self._controller.admitted -= 1
+
+
+def _overloaded() -> HTTPException:
+    return HTTPException(
+        status_code=503,
+        detail="サーバーが混雑しています。しばらくしてから再試行してください。",
+        headers={"Retry-After": "5"},
+    )
+
+
+def _sse(event: str, data: Any) -> str:
+    """SSEのイベント1件をフォーマット"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def _context_from(request: Request):
+    """ヘッダー X-Tenant-Id / X-Project-Id をリクエストコンテキストに設定（対話レーン）"""
+    return request_context(
+        tenant_id=request.headers.get("x-tenant-id"),
+        project_id=request.headers.get("x-project-id"),
+        lane=LANE_INTERACTIVE,
+    )
+
+
+async def _run_until_disconnect(request: Request, coro, controller: AdmissionController):
+    """クライアントが切断したら実行中のコルーチン（LLM呼び出し）をキャンセルする"""
+    with _context_from(request):
+        task = asyncio.ensure_future(coro)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=DISCONNECT_POLL_INTERVAL)
+            if done:
+                try:
+                    return task.result()
+                except TokenBudgetExceededError as e:
+                    # LLMを呼ぶ前に拒否された（理由をそのまま返す）
+                    raise HTTPException(status_code=429, detail=e.reason)
+            if await request.is_disconnected():
+                controller.cancelled += 1
+                task.cancel()
+                raise HTTPException(status_code=499, detail="client disconnected")
+    finally:
+        if not task.done():
+            task.cancel()
+
+
+# ==================== アプリケーション ====================
+
+def create_app(
+    agent_factory: Callable[[], ProblemDiscoveryAgent] | None = None,
+    max_active: int = 8,
+    max_waiting: int = 32,
+    sheet_index: SheetIndex | None = None,
+    speculation: SpeculationPolicy | None = None,
+) -> FastAPI:
+    """
+    FastAPIアプリケーションを作成
+    
+    Args:
+        agent_factory: エージェントの生成関数（初回リクエスト時に1回だけ呼ばれる）
+        max_active: 同時実行数の上限
+        max_waiting: 待機キューの上限（超えたら 503）
+        sheet_index: 指定時、生成した出力を追加し検索エンドポイントを有効にする
+                     （X-Project-Id ごとに最新の出力で置き換える）
+        speculation: 指定時、追加質問への回答待ちの間に closed 質問の回答候補ごとの
+                     次のステップを先行実行する（回答は同じインスタンスに届く必要がある）
+    """
+    app = FastAPI(title="AI Lightning Studio - Problem Discovery API")
+    admission = AdmissionController(max_active=max_active, max_waiting=max_waiting)
+    factory = agent_factory or create_default_agent
+    holder: dict[str, ProblemDiscoveryOrchestrator] = {}
+    
+    def orchestrator() -> ProblemDiscoveryOrchestrator:
+        if "orchestrator" not in holder:
+            holder["orchestrator"] = ProblemDiscoveryOrchestrator(factory(), speculation=speculation)
+        return holder["orchestrator"]
+    
+    app.state.admission = admission
+    app.state.sheet_index = sheet_index
+    
+    def index_output(output: Any, project_meta: Any, request: Request) -> None:
+        if sheet_index is not None:
+            sheet_index.add(output, project_meta=project_meta, session_id=request.headers.get("x-project-id"))
+    
+    @app.get("/healthz")
+    async def healthz() -> dict[str, Any]:
+        status: dict[str, Any] = {"status": "ok", "admission": admission.stats()}
+        scheduler = holder["orchestrator"].agent.scheduler if "orchestrator" in holder else None
+        if scheduler is not None:
+            status["scheduler"] = scheduler.metrics()
+        speculator = holder["orchestrator"].speculator if "orchestrator" in holder else None
+        if speculator is not None:
+            status["speculation"] = speculator.stats()
+        return status
+    
+    @app.post("/api/v1/phases/problem_discovery")
+    async def run_phase(body: ProblemDiscoveryRunRequest, request: Request) -> dict[str, Any]:
+        """Phase 1 を1回実行して Firestore 形式の出力を返す"""
+        ticket = admission.try_admit()
+        if ticket is None:
+            raise _overloaded()
+        
+        agent = orchestrator().agent
+        async with ticket.slot():
+            output = await _run_until_disconnect(
+                request,
+                agent.arun(_to_input(body), latency_budget=body.latency_budget),
+                admission,
+            )
+        index_output(output, body.project_meta, request)
+        return FirestoreOutput.from_output(output)
+    
+    @app.post("/api/v1/phases/problem_discovery/stream")
+    async def stream_phase(body: ProblemDiscoveryRunRequest, request: Request) -> StreamingResponse:
+        """
+        Phase 1 を実行し、SSEで進捗を配信
+        
+        イベント: queued / progress / partial / result / error
+        """
+        ticket = admission.try_admit()
+        if ticket is None:
+            raise _overloaded()
+        
+        agent = orchestrator().agent
+        
+        async def events() -> AsyncIterator[str]:
+            yield _sse("queued", admission.stats())
+            # ストリーム本体はレスポンス送信タスク内で実行されるため、ここでコンテキストを設定する
+            with _context_from(request):
+                async with ticket.slot():
+                    stream = agent.astream(_to_input(body), latency_budget=body.latency_budget)
+                    try:
+                        async for event, data in stream:
+                            if await request.is_disconnected():
+                                admission.cancelled += 1
+                                return
+                            if event == "result":
+                                index_output(data, body.project_meta, request)
+                                yield _sse("result", FirestoreOutput.from_output(data))
+                            else:
+                                yield _sse(event, data)
+                    except asyncio.CancelledError:
+                        # 切断によりサーバーがストリームを中断した（LLM呼び出しも中断される）
+                        admission.cancelled += 1
+                        raise
+                    except Exception as e:
+                        yield _sse("error", {"detail": str(e)})
+                    finally:
+                        await stream.aclose()
+        
+        generator = events()
+        # 本体が一度も反復されずに破棄された場合も入場券を返却する
+        weakref.finalize(generator, ticket.release)
+        return StreamingResponse(
+            generator,
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+    
+    @app.post("/api/v1/phases/problem_discovery/sessions")
+    async def start_session(body: ProblemDiscoveryRunRequest, request: Request) -> dict[str, Any]:
+        """セッションを開始し、最初の1往復を実行"""
+        state = orchestrator().start(_to_input(body))
+        return await _step(SessionStepRequest(state=state, latency_budget=body.latency_budget), request)
+    
+    @app.post("/api/v1/phases/problem_discovery/sessions/step")
+    async def step_session(body: SessionStepRequest, request: Request) -> dict[str, Any]:
+        """クライアントが保持する状態と回答から次の1往復を実行"""
+        return await _step(body, request)
+    
+    async def _step(body: SessionStepRequest, request: Request) -> dict[str, Any]:
+        ticket = admission.try_admit()
+        if ticket is None:
+            raise _overloaded()
+        
+        orch = orchestrator()
+        async with ticket.slot():
+            state, output, next_phase = await _run_until_disconnect(
+                request,
+                orch.astep(body.state, body.answer, latency_budget=body.latency_budget),
+                admission,
+            )
+        index_output(output, state.project_meta, request)
+        return {
+            "state": state.model_dump(mode="json"),
+            "response": orch.agent.get_user_response(output),
+            "output": FirestoreOutput.from_output(output),
+            "nextPhase": next_phase,
+        }
+    
+    @app.get("/api/v1/search/problem_sheets")
+    async def search_problem_sheets(q: str, industry: Optional[str] = None, k: int = 10) -> dict[str, Any]:
+        """過去の課題シートを検索（sheet_index 未設定時は 404）"""
+        if sheet_index is None:
+            raise HTTPException(status_code=404, detail="検索インデックスが設定されていません")
+        return {"query": q, "hits": sheet_index.search(q, k=min(k, 100), industry=industry)}
+    
+    return app
+
+
+def _to_input(body: ProblemDiscoveryRunRequest) -> ProblemDiscoveryInput:
+    return ProblemDiscoveryInput(
+        user_free_text=body.user_free_text,
+        project_meta=body.project_meta,
+        history=body.history,
+    )
+
+
+app = create_app()
@@ -0,0 +1,22 @@
+"""
+テスト共通のフィクスチャ（フェイクLLMで動かす）
+"""
+
+from typing import Callable
+
+import pytest
+
+from agents.agent1 import ProblemDiscoveryAgent
+from agents.benchmarks.fake_llm import FakeLatencyChatModel
+
+SAMPLE_TEXT = "毎朝の通勤電車が混んでいて、スマホで仕事のメールを確認したいのに全然できない。"
+
+
+@pytest.fixture
+def make_agent() -> Callable[..., ProblemDiscoveryAgent]:
+    """フェイクLLMのエージェントを作る（latency で応答時間、その他はエージェントの引数）"""
+    def factory(latency: float = 0.0, **kwargs) -> ProblemDiscoveryAgent:
+        kwargs.setdefault("llm", FakeLatencyChatModel(latency=latency))
+        kwargs.setdefault("critic_llm", FakeLatencyChatModel(latency=latency))
+        return ProblemDiscoveryAgent(**kwargs)
+    return factory
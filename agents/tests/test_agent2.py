@@ -0,0 +1,61 @@
+"""
+質問設計エージェント（QuestionDesignAgent）のテスト
+"""
+
+import asyncio
+import time
+
+import pytest
+
+from agents.agent2 import QuestionDesignAgent
+from agents.benchmarks.fake_llm import SAMPLE_OUTPUT, FakeLatencyChatModel
+from agents.utils.question_schemas import QuestionDesignInput
+from agents.utils.schemas import ProblemDiscoverySheet
+
+SPARSE_INPUT = QuestionDesignInput(problem_statement="通勤中にメールが読めない", problem_discovery_sheet=ProblemDiscoverySheet())
+
+
+def _agent(latency: float = 0.0, **kwargs) -> QuestionDesignAgent:
+    return QuestionDesignAgent(llm=FakeLatencyChatModel(latency=latency), **kwargs)
+
+
+def test_sparse_sheet_covers_every_gap():
+    output = _agent().run(SPARSE_INPUT)
+    report = output.quality_report
+    assert report.missing_fields == []
+    assert report.coverage.model_dump() == {"job": True, "context": True, "pain": True, "emotion": True}
+    # 回答が必要なギャップがあるためユーザーに聞く
+    assert report.next_action == "ask_user"
+    assert len(output.question_sheet) == 10
+    assert len(output.question_intent_map) == len(output.question_sheet)
+
+
+def test_complete_sheet_proceeds(make_agent):
+    sheet = make_agent()._parse_sheet(SAMPLE_OUTPUT["problemDiscoverySheet"])
+    output = asyncio.run(_agent().arun(QuestionDesignInput(problem_statement="課題", problem_discovery_sheet=sheet)))
+    assert output.quality_report.next_action == "proceed"
+    assert {q.category for q in output.question_sheet} == {"who", "when", "where", "what", "why", "how", "emotion"}
+
+
+def test_max_questions_is_respected():
+    output = _agent(max_questions=4).run(SPARSE_INPUT)
+    assert len(output.question_sheet) == 4
+    # 上限で切り詰めた分は補えていないギャップとして報告する
+    assert output.quality_report.issues[0].startswith("4問を超えたため")
+    assert output.quality_report.missing_fields
+
+
+def test_timeout_returns_error_output():
+    t0 = time.perf_counter()
+    output = _agent(latency=1.0, llm_timeout=0.1).run(SPARSE_INPUT)
+    assert time.perf_counter() - t0 < 0.5
+    assert output.question_sheet == []
+    assert output.quality_report.missing_fields == ["timeout"]
+    assert output.gaps
+
+
+def test_invalid_arguments():
+    with pytest.raises(ValueError):
+        _agent(max_questions=0)
+    with pytest.raises(ValueError):
+        _agent(max_attempts=0)
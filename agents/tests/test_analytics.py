@@ -0,0 +1,97 @@
+"""
+列指向アナリティクス（agents.analytics）のテスト
+"""
+
+import numpy as np
+import pytest
+
+from agents.analytics import UNKNOWN_INDUSTRY, DiscoveryColumnsBuilder, normalize_text
+from agents.utils.schemas import ProjectMeta
+
+
+def _record(confidence: float, next_action: str, pains, needs=(), missing=()) -> dict:
+    return {
+        "problemDiscoverySheet": {
+            "pains": [{"pain": p, "severity": s, "frequency": f} for p, s, f in pains],
+            "unmetNeeds": [{"need": n, "whyDepth": ["why"] * depth} for n, depth in needs],
+        },
+        "qualityReport": {"confidence": confidence, "missingFields": list(missing), "nextAction": next_action},
+    }
+
+
+# 重大度×頻度: 満員 20+6=26、メール 6、Wi-Fi 2+25=27
+RECORDS = [
+    (
+        _record(0.95, "proceed", [("満員で座れない", 4, 5), ("メールが読めない", 3, 2)], needs=[("座って作業したい", 3)]),
+        {"industry": "retail"},
+    ),
+    (
+        _record(0.55, "ask_more", [("満員で座れない", 2, 3), ("Ｗｉｆｉが  遅い", 1, 2)],
+                needs=[("座って作業したい", 1)], missing=["context.trigger"]),
+        ProjectMeta(industry="retail"),
+    ),
+    (
+        _record(0.25, "ask_more", [("wifiが 遅い", 5, 5)], missing=["context.trigger", "job.main"]),
+        None,
+    ),
+]
+
+
+@pytest.fixture
+def columns():
+    builder = DiscoveryColumnsBuilder()
+    builder.extend(RECORDS)
+    return builder.build()
+
+
+def test_normalize_text():
+    assert normalize_text("Ｗｉｆｉが  遅い ") == "wifiが 遅い"
+    assert normalize_text(None) == ""
+
+
+def test_top_pains_by_score(columns):
+    top = columns.top_pains(k=2)
+    assert [(p["pain"], p["count"], p["score"]) for p in top] == [("wifiが 遅い", 2, 27.0), ("満員で座れない", 2, 26.0)]
+    assert top[1]["meanSeverity"] == 3.0
+    assert top[1]["meanFrequency"] == 4.0
+    assert len(columns.top_pains(k=10)) == 3
+
+
+def test_top_pains_by_industry(columns):
+    top = columns.top_pains(k=10, industry="retail")
+    assert [(p["pain"], p["score"]) for p in top] == [("満員で座れない", 26.0), ("メールが読めない", 6.0), ("wifiが 遅い", 2.0)]
+    assert columns.top_pains(industry="unknown") == []
+
+
+def test_industry_stats(columns):
+    stats = columns.industry_stats()
+    assert set(stats) == {"retail", UNKNOWN_INDUSTRY}
+    retail = stats["retail"]
+    assert retail["sessions"] == 2
+    assert retail["meanConfidence"] == pytest.approx(0.75)
+    assert retail["proceedRatio"] == 0.5
+    assert retail["meanPains"] == 2.0
+    assert retail["meanPainScore"] == (20 + 6 + 6 + 2) / 4
+    assert stats[UNKNOWN_INDUSTRY]["meanPainScore"] == 25.0
+
+
+def test_confidence_histogram(columns):
+    counts, edges = columns.confidence_histogram(bins=10)
+    assert np.flatnonzero(counts).tolist() == [2, 5, 9]
+    assert edges[0] == 0.0 and edges[-1] == 1.0
+    counts, _ = columns.confidence_histogram(bins=10, industry="retail")
+    assert np.flatnonzero(counts).tolist() == [5, 9]
+
+
+def test_missing_fields_and_needs(columns):
+    assert columns.missing_field_counts() == [("context.trigger", 2), ("job.main", 1)]
+    assert columns.top_unmet_needs() == [{"need": "座って作業したい", "count": 2, "meanWhyDepth": 2.0}]
+
+
+def test_build_is_a_snapshot():
+    builder = DiscoveryColumnsBuilder()
+    builder.extend(RECORDS[:1])
+    first = builder.build()
+    builder.extend(RECORDS[1:])
+    assert first.n_sessions == 1
+    assert builder.build().n_sessions == 3
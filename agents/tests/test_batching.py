@@ -0,0 +1,91 @@
+"""
+マイクロバッチ（agents.utils.batching）のテスト
+"""
+
+import time
+from concurrent.futures import wait
+
+import pytest
+
+from agents.benchmarks.fake_llm import FakeLatencyChatModel
+from agents.tests.conftest import SAMPLE_TEXT
+from agents.utils.batching import BatchProcessError, MicroBatcher, MicroBatchPolicy
+from agents.utils.latency import Deadline
+from agents.utils.request_context import LANE_BATCH, request_context
+from agents.utils.schemas import ProblemDiscoveryInput
+
+POLICY = MicroBatchPolicy(max_items=4, max_wait=0.01, max_retries=1)
+
+
+def _run(process, items):
+    """要素を投入し、すべて完了してから終了する"""
+    batcher = MicroBatcher(process, POLICY)
+    futures = [batcher.submit(item) for item in items]
+    wait(futures, timeout=5)
+    batcher.close()
+    return futures, batcher
+
+
+def test_results_follow_input_order():
+    futures, batcher = _run(lambda items: [item * 2 for item in items], [1, 2, 3])
+    assert [f.result(timeout=1) for f in futures] == [2, 4, 6]
+    assert batcher.stats()["gaveUp"] == 0
+
+
+def test_short_result_fails_every_future():
+    calls = []
+    
+    def process(items):
+        calls.append(len(items))
+        return [item for item in items[:-1]]
+    
+    futures, batcher = _run(process, [1, 2, 3])
+    for future in futures:
+        with pytest.raises(BatchProcessError):
+            future.result(timeout=1)
+    # 失敗として1回だけ再試行し、使い切った要素は例外で完了する
+    assert sum(calls) == 6
+    assert batcher.stats()["gaveUp"] == 3
+
+
+def test_process_exception_is_chained():
+    def process(items):
+        raise KeyError("boom")
+    
+    futures, _ = _run(process, [1])
+    with pytest.raises(BatchProcessError) as exc_info:
+        futures[0].result(timeout=1)
+    assert isinstance(exc_info.value.__cause__, KeyError)
+
+
+def test_item_failure_resolves_none():
+    futures, _ = _run(lambda items: [None if item == 2 else item for item in items], [1, 2])
+    assert [f.result(timeout=1) for f in futures] == [1, None]
+
+
+def test_batch_call_timeout_follows_llm_timeout(make_agent):
+    agent = make_agent(llm=FakeLatencyChatModel(latency=2.0), llm_timeout=0.2, micro_batch=MicroBatchPolicy())
+    try:
+        t0 = time.perf_counter()
+        assert agent._invoke_batch(agent.llm, agent._build_extraction_messages(
+            ProblemDiscoveryInput(user_free_text=SAMPLE_TEXT)), None) is None
+        assert time.perf_counter() - t0 < 1.0
+        
+        t0 = time.perf_counter()
+        assert agent._invoke_batch(agent.llm, [], Deadline.after(0.05)) is None
+        assert time.perf_counter() - t0 < 0.2
+    finally:
+        agent.close()
+
+
+def test_batched_run_falls_back_when_batch_fails(make_agent, monkeypatch):
+    agent = make_agent(micro_batch=MicroBatchPolicy(max_wait=0.01, max_retries=0))
+    monkeypatch.setattr(agent._extract_batcher, "process", lambda entries: [])
+    try:
+        with request_context(lane=LANE_BATCH):
+            output = agent.run(ProblemDiscoveryInput(user_free_text=SAMPLE_TEXT))
+        # バッチが失敗しても単発呼び出しで完了する
+        assert output.problem_statement
+        assert "timeout" not in output.quality_report.missing_fields
+    finally:
+        agent.close()
@@ -0,0 +1,126 @@
+"""
+保存用コーデック（agents.utils.codec）のテスト
+"""
+
+import io
+import zlib
+
+import pytest
+
+from agents.benchmarks.fake_llm import SAMPLE_OUTPUT
+from agents.utils import codec
+from agents.utils.schemas import FollowupQuestion, QualityReport, SessionState
+
+VALUES = {
+    "ints": [0, 1, -1, 63, -64, 2**40, -(2**63)],
+    "floats": [0.0, -0.5, 0.1, 1e-300, 3.141592653589793],
+    "bools": [True, False, None],
+    "text": ["", "通勤中にメールを確認する", "ask_more", "a" * 300],
+    # 共有辞書にないキーと値
+    "独自キー": {"nested": [[], {}, {"x": 1}]},
+    "problemStatement": "proceed",
+}
+
+
+@pytest.mark.parametrize("compression", codec.available_compressions())
+def test_round_trip_every_value_type(compression):
+    data = codec.encode(VALUES, compression)
+    assert codec.decode(data) == VALUES
+    assert codec.decode(codec.encode(SAMPLE_OUTPUT, compression)) == SAMPLE_OUTPUT
+
+
+def test_compression_header():
+    record = {"problemStatement": "同じ文が続く。" * 100}
+    for compression in codec.available_compressions():
+        data = codec.encode(record, compression)
+        assert data[5] == codec._COMPRESSION_CODES[compression]
+    # 圧縮で大きくなる短いレコードは無圧縮で保存する
+    assert codec.encode({"a": 1}, codec.COMPRESSION_ZLIB)[5] == codec._COMPRESSION_CODES[codec.COMPRESSION_NONE]
+
+
+def test_zstd_requires_zstandard(monkeypatch):
+    pytest.importorskip("zstandard")
+    data = codec.encode({"problemStatement": "同じ文が続く。" * 100}, codec.COMPRESSION_ZSTD)
+    monkeypatch.setattr(codec, "zstandard", None)
+    assert codec.COMPRESSION_ZSTD not in codec.available_compressions()
+    with pytest.raises(ValueError):
+        codec.encode({}, codec.COMPRESSION_ZSTD)
+    with pytest.raises(codec.CodecError):
+        codec.decode(data)
+
+
+def test_unsupported_values():
+    with pytest.raises(codec.CodecError):
+        codec.encode({1: "数値のキー"})
+    with pytest.raises(codec.CodecError):
+        codec.encode({"set": {1, 2}})
+
+
+@pytest.mark.parametrize("compression", [codec.COMPRESSION_NONE, codec.COMPRESSION_ZLIB])
+def test_truncated_data_raises(compression):
+    data = codec.encode(SAMPLE_OUTPUT, compression)
+    for end in range(len(data) - 1, 0, -7):
+        with pytest.raises(codec.CodecError):
+            codec.decode(data[:end])
+
+
+def test_corrupt_data_raises():
+    data = codec.encode(VALUES, codec.COMPRESSION_NONE)
+    with pytest.raises(codec.CodecError):
+        codec.decode(b"JSON" + data[4:])
+    with pytest.raises(codec.CodecError):
+        codec.decode(data[:4] + bytes([99]) + data[5:])
+    with pytest.raises(codec.CodecError):
+        codec.decode(data[:6] + bytes([0xFF]) + data[7:])
+    with pytest.raises(codec.CodecError):
+        codec.decode(data + b"\x00")
+    with pytest.raises(codec.CodecError):
+        codec.decode(data[:5] + bytes([1]) + zlib.compress(data[6:])[:-4] + b"xxxx")
+
+
+def test_session_codec_keeps_question_targets():
+    state = SessionState(
+        iteration=1,
+        user_free_text="通勤電車でメールが読めない",
+        problem_statement=SAMPLE_OUTPUT["problemStatement"],
+        sheet=SAMPLE_OUTPUT["problemDiscoverySheet"],
+        followup_questions=[
+            FollowupQuestion(
+                question="きっかけは？", type="closed", target="context.trigger",
+                options=["始業前にメールが届いたとき", "会議の前"],
+            ),
+        ],
+        quality_report=QualityReport(confidence=0.6, missing_fields=["context.trigger"], next_action="ask_more"),
+    )
+    data = codec.encode_session(state)
+    assert data[4] == codec.CODEC_VERSION == 2
+    assert codec.decode_session(data) == state
+    # 共有辞書に target / options が入っている
+    keys, _ = codec._DICTIONARIES[2]
+    assert {"target", "options"} <= set(keys)
+
+
+def test_codec_decodes_v1_records(monkeypatch):
+    record = {"followupQuestions": [{"question": "頻度は？", "type": "scale"}], "nextAction": "ask_more"}
+    monkeypatch.setattr(codec, "CODEC_VERSION", 1)
+    data = codec.encode(record)
+    assert data[4] == 1
+    monkeypatch.undo()
+    assert codec.decode(data) == record
+
+
+def test_records_stream(tmp_path):
+    records = [SAMPLE_OUTPUT, VALUES, {"problemStatement": "x" * 200}]
+    path = tmp_path / "records.bin"
+    assert codec.write_records(path, iter(records)) == 3
+    reader = codec.read_records(path)
+    assert next(reader) == SAMPLE_OUTPUT
+    assert list(reader) == records[1:]
+    
+    buffer = io.BytesIO()
+    codec.write_records(buffer, records, codec.COMPRESSION_NONE)
+    assert list(codec.read_records(io.BytesIO(buffer.getvalue()))) == records
+    with pytest.raises(codec.CodecError):
+        list(codec.read_records(io.BytesIO(buffer.getvalue()[:-1])))
+    with pytest.raises(codec.CodecError):
+        list(codec.read_records(io.BytesIO(b"\x80")))
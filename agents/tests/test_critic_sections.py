@@ -0,0 +1,112 @@
+"""
+セクション単位のCritic（agents.utils.critic_sections と critic_mode="sectional"）のテスト
+"""
+
+import copy
+import json
+import re
+
+import pytest
+
+from agents.benchmarks.fake_llm import SAMPLE_OUTPUT, SAMPLE_SECTION_VERDICT, FakeLatencyChatModel, default_responder
+from agents.prompts import SECTION_CRITIC_PROMPT
+from agents.utils.critic_sections import (
+    CRITIC_SECTIONS,
+    VerdictMemo,
+    combine_verdicts,
+    validate_verdict,
+)
+
+_SECTION_LINE = re.compile(r"^## (\w+)$", re.MULTILINE)
+
+
+class _Recorder:
+    """Criticに送られたセクションを記録する（omit のセクションは応答から外す）"""
+    
+    def __init__(self):
+        self.requests: list[list[str]] = []
+        self.omit: set[str] = set()
+    
+    def __call__(self, messages) -> str:
+        if messages[0].content != SECTION_CRITIC_PROMPT:
+            return default_responder(messages)
+        sections = _SECTION_LINE.findall(str(messages[-1].content))
+        self.requests.append(sections)
+        verdicts = {name: SAMPLE_SECTION_VERDICT for name in sections if name not in self.omit}
+        return json.dumps({"sections": verdicts}, ensure_ascii=False)
+
+
+@pytest.fixture
+def recorder() -> _Recorder:
+    return _Recorder()
+
+
+@pytest.fixture
+def agent(make_agent, recorder):
+    return make_agent(critic_mode="sectional", critic_llm=FakeLatencyChatModel(responder=recorder))
+
+
+def _output(agent, **sheet_updates):
+    raw = copy.deepcopy(SAMPLE_OUTPUT)
+    raw["qualityReport"] = {"confidence": 0.4, "missingFields": ["self"], "contradictions": [], "nextAction": "ask_more"}
+    raw["problemDiscoverySheet"].update(sheet_updates)
+    return agent._parse_output(raw)
+
+
+def test_unchanged_output_makes_no_llm_call(agent, recorder):
+    first = agent._run_sectional_critic(_output(agent))
+    assert recorder.requests == [list(CRITIC_SECTIONS)]
+    assert first.quality_report.next_action == "proceed"
+    assert first.quality_report.confidence == SAMPLE_SECTION_VERDICT["confidence"]
+    
+    calls = agent.critic_llm.calls
+    second = agent._run_sectional_critic(_output(agent))
+    assert agent.critic_llm.calls == calls
+    assert second.quality_report == first.quality_report
+    assert agent.critic_memo.stats()["hits"] == len(CRITIC_SECTIONS)
+
+
+def test_only_changed_sections_are_judged(agent, recorder):
+    agent._run_sectional_critic(_output(agent))
+    pains = copy.deepcopy(SAMPLE_OUTPUT["problemDiscoverySheet"]["pains"])
+    pains[0]["severity"] = 5
+    agent._run_sectional_critic(_output(agent, pains=pains))
+    # unmetNeeds は pains とのつながりを評価するため、pains が変われば評価し直す
+    assert recorder.requests[-1] == ["pains", "unmetNeeds"]
+
+
+def test_partial_verdict_keeps_self_report(agent, recorder):
+    recorder.omit = {"context"}
+    output = agent._run_sectional_critic(_output(agent))
+    assert output.quality_report.missing_fields == ["self"]
+    assert output.quality_report.confidence == 0.4
+    
+    # 評価できたセクションはメモ済みのため、次は欠けたセクションだけを評価する
+    recorder.omit = set()
+    output = agent._run_sectional_critic(_output(agent))
+    assert recorder.requests[-1] == ["context"]
+    assert output.quality_report.next_action == "proceed"
+
+
+def test_combine_verdicts():
+    verdicts = {name: validate_verdict(SAMPLE_SECTION_VERDICT) for name in CRITIC_SECTIONS}
+    verdicts["pains"] = validate_verdict({"ok": False, "confidence": 2, "missingFields": ["pains[0].evidence"]})
+    report = combine_verdicts(verdicts)
+    assert report.next_action == "ask_more"
+    assert report.missing_fields == ["pains[0].evidence"]
+    assert report.confidence == round((0.85 * 5 + 1.0) / 6, 2)
+    
+    assert validate_verdict({"ok": "yes", "confidence": 0.5}) is None
+    assert validate_verdict({"ok": True}) is None
+
+
+def test_verdict_memo_evicts_least_recently_used():
+    memo = VerdictMemo(max_entries=2)
+    memo.put("a", {"ok": True})
+    memo.put("b", {"ok": True})
+    assert memo.get("a") is not None
+    memo.put("c", {"ok": True})
+    assert memo.get("b") is None
+    assert memo.stats() == {"hits": 1, "misses": 1, "entries": 2}
+    with pytest.raises(ValueError):
+        VerdictMemo(max_entries=0)
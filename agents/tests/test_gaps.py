@@ -0,0 +1,88 @@
+"""
+情報ギャップ検出と質問シートの品質判定（agents.utils.gaps）のテスト
+"""
+
+import pytest
+
+from agents.benchmarks.fake_llm import SAMPLE_OUTPUT
+from agents.utils.gaps import check_question_sheet, detect_gaps, intent_map, needs_answers, normalize_questions
+from agents.utils.question_schemas import QUESTION_CATEGORIES, DesignedQuestion
+from agents.utils.schemas import ProblemDiscoverySheet
+
+
+@pytest.fixture
+def full_sheet(make_agent) -> ProblemDiscoverySheet:
+    return make_agent()._parse_sheet(SAMPLE_OUTPUT["problemDiscoverySheet"])
+
+
+def _question(text: str, category: str, field: str, priority: str = "medium") -> DesignedQuestion:
+    return DesignedQuestion(question=text, category=category, priority=priority, related_field=field)
+
+
+def test_empty_sheet_reports_missing_fields():
+    gaps = detect_gaps(None)
+    fields = [gap.field for gap in gaps]
+    assert fields[:5] == ["job.main", "context.who", "context.when", "context.where", "context.trigger"]
+    assert {"pains", "unmetNeeds.whyDepth", "currentSolutions", "emotion.feelings", "successCriteria"} <= set(fields)
+    assert all(gap.kind == "missing" for gap in gaps)
+    assert needs_answers(gaps) == gaps
+
+
+def test_complete_sheet_only_verifies_each_category(full_sheet):
+    gaps = detect_gaps(full_sheet)
+    assert needs_answers(gaps) == []
+    assert sorted(gap.category for gap in gaps) == sorted(QUESTION_CATEGORIES)
+    # 最も重い pain（severity × frequency）を検証対象にする
+    assert next(gap for gap in gaps if gap.category == "why").field == "pains[0]"
+
+
+def test_unclear_values_are_flagged(full_sheet):
+    sheet = full_sheet.model_copy(deep=True)
+    sheet.job.main = "メール"
+    sheet.context.trigger = "朝"
+    sheet.pains[1].impact = ""
+    sheet.unmet_needs = sheet.unmet_needs[:1]
+    sheet.unmet_needs[0].why_depth = sheet.unmet_needs[0].why_depth[:2]
+    
+    kinds = {gap.field: gap.kind for gap in needs_answers(detect_gaps(sheet))}
+    assert kinds == {
+        "job.main": "unclear",
+        "context.trigger": "unclear",
+        "pains[1].impact": "unclear",
+        "unmetNeeds.whyDepth": "unclear",
+    }
+
+
+def test_normalize_drops_abstract_duplicates_and_low_priority():
+    gaps = detect_gaps(None)
+    questions = [
+        _question("もう少し詳しく教えてください", "what", "job.main"),
+        _question("この困りごとを一番強く感じているのは誰ですか？", "WHO", "context.who", "HIGH"),
+        _question("この困りごとを一番強く感じているのは誰ですか", "who", "context.who"),
+        _question("最近それが起きたのはいつですか？", "", "context.when", ""),
+        _question("どこで起きていますか？", "where", "context.where", "low"),
+    ]
+    kept, issues = normalize_questions(questions, gaps, max_questions=2)
+    
+    assert [q.related_field for q in kept] == ["context.who", "context.when"]
+    assert (kept[0].category, kept[0].priority) == ("who", "high")
+    # カテゴリ・優先度が不正ならギャップの値で補う
+    assert (kept[1].category, kept[1].priority) == ("when", "medium")
+    assert len(issues) == 3
+    assert [i.linked_phase1_field for i in intent_map(kept, gaps)] == ["context.who", "context.when"]
+
+
+def test_check_question_sheet_reports_uncovered_gaps():
+    gaps = detect_gaps(None)
+    questions = [
+        _question("誰が困っていますか？", "who", "context.who"),
+        _question("どんな気持ちになりましたか？", "emotion", "emotion.feelings"),
+    ]
+    report = check_question_sheet(questions, gaps)
+    assert report.next_action == "ask_user"
+    assert "context.who" not in report.missing_fields
+    assert "job.main" in report.missing_fields
+    assert report.coverage.job is False
+    assert report.confidence < 0.5
+    
+    assert check_question_sheet([], []).next_action == "proceed"
@@ -0,0 +1,132 @@
+"""
+ジョブキュー（agents.jobs）のテスト
+"""
+
+import httpx
+import pytest
+from pydantic import BaseModel, ValidationError
+
+from agents.jobs import (
+    STATUS_DEAD,
+    STATUS_DONE,
+    STATUS_QUEUED,
+    JobQueue,
+    JobRetryError,
+    WorkerPool,
+    is_retryable,
+)
+from agents.utils.latency import DeadlineExceededError
+from agents.utils.tokens import TokenBudgetExceededError
+
+
+class _ProviderError(Exception):
+    def __init__(self, code: int):
+        super().__init__(f"HTTP {code}")
+        self.code = code
+
+
+class _Strict(BaseModel):
+    value: int
+
+
+def _validation_error() -> ValidationError:
+    with pytest.raises(ValidationError) as exc_info:
+        _Strict.model_validate({"value": "x"})
+    return exc_info.value
+
+
+def _wrapped(cause: BaseException) -> Exception:
+    try:
+        raise RuntimeError("wrapped") from cause
+    except RuntimeError as e:
+        return e
+
+
+@pytest.mark.parametrize("error", [
+    JobRetryError("timeout"),
+    TimeoutError(),
+    DeadlineExceededError("deadline"),
+    ConnectionError(),
+    _ProviderError(429),
+    _ProviderError(503),
+    _wrapped(_ProviderError(500)),
+])
+def test_transient_errors_are_retryable(error):
+    assert is_retryable(error)
+
+
+@pytest.mark.parametrize("error", [
+    TokenBudgetExceededError("over", "tenant", 100, 0),
+    ValueError("bad input"),
+    KeyError("input"),
+    _ProviderError(400),
+    _wrapped(_ProviderError(403)),
+])
+def test_permanent_errors_are_not_retryable(error):
+    assert not is_retryable(error)
+
+
+_REQUEST = httpx.Request("POST", "https://generativelanguage.googleapis.com/v1beta/models")
+
+
+@pytest.mark.parametrize("error", [
+    httpx.ConnectError("connection refused", request=_REQUEST),
+    httpx.ReadTimeout("read timed out", request=_REQUEST),
+    _wrapped(httpx.RemoteProtocolError("server disconnected", request=_REQUEST)),
+])
+def test_httpx_transport_errors_are_retryable(error):
+    assert not isinstance(error, (TimeoutError, ConnectionError))
+    assert is_retryable(error)
+
+
+def test_validation_error_is_not_retryable():
+    assert not is_retryable(_validation_error())
+
+
+def test_fail_without_retry_goes_dead(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.db"), max_attempts=5)
+    job_id = queue.enqueue({"input": {}})
+    queue.lease("w")
+    assert queue.fail(job_id, "w", "ValueError: bad", retry=False) == STATUS_DEAD
+    
+    job_id = queue.enqueue({"input": {}})
+    queue.lease("w")
+    assert queue.fail(job_id, "w", "TimeoutError") == STATUS_QUEUED
+
+
+def _raise_validation(payload):
+    _Strict.model_validate(payload)
+
+
+def _raise_timeout(payload):
+    raise TimeoutError("slow")
+
+
+def _ok(payload):
+    return {"ok": True}
+
+
+def test_worker_dead_letters_permanent_failures_on_first_attempt(tmp_path):
+    path = str(tmp_path / "jobs.db")
+    queue = JobQueue(path, max_attempts=5)
+    job_id = queue.enqueue({"value": "x"})
+    WorkerPool(path, handler=_raise_validation, workers=1, poll_interval=0.01).run_until_empty()
+    job = queue.get(job_id)
+    assert job["status"] == STATUS_DEAD
+    assert job["attempts"] == 1
+    assert job["last_error"].startswith("ValidationError")
+
+
+def test_worker_retries_transient_failures(tmp_path):
+    path = str(tmp_path / "jobs.db")
+    queue = JobQueue(path, max_attempts=3)
+    job_id = queue.enqueue({})
+    WorkerPool(path, handler=_raise_timeout, workers=1, poll_interval=0.01,
+               queue_options={"backoff_base": 0.0}).run_until_empty()
+    job = queue.get(job_id)
+    assert job["status"] == STATUS_DEAD
+    assert job["attempts"] == 3
+    
+    done_id = queue.enqueue({})
+    WorkerPool(path, handler=_ok, workers=1, poll_interval=0.01).run_until_empty()
+    assert queue.get(done_id)["status"] == STATUS_DONE
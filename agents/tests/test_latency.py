@@ -0,0 +1,143 @@
+"""
+デッドラインとヘッジ実行（agents.utils.latency）のテスト
+"""
+
+import asyncio
+import threading
+import time
+
+import httpx
+import pytest
+
+from agents.utils.latency import DeadlineExceededError, HedgedInvoker, LatencyTracker
+
+_REQUEST = httpx.Request("POST", "https://generativelanguage.googleapis.com/v1beta/models")
+
+
+def _invoker(p90: float) -> HedgedInvoker:
+    """ローリング p90 が p90 秒になるよう統計を埋めたヘッジ実行器"""
+    tracker = LatencyTracker(min_samples=10)
+    for _ in range(10):
+        tracker.record(p90)
+    return HedgedInvoker(tracker=tracker, max_hedges=1)
+
+
+class _Calls:
+    """試行ごとの遅延と結果を決めた呼び出し（試行の順に latencies / results を使う）"""
+    
+    def __init__(self, latencies: list[float], results: list[str]):
+        self.latencies = latencies
+        self.results = results
+        self.started: list[float] = []
+        self.finished: list[str] = []
+        self._lock = threading.Lock()
+        self._t0 = time.monotonic()
+    
+    def _next(self) -> int:
+        with self._lock:
+            self.started.append(time.monotonic() - self._t0)
+            return len(self.started) - 1
+    
+    def __call__(self) -> str:
+        attempt = self._next()
+        time.sleep(self.latencies[attempt])
+        self.finished.append(self.results[attempt])
+        return self.results[attempt]
+    
+    async def acall(self) -> str:
+        attempt = self._next()
+        try:
+            await asyncio.sleep(self.latencies[attempt])
+        except asyncio.CancelledError:
+            self.finished.append(f"cancelled:{self.results[attempt]}")
+            raise
+        self.finished.append(self.results[attempt])
+        return self.results[attempt]
+
+
+# ---------- ヘッジ ----------
+
+def test_no_hedge_before_p90():
+    invoker = _invoker(p90=0.5)
+    calls = _Calls([0.05], ["primary"])
+    assert invoker.invoke(calls, timeout=2.0) == "primary"
+    assert len(calls.started) == 1
+    assert invoker.hedges_sent == 0
+
+
+def test_hedge_after_p90_wins():
+    invoker = _invoker(p90=0.05)
+    calls = _Calls([1.0, 0.0], ["primary", "hedge"])
+    t0 = time.monotonic()
+    assert invoker.invoke(calls, timeout=2.0) == "hedge"
+    # 一次リクエストの完了を待たずに返る（敗者の結果は捨てる）
+    assert time.monotonic() - t0 < 0.5
+    assert calls.finished == ["hedge"]
+    assert calls.started[1] >= 0.05
+    assert (invoker.hedges_sent, invoker.hedges_won) == (1, 1)
+
+
+def test_first_valid_response_wins():
+    invoker = _invoker(p90=0.05)
+    # 一次リクエストが先に返るが無効な応答のため、後から返ったヘッジを採用する
+    calls = _Calls([0.1, 0.1], ["invalid", "valid"])
+    assert invoker.invoke(calls, timeout=2.0, is_valid=lambda r: r == "valid") == "valid"
+    assert calls.finished == ["invalid", "valid"]
+    assert invoker.hedges_won == 1
+
+
+def test_async_loser_is_cancelled():
+    invoker = _invoker(p90=0.05)
+    calls = _Calls([1.0, 0.0], ["primary", "hedge"])
+    
+    async def main():
+        result = await invoker.ainvoke(calls.acall, timeout=2.0)
+        await asyncio.sleep(0)  # キャンセルを敗者のタスクに届ける
+        return result
+    
+    assert asyncio.run(main()) == "hedge"
+    assert calls.finished == ["hedge", "cancelled:primary"]
+
+
+def test_hedge_false_never_hedges():
+    invoker = _invoker(p90=0.01)
+    calls = _Calls([0.1], ["primary"])
+    assert invoker.invoke(calls, timeout=2.0, hedge=False) == "primary"
+    assert invoker.hedges_sent == 0
+
+
+# ---------- タイムアウト ----------
+
+def test_slow_call_raises_deadline_exceeded():
+    calls = _Calls([1.0], ["primary"])
+    t0 = time.monotonic()
+    with pytest.raises(DeadlineExceededError):
+        HedgedInvoker(max_hedges=0).invoke(calls, timeout=0.05)
+    assert time.monotonic() - t0 < 0.5
+
+
+@pytest.mark.parametrize("error", [
+    TimeoutError("client timeout"),
+    httpx.ReadTimeout("read timed out", request=_REQUEST),
+    httpx.ConnectTimeout("connect timed out", request=_REQUEST),
+])
+def test_client_timeout_is_reported_as_deadline(error):
+    def call():
+        raise error
+    
+    async def acall():
+        raise error
+    
+    with pytest.raises(DeadlineExceededError) as exc_info:
+        HedgedInvoker(max_hedges=0).invoke(call, timeout=1.0)
+    assert exc_info.value.__cause__ is error
+    with pytest.raises(DeadlineExceededError):
+        asyncio.run(HedgedInvoker(max_hedges=0).ainvoke(acall, timeout=1.0))
+
+
+def test_other_errors_pass_through():
+    def call():
+        raise httpx.ConnectError("connection refused", request=_REQUEST)
+    
+    with pytest.raises(httpx.ConnectError):
+        HedgedInvoker(max_hedges=0).invoke(call, timeout=1.0)
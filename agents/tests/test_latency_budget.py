@@ -0,0 +1,93 @@
+"""
+レイテンシ予算モード（latency_budget）の段階的な劣化のテスト
+"""
+
+import asyncio
+import copy
+import json
+
+import pytest
+
+from agents.benchmarks.fake_llm import SAMPLE_OUTPUT, FakeLatencyChatModel, default_responder
+from agents.prompts import SYSTEM_PROMPT
+from agents.tests.conftest import SAMPLE_TEXT
+from agents.utils.latency import DEGRADE_FAST_MODEL, DEGRADE_LOCAL_CRITIC, DEGRADE_SHORT_HISTORY
+from agents.utils.quality import LOCAL_CONFIDENCE_CAP
+from agents.utils.schemas import ConversationMessage, ProblemDiscoveryInput
+
+HISTORY = [ConversationMessage(role="user", content=f"履歴{i}番目の発言") for i in range(10)]
+
+
+class _Extraction:
+    """抽出の応答（自己評価を差し替え可能）と、受け取ったユーザープロンプトを記録する"""
+    
+    def __init__(self, **quality_report):
+        self.output = copy.deepcopy(SAMPLE_OUTPUT)
+        self.output["qualityReport"].update(quality_report)
+        self.prompts: list[str] = []
+    
+    def __call__(self, messages) -> str:
+        if messages[0].content != SYSTEM_PROMPT:
+            return default_responder(messages)
+        self.prompts.append(str(messages[-1].content))
+        return json.dumps(self.output, ensure_ascii=False)
+
+
+def _run(agent, use_async: bool = False, **kwargs):
+    input_data = ProblemDiscoveryInput(user_free_text=SAMPLE_TEXT, history=HISTORY)
+    if use_async:
+        return asyncio.run(agent.arun(input_data, **kwargs))
+    return agent.run(input_data, **kwargs)
+
+
+@pytest.mark.parametrize("use_async", [False, True])
+def test_tight_budget_applies_every_degradation(make_agent, use_async):
+    extraction = _Extraction()
+    agent = make_agent(
+        llm=FakeLatencyChatModel(responder=extraction),
+        fast_llm=FakeLatencyChatModel(responder=extraction),
+    )
+    output = _run(agent, use_async, latency_budget=5.0)
+    
+    assert output.degradations == [DEGRADE_FAST_MODEL, DEGRADE_SHORT_HISTORY, DEGRADE_LOCAL_CRITIC]
+    # 抽出は高速モデルで行い、LLM Critic は呼ばない
+    assert (agent.llm.calls, agent.fast_llm.calls, agent.critic_llm.calls) == (0, 1, 0)
+    # 会話履歴は直近 short_history_messages 件だけを渡す
+    prompt = extraction.prompts[0]
+    assert "履歴9番目" in prompt and "履歴6番目" in prompt
+    assert "履歴5番目" not in prompt
+
+
+def test_generous_budget_keeps_full_quality(make_agent):
+    agent = make_agent(fast_llm=FakeLatencyChatModel())
+    output = _run(agent, latency_budget=60.0)
+    assert output.degradations == []
+    assert (agent.llm.calls, agent.fast_llm.calls, agent.critic_llm.calls) == (1, 0, 1)
+
+
+def test_degradations_follow_policy_thresholds(make_agent):
+    # 高速モデルがなければ切り替えず、残りがしきい値以上の段階は劣化させない
+    agent = make_agent()
+    output = _run(agent, latency_budget=12.0)
+    assert output.degradations == [DEGRADE_SHORT_HISTORY]
+    assert agent.critic_llm.calls == 1
+
+
+def test_local_critic_caps_confidence(make_agent):
+    agent = make_agent(llm=FakeLatencyChatModel(responder=_Extraction(confidence=1.0)))
+    report = _run(agent, latency_budget=5.0).quality_report
+    # 自己評価が高くても、ローカル検査では上限までしか信頼しない
+    assert report.confidence == LOCAL_CONFIDENCE_CAP
+    assert report.next_action == "proceed"
+    assert agent.critic_llm.calls == 0
+
+
+def test_local_critic_keeps_self_reported_gaps(make_agent):
+    extraction = _Extraction(confidence=0.9, missingFields=["context.trigger"], nextAction="ask_more")
+    extraction.output["problemDiscoverySheet"]["job"]["main"] = "不明"
+    agent = make_agent(llm=FakeLatencyChatModel(responder=extraction))
+    report = _run(agent, latency_budget=5.0).quality_report
+    assert report.next_action == "ask_more"
+    # 自己評価の不足に、ローカル検査で見つかった不足を加える
+    assert report.missing_fields == ["context.trigger", "job.main"]
+    assert report.confidence < LOCAL_CONFIDENCE_CAP
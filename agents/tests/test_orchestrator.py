@@ -0,0 +1,184 @@
+"""
+オーケストレーター（ProblemDiscoveryOrchestrator）のテスト
+"""
+
+import asyncio
+import copy
+import time
+from concurrent.futures import wait
+
+import pytest
+
+from agents.agent1 import ProblemDiscoveryOrchestrator
+from agents.benchmarks.fake_llm import SAMPLE_OUTPUT
+from agents.utils.schemas import FollowupAnswer, FollowupQuestion, QualityReport, SessionState
+from agents.utils.speculation import SpeculationPolicy, state_key
+
+QUESTIONS = [
+    FollowupQuestion(question="困りごとの重大度は？", type="scale", target="pains[0].severity"),
+    FollowupQuestion(
+        question="きっかけは？", type="closed", target="context.trigger",
+        options=["始業前にメールが届いたとき", "会議の前"],
+    ),
+    FollowupQuestion(question="頻度は？", type="scale", target="pains[0].frequency"),
+]
+
+
+def _state(quality_report: QualityReport, questions: list[FollowupQuestion] = QUESTIONS) -> SessionState:
+    sheet = copy.deepcopy(SAMPLE_OUTPUT["problemDiscoverySheet"])
+    return SessionState(
+        iteration=1,
+        user_free_text="通勤電車でメールが読めない",
+        problem_statement=SAMPLE_OUTPUT["problemStatement"],
+        sheet=sheet,
+        followup_questions=questions,
+        quality_report=quality_report,
+    )
+
+
+FLAGGED = QualityReport(
+    confidence=0.6,
+    missing_fields=["context.trigger"],
+    contradictions=["頻度と影響の記述が食い違っている"],
+    next_action="ask_more",
+)
+
+
+@pytest.fixture
+def orchestrator(make_agent) -> ProblemDiscoveryOrchestrator:
+    return ProblemDiscoveryOrchestrator(agent=make_agent())
+
+
+def test_partial_answer_asks_remaining_questions(orchestrator):
+    state = _state(FLAGGED)
+    local = orchestrator._apply_locally(state, [FollowupAnswer(question_index=0, answer="5")])
+    assert local is not None
+    new_state, output = local
+    
+    report = output.quality_report
+    assert report.next_action == "ask_more"
+    assert report.missing_fields == ["context.trigger"]
+    assert report.contradictions == FLAGGED.contradictions
+    assert report.confidence <= FLAGGED.confidence
+    assert [q.target for q in output.followup_questions] == ["context.trigger", "pains[0].frequency"]
+    assert new_state.next_phase == "problem_discovery"
+    assert new_state.sheet["pains"][0]["severity"] == 5
+
+
+def test_full_answer_with_open_contradiction_re_extracts(orchestrator):
+    answers = [
+        FollowupAnswer(question_index=0, answer="5"),
+        FollowupAnswer(question_index=1, answer="1"),
+        FollowupAnswer(question_index=2, answer="4"),
+    ]
+    assert orchestrator._apply_locally(_state(FLAGGED), answers) is None
+    
+    # 矛盾がなく不足も埋まればローカルで進める
+    clean = FLAGGED.model_copy(update={"contradictions": []})
+    new_state, output = orchestrator._apply_locally(_state(clean), answers)
+    assert output.quality_report.next_action == "proceed"
+    assert output.quality_report.missing_fields == []
+    assert new_state.next_phase == "question_design_phase"
+    assert new_state.sheet["context"]["trigger"] == "始業前にメールが届いたとき"
+
+
+def test_step_with_partial_answer_does_not_proceed(orchestrator):
+    state = _state(FLAGGED)
+    new_state, output, next_phase = orchestrator.step(state, [FollowupAnswer(question_index=0, answer="5")])
+    assert next_phase == "problem_discovery"
+    assert new_state.iteration == 2
+    assert len(output.followup_questions) == 2
+
+
+# ---------- 投機実行 ----------
+
+# target のない closed 質問はローカル適用できないため、回答候補ごとに先行実行する
+SPECULATED = [
+    FollowupQuestion(question="いつ困りますか？", type="closed", options=["朝", "夜"]),
+    FollowupQuestion(question="頻度は？", type="scale", target="pains[0].frequency"),
+]
+
+
+def _speculating(make_agent, latency: float = 0.0, **policy) -> ProblemDiscoveryOrchestrator:
+    agent = make_agent(latency=latency)
+    return ProblemDiscoveryOrchestrator(agent=agent, speculation=SpeculationPolicy(**policy))
+
+
+def _prefetched(orchestrator: ProblemDiscoveryOrchestrator, state: SessionState) -> list:
+    assert orchestrator.prefetch(state) == 2
+    runs = orchestrator.speculator._sessions[state_key(state)]
+    return [future for _, future in runs.values()]
+
+
+def test_speculated_answer_is_served(make_agent):
+    orchestrator = _speculating(make_agent)
+    state = _state(FLAGGED, SPECULATED)
+    futures = _prefetched(orchestrator, state)
+    wait(futures, timeout=5)
+    
+    new_state, output, _ = orchestrator.step(state, [FollowupAnswer(question_index=0, answer="夜")])
+    assert orchestrator.speculator.stats()["served"] == 1
+    # 候補は選択肢の並び順に開始される
+    assert output is futures[1].result()
+    assert new_state.iteration == 2
+    assert output.problem_statement
+    orchestrator.speculator.close()
+
+
+def test_local_answer_discards_speculation(make_agent):
+    orchestrator = _speculating(make_agent, latency=0.2)
+    state = _state(FLAGGED.model_copy(update={"contradictions": []}), SPECULATED)
+    _prefetched(orchestrator, state)
+    
+    new_state, output, _ = orchestrator.step(state, [FollowupAnswer(question_index=1, answer="3")])
+    # scale 質問だけの回答はローカルで適用し、残りの質問を聞き直す
+    assert [q.type for q in output.followup_questions] == ["closed"]
+    assert orchestrator.speculator.stats()["served"] == 0
+    assert orchestrator.speculator.pending(state_key(state)) == 0
+    orchestrator.speculator.close()
+
+
+@pytest.mark.parametrize("use_async", [False, True])
+def test_turn_budget_covers_speculation_and_fallback(make_agent, use_async):
+    orchestrator = _speculating(make_agent, latency=1.0)
+    state = _state(FLAGGED, SPECULATED)
+    _prefetched(orchestrator, state)
+    answer = [FollowupAnswer(question_index=0, answer="朝")]
+    
+    t0 = time.perf_counter()
+    if use_async:
+        _, output, _ = asyncio.run(orchestrator.astep(state, answer, latency_budget=0.3))
+    else:
+        _, output, _ = orchestrator.step(state, answer, latency_budget=0.3)
+    # 先行実行の待ちと通常の実行で、予算を合わせて 0.3 秒しか使わない
+    assert time.perf_counter() - t0 < 0.55
+    assert "timeout" in output.quality_report.missing_fields
+    assert orchestrator.speculator.stats()["late"] == 1
+    orchestrator.speculator.close()
+
+
+def test_speculation_is_bounded_by_run_timeout(make_agent):
+    orchestrator = _speculating(make_agent, latency=5.0, run_timeout=0.1)
+    futures = _prefetched(orchestrator, _state(FLAGGED, SPECULATED))
+    done, _ = wait(futures, timeout=2)
+    assert len(done) == 2
+    assert all(isinstance(future.exception(), RuntimeError) for future in futures)
+    orchestrator.speculator.close()
+
+
+@pytest.mark.parametrize("use_async", [False, True])
+def test_failed_speculation_is_counted(make_agent, use_async):
+    orchestrator = _speculating(make_agent, latency=5.0, run_timeout=0.1)
+    state = _state(FLAGGED, SPECULATED)
+    wait(_prefetched(orchestrator, state), timeout=2)
+    answer = [FollowupAnswer(question_index=0, answer="夜")]
+    
+    if use_async:
+        _, output, _ = asyncio.run(orchestrator.astep(state, answer, latency_budget=0.2))
+    else:
+        _, output, _ = orchestrator.step(state, answer, latency_budget=0.2)
+    # 失敗した先行実行は使わず、通常の実行に切り替える
+    assert "timeout" in output.quality_report.missing_fields
+    stats = orchestrator.speculator.stats()
+    assert (stats["served"], stats["failed"], stats["late"]) == (1, 1, 0)
+    orchestrator.speculator.close()
@@ -0,0 +1,102 @@
+"""
+LCEL ラッパー（ProblemDiscoveryRunnable）のテスト
+"""
+
+import asyncio
+import contextlib
+import threading
+
+import pytest
+from pydantic import PrivateAttr
+
+from agents.agent1 import ProblemDiscoveryRunnable
+from agents.benchmarks.fake_llm import FakeLatencyChatModel, default_responder
+from agents.tests.conftest import SAMPLE_TEXT
+from agents.utils.request_context import LANE_BATCH, current_request_context
+from agents.utils.schemas import ProblemDiscoveryInput
+
+TEXTS = [f"{SAMPLE_TEXT}（{i}件目）" for i in range(5)]
+
+
+class _PeakModel(FakeLatencyChatModel):
+    """同時に処理中の呼び出し数の最大値と、呼び出し時のレーンを記録するフェイクLLM"""
+    peak: int = 0
+    lanes: list[str] = []
+    _in_flight: int = PrivateAttr(default=0)
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+    
+    @contextlib.contextmanager
+    def _track(self):
+        with self._lock:
+            self.lanes.append(current_request_context().lane)
+            self._in_flight += 1
+            self.peak = max(self.peak, self._in_flight)
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+    
+    def _generate(self, *args, **kwargs):
+        with self._track():
+            return super()._generate(*args, **kwargs)
+    
+    async def _agenerate(self, *args, **kwargs):
+        with self._track():
+            return await super()._agenerate(*args, **kwargs)
+
+
+@pytest.fixture
+def agent(make_agent):
+    return make_agent(enable_critic=False)
+
+
+@pytest.fixture
+def runnable(agent) -> ProblemDiscoveryRunnable:
+    return ProblemDiscoveryRunnable(agent)
+
+
+def _expected(agent, texts: list[str]) -> list:
+    return [agent.run(ProblemDiscoveryInput(user_free_text=text)) for text in texts]
+
+
+def test_invoke_matches_run(agent, runnable):
+    expected = _expected(agent, TEXTS[:1])[0]
+    assert runnable.invoke(TEXTS[0]) == expected
+    assert runnable.invoke({"input": TEXTS[0]}) == expected
+    assert asyncio.run(runnable.ainvoke(ProblemDiscoveryInput(user_free_text=TEXTS[0]))) == expected
+
+
+def test_batch_matches_run(agent, runnable):
+    expected = _expected(agent, TEXTS)
+    assert runnable.batch(TEXTS) == expected
+    assert asyncio.run(runnable.abatch(TEXTS)) == expected
+
+
+def test_astream_ends_with_run_output(agent, runnable):
+    async def collect():
+        return [chunk async for chunk in runnable.astream(TEXTS[0])]
+    
+    chunks = asyncio.run(collect())
+    # 途中は部分出力（キャメルケースの dict）、最後に run と同じ出力を返す
+    assert chunks[-1] == _expected(agent, TEXTS[:1])[0]
+    assert len(chunks) > 1
+    assert all(isinstance(chunk, dict) for chunk in chunks[:-1])
+
+
+@pytest.mark.parametrize("use_async", [False, True])
+def test_batch_runs_in_batch_lane_within_max_concurrency(make_agent, use_async):
+    llm = _PeakModel(responder=default_responder, latency=0.05)
+    runnable = ProblemDiscoveryRunnable(make_agent(llm=llm, enable_critic=False))
+    config = {"max_concurrency": 2}
+    if use_async:
+        outputs = asyncio.run(runnable.abatch(TEXTS, config))
+    else:
+        outputs = runnable.batch(TEXTS, config)
+    
+    assert len(outputs) == len(TEXTS)
+    assert llm.lanes == [LANE_BATCH] * len(TEXTS)
+    assert llm.peak == 2
+    # 単発の呼び出しは既定のレーンのまま
+    runnable.invoke(TEXTS[0])
+    assert llm.lanes[-1] != LANE_BATCH
@@ -0,0 +1,149 @@
+"""
+公平スケジューラ（agents.utils.scheduler）のテスト
+"""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from agents.utils.latency import Deadline, DeadlineExceededError
+from agents.utils.request_context import LANE_BATCH, RequestContext
+from agents.utils.scheduler import PRUNE_MIN_FLOWS, FairScheduler
+
+
+def test_slot_times_out_and_leaves_queue():
+    scheduler = FairScheduler(max_concurrency=1)
+    with scheduler.slot():
+        t0 = time.perf_counter()
+        with pytest.raises(DeadlineExceededError):
+            with scheduler.slot(RequestContext(tenant_id="a"), deadline=Deadline.after(0.05)):
+                pass
+        assert time.perf_counter() - t0 < 1.0
+        assert scheduler.queue_depths() == {"interactive": {}, "batch": {}}
+    # 枠は正しく返却されている
+    assert scheduler.metrics()["_total"]["inFlight"] == 0
+    with scheduler.slot(deadline=0.05):
+        pass
+
+
+def test_aslot_times_out_and_leaves_queue():
+    scheduler = FairScheduler(max_concurrency=1)
+    
+    async def main():
+        async with scheduler.aslot():
+            with pytest.raises(DeadlineExceededError):
+                async with scheduler.aslot(RequestContext(tenant_id="a"), deadline=0.05):
+                    pass
+            assert scheduler.metrics()["interactive"]["queueDepth"] == 0
+        async with scheduler.aslot(deadline=0.05):
+            pass
+    
+    asyncio.run(main())
+    assert scheduler.metrics()["_total"]["inFlight"] == 0
+
+
+def test_waiter_granted_before_deadline_runs():
+    scheduler = FairScheduler(max_concurrency=1)
+    ran = threading.Event()
+    gate = threading.Event()
+    
+    def holder():
+        with scheduler.slot():
+            gate.wait()
+    
+    thread = threading.Thread(target=holder)
+    thread.start()
+    while scheduler.metrics()["_total"]["inFlight"] == 0:
+        time.sleep(0.001)
+    threading.Timer(0.02, gate.set).start()
+    with scheduler.slot(deadline=1.0):
+        ran.set()
+    thread.join()
+    assert ran.is_set()
+    assert scheduler.metrics()["_total"]["inFlight"] == 0
+
+
+def test_interactive_lane_before_batch():
+    scheduler = FairScheduler(max_concurrency=1)
+    order: list[str] = []
+    gate = threading.Event()
+    
+    def call(lane: str, tenant: str):
+        with scheduler.slot(RequestContext(tenant_id=tenant, lane=lane)):
+            order.append(lane)
+    
+    with scheduler.slot():
+        threads = [threading.Thread(target=call, args=(LANE_BATCH, "bulk"))]
+        threads[0].start()
+        while scheduler.metrics()["batch"]["queueDepth"] < 1:
+            time.sleep(0.001)
+        threads.append(threading.Thread(target=call, args=("interactive", "user")))
+        threads[1].start()
+        while scheduler.metrics()["interactive"]["queueDepth"] < 1:
+            time.sleep(0.001)
+        gate.set()
+    for thread in threads:
+        thread.join()
+    assert order == ["interactive", "batch"]
+
+
+def _drain_in_grant_order(scheduler: FairScheduler, flows: list[str]) -> list[str]:
+    """
+    唯一の枠を保持したまま flows の順に待機を積み、枠を返したあとの割り当て順を返す
+    """
+    order: list[str] = []
+    
+    def call(flow: str):
+        with scheduler.slot(RequestContext(tenant_id=flow)):
+            order.append(flow)
+    
+    threads = []
+    with scheduler.slot(RequestContext(tenant_id="holder")):
+        for i, flow in enumerate(flows):
+            thread = threading.Thread(target=call, args=(flow,))
+            thread.start()
+            threads.append(thread)
+            # 積んだ順にキューへ入るよう、1件ずつ待ちが増えるのを確認する
+            while scheduler.metrics()["interactive"]["queueDepth"] < i + 1:
+                time.sleep(0.001)
+    for thread in threads:
+        thread.join()
+    return order
+
+
+def test_weighted_flows_share_slots_by_weight():
+    scheduler = FairScheduler(max_concurrency=1, weights={"a": 2.0, "b": 1.0})
+    order = _drain_in_grant_order(scheduler, ["a"] * 6 + ["b"] * 6)
+    
+    # 両方のフローに待ちがある間は a:b = 2:1 で割り当てる
+    assert order[:9].count("a") == 6
+    assert order[:9].count("b") == 3
+    for end in range(3, 10, 3):
+        assert order[:end].count("a") == 2 * end // 3
+    assert order[9:] == ["b"] * 3
+
+
+def test_new_flow_is_not_starved_by_backlog():
+    scheduler = FairScheduler(max_concurrency=1)
+    order = _drain_in_grant_order(scheduler, ["old"] * 10 + ["new"])
+    # 後から来たフローも、古いフローの待ちを使い切るのを待たずに割り当てられる
+    assert order.index("new") <= 1
+    assert order.count("old") == 10
+
+
+def test_idle_flows_are_pruned():
+    scheduler = FairScheduler(max_concurrency=1)
+    for i in range(PRUNE_MIN_FLOWS * 4):
+        with scheduler.slot(RequestContext(tenant_id=f"t{i}")):
+            pass
+    lane = scheduler._lanes["interactive"]
+    assert not lane.flows
+    assert len(lane.finish_tags) <= 2 * PRUNE_MIN_FLOWS
+
+
+def test_flow_key_separates_projects_from_tenants():
+    assert RequestContext(tenant_id="acme", project_id="p1").flow_key == "acme"
+    assert RequestContext(project_id="acme").flow_key == "project:acme"
+    assert RequestContext().flow_key == "default"
@@ -0,0 +1,85 @@
+"""
+課題シートの検索インデックス（agents.search）のテスト
+"""
+
+import copy
+
+import pytest
+
+from agents import search
+from agents.benchmarks.fake_llm import SAMPLE_OUTPUT
+from agents.search import SheetIndex
+
+
+def _record(statement: str, job: str) -> dict:
+    record = copy.deepcopy(SAMPLE_OUTPUT)
+    record["problemStatement"] = statement
+    record["problemDiscoverySheet"]["job"]["main"] = job
+    return record
+
+
+def _live_length(index: SheetIndex) -> float:
+    return sum(index._length[row] for row in range(index.n_docs) if row not in index._deleted)
+
+
+def _ranking(index: SheetIndex, query: str) -> list[tuple[str, float]]:
+    return [(hit["sessionId"], round(hit["score"], 4)) for hit in index.search(query, k=20)]
+
+
+def test_replacement_updates_total_length():
+    index = SheetIndex()
+    index.add(_record("満員電車でメールが読めない", "メールを確認する"), session_id="p1")
+    index.add(_record("会議室の予約が取れない", "会議室を予約する"), session_id="p2")
+    index.add(_record("会議室の予約が取れない。毎週の定例で困っている", "会議室を確保する"), session_id="p2")
+    
+    assert len(index) == 2
+    assert index._total_length == pytest.approx(_live_length(index))
+    hits = index.search("会議室", k=5)
+    assert [hit["sessionId"] for hit in hits] == ["p2"]
+    assert hits[0]["row"] == 2
+
+
+def test_compact_preserves_ranking_and_drops_postings():
+    index = SheetIndex()
+    for i in range(6):
+        index.add(_record(f"満員電車でメールが読めない（{i}）", "メールを確認する"), session_id=f"p{i % 3}")
+    before = _ranking(index, "満員電車 メール")
+    postings = index.stats()["postings"]
+    
+    assert index.compact() == 3
+    assert index.n_docs == len(index) == 3
+    assert index.stats()["postings"] < postings
+    assert index._total_length == pytest.approx(_live_length(index))
+    assert _ranking(index, "満員電車 メール") == before
+    assert sorted(hit["row"] for hit in index.search("満員電車", k=5)) == [0, 1, 2]
+    assert index.compact() == 0
+
+
+def test_add_compacts_automatically(monkeypatch):
+    monkeypatch.setattr(search, "COMPACT_MIN_DELETED", 4)
+    index = SheetIndex()
+    for i in range(20):
+        row = index.add(_record(f"通勤が辛い{i}", "通勤する"), session_id="same")
+        assert index._session_ids[row] == "same"
+    assert len(index._deleted) < 4
+    assert len(index) == 1
+    # 置き換えられた行のポスティングは詰められている
+    single = SheetIndex()
+    single.add(_record("通勤が辛い0", "通勤する"))
+    assert index.stats()["postings"] <= (len(index._deleted) + 1) * (single.stats()["postings"] + 2)
+
+
+def test_save_load_after_compaction(tmp_path):
+    index = SheetIndex()
+    index.add(_record("満員電車でメールが読めない", "メールを確認する"), project_meta={"industry": "通信"}, session_id="p1")
+    index.save(tmp_path / "index")
+    index.add(_record("会議室の予約が取れない", "会議室を予約する"), session_id="p2")
+    index.add(_record("満員電車で立ちっぱなし", "座って通勤する"), project_meta={"industry": "通信"}, session_id="p1")
+    index.compact()
+    index.save(tmp_path / "index")
+    
+    loaded = SheetIndex.load(tmp_path / "index")
+    assert len(loaded) == 2
+    assert loaded._total_length == pytest.approx(index._total_length)
+    assert _ranking(loaded, "満員電車") == _ranking(index, "満員電車")
+    assert [hit["sessionId"] for hit in loaded.search("満員電車", industry="通信")] == ["p1"]
@@ -0,0 +1,149 @@
+"""
+HTTPサービス（agents.service）のテスト
+"""
+
+import asyncio
+import time
+
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+from agents import service
+from agents.service import AdmissionController, create_app
+from agents.tests.conftest import SAMPLE_TEXT
+
+SESSIONS = "/api/v1/phases/problem_discovery/sessions"
+STREAM = "/api/v1/phases/problem_discovery/stream"
+
+
+def _events(lines) -> list[str]:
+    return [line.removeprefix("event: ") for line in lines if line.startswith("event: ")]
+
+
+class _DisconnectingRequest:
+    """is_disconnected() が指定回数目から True を返すリクエストの代用"""
+    
+    def __init__(self, after: int = 1):
+        self.headers: dict[str, str] = {}
+        self._after = after
+        self.polls = 0
+    
+    async def is_disconnected(self) -> bool:
+        self.polls += 1
+        return self.polls >= self._after
+
+
+# ==================== 流入制御 ====================
+
+def test_rejects_with_503_when_saturated(make_agent):
+    app = create_app(agent_factory=make_agent, max_active=1, max_waiting=0)
+    client = TestClient(app)
+    ticket = app.state.admission.try_admit()
+    assert ticket is not None
+    
+    response = client.post(SESSIONS, json={"user_free_text": SAMPLE_TEXT})
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "5"
+    assert app.state.admission.stats()["rejected"] == 1
+    
+    # 枠が空けば受け付ける
+    ticket.release()
+    assert client.post(SESSIONS, json={"user_free_text": SAMPLE_TEXT}).status_code == 200
+
+
+def test_admission_ticket_release_is_idempotent():
+    controller = AdmissionController(max_active=1, max_waiting=0)
+    ticket = controller.try_admit()
+    assert controller.try_admit() is None
+    ticket.release()
+    ticket.release()
+    assert controller.admitted == 0
+    assert controller.try_admit() is not None
+
+
+# ==================== SSE ====================
+
+def test_stream_event_order(make_agent):
+    client = TestClient(create_app(agent_factory=make_agent))
+    with client.stream("POST", STREAM, json={"user_free_text": SAMPLE_TEXT}) as response:
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+        events = _events(response.iter_lines())
+    
+    assert events[0] == "queued"
+    assert events[-1] == "result"
+    assert events.count("result") == 1
+    assert "error" not in events
+    assert "progress" in events and "partial" in events
+    # 部分フィールドは抽出の進捗の後に届く
+    assert events.index("progress") < events.index("partial")
+
+
+def test_stream_releases_admission_after_completion(make_agent):
+    app = create_app(agent_factory=make_agent, max_active=1, max_waiting=0)
+    client = TestClient(app)
+    for _ in range(2):
+        with client.stream("POST", STREAM, json={"user_free_text": SAMPLE_TEXT}) as response:
+            assert _events(response.iter_lines())[-1] == "result"
+    assert app.state.admission.stats()["rejected"] == 0
+
+
+# ==================== 切断 ====================
+
+def test_disconnect_cancels_llm_call(make_agent, monkeypatch):
+    monkeypatch.setattr(service, "DISCONNECT_POLL_INTERVAL", 0.01)
+    agent = make_agent(latency=5.0)
+    controller = AdmissionController()
+    request = _DisconnectingRequest(after=2)
+    cancelled = asyncio.Event()
+    
+    async def run():
+        try:
+            return await agent.arun(service.ProblemDiscoveryInput(user_free_text=SAMPLE_TEXT))
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+    
+    async def main():
+        t0 = time.perf_counter()
+        with pytest.raises(HTTPException) as exc_info:
+            await service._run_until_disconnect(request, run(), controller)
+        await asyncio.wait_for(cancelled.wait(), timeout=1.0)
+        return exc_info.value, time.perf_counter() - t0
+    
+    error, elapsed = asyncio.run(main())
+    assert error.status_code == 499
+    assert controller.cancelled == 1
+    assert elapsed < 1.0
+
+
+# ==================== セッション ====================
+
+def test_session_step_round_trip(make_agent):
+    client = TestClient(create_app(agent_factory=make_agent))
+    started = client.post(SESSIONS, json={"user_free_text": SAMPLE_TEXT})
+    assert started.status_code == 200
+    body = started.json()
+    assert body["state"]["iteration"] == 1
+    assert body["output"]["problemStatement"]
+    assert body["response"]["status"] in ("proceed", "ask_more")
+    
+    # クライアントが保持した状態をそのまま返して続きを実行する
+    state = dict(body["state"], next_phase="problem_discovery")
+    stepped = client.post(f"{SESSIONS}/step", json={"state": state, "answer": "片道40分ほど乗っています"})
+    assert stepped.status_code == 200
+    result = stepped.json()
+    assert result["state"]["iteration"] == 2
+    assert result["state"]["user_free_text"] == "片道40分ほど乗っています"
+    history = result["state"]["history"]
+    assert [m["role"] for m in history] == ["user", "assistant", "user"]
+    assert history[0]["content"] == SAMPLE_TEXT
+    assert history[-1]["content"] == "片道40分ほど乗っています"
+    assert result["nextPhase"] == result["state"]["next_phase"]
+
+
+def test_step_rejects_invalid_state(make_agent):
+    client = TestClient(create_app(agent_factory=make_agent))
+    response = client.post(f"{SESSIONS}/step", json={"state": {"iteration": "x"}, "answer": "はい"})
+    assert response.status_code == 422
@@ -0,0 +1,134 @@
+"""
+2段階抽出（extraction_mode="split"）とプロンプトの組み立てのテスト
+"""
+
+import asyncio
+import copy
+import json
+import time
+
+import pytest
+
+from agents.benchmarks.fake_llm import SAMPLE_OUTPUT, FakeLatencyChatModel
+from agents.prompts import EXTRACTION_PROMPT, SYSTEM_PROMPT, WHY_DEEPDIVE_PROMPT
+from agents.tests.conftest import SAMPLE_TEXT
+from agents.utils.schemas import ProblemDiscoveryInput
+
+# severity × frequency: 4, 20, 9, 20（同点は抽出順）
+PAINS = [
+    {"pain": "A: 座れない", "severity": 2, "frequency": 2},
+    {"pain": "B: メールが読めない", "severity": 5, "frequency": 4},
+    {"pain": "C: 電車が遅れる", "severity": 3, "frequency": 3},
+    {"pain": "D: 立ちっぱなしで疲れる", "severity": 4, "frequency": 5},
+]
+
+
+def _stage1() -> dict:
+    output = copy.deepcopy(SAMPLE_OUTPUT)
+    output["problemDiscoverySheet"]["pains"] = copy.deepcopy(PAINS)
+    output["problemDiscoverySheet"]["unmetNeeds"] = []
+    return output
+
+
+class _SlowWhyModel(FakeLatencyChatModel):
+    """応答に slow_marker を含む呼び出しだけ slow_latency 秒かかるフェイクLLM"""
+    slow_marker: str = ""
+    slow_latency: float = 0.0
+    
+    def _sample_latency(self, text: str) -> float:
+        return self.slow_latency if self.slow_marker and self.slow_marker in text else 0.0
+
+
+class _SplitResponder:
+    """1段目は PAINS を返し、Why深掘りは pain ごとに応答する（broken の pain は解析できない応答）"""
+    
+    def __init__(self, broken: str = ""):
+        self.broken = broken
+        self.why_calls: list[str] = []
+    
+    def __call__(self, messages) -> str:
+        system, user = str(messages[0].content), str(messages[-1].content)
+        if system == EXTRACTION_PROMPT:
+            return json.dumps(_stage1(), ensure_ascii=False)
+        assert system == WHY_DEEPDIVE_PROMPT
+        pain = next(p["pain"] for p in PAINS if p["pain"] in user)
+        label = pain[0]
+        self.why_calls.append(label)
+        if label == self.broken:
+            return "Why: わかりません"
+        return json.dumps({"need": f"{label}のニーズ", "whyDepth": [f"{label}-1", f"{label}-2", f"{label}-3"]}, ensure_ascii=False)
+
+
+def _agent(make_agent, responder, top_k: int = 2, llm=None, **kwargs):
+    return make_agent(
+        llm=llm or FakeLatencyChatModel(responder=responder),
+        extraction_mode="split",
+        why_top_k=top_k,
+        enable_critic=False,
+        **kwargs,
+    )
+
+
+def _needs(output) -> list[str]:
+    return [need.need for need in output.problem_discovery_sheet.unmet_needs]
+
+
+def test_prompts_share_sections_except_why_step():
+    assert "Why深掘り" in SYSTEM_PROMPT and "### Step 4. problemStatement生成" in SYSTEM_PROMPT
+    assert "### Step 2. Why深掘り" not in EXTRACTION_PROMPT
+    assert "### Step 3. problemStatement生成" in EXTRACTION_PROMPT
+    assert "unmetNeeds は空配列 [] としてください" in EXTRACTION_PROMPT
+    # 役割・原則・出力形式は同じ文面
+    assert SYSTEM_PROMPT.split("## 処理手順")[0] == EXTRACTION_PROMPT.split("## 処理手順")[0]
+    assert SYSTEM_PROMPT.endswith(EXTRACTION_PROMPT.split("## 注意")[1].split("\n\n", 1)[1])
+
+
+def test_why_targets_rank_by_severity_times_frequency(make_agent):
+    agent = _agent(make_agent, _SplitResponder(), top_k=3)
+    targets = agent._why_targets(_stage1())
+    assert [p["pain"][0] for p in targets] == ["B", "D", "C"]
+    
+    broken = _stage1()
+    broken["problemDiscoverySheet"]["pains"][0]["severity"] = "高い"
+    assert agent._pain_score(broken["problemDiscoverySheet"]["pains"][0]) == 2
+    assert make_agent()._why_targets(_stage1()) == []
+
+
+@pytest.mark.parametrize("use_async", [False, True])
+def test_whys_are_merged_in_rank_order(make_agent, use_async):
+    responder = _SplitResponder()
+    agent = _agent(make_agent, responder)
+    input_data = ProblemDiscoveryInput(user_free_text=SAMPLE_TEXT)
+    output = asyncio.run(agent.arun(input_data)) if use_async else agent.run(input_data)
+    
+    assert sorted(responder.why_calls) == ["B", "D"]
+    assert _needs(output) == ["Bのニーズ", "Dのニーズ"]
+    assert output.problem_discovery_sheet.unmet_needs[0].why_depth == ["B-1", "B-2", "B-3"]
+    assert [p.pain[0] for p in output.problem_discovery_sheet.pains] == ["A", "B", "C", "D"]
+
+
+def test_failed_why_is_dropped(make_agent):
+    agent = _agent(make_agent, _SplitResponder(broken="B"), top_k=3)
+    output = agent.run(ProblemDiscoveryInput(user_free_text=SAMPLE_TEXT))
+    assert _needs(output) == ["Dのニーズ", "Cのニーズ"]
+
+
+@pytest.mark.parametrize("use_async", [False, True])
+def test_timed_out_why_is_dropped(make_agent, use_async):
+    llm = _SlowWhyModel(responder=_SplitResponder(), slow_marker="Dのニーズ", slow_latency=2.0)
+    agent = _agent(make_agent, None, llm=llm)
+    input_data = ProblemDiscoveryInput(user_free_text=SAMPLE_TEXT)
+    t0 = time.perf_counter()
+    if use_async:
+        output = asyncio.run(agent.arun(input_data, deadline=0.3))
+    else:
+        output = agent.run(input_data, deadline=0.3)
+    assert time.perf_counter() - t0 < 1.0
+    assert _needs(output) == ["Bのニーズ"]
+
+
+def test_all_whys_failing_keeps_stage1_output(make_agent):
+    agent = _agent(make_agent, _SplitResponder(broken="B"), top_k=1)
+    output = agent.run(ProblemDiscoveryInput(user_free_text=SAMPLE_TEXT))
+    assert _needs(output) == []
+    assert output.problem_statement == SAMPLE_OUTPUT["problemStatement"]
@@ -0,0 +1,87 @@
+"""
+モデル・設定スイープ（agents.benchmarks.sweep）の集計のテスト
+"""
+
+import pytest
+
+from agents.benchmarks.sweep import DEFAULT_CORPUS, build_grid, pick_best, run_sweep, summarize
+
+
+def _session(turns, proceeded: bool, iterations: int, elapsed: float, tokens, error=None) -> dict:
+    return {
+        "turns": [{"latency": t, "nextAction": a, "parseError": p} for t, a, p in turns],
+        "proceeded": proceeded,
+        "iterations": iterations,
+        "elapsed": elapsed,
+        "tokens": {"input": tokens[0], "output": tokens[1]},
+        "error": error,
+    }
+
+
+SESSIONS = [
+    _session([(0.1, "ask_more", False), (0.3, "proceed", False)], True, 2, 0.5, (100, 20)),
+    _session([(0.2, "ask_more", True)], False, 1, 0.4, (50, 10), error="TimeoutError: 応答なし"),
+]
+
+
+def test_summarize():
+    summary = summarize(SESSIONS)
+    assert summary == {
+        "sessions": 2,
+        "turns": 3,
+        "turnP50": 0.2,
+        "turnP95": 0.3,
+        "sessionMean": pytest.approx(0.45),
+        "inputTokens": 75.0,
+        "outputTokens": 15.0,
+        "parseFailRate": pytest.approx(1 / 3),
+        "errorRate": 0.5,
+        "proceedRatio": pytest.approx(1 / 3),
+        "sessionProceedRate": 0.5,
+        "avgIterationsToProceed": 2.0,
+    }
+
+
+def test_summarize_without_sessions():
+    summary = summarize([])
+    assert (summary["sessions"], summary["turns"], summary["errorRate"]) == (0, 0, 0.0)
+    assert summary["avgIterationsToProceed"] is None
+
+
+def _row(label: str, p95: float, proceed: float = 1.0, parse_fail: float = 0.0, error: float = 0.0) -> dict:
+    return {
+        "label": label,
+        "turnP95": p95,
+        "sessionProceedRate": proceed,
+        "parseFailRate": parse_fail,
+        "errorRate": error,
+    }
+
+
+def test_pick_best_prefers_fastest_eligible():
+    rows = [
+        _row("slow", 2.0),
+        _row("fast-but-low-proceed", 0.5, proceed=0.5),
+        _row("fast-but-parse-fail", 0.6, parse_fail=0.1),
+        _row("fast-with-errors", 0.7, error=0.2),
+        _row("ok", 1.0),
+    ]
+    assert pick_best(rows, min_proceed=0.8, max_parse_fail=0.05)["label"] == "ok"
+    # 境界値は条件を満たす
+    assert pick_best([_row("edge", 1.0, proceed=0.8, parse_fail=0.05)], 0.8, 0.05)["label"] == "edge"
+    assert pick_best(rows[1:4], min_proceed=0.8, max_parse_fail=0.05) is None
+
+
+def test_build_grid():
+    grid = build_grid(["flash-lite", "flash"], [0.1, 0.3], [True, False])
+    assert len(grid) == 8
+    assert grid[0].label == "flash-lite t=0.1 critic=on"
+    assert grid[-1].label == "flash t=0.3 critic=off"
+
+
+def test_run_sweep_on_fake_backend():
+    grid = build_grid(["flash-lite"], [0.3], [False])
+    [result] = run_sweep(grid, DEFAULT_CORPUS[:2], fake_latency=0.0)
+    assert result["label"] == grid[0].label
+    assert (result["sessions"], result["errorRate"], result["parseFailRate"]) == (2, 0.0, 0.0)
+    assert result["turns"] >= 2
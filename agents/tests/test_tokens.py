@@ -0,0 +1,106 @@
+"""
+トークン予算（agents.utils.tokens と エージェントの事前見積もり）のテスト
+"""
+
+import asyncio
+
+import pytest
+
+from agents.tests.conftest import SAMPLE_TEXT
+from agents.utils.request_context import request_context
+from agents.utils.schemas import ProblemDiscoveryInput
+from agents.utils.tokens import TokenBudgetExceededError, TokenBudgetLedger, TokenBudgetPolicy
+
+LONG_INPUT = ProblemDiscoveryInput(user_free_text=SAMPLE_TEXT * 2000)
+
+
+def test_no_cap_without_budget(make_agent):
+    agent = make_agent()
+    degradations: list[str] = []
+    input_data, reservation = agent._plan_tokens(LONG_INPUT, degradations)
+    assert input_data is LONG_INPUT
+    assert reservation is None
+    assert degradations == []
+
+
+def test_explicit_cap_shrinks_input(make_agent):
+    agent = make_agent(token_policy=TokenBudgetPolicy(max_request_tokens=8000))
+    degradations: list[str] = []
+    input_data, reservation = agent._plan_tokens(LONG_INPUT, degradations)
+    assert len(input_data.user_free_text) < len(LONG_INPUT.user_free_text)
+    assert reservation is None
+    assert degradations
+
+
+def test_ledger_without_limit_reserves_estimate(make_agent):
+    ledger = TokenBudgetLedger()
+    agent = make_agent(token_ledger=ledger)
+    with request_context(tenant_id="acme"):
+        input_data, reservation = agent._plan_tokens(LONG_INPUT, [])
+    assert input_data is LONG_INPUT
+    assert reservation.tokens > 0
+    assert ledger.snapshot() == {"tenant:acme": reservation.tokens}
+
+
+def test_ledger_limit_rejects(make_agent):
+    agent = make_agent(token_ledger=TokenBudgetLedger(tenant_limit=100))
+    with request_context(tenant_id="acme"), pytest.raises(TokenBudgetExceededError) as exc_info:
+        agent.run(ProblemDiscoveryInput(user_free_text=SAMPLE_TEXT))
+    assert exc_info.value.scope == "tenant:acme"
+
+
+def _stream(agent, stop_after: str | None = None) -> list[str]:
+    async def main():
+        events = []
+        stream = agent.astream(ProblemDiscoveryInput(user_free_text=SAMPLE_TEXT))
+        try:
+            async for event, _ in stream:
+                events.append(event)
+                if event == stop_after:
+                    break
+        finally:
+            await stream.aclose()
+        return events
+    
+    with request_context(tenant_id="acme"):
+        return asyncio.run(main())
+
+
+def test_astream_settles_actual_usage(make_agent):
+    ledger = TokenBudgetLedger(tenant_limit=1_000_000)
+    agent = make_agent(token_ledger=ledger)
+    with request_context(tenant_id="acme"):
+        estimated = agent._estimate_run_tokens(ProblemDiscoveryInput(user_free_text=SAMPLE_TEXT))
+    assert _stream(agent)[-1] == "result"
+    used = ledger.used("tenant:acme")
+    assert 0 < used != estimated
+
+
+def test_astream_refunds_when_abandoned_before_llm(make_agent):
+    ledger = TokenBudgetLedger(tenant_limit=1_000_000)
+    agent = make_agent(token_ledger=ledger)
+    assert _stream(agent, stop_after="progress") == ["progress"]
+    assert ledger.used("tenant:acme") == 0
+
+
+def test_astream_keeps_estimate_when_abandoned_midway(make_agent):
+    ledger = TokenBudgetLedger(tenant_limit=1_000_000)
+    agent = make_agent(token_ledger=ledger)
+    with request_context(tenant_id="acme"):
+        estimated = agent._estimate_run_tokens(ProblemDiscoveryInput(user_free_text=SAMPLE_TEXT))
+    # 抽出のストリーム途中で切断: 使用量は届いていないが呼び出しは始まっているため見積もりのまま
+    assert _stream(agent, stop_after="partial")[-1] == "partial"
+    assert ledger.used("tenant:acme") == estimated
+
+
+def test_run_refunds_when_failing_before_llm(make_agent, monkeypatch):
+    ledger = TokenBudgetLedger(tenant_limit=1_000_000)
+    agent = make_agent(token_ledger=ledger)
+    
+    def fail(*args, **kwargs):
+        raise RuntimeError("boom")
+    
+    monkeypatch.setattr(agent, "_build_extraction_messages", fail)
+    with request_context(tenant_id="acme"), pytest.raises(RuntimeError):
+        agent.run(ProblemDiscoveryInput(user_free_text=SAMPLE_TEXT))
+    assert ledger.used("tenant:acme") == 0
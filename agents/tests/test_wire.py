@@ -0,0 +1,71 @@
+"""
+短縮ワイヤーフォーマット（agents.utils.wire）のテスト
+"""
+
+import pytest
+
+from agents.benchmarks.fake_llm import SAMPLE_OUTPUT
+from agents.tests.conftest import SAMPLE_TEXT
+from agents.utils.schemas import ProblemDiscoveryInput
+from agents.utils.wire import (
+    POSITIONAL_FIELDS,
+    SHORT_KEYS,
+    WIRE_COMPACT,
+    WIRE_COMPACT_POSITIONAL,
+    WIRE_JSON,
+    expand_compact,
+    to_compact,
+)
+
+
+@pytest.mark.parametrize("positional", [False, True])
+def test_round_trip_keeps_full_output(positional):
+    compact = to_compact(SAMPLE_OUTPUT, positional=positional)
+    assert set(compact) == set(SHORT_KEYS["output"].values())
+    assert set(compact["s"]) == set(SHORT_KEYS["problemDiscoverySheet"].values())
+    assert expand_compact(compact) == SAMPLE_OUTPUT
+
+
+def test_positional_rows_follow_field_order():
+    compact = to_compact(SAMPLE_OUTPUT, positional=True)
+    pain = SAMPLE_OUTPUT["problemDiscoverySheet"]["pains"][0]
+    assert compact["s"]["p"][0] == [pain[f] for f in POSITIONAL_FIELDS["pains"]]
+    # 位置配列にしない配列要素は短縮キーの辞書のまま
+    assert isinstance(compact["s"]["u"][0], dict)
+
+
+def test_unknown_keys_are_kept():
+    data = {"ps": "課題", "zz": 1, "s": {"j": {"m": "確認する", "xx": "?"}}, "qualityReport": {"cf": 0.5}}
+    assert expand_compact(data) == {
+        "problemStatement": "課題",
+        "zz": 1,
+        "problemDiscoverySheet": {"job": {"main": "確認する", "xx": "?"}},
+        # キャメルケースの親キーも同じ種別として展開する
+        "qualityReport": {"confidence": 0.5},
+    }
+
+
+def test_malformed_positional_rows():
+    rows = [["座れない", "疲れる"], ["遅延", "遅刻", 3, 2, "毎週", "余分"], "文字列の行"]
+    pains = expand_compact({"s": {"p": rows}})["problemDiscoverySheet"]["pains"]
+    # 足りない位置は欠けたまま、余分な位置は捨て、配列でない要素はそのまま残す
+    assert pains[0] == {"pain": "座れない", "impact": "疲れる"}
+    assert pains[1] == {"pain": "遅延", "impact": "遅刻", "severity": 3, "frequency": 2, "evidence": "毎週"}
+    assert pains[2] == "文字列の行"
+
+
+@pytest.mark.parametrize("wire_format", [WIRE_COMPACT, WIRE_COMPACT_POSITIONAL])
+def test_agent_output_matches_json_format(make_agent, wire_format):
+    input_data = ProblemDiscoveryInput(user_free_text=SAMPLE_TEXT)
+    expected = make_agent(wire_format=WIRE_JSON).run(input_data)
+    assert make_agent(wire_format=wire_format).run(input_data) == expected
+
+
+def test_agent_parses_short_positional_row(make_agent):
+    agent = make_agent(wire_format=WIRE_COMPACT_POSITIONAL)
+    raw = agent._decode_extraction('{"ps": "課題", "s": {"p": [["座れない"]]}}')
+    output = agent._parse_output(raw)
+    # 欠けた位置は既定値で補う
+    pain = output.problem_discovery_sheet.pains[0]
+    assert (pain.pain, pain.impact, pain.severity) == ("座れない", "", 1)
+    assert output.problem_statement == "課題"
@@ -5,12 +5,28 @@ Agents Utils Package
 エージェント用ユーティリティ
 """
 
+from agents.utils.latency import (
+    Deadline,
+    DeadlineExceededError,
+    HedgedInvoker,
+    LatencyBudgetPolicy,
+    LatencyTracker,
+)
+from agents.utils.quality import local_quality_check
+from agents.utils.request_context import (
+    LANE_BATCH,
+    LANE_INTERACTIVE,
+    RequestContext,
+    current_request_context,
+    request_context,
+)
 from agents.utils.schemas import (
     Context,
     ConversationMessage,
     CurrentSolution,
     Emotion,
     FirestoreOutput,
+    FollowupAnswer,
     FollowupQuestion,
     Job,
     Pain,
@@ -19,22 +35,53 @@ from agents.utils.schemas import (
     ProblemDiscoverySheet,
     ProjectMeta,
     QualityReport,
+    SessionState,
     UnmetNeed,
 )
+from agents.utils.scheduler import FairScheduler
+from agents.utils.speculation import SpeculationPolicy, Speculator
+from agents.utils.tokens import (
+    TokenBudgetExceededError,
+    TokenBudgetLedger,
+    TokenBudgetPolicy,
+    TokenEstimator,
+    estimate_tokens,
+)
 
 __all__ = [
+    "LANE_BATCH",
+    "LANE_INTERACTIVE",
     "Context",
     "ConversationMessage",
     "CurrentSolution",
+    "Deadline",
+    "DeadlineExceededError",
     "Emotion",
+    "FairScheduler",
     "FirestoreOutput",
+    "FollowupAnswer",
     "FollowupQuestion",
+    "HedgedInvoker",
     "Job",
+    "LatencyBudgetPolicy",
+    "LatencyTracker",
     "Pain",
     "ProblemDiscoveryInput",
     "ProblemDiscoveryOutput",
     "ProblemDiscoverySheet",
     "ProjectMeta",
     "QualityReport",
+    "RequestContext",
+    "SessionState",
+    "SpeculationPolicy",
+    "Speculator",
+    "TokenBudgetExceededError",
+    "TokenBudgetLedger",
+    "TokenBudgetPolicy",
+    "TokenEstimator",
     "UnmetNeed",
+    "current_request_context",
+    "estimate_tokens",
+    "local_quality_check",
+    "request_context",
 ]
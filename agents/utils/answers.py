@@ -0,0 +1,206 @@
+"""
+追加質問への構造化回答のローカル適用
+Applying Structured Follow-up Answers
+
+scale（段階評価）・closed（選択式）の追加質問は、回答で更新するフィールド（target）が
+決まっているため、LLMを呼ばずに直前の problemDiscoverySheet に直接書き込める。
+open（自由回答）の回答や、解釈できない回答は適用せずに呼び出し側へ返す。
+
+target はキャメルケースのパスで指定する（qualityReport.missingFields と同じ表記）。
+
+    pains[0].severity       → 整数（1-5）を設定
+    context.trigger         → 文字列を設定
+    context.constraints     → 文字列のリストに追加
+    currentSolutions        → 要素を追加（{"solution": 回答}）
+"""
+
+import copy
+import re
+import unicodedata
+from typing import Any, Optional
+
+from agents.utils.schemas import FollowupAnswer, FollowupQuestion
+
+# 整数（1-5）のフィールド
+SCALE_FIELDS = {"severity", "frequency"}
+
+# 文字列のリストのフィールド
+LIST_FIELDS = {
+    "job.functional", "job.emotional", "job.social",
+    "context.constraints", "context.stakeholders",
+    "emotion.feelings",
+    "successCriteria", "assumptions", "unknowns",
+}
+
+# 要素がオブジェクトのリストと、回答を入れる主フィールド
+OBJECT_LIST_FIELDS = {"pains": "pain", "currentSolutions": "solution", "unmetNeeds": "need"}
+
+# 文字列のフィールド（配列要素のフィールドは [i] を除いた表記）
+TEXT_FIELDS = {
+    "job.main",
+    "context.who", "context.when", "context.where", "context.trigger",
+    "pains.pain", "pains.impact", "pains.evidence",
+    "currentSolutions.solution", "currentSolutions.whyChosen", "currentSolutions.dissatisfaction",
+    "unmetNeeds.need",
+    "emotion.momentOfTruth",
+}
+
+_SEGMENT = re.compile(r"^([A-Za-z]+)(?:\[(\d+)\])?$")
+_FIRST_NUMBER = re.compile(r"\d+")
+
+
+def parse_target(target: str) -> Optional[list[tuple[str, Optional[int]]]]:
+    """
+    target を (キー, 配列の位置) の列に分解する。既知のフィールドでなければ None
+    
+    例: "pains[0].severity" → [("pains", 0), ("severity", None)]
+    """
+    segments = []
+    for part in target.strip().split("."):
+        match = _SEGMENT.match(part)
+        if match is None:
+            return None
+        key, index = match.groups()
+        segments.append((key, int(index) if index is not None else None))
+    if not segments:
+        return None
+    
+    schema_path = ".".join(key for key, _ in segments)
+    # 配列の位置は要素がオブジェクトのリストにのみ付けられる
+    for i, (key, index) in enumerate(segments):
+        if index is not None and (i != 0 or key not in OBJECT_LIST_FIELDS):
+            return None
+    if len(segments) == 2 and segments[0][0] in OBJECT_LIST_FIELDS:
+        if segments[0][1] is None:
+            return None
+        if segments[1][0] in SCALE_FIELDS and segments[0][0] == "pains":
+            return segments
+    if schema_path in TEXT_FIELDS or schema_path in LIST_FIELDS:
+        return segments
+    if len(segments) == 1 and schema_path in OBJECT_LIST_FIELDS and segments[0][1] is None:
+        return segments
+    return None
+
+
+def parse_scale(answer: str) -> Optional[int]:
+    """scale の回答から 1-5 の値を取り出す（全角数字・「4くらい」なども可）"""
+    match = _FIRST_NUMBER.search(unicodedata.normalize("NFKC", answer))
+    if match is None:
+        return None
+    value = int(match.group())
+    return value if 1 <= value <= 5 else None
+
+
+def match_option(answer: str, options: list[str]) -> Optional[str]:
+    """closed の回答を選択肢に対応付ける（番号 1.. または選択肢の文言）"""
+    text = unicodedata.normalize("NFKC", answer).strip()
+    if not text or not options:
+        return None
+    if text.isdigit() and 1 <= int(text) <= len(options):
+        return options[int(text) - 1]
+    normalized = [unicodedata.normalize("NFKC", option).strip() for option in options]
+    if text in normalized:
+        return options[normalized.index(text)]
+    # 選択肢をそのまま含む回答（「使っていない、です」など）は、1つだけ該当すれば採用
+    hits = [option for option, n in zip(options, normalized) if n and n in text]
+    return hits[0] if len(hits) == 1 else None
+
+
+def covers(target: str, field: str) -> bool:
+    """
+    target への回答で qualityReport.missingFields の field が埋まるか
+    
+    同じパス、または一方がもう一方を含むパス（"pains[0]" と "pains[0].severity" など）なら True。
+    """
+    target, field = target.strip(), field.strip()
+    if not target or not field:
+        return False
+    if target == field:
+        return True
+    longer, shorter = (target, field) if len(target) > len(field) else (field, target)
+    return longer.startswith(shorter) and longer[len(shorter)] in ".["
+
+
+def structured_value(question: FollowupQuestion, answer: str) -> Any:
+    """
+    回答を target に書き込む値に変換する。ローカルで適用できなければ None
+    """
+    segments = parse_target(question.target) if question.target else None
+    if segments is None:
+        return None
+    leaf = segments[-1][0]
+    if question.type == "scale":
+        return parse_scale(answer) if leaf in SCALE_FIELDS else None
+    if question.type == "closed" and leaf not in SCALE_FIELDS:
+        return match_option(answer, question.options)
+    return None
+
+
+def _set(sheet: dict[str, Any], segments: list[tuple[str, Optional[int]]], value: Any) -> bool:
+    """シート（キャメルケース辞書）の target に値を書き込む。位置が範囲外なら False"""
+    path = ".".join(key for key, _ in segments)
+    head, index = segments[0]
+    
+    if len(segments) == 1 and head in OBJECT_LIST_FIELDS:
+        sheet.setdefault(head, []).append({OBJECT_LIST_FIELDS[head]: value})
+        return True
+    if index is not None:
+        items = sheet.setdefault(head, [])
+        if index > len(items):
+            return False
+        if index == len(items):
+            # 末尾の1つ先は新しい要素として追加する
+            items.append({})
+        container = items[index]
+    elif len(segments) == 1:
+        container = sheet
+    else:
+        container = sheet.setdefault(head, {})
+    
+    key = segments[-1][0]
+    if path in LIST_FIELDS:
+        values = container.setdefault(key, [])
+        if value not in values:
+            values.append(value)
+    else:
+        container[key] = value
+    return True
+
+
+def apply_answers(
+    sheet: dict[str, Any],
+    questions: list[FollowupQuestion],
+    answers: list[FollowupAnswer],
+) -> tuple[dict[str, Any], list[FollowupAnswer]]:
+    """
+    構造化回答をシートに適用する
+    
+    Args:
+        sheet: 直前の problemDiscoverySheet（キャメルケース辞書。変更しない）
+        questions: 直前の followupQuestions
+        answers: 回答
+    
+    Returns:
+        (適用後のシート, ローカルで適用できなかった回答)
+    """
+    updated = copy.deepcopy(sheet)
+    unapplied = []
+    for answer in answers:
+        if answer.question_index >= len(questions):
+            unapplied.append(answer)
+            continue
+        question = questions[answer.question_index]
+        value = structured_value(question, answer.answer)
+        if value is None or not _set(updated, parse_target(question.target), value):
+            unapplied.append(answer)
+    return updated, unapplied
+
+
+def format_answers(questions: list[FollowupQuestion], answers: list[FollowupAnswer]) -> str:
+    """回答を会話履歴・LLM入力用のテキストにする"""
+    lines = []
+    for answer in answers:
+        if answer.question_index < len(questions):
+            lines.append(f"Q: {questions[answer.question_index].question}")
+        lines.append(f"A: {answer.answer}")
+    return "\n".join(lines)
@@ -0,0 +1,215 @@
+"""
+LLM呼び出しのマイクロバッチ
+Cross-request Micro-batching
+
+一括処理で短い入力が大量に流れる場合、1件ごとの呼び出しはシステムプロンプトと
+往復のオーバーヘッドを毎回支払う。MicroBatcher は短い時間窓に届いた要求を集め、
+1回の複数件プロンプトで処理する。
+
+- グループ（テナント等）ごとにまとめ、異なるグループは混ぜない
+- 窓（max_wait 秒）が過ぎるか max_items 件集まったら実行
+- 応答の分割・検証は process 関数が行い、失敗した要素だけを次のバッチで再試行
+- 再試行を使い切った要素は None で完了する（呼び出し側で単発呼び出しに切り替える）
+- process が例外を送出した・要素数と異なる件数の結果を返した場合は、全要素を失敗として扱い、
+  再試行を使い切った要素は BatchProcessError で完了する（結果の届かない要素を残さない）
+"""
+
+import contextvars
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+from pydantic import BaseModel, Field
+
+
+class BatchProcessError(RuntimeError):
+    """バッチ処理関数が失敗した（例外の送出、または結果の件数が要素数と一致しない）"""
+
+
+class MicroBatchPolicy(BaseModel):
+    """マイクロバッチの設定"""
+    max_items: int = Field(default=8, description="1回の呼び出しにまとめる最大件数")
+    max_wait: float = Field(default=0.05, description="最初の要求から実行までの最大待ち時間（秒）")
+    max_retries: int = Field(default=1, description="失敗した要素をバッチで再試行する回数")
+    call_timeout: Optional[float] = Field(
+        default=None,
+        description="バッチ呼び出し1回のタイムアウト上限（秒）。None なら呼び出し側のLLMタイムアウト",
+    )
+    max_workers: int = Field(default=4, description="同時に実行するバッチ呼び出しの数")
+
+
+class _Entry:
+    """バッチ待ちの要求1件"""
+    
+    __slots__ = ("item", "group", "future", "context", "attempts")
+    
+    def __init__(self, item: Any, group: str, context: contextvars.Context):
+        self.item = item
+        self.group = group
+        self.future: Future = Future()
+        self.context = context
+        self.attempts = 0
+
+
+class MicroBatcher:
+    """
+    要求を時間窓で集めて process にまとめて渡す
+    
+    Args:
+        process: 要素のリストを受け取り、同じ順序で結果（失敗は None）のリストを返す関数。
+                 先頭要素の投入時のコンテキスト（request_context 等）で実行される
+        policy: バッチの設定
+        name: スレッド名の接頭辞
+    """
+    
+    def __init__(
+        self,
+        process: Callable[[list[Any]], list[Any | None]],
+        policy: MicroBatchPolicy | None = None,
+        name: str = "micro-batch",
+    ):
+        self.process = process
+        self.policy = policy or MicroBatchPolicy()
+        self._pending: dict[str, list[_Entry]] = {}
+        self._opened_at: dict[str, float] = {}
+        self._cond = threading.Condition()
+        self._executor = ThreadPoolExecutor(max_workers=self.policy.max_workers, thread_name_prefix=name)
+        self._closed = False
+        self._flusher = threading.Thread(target=self._flush_loop, name=f"{name}-flusher", daemon=True)
+        self._flusher.start()
+        # 統計
+        self.batches = 0
+        self.items = 0
+        self.retried = 0
+        self.gave_up = 0
+    
+    def submit(self, item: Any, group: str = "default") -> Future:
+        """要素を投入し、結果（失敗時は None）が入る Future を返す"""
+        entry = _Entry(item, group, contextvars.copy_context())
+        self._enqueue(entry)
+        return entry.future
+    
+    def close(self) -> None:
+        """新規受付を止め、待機中の要素を実行してから終了する"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._flusher.join()
+        self._executor.shutdown(wait=True)
+    
+    def stats(self) -> dict[str, float]:
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "itemsPerBatch": self.items / self.batches if self.batches else 0.0,
+            "retried": self.retried,
+            "gaveUp": self.gave_up,
+        }
+    
+    # ---------- 内部処理 ----------
+    
+    def _enqueue(self, entry: _Entry) -> None:
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("MicroBatcher は終了しています")
+            queue = self._pending.setdefault(entry.group, [])
+            if not queue:
+                self._opened_at[entry.group] = time.monotonic()
+            queue.append(entry)
+            self._cond.notify_all()
+    
+    def _flush_loop(self) -> None:
+        while True:
+            with self._cond:
+                batch = self._next_batch()
+                while batch is None:
+                    if self._closed and not self._pending:
+                        return
+                    self._cond.wait(timeout=self._wait_time())
+                    batch = self._next_batch()
+            self._executor.submit(self._run_batch, batch)
+    
+    def _wait_time(self) -> float | None:
+        """ロック保持中に呼ぶ。最も古いグループの窓が閉じるまでの時間"""
+        if not self._opened_at:
+            return None
+        oldest = min(self._opened_at.values())
+        return max(0.0, oldest + self.policy.max_wait - time.monotonic())
+    
+    def _next_batch(self) -> list[_Entry] | None:
+        """ロック保持中に呼ぶ。満杯または窓が閉じたグループから取り出す"""
+        now = time.monotonic()
+        for group in list(self._pending):
+            # キャンセル済み（呼び出し側がタイムアウト）の要求は捨てる
+            queue = [e for e in self._pending[group] if not e.future.cancelled()]
+            ready = (
+                len(queue) >= self.policy.max_items
+                or now - self._opened_at[group] >= self.policy.max_wait
+                or self._closed
+            )
+            if queue and not ready:
+                self._pending[group] = queue
+                continue
+            batch, rest = queue[:self.policy.max_items], queue[self.policy.max_items:]
+            if rest:
+                self._pending[group] = rest
+                self._opened_at[group] = now
+            else:
+                del self._pending[group]
+                del self._opened_at[group]
+            if batch:
+                return batch
+        return None
+    
+    def _run_batch(self, batch: list[_Entry]) -> None:
+        self.batches += 1
+        self.items += len(batch)
+        error: BatchProcessError | None = None
+        try:
+            results = batch[0].context.run(self.process, [e.item for e in batch])
+            if not isinstance(results, list) or len(results) != len(batch):
+                count = len(results) if isinstance(results, list) else type(results).__name__
+                raise BatchProcessError(f"process の結果が要素数と一致しません: {count} != {len(batch)}")
+        except BatchProcessError as e:
+            error, results = e, [None] * len(batch)
+        except Exception as e:
+            error = BatchProcessError(f"process が失敗しました: {type(e).__name__}: {e}")
+            error.__cause__ = e
+            results = [None] * len(batch)
+        
+        for entry, result in zip(batch, results):
+            if result is not None:
+                _resolve(entry.future, result)
+            elif entry.attempts < self.policy.max_retries and not self._closed:
+                # 失敗した要素だけを次のバッチで再試行
+                entry.attempts += 1
+                self.retried += 1
+                try:
+                    self._enqueue(entry)
+                except RuntimeError:
+                    _settle(entry.future, error)
+            else:
+                self.gave_up += 1
+                _settle(entry.future, error)
+
+
+def _settle(future: Future, error: BatchProcessError | None) -> None:
+    """失敗した要素を完了する（process の失敗なら例外、個別の失敗なら None）"""
+    if error is None:
+        _resolve(future, None)
+    elif not future.done():
+        try:
+            future.set_exception(error)
+        except Exception:
+            # 呼び出し側が同時にキャンセルした
+            pass
+
+
+def _resolve(future: Future, value: Any) -> None:
+    if not future.done():
+        try:
+            future.set_result(value)
+        except Exception:
+            # 呼び出し側が同時にキャンセルした
+            pass
@@ -0,0 +1,379 @@
+"""
+フェーズ出力・セッション状態の保存用コーデック
+Compact Binary Storage Codec
+
+FirestoreOutput 形式の出力やオーケストレーターの SessionState は、インデント付きJSONだと
+同じ長いキー（"problemDiscoverySheet" など）をレコードごとに繰り返す。
+保存・エクスポート用に、以下のバイナリ形式で符号化する。
+
+- ヘッダー: マジック b"ALSC" ＋ 形式バージョン（1バイト）＋ 圧縮方式（1バイト）
+- 値はタグ付きの可変長整数（varint）エンコーディング
+- 辞書のキーと頻出する文字列値は、バージョンごとに固定の共有辞書の番号で表す
+- 本体は zlib（標準）または zstd（zstandard がインストールされている場合）で圧縮。
+  圧縮しても小さくならない場合は無圧縮で保存する
+
+JSONで表せる値（dict / list / str / int / float / bool / None）は損失なく往復する。
+共有辞書は末尾にのみ追加し、追加したら CODEC_VERSION を上げること
+（復号時はヘッダーのバージョンに対応する辞書を使う）。
+
+    data = encode_output(output)        # ProblemDiscoveryOutput または FirestoreOutput 形式の辞書
+    record = decode_output(data)        # FirestoreOutput 形式の辞書
+    data = encode_session(state)
+    state = decode_session(data)
+"""
+
+import struct
+import zlib
+from pathlib import Path
+from typing import Any, BinaryIO, Iterable, Iterator, Union
+
+from agents.utils.schemas import FirestoreOutput, ProblemDiscoveryOutput, SessionState
+
+try:
+    import zstandard
+except ImportError:  # zstd はオプション
+    zstandard = None
+
+MAGIC = b"ALSC"
+CODEC_VERSION = 2
+
+# 圧縮方式
+COMPRESSION_NONE = "none"
+COMPRESSION_ZLIB = "zlib"
+COMPRESSION_ZSTD = "zstd"
+_COMPRESSION_CODES = {COMPRESSION_NONE: 0, COMPRESSION_ZLIB: 1, COMPRESSION_ZSTD: 2}
+_COMPRESSION_NAMES = {code: name for name, code in _COMPRESSION_CODES.items()}
+
+# バージョンごとの共有辞書（キー, 頻出する文字列値）
+_DICTIONARIES: dict[int, tuple[tuple[str, ...], tuple[str, ...]]] = {
+    1: (
+        (
+            # FirestoreOutput
+            "problemStatement", "problemDiscoverySheet", "followupQuestions", "qualityReport", "degradations",
+            "job", "main", "functional", "emotional", "social",
+            "context", "who", "when", "where", "trigger", "constraints", "stakeholders",
+            "pains", "pain", "impact", "severity", "frequency", "evidence",
+            "currentSolutions", "solution", "whyChosen", "dissatisfaction",
+            "unmetNeeds", "need", "whyDepth",
+            "emotion", "feelings", "momentOfTruth",
+            "successCriteria", "assumptions", "unknowns",
+            "question", "intent", "type",
+            "confidence", "missingFields", "contradictions", "nextAction",
+            # SessionState / ProblemDiscoveryInput
+            "iteration", "user_free_text", "project_meta", "history", "problem_statement", "sheet",
+            "followup_questions", "quality_report", "next_phase",
+            "missing_fields", "next_action",
+            "industry", "target_customer", "existing_assets",
+            "role", "content",
+            # エクスポートレコード
+            "jobId", "tenantId", "projectId", "projectMeta", "output", "input",
+        ),
+        (
+            "ask_more", "proceed", "open", "closed", "scale", "user", "assistant",
+            "problem_discovery", "timeout", "parse_error",
+            "critic_local", "history_truncated", "fast_model", "project_meta_trimmed", "input_truncated",
+        ),
+    ),
+}
+# v2: 追加質問の回答先（target / options）と次フェーズ名を追加
+_DICTIONARIES[2] = (
+    _DICTIONARIES[1][0] + ("target", "options"),
+    _DICTIONARIES[1][1] + ("question_design_phase",),
+)
+
+# 値のタグ
+_T_NONE, _T_FALSE, _T_TRUE, _T_INT, _T_FLOAT, _T_STR, _T_LIST, _T_DICT, _T_SYMBOL = range(9)
+
+_HEADER = struct.Struct(">4sBB")
+
+
+class CodecError(ValueError):
+    """符号化・復号できないデータ"""
+
+
+# ==================== 値の符号化 ====================
+
+def _write_varint(out: bytearray, value: int) -> None:
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_varint(data: bytes, pos: int) -> tuple[int, int]:
+    result = shift = 0
+    while True:
+        try:
+            byte = data[pos]
+        except IndexError:
+            raise CodecError("データが途中で終わっています") from None
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return result, pos
+        shift += 7
+
+
+class _Encoder:
+    def __init__(self, version: int):
+        keys, symbols = _DICTIONARIES[version]
+        self.keys = {key: i for i, key in enumerate(keys)}
+        self.symbols = {symbol: i for i, symbol in enumerate(symbols)}
+        self.out = bytearray()
+    
+    def value(self, value: Any) -> None:
+        out = self.out
+        if value is None:
+            out.append(_T_NONE)
+        elif value is True:
+            out.append(_T_TRUE)
+        elif value is False:
+            out.append(_T_FALSE)
+        elif isinstance(value, str):
+            symbol = self.symbols.get(value)
+            if symbol is not None:
+                out.append(_T_SYMBOL)
+                _write_varint(out, symbol)
+            else:
+                raw = value.encode("utf-8")
+                out.append(_T_STR)
+                _write_varint(out, len(raw))
+                out += raw
+        elif isinstance(value, int):
+            out.append(_T_INT)
+            # ジグザグ符号化（負数も短く表す）
+            _write_varint(out, value * 2 if value >= 0 else -value * 2 - 1)
+        elif isinstance(value, float):
+            # 最短の10進表現は float に戻すと元の値と一致する（多くの値で8バイトより短い）
+            raw = repr(value).encode("ascii")
+            out.append(_T_FLOAT)
+            _write_varint(out, len(raw))
+            out += raw
+        elif isinstance(value, dict):
+            out.append(_T_DICT)
+            _write_varint(out, len(value))
+            for key, item in value.items():
+                if not isinstance(key, str):
+                    raise CodecError(f"辞書のキーは文字列のみ対応しています: {key!r}")
+                code = self.keys.get(key)
+                if code is not None:
+                    _write_varint(out, code << 1)
+                else:
+                    raw = key.encode("utf-8")
+                    _write_varint(out, (len(raw) << 1) | 1)
+                    out += raw
+                self.value(item)
+        elif isinstance(value, (list, tuple)):
+            out.append(_T_LIST)
+            _write_varint(out, len(value))
+            for item in value:
+                self.value(item)
+        else:
+            raise CodecError(f"符号化できない型です: {type(value).__name__}")
+
+
+class _Decoder:
+    def __init__(self, data: bytes, version: int):
+        self.keys, self.symbols = _DICTIONARIES[version]
+        self.data = data
+        self.pos = 0
+    
+    def value(self) -> Any:
+        data = self.data
+        try:
+            tag = data[self.pos]
+        except IndexError:
+            raise CodecError("データが途中で終わっています") from None
+        self.pos += 1
+        if tag == _T_NONE:
+            return None
+        if tag == _T_TRUE:
+            return True
+        if tag == _T_FALSE:
+            return False
+        if tag == _T_SYMBOL:
+            code, self.pos = _read_varint(data, self.pos)
+            return self.symbols[code]
+        if tag == _T_STR:
+            return self._text()
+        if tag == _T_INT:
+            raw, self.pos = _read_varint(data, self.pos)
+            return raw >> 1 if not raw & 1 else -((raw + 1) >> 1)
+        if tag == _T_FLOAT:
+            return float(self._text())
+        if tag == _T_LIST:
+            count, self.pos = _read_varint(data, self.pos)
+            return [self.value() for _ in range(count)]
+        if tag == _T_DICT:
+            count, self.pos = _read_varint(data, self.pos)
+            result = {}
+            for _ in range(count):
+                code, self.pos = _read_varint(data, self.pos)
+                if code & 1:
+                    key = data[self.pos:self.pos + (code >> 1)].decode("utf-8")
+                    self.pos += code >> 1
+                else:
+                    key = self.keys[code >> 1]
+                result[key] = self.value()
+            return result
+        raise CodecError(f"不明なタグです: {tag}")
+    
+    def _text(self) -> str:
+        length, self.pos = _read_varint(self.data, self.pos)
+        end = self.pos + length
+        if end > len(self.data):
+            raise CodecError("データが途中で終わっています")
+        text = self.data[self.pos:end].decode("utf-8")
+        self.pos = end
+        return text
+
+
+# ==================== 公開API ====================
+
+def available_compressions() -> tuple[str, ...]:
+    """この環境で使える圧縮方式"""
+    if zstandard is None:
+        return (COMPRESSION_NONE, COMPRESSION_ZLIB)
+    return (COMPRESSION_NONE, COMPRESSION_ZLIB, COMPRESSION_ZSTD)
+
+
+def encode(value: Any, compression: str = COMPRESSION_ZLIB, level: int | None = None) -> bytes:
+    """
+    JSONで表せる値を符号化する
+    
+    Args:
+        value: dict / list / str / int / float / bool / None からなる値
+        compression: "none" / "zlib" / "zstd"
+        level: 圧縮レベル（省略時は各方式の既定値）
+    
+    Raises:
+        CodecError: 符号化できない型を含む場合
+        ValueError: 使えない圧縮方式を指定した場合
+    """
+    if compression not in available_compressions():
+        raise ValueError(f"使用できない圧縮方式です: {compression}（zstd には zstandard が必要）")
+    encoder = _Encoder(CODEC_VERSION)
+    encoder.value(value)
+    body = bytes(encoder.out)
+    
+    if compression == COMPRESSION_ZLIB:
+        compressed = zlib.compress(body, 6 if level is None else level)
+    elif compression == COMPRESSION_ZSTD:
+        compressed = zstandard.ZstdCompressor(level=3 if level is None else level).compress(body)
+    else:
+        compressed = body
+    # 短いレコードでは圧縮で大きくなることがあるため、その場合は無圧縮で保存する
+    if len(compressed) >= len(body):
+        compression, compressed = COMPRESSION_NONE, body
+    return _HEADER.pack(MAGIC, CODEC_VERSION, _COMPRESSION_CODES[compression]) + compressed
+
+
+def decode(data: bytes) -> Any:
+    """
+    encode() したデータを復号する
+    
+    Raises:
+        CodecError: 形式・バージョンが不正、またはデータが壊れている場合
+    """
+    if not is_encoded(data):
+        raise CodecError("コーデックの形式ではありません")
+    _, version, compression_code = _HEADER.unpack_from(data)
+    if version not in _DICTIONARIES:
+        raise CodecError(f"未対応の形式バージョンです: {version}")
+    compression = _COMPRESSION_NAMES.get(compression_code)
+    body = bytes(data[_HEADER.size:])
+    try:
+        if compression == COMPRESSION_ZLIB:
+            body = zlib.decompress(body)
+        elif compression == COMPRESSION_ZSTD:
+            if zstandard is None:
+                raise CodecError("zstd で圧縮されたデータの復号には zstandard が必要です")
+            body = zstandard.ZstdDecompressor().decompress(body)
+        elif compression != COMPRESSION_NONE:
+            raise CodecError(f"不明な圧縮方式です: {compression_code}")
+    except zlib.error as e:
+        raise CodecError(f"展開に失敗しました: {e}") from e
+    
+    decoder = _Decoder(body, version)
+    try:
+        value = decoder.value()
+    except (IndexError, UnicodeDecodeError) as e:
+        raise CodecError(f"データが壊れています: {e}") from e
+    if decoder.pos != len(body):
+        raise CodecError("データの末尾に余分なバイトがあります")
+    return value
+
+
+def is_encoded(data: Any) -> bool:
+    """コーデックで符号化されたバイト列か"""
+    return isinstance(data, (bytes, bytearray, memoryview)) and bytes(data[:4]) == MAGIC and len(data) >= _HEADER.size
+
+
+def encode_output(output: Union[ProblemDiscoveryOutput, dict[str, Any]], compression: str = COMPRESSION_ZLIB) -> bytes:
+    """Phase 1 出力（ProblemDiscoveryOutput または FirestoreOutput 形式の辞書）を符号化"""
+    record = FirestoreOutput.from_output(output) if isinstance(output, ProblemDiscoveryOutput) else output
+    return encode(record, compression)
+
+
+def decode_output(data: bytes) -> dict[str, Any]:
+    """encode_output() したデータを FirestoreOutput 形式の辞書に戻す"""
+    return decode(data)
+
+
+def encode_session(state: SessionState, compression: str = COMPRESSION_ZLIB) -> bytes:
+    """オーケストレーターのセッション状態を符号化"""
+    return encode(state.model_dump(mode="json"), compression)
+
+
+def decode_session(data: bytes) -> SessionState:
+    """encode_session() したデータを SessionState に戻す"""
+    return SessionState.model_validate(decode(data))
+
+
+# ==================== レコードファイル ====================
+
+def write_records(
+    target: Union[str, Path, BinaryIO],
+    records: Iterable[Any],
+    compression: str = COMPRESSION_ZLIB,
+) -> int:
+    """
+    レコードを「長さ（varint）＋符号化データ」の連続としてファイルに書き、件数を返す
+    
+    1件ずつ符号化するため、読み出し側もストリームで処理できる。
+    """
+    if isinstance(target, (str, Path)):
+        with open(target, "wb") as f:
+            return write_records(f, records, compression)
+    count = 0
+    for record in records:
+        data = encode(record, compression)
+        prefix = bytearray()
+        _write_varint(prefix, len(data))
+        target.write(bytes(prefix) + data)
+        count += 1
+    return count
+
+
+def read_records(source: Union[str, Path, BinaryIO]) -> Iterator[Any]:
+    """write_records() で書いたファイルからレコードを順に読み出す"""
+    if isinstance(source, (str, Path)):
+        with open(source, "rb") as f:
+            yield from read_records(f)
+        return
+    while True:
+        length = shift = 0
+        while True:
+            byte = source.read(1)
+            if not byte:
+                if shift:
+                    raise CodecError("データが途中で終わっています")
+                return
+            length |= (byte[0] & 0x7F) << shift
+            if byte[0] < 0x80:
+                break
+            shift += 7
+        data = source.read(length)
+        if len(data) != length:
+            raise CodecError("データが途中で終わっています")
+        yield decode(data)
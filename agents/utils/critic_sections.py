@@ -0,0 +1,119 @@
+"""
+セクション単位のCritic評価とメモ化
+Section-scoped Incremental Critic
+
+オーケストレーターの2回目以降の往復では、前回から変わるのが context や pain の1件だけ、
+ということが多い。Criticの評価をセクション（job / context / pains / currentSolutions /
+unmetNeeds / problemStatement）単位に分け、各セクションの内容ハッシュをキーに評価をメモ化する。
+内容が変わったセクションだけをLLMに送り、メモ化済みの評価と合わせて qualityReport を組み立てる。
+"""
+
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Optional
+
+from agents.utils.schemas import FirestoreOutput, ProblemDiscoveryOutput, QualityReport
+
+# 評価するセクション（CRITIC_PROMPT のチェック項目1〜6に対応）
+CRITIC_SECTIONS = ("job", "context", "pains", "currentSolutions", "unmetNeeds", "problemStatement")
+
+# 評価が他のセクションの内容にも依存するもの（unmetNeeds は pains とのつながりを見る）
+SECTION_DEPENDENCIES: dict[str, tuple[str, ...]] = {"unmetNeeds": ("pains",)}
+
+
+def section_payloads(output: ProblemDiscoveryOutput) -> dict[str, Any]:
+    """出力をセクション名 → 内容（キャメルケース）に分ける"""
+    data = FirestoreOutput.from_output(output)
+    sheet = data["problemDiscoverySheet"]
+    payloads = {name: sheet[name] for name in CRITIC_SECTIONS if name in sheet}
+    payloads["problemStatement"] = data["problemStatement"]
+    return payloads
+
+
+def section_references(name: str, payloads: dict[str, Any]) -> dict[str, Any]:
+    """評価の参考として併記するセクション"""
+    return {dep: payloads[dep] for dep in SECTION_DEPENDENCIES.get(name, ())}
+
+
+def section_hash(name: str, payloads: dict[str, Any]) -> str:
+    """セクションの内容ハッシュ（依存するセクションの内容も含める）"""
+    content = {"section": name, "content": payloads[name], "references": section_references(name, payloads)}
+    encoded = json.dumps(content, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+def validate_verdict(data: Any) -> Optional[dict[str, Any]]:
+    """セクション評価1件の検証・正規化（ok と confidence が揃っていなければ None）"""
+    if not isinstance(data, dict) or not isinstance(data.get("ok"), bool):
+        return None
+    try:
+        confidence = min(1.0, max(0.0, float(data.get("confidence"))))
+    except (TypeError, ValueError):
+        return None
+    missing_fields = data.get("missingFields")
+    contradictions = data.get("contradictions")
+    return {
+        "ok": data["ok"],
+        "confidence": confidence,
+        "missingFields": [str(f) for f in missing_fields] if isinstance(missing_fields, list) else [],
+        "contradictions": [str(c) for c in contradictions] if isinstance(contradictions, list) else [],
+    }
+
+
+def combine_verdicts(verdicts: dict[str, dict[str, Any]]) -> QualityReport:
+    """
+    セクションごとの評価を qualityReport にまとめる
+    
+    confidence はセクションの平均、すべてのセクションが ok かつ不足がなければ proceed。
+    """
+    ordered = [verdicts[name] for name in CRITIC_SECTIONS if name in verdicts]
+    missing_fields = list(dict.fromkeys(f for v in ordered for f in v["missingFields"]))
+    contradictions = list(dict.fromkeys(c for v in ordered for c in v["contradictions"]))
+    confidence = sum(v["confidence"] for v in ordered) / len(ordered) if ordered else 0.0
+    proceed = bool(ordered) and all(v["ok"] for v in ordered) and not missing_fields
+    return QualityReport(
+        confidence=round(confidence, 2),
+        missing_fields=missing_fields,
+        contradictions=contradictions,
+        next_action="proceed" if proceed else "ask_more",
+    )
+
+
+class VerdictMemo:
+    """
+    セクションの内容ハッシュ → 評価のメモ（上限を超えたら最も古く使われたものから破棄）
+    
+    内容だけで決まるため、セッションをまたいで共有してよい。
+    """
+    
+    def __init__(self, max_entries: int = 1024):
+        if max_entries < 1:
+            raise ValueError(f"max_entries は1以上を指定してください: {max_entries}")
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, dict[str, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+        # 統計
+        self.hits = 0
+        self.misses = 0
+    
+    def get(self, key: str) -> Optional[dict[str, Any]]:
+        with self._lock:
+            verdict = self._entries.get(key)
+            if verdict is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return verdict
+    
+    def put(self, key: str, verdict: dict[str, Any]) -> None:
+        with self._lock:
+            self._entries[key] = verdict
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+    
+    def stats(self) -> dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries)}
@@ -0,0 +1,283 @@
+"""
+情報ギャップ検出と質問シートのローカル品質判定
+Question Design Agent - Local Gap Detection and Coverage Checks
+
+質問設計仕様書 Step 1（情報ギャップ検出）と Step 4（品質判定）は、Phase 1 の
+problemDiscoverySheet と生成された質問シートに対する構造的な検査なので、LLMを使わずに判定する。
+LLMには検出したギャップと関連フィールドだけを渡し、質問文の生成のみを任せる。
+"""
+
+import re
+import unicodedata
+
+from agents.utils.quality import VERB_ENDING, is_vague
+from agents.utils.question_schemas import (
+    COVERAGE_ASPECTS,
+    PRIORITIES,
+    QUESTION_CATEGORIES,
+    Coverage,
+    DesignedQuestion,
+    Gap,
+    QuestionIntent,
+    QuestionQualityReport,
+)
+from agents.utils.schemas import ProblemDiscoverySheet
+
+# Why深掘りがこの段数未満なら pain の原因が不明確とみなす
+MIN_WHY_DEPTH = 3
+
+# 影響・原因を確認する pain の件数（severity × frequency の上位）
+TOP_PAINS = 2
+
+# 抽象的な質問（仕様書 Step 2 で禁止）
+_ABSTRACT_QUESTIONS = re.compile(r"(詳しく|もう少し|具体的に)(教えて|聞かせて|説明して)|他に何か|何かありますか")
+
+# 重複判定（文字バイグラムの Jaccard 係数）
+DUPLICATE_SIMILARITY = 0.7
+
+_INDEX = re.compile(r"\[\d+\]")
+_NON_WORD = re.compile(r"[\s、。，．？！?!・「」『』（）()]")
+
+
+# ==================== Step 1. 情報ギャップ検出 ====================
+
+def _ranked_pains(sheet: ProblemDiscoverySheet) -> list[int]:
+    """severity × frequency の降順の pain の位置"""
+    return sorted(
+        range(len(sheet.pains)),
+        key=lambda i: -(sheet.pains[i].severity * sheet.pains[i].frequency),
+    )
+
+
+def detect_gaps(sheet: ProblemDiscoverySheet | None) -> list[Gap]:
+    """
+    Phase 1 出力の情報ギャップを検出する
+    
+    欠落・曖昧なフィールド（missing / unclear）に加え、ギャップのないカテゴリには
+    埋まっている値を検証する項目（verify）を1件ずつ加え、5W1H＋感情を網羅できるようにする。
+    """
+    sheet = sheet or ProblemDiscoverySheet()
+    gaps: list[Gap] = []
+    
+    # job が具体的か
+    main = sheet.job.main.strip()
+    if is_vague(main):
+        gaps.append(Gap(
+            field="job.main", category="what", aspect="job", priority="high",
+            reason="主ジョブ（何を達成したいか）が分かっていない",
+        ))
+    elif not VERB_ENDING.search(main):
+        gaps.append(Gap(
+            field="job.main", category="what", aspect="job", kind="unclear", priority="high",
+            reason="主ジョブが「動詞＋目的語」の形で具体化されていない", current=main,
+        ))
+    
+    # context（who / when / where / trigger）が揃っているか
+    context = sheet.context
+    for key, category, label, priority in (
+        ("who", "who", "誰が困っているか", "high"),
+        ("when", "when", "いつ起きるか", "medium"),
+        ("where", "where", "どこで起きるか", "medium"),
+        ("trigger", "when", "何がきっかけで起きるか", "high"),
+    ):
+        value = getattr(context, key).strip()
+        if is_vague(value):
+            gaps.append(Gap(
+                field=f"context.{key}", category=category, aspect="context", priority=priority,
+                reason=f"{label}が分かっていない",
+            ))
+        elif key == "trigger" and len(value) < 4:
+            gaps.append(Gap(
+                field="context.trigger", category="when", aspect="context", kind="unclear", priority=priority,
+                reason="きっかけが具体的でない", current=value,
+            ))
+    
+    # pain の影響・原因が明確か
+    ranked = _ranked_pains(sheet)
+    if not ranked:
+        gaps.append(Gap(
+            field="pains", category="what", aspect="pain", priority="high",
+            reason="困りごと（pain）が抽出されていない",
+        ))
+    for i in ranked[:TOP_PAINS]:
+        pain = sheet.pains[i]
+        if is_vague(pain.impact):
+            gaps.append(Gap(
+                field=f"pains[{i}].impact", category="how", aspect="pain", kind="unclear", priority="high",
+                reason="困りごとがどのような影響を生んでいるか分かっていない", current=pain.pain,
+            ))
+    depth = max((len(n.why_depth) for n in sheet.unmet_needs), default=0)
+    if depth < MIN_WHY_DEPTH:
+        gaps.append(Gap(
+            field="unmetNeeds.whyDepth", category="why", aspect="pain",
+            kind="unclear" if depth else "missing", priority="high",
+            reason=f"困りごとの原因（なぜ）が{MIN_WHY_DEPTH}段階まで掘り下げられていない",
+            current=sheet.pains[ranked[0]].pain if ranked else main,
+        ))
+    if not any(not is_vague(s.solution) for s in sheet.current_solutions):
+        gaps.append(Gap(
+            field="currentSolutions", category="how", aspect="pain", priority="medium",
+            reason="今どのように対処しているか分かっていない",
+        ))
+    
+    # 感情・判断基準が欠けていないか
+    if not sheet.emotion.feelings:
+        gaps.append(Gap(
+            field="emotion.feelings", category="emotion", aspect="emotion", priority="medium",
+            reason="困りごとに伴う感情（不安・苛立ち・期待など）が分かっていない",
+        ))
+    elif is_vague(sheet.emotion.moment_of_truth):
+        gaps.append(Gap(
+            field="emotion.momentOfTruth", category="emotion", aspect="emotion", priority="low",
+            reason="感情が最も強く動く瞬間が分かっていない", current="、".join(sheet.emotion.feelings),
+        ))
+    if not sheet.success_criteria:
+        gaps.append(Gap(
+            field="successCriteria", category="how", aspect="emotion", priority="medium",
+            reason="どうなれば解決したといえるか（判断基準）が分かっていない",
+        ))
+    
+    # ギャップのないカテゴリは、埋まっている値を仮説として検証する
+    covered = {gap.category for gap in gaps}
+    top_pain = sheet.pains[ranked[0]] if ranked else None
+    solution = next((s.solution for s in sheet.current_solutions if not is_vague(s.solution)), "")
+    candidates = (
+        ("who", "context.who", "context", context.who),
+        ("when", "context.when", "context", context.when),
+        ("where", "context.where", "context", context.where),
+        ("what", "job.main", "job", main),
+        ("why", f"pains[{ranked[0]}]" if ranked else "pains", "pain", top_pain.pain if top_pain else ""),
+        ("how", "currentSolutions", "pain", solution),
+        ("emotion", "emotion.feelings", "emotion", "、".join(sheet.emotion.feelings)),
+    )
+    for category, field, aspect, value in candidates:
+        if category not in covered and value.strip():
+            gaps.append(Gap(
+                field=field, category=category, aspect=aspect, kind="verify", priority="low",
+                reason=f"Phase 1 の仮説（{field}）が正しいか確かめる", current=value,
+            ))
+    return gaps
+
+
+def needs_answers(gaps: list[Gap]) -> list[Gap]:
+    """ユーザーの回答で埋める必要のあるギャップ（verify 以外）"""
+    return [gap for gap in gaps if gap.kind != "verify"]
+
+
+# ==================== Step 4. 品質判定 ====================
+
+def _normalize(text: str) -> str:
+    return _NON_WORD.sub("", unicodedata.normalize("NFKC", text).lower())
+
+
+def _bigrams(text: str) -> set[str]:
+    return {text[i:i + 2] for i in range(len(text) - 1)} or {text}
+
+
+def _similar(a: str, b: str) -> bool:
+    grams_a, grams_b = _bigrams(_normalize(a)), _bigrams(_normalize(b))
+    return len(grams_a & grams_b) / len(grams_a | grams_b) >= DUPLICATE_SIMILARITY
+
+
+def _matches(question: DesignedQuestion, gap: Gap) -> bool:
+    """質問がギャップを補うか（relatedField が一致、または配列の位置違い）"""
+    related = _INDEX.sub("", question.related_field.strip())
+    if not related:
+        return False
+    target = _INDEX.sub("", gap.field)
+    return related == target or related.startswith(target + ".")
+
+
+def _gap_for(question: DesignedQuestion, gaps: list[Gap]) -> Gap | None:
+    return next((gap for gap in gaps if _matches(question, gap)), None)
+
+
+def normalize_questions(
+    questions: list[DesignedQuestion],
+    gaps: list[Gap],
+    max_questions: int = 10,
+) -> tuple[list[DesignedQuestion], list[str]]:
+    """
+    質問シートを整える（カテゴリ・優先度の正規化、抽象的な質問と重複の除外、最大件数での切り詰め）
+    
+    Returns:
+        (整えた質問シート, 除外した理由の説明)
+    """
+    issues: list[str] = []
+    kept: list[DesignedQuestion] = []
+    for question in questions:
+        text = question.question.strip()
+        if not text:
+            continue
+        if _ABSTRACT_QUESTIONS.search(text):
+            issues.append(f"抽象的な質問を除外: {text}")
+            continue
+        if any(_similar(text, other.question) for other in kept):
+            issues.append(f"重複する質問を除外: {text}")
+            continue
+        gap = _gap_for(question, gaps)
+        category = question.category.strip().lower()
+        if category not in QUESTION_CATEGORIES:
+            category = gap.category if gap else "what"
+        priority = question.priority.strip().lower()
+        if priority not in PRIORITIES:
+            priority = gap.priority if gap else "medium"
+        kept.append(question.model_copy(update={"question": text, "category": category, "priority": priority}))
+    
+    if len(kept) > max_questions:
+        issues.append(f"{max_questions}問を超えたため優先度の低い{len(kept) - max_questions}問を除外")
+        order = sorted(range(len(kept)), key=lambda i: PRIORITIES.index(kept[i].priority))
+        keep = set(order[:max_questions])
+        kept = [q for i, q in enumerate(kept) if i in keep]
+    return kept, issues
+
+
+def intent_map(questions: list[DesignedQuestion], gaps: list[Gap]) -> list[QuestionIntent]:
+    """質問ごとに、明らかにするギャップと Phase 1 のフィールドを対応付ける"""
+    intents = []
+    for question in questions:
+        gap = _gap_for(question, gaps)
+        intents.append(QuestionIntent(
+            target=gap.reason if gap else question.intent,
+            linked_phase1_field=gap.field if gap else question.related_field,
+        ))
+    return intents
+
+
+def check_question_sheet(
+    questions: list[DesignedQuestion],
+    gaps: list[Gap],
+    issues: list[str] | None = None,
+) -> QuestionQualityReport:
+    """
+    質問シートの網羅性・規則をローカルで判定する
+    
+    - 回答が必要なギャップ（missing / unclear）が質問で補えているか（観点ごとの coverage）
+    - 5W1H＋感情のカテゴリを網羅しているか、感情の質問が1問以上あるか
+    - 回答が必要なギャップがなければ nextAction = "proceed"
+    """
+    issues = list(issues or [])
+    required = needs_answers(gaps)
+    missing_fields = [gap.field for gap in required if not any(_matches(q, gap) for q in questions)]
+    
+    coverage = Coverage(**{
+        aspect: all(gap.field not in missing_fields for gap in required if gap.aspect == aspect)
+        for aspect in COVERAGE_ASPECTS
+    })
+    categories = {q.category for q in questions}
+    if "emotion" not in categories:
+        issues.append("感情面の質問がない")
+        coverage.emotion = False
+    uncovered = [c for c in QUESTION_CATEGORIES if c not in categories]
+    if uncovered:
+        issues.append(f"カテゴリの不足: {', '.join(uncovered)}")
+    
+    gap_ratio = 1.0 - len(missing_fields) / len(required) if required else 1.0
+    category_ratio = 1.0 - len(uncovered) / len(QUESTION_CATEGORIES)
+    return QuestionQualityReport(
+        confidence=round(0.6 * gap_ratio + 0.4 * category_ratio, 2),
+        coverage=coverage,
+        missing_fields=missing_fields,
+        issues=issues,
+        next_action="ask_user" if required else "proceed",
+    )
@@ -0,0 +1,366 @@
+"""
+LLM呼び出しのレイテンシ制御ユーティリティ
+Latency Control - Deadlines / Rolling Percentiles / Hedged Requests
+"""
+
+import asyncio
+import contextvars
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Awaitable, Callable, Optional, TypeVar, Union
+
+import httpx
+from pydantic import BaseModel, Field
+
+T = TypeVar("T")
+
+
+class DeadlineExceededError(TimeoutError):
+    """デッドラインまでにLLM呼び出しが完了しなかった"""
+
+
+# ==================== デッドライン ====================
+
+class Deadline:
+    """
+    リクエスト全体の締め切り時刻
+    
+    time.monotonic() 基準の絶対時刻を保持し、各LLM呼び出しには
+    残り時間（remaining）をタイムアウトとして渡す。
+    """
+    
+    def __init__(self, expires_at: float):
+        self.expires_at = expires_at
+    
+    @classmethod
+    def after(cls, seconds: float) -> "Deadline":
+        """現在時刻から seconds 秒後のデッドラインを作成"""
+        return cls(time.monotonic() + seconds)
+    
+    @classmethod
+    def coerce(cls, value: Union["Deadline", float, None]) -> Optional["Deadline"]:
+        """Deadline / 残り秒数 / None のいずれかを Deadline に正規化"""
+        if value is None or isinstance(value, Deadline):
+            return value
+        return cls.after(float(value))
+    
+    def remaining(self) -> float:
+        """残り時間（秒）。期限切れの場合は 0.0"""
+        return max(0.0, self.expires_at - time.monotonic())
+    
+    def expired(self) -> bool:
+        """期限切れかどうか"""
+        return self.remaining() <= 0.0
+    
+    def clamp(self, timeout: float) -> float:
+        """timeout を残り時間で切り詰める"""
+        return min(timeout, self.remaining())
+    
+    def __repr__(self) -> str:
+        return f"Deadline(remaining={self.remaining():.3f}s)"
+
+
+# ==================== レイテンシ予算 ====================
+
+# 適用した品質劣化の識別子（ProblemDiscoveryOutput.degradations に記録）
+DEGRADE_LOCAL_CRITIC = "critic_local"
+DEGRADE_SHORT_HISTORY = "history_truncated"
+DEGRADE_FAST_MODEL = "fast_model"
+
+
+class LatencyBudgetPolicy(BaseModel):
+    """
+    レイテンシ予算が少ないときの段階的な品質劣化ルール
+    
+    各しきい値は「その時点での残り時間（秒）」と比較する。
+    """
+    fast_model_below: float = Field(default=10.0, description="開始時の残りがこれ未満なら高速モデルに切り替え")
+    short_history_below: float = Field(default=15.0, description="開始時の残りがこれ未満なら会話履歴を短縮")
+    short_history_messages: int = Field(default=4, description="短縮時に残す直近の履歴件数")
+    llm_critic_below: float = Field(default=8.0, description="抽出後の残りがこれ未満ならLLM Criticをローカル検査に置換")
+
+
+# ==================== ローリングパーセンタイル ====================
+
+class LatencyTracker:
+    """
+    直近 window 件のレイテンシを保持し、パーセンタイルを返す
+    
+    スレッドセーフ。サンプル数が min_samples 未満の間は
+    percentile() が None を返す（ヘッジ判定を行わない）。
+    """
+    
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        self._samples: deque[float] = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.min_samples = min_samples
+    
+    def record(self, seconds: float) -> None:
+        """レイテンシを1件記録"""
+        with self._lock:
+            self._samples.append(seconds)
+    
+    def percentile(self, q: float) -> float | None:
+        """q（0.0-1.0）パーセンタイルを返す"""
+        with self._lock:
+            if len(self._samples) < self.min_samples:
+                return None
+            ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, max(0, int(round(q * (len(ordered) - 1)))))
+        return ordered[index]
+    
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._samples)
+
+
+def summarize_latencies(samples: list[float]) -> dict[str, float]:
+    """ベンチマーク用: p50/p95/p99/平均/最大を計算"""
+    if not samples:
+        return {"count": 0, "mean": 0.0, "p50": 0.0, "p95": 0.0, "p99": 0.0, "max": 0.0}
+    ordered = sorted(samples)
+    
+    def pick(q: float) -> float:
+        return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+    
+    return {
+        "count": len(ordered),
+        "mean": sum(ordered) / len(ordered),
+        "p50": pick(0.50),
+        "p95": pick(0.95),
+        "p99": pick(0.99),
+        "max": ordered[-1],
+    }
+
+
+# ==================== ヘッジドリクエスト ====================
+
+# クライアント側のタイムアウト（Gemini クライアントは httpx のタイムアウト例外を送出する）
+CLIENT_TIMEOUT_ERRORS: tuple[type[BaseException], ...] = (TimeoutError, httpx.TimeoutException)
+
+# max_workers を指定しない HedgedInvoker が共有するスレッドプール
+# （エージェントを作るたびにプールを作るとスレッドが解放されずに増え続けるため）
+SHARED_MAX_WORKERS = 32
+_shared_executor: ThreadPoolExecutor | None = None
+_shared_lock = threading.Lock()
+
+
+def _get_shared_executor() -> ThreadPoolExecutor:
+    global _shared_executor
+    with _shared_lock:
+        if _shared_executor is None:
+            _shared_executor = ThreadPoolExecutor(max_workers=SHARED_MAX_WORKERS, thread_name_prefix="hedged-llm")
+        return _shared_executor
+
+
+class HedgedInvoker:
+    """
+    テールレイテンシ対策のヘッジドリクエスト実行器
+    
+    1. 一次リクエストを送信
+    2. ローリング p{hedge_percentile} を超えても応答がなければ複製リクエストを送信
+    3. 最初に返ってきた「有効な」応答を採用し、残りはキャンセル
+    
+    同期版（invoke）はスレッドで実行するため、既に開始したリクエストは
+    結果を破棄するのみ（ソケットはクライアントのタイムアウトで閉じられる）。
+    非同期版（ainvoke）は敗者のタスクを実際にキャンセルする。
+    
+    同期版のスレッドは、max_workers を省略するとプロセス内で共有するプール
+    （SHARED_MAX_WORKERS 本）を使う。max_workers を指定した場合は専用のプールを作り、
+    close() または with ブロックの終了で解放する。
+    """
+    
+    def __init__(
+        self,
+        tracker: LatencyTracker | None = None,
+        hedge_percentile: float = 0.9,
+        max_hedges: int = 1,
+        max_workers: int | None = None,
+    ):
+        self.tracker = tracker or LatencyTracker()
+        self.hedge_percentile = hedge_percentile
+        self.max_hedges = max_hedges
+        self._owns_executor = max_workers is not None
+        if max_workers is not None:
+            self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="hedged-llm")
+        else:
+            self._executor = _get_shared_executor()
+        self.hedges_sent = 0
+        self.hedges_won = 0
+    
+    def close(self) -> None:
+        """専用のスレッドプールを解放する（共有プールは解放しない）"""
+        if self._owns_executor:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+    
+    def __enter__(self) -> "HedgedInvoker":
+        return self
+    
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+    
+    def hedge_delay(self, timeout: float) -> float | None:
+        """ヘッジを送るまでの待ち時間。送らない場合は None"""
+        if self.max_hedges <= 0:
+            return None
+        delay = self.tracker.percentile(self.hedge_percentile)
+        if delay is None or delay >= timeout:
+            return None
+        return delay
+    
+    def invoke(
+        self,
+        call: Callable[[], T],
+        timeout: float,
+        is_valid: Callable[[T], bool] | None = None,
+        hedge: bool = True,
+    ) -> T:
+        """
+        同期版: call をヘッジ付きで実行
+        
+        hedge=False の場合はタイムアウトのみ適用し、レイテンシ統計にも記録しない
+        （抽出以外の呼び出しで p90 を汚さないため）。
+        クライアント側のタイムアウト（CLIENT_TIMEOUT_ERRORS）も DeadlineExceededError として送出する。
+        """
+        if timeout <= 0:
+            raise DeadlineExceededError("デッドラインを超過しています")
+        
+        started = time.monotonic()
+        end = started + timeout
+        pending: dict[Future, bool] = {}
+        
+        def submit(is_hedge: bool) -> None:
+            ctx = contextvars.copy_context()
+            pending[self._executor.submit(ctx.run, self._timed, call)] = is_hedge
+        
+        submit(False)
+        hedges = 0
+        fallback: tuple[bool, Any] | None = None
+        
+        try:
+            while pending:
+                now = time.monotonic()
+                if now >= end:
+                    break
+                wait_for = end - now
+                delay = self.hedge_delay(timeout) if hedge and hedges < self.max_hedges else None
+                if delay is not None:
+                    wait_for = min(wait_for, max(0.0, started + delay * (hedges + 1) - now))
+                
+                done, _ = wait(list(pending), timeout=wait_for, return_when=FIRST_COMPLETED)
+                if not done:
+                    if delay is not None and time.monotonic() < end:
+                        hedges += 1
+                        self.hedges_sent += 1
+                        submit(True)
+                    continue
+                
+                for future in done:
+                    is_hedge = pending.pop(future)
+                    error = future.exception()
+                    if error is not None:
+                        fallback = fallback or (False, error)
+                        continue
+                    result, elapsed = future.result()
+                    if hedge:
+                        self.tracker.record(elapsed)
+                    if is_valid is None or is_valid(result):
+                        if is_hedge:
+                            self.hedges_won += 1
+                        return result
+                    fallback = (True, result)
+        finally:
+            for future in pending:
+                future.cancel()
+        
+        if fallback is not None:
+            ok, value = fallback
+            if ok:
+                return value
+            raise self._failure(value)
+        raise DeadlineExceededError(f"LLM呼び出しが {timeout:.1f} 秒以内に完了しませんでした")
+    
+    async def ainvoke(
+        self,
+        call: Callable[[], Awaitable[T]],
+        timeout: float,
+        is_valid: Callable[[T], bool] | None = None,
+        hedge: bool = True,
+    ) -> T:
+        """非同期版: call をヘッジ付きで実行し、敗者タスクをキャンセル"""
+        if timeout <= 0:
+            raise DeadlineExceededError("デッドラインを超過しています")
+        
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        end = started + timeout
+        pending: dict[asyncio.Task, bool] = {}
+        
+        async def timed() -> tuple[T, float]:
+            t0 = loop.time()
+            result = await call()
+            return result, loop.time() - t0
+        
+        pending[asyncio.ensure_future(timed())] = False
+        hedges = 0
+        fallback: tuple[bool, Any] | None = None
+        
+        try:
+            while pending:
+                now = loop.time()
+                if now >= end:
+                    break
+                wait_for = end - now
+                delay = self.hedge_delay(timeout) if hedge and hedges < self.max_hedges else None
+                if delay is not None:
+                    wait_for = min(wait_for, max(0.0, started + delay * (hedges + 1) - now))
+                
+                done, _ = await asyncio.wait(list(pending), timeout=wait_for, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    if delay is not None and loop.time() < end:
+                        hedges += 1
+                        self.hedges_sent += 1
+                        pending[asyncio.ensure_future(timed())] = True
+                    continue
+                
+                for task in done:
+                    is_hedge = pending.pop(task)
+                    error = task.exception()
+                    if error is not None:
+                        fallback = fallback or (False, error)
+                        continue
+                    result, elapsed = task.result()
+                    if hedge:
+                        self.tracker.record(elapsed)
+                    if is_valid is None or is_valid(result):
+                        if is_hedge:
+                            self.hedges_won += 1
+                        return result
+                    fallback = (True, result)
+        finally:
+            for task in pending:
+                task.cancel()
+        
+        if fallback is not None:
+            ok, value = fallback
+            if ok:
+                return value
+            raise self._failure(value)
+        raise DeadlineExceededError(f"LLM呼び出しが {timeout:.1f} 秒以内に完了しませんでした")
+    
+    @staticmethod
+    def _failure(error: BaseException) -> BaseException:
+        """呼び出しの例外。クライアント側のタイムアウトはデッドライン超過として扱う"""
+        if isinstance(error, CLIENT_TIMEOUT_ERRORS) and not isinstance(error, DeadlineExceededError):
+            deadline_error = DeadlineExceededError(str(error) or "LLM呼び出しがタイムアウトしました")
+            deadline_error.__cause__ = error
+            return deadline_error
+        return error
+    
+    @staticmethod
+    def _timed(call: Callable[[], T]) -> tuple[T, float]:
+        t0 = time.monotonic()
+        result = call()
+        return result, time.monotonic() - t0
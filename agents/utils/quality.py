@@ -0,0 +1,122 @@
+"""
+ローカル品質チェック（LLMを使わない構造検査）
+Problem Discovery Agent - Local Quality Checks
+
+仕様書セクション7のCriticチェック項目のうち、構造的に判定できるものを
+ルールベースで評価する。LLM Critic を省略する場合の代替として使う。
+"""
+
+import re
+
+from agents.utils.schemas import ProblemDiscoveryOutput, QualityReport
+
+# ローカル判定の信頼度上限（意味的な妥当性までは判定できないため）
+LOCAL_CONFIDENCE_CAP = 0.85
+
+# 具体性に欠ける値
+_VAGUE_VALUES = {"", "不明", "なし", "特になし", "未定", "-", "n/a", "unknown"}
+
+# 文末（problemStatement が1文かどうかの判定用）
+_SENTENCE_END = re.compile(r"[。．！？!?]")
+
+# 動詞の終止形・「〜したい」等で終わっていれば「動詞＋目的語」とみなす
+VERB_ENDING = re.compile(r"(する|したい|できる|[うくぐすつぬぶむるい]|たい)$")
+
+
+def is_vague(value: str) -> bool:
+    """空・「不明」など具体性に欠ける値か（gaps でも同じ判定を使う）"""
+    return value.strip().lower() in _VAGUE_VALUES
+
+
+def check_job(output: ProblemDiscoveryOutput) -> list[str]:
+    """1. job.main が「動詞＋目的語」の形式か"""
+    main = output.problem_discovery_sheet.job.main.strip()
+    if is_vague(main) or not VERB_ENDING.search(main):
+        return ["job.main"]
+    return []
+
+
+def check_context(output: ProblemDiscoveryOutput) -> list[str]:
+    """2. context.trigger が具体的か"""
+    trigger = output.problem_discovery_sheet.context.trigger
+    if is_vague(trigger) or len(trigger.strip()) < 4:
+        return ["context.trigger"]
+    return []
+
+
+def check_pains(output: ProblemDiscoveryOutput) -> list[str]:
+    """3. pains が抽象語のみで終わっていないか（影響が明確か）"""
+    pains = output.problem_discovery_sheet.pains
+    if not pains:
+        return ["pains"]
+    return [
+        f"pains[{i}].impact"
+        for i, p in enumerate(pains)
+        if is_vague(p.pain) or is_vague(p.impact)
+    ]
+
+
+def check_current_solutions(output: ProblemDiscoveryOutput) -> list[str]:
+    """4. currentSolutions が最低1件あるか"""
+    solutions = output.problem_discovery_sheet.current_solutions
+    if not any(not is_vague(s.solution) for s in solutions):
+        return ["currentSolutions"]
+    return []
+
+
+def check_unmet_needs(output: ProblemDiscoveryOutput) -> list[str]:
+    """5. unmetNeeds が pains とつながっているか（Why深掘りがあるか）"""
+    sheet = output.problem_discovery_sheet
+    if not sheet.pains:
+        return []
+    if not sheet.unmet_needs:
+        return ["unmetNeeds"]
+    return [
+        f"unmetNeeds[{i}].whyDepth"
+        for i, n in enumerate(sheet.unmet_needs)
+        if not n.why_depth
+    ]
+
+
+def check_problem_statement(output: ProblemDiscoveryOutput) -> list[str]:
+    """6. problemStatement が1文で完結しているか"""
+    statement = output.problem_statement.strip()
+    if not statement:
+        return ["problemStatement"]
+    # 最後の1文字を除いた本文中に文末記号があれば複数文
+    if _SENTENCE_END.search(statement[:-1]):
+        return ["problemStatement"]
+    return []
+
+
+LOCAL_CHECKS = (
+    check_job,
+    check_context,
+    check_pains,
+    check_current_solutions,
+    check_unmet_needs,
+    check_problem_statement,
+)
+
+
+def local_quality_check(output: ProblemDiscoveryOutput) -> QualityReport:
+    """
+    構造チェックのみで QualityReport を作成
+    
+    全項目クリアで confidence = LOCAL_CONFIDENCE_CAP、nextAction = "proceed"。
+    """
+    missing_fields: list[str] = []
+    passed = 0
+    for check in LOCAL_CHECKS:
+        result = check(output)
+        if result:
+            missing_fields.extend(result)
+        else:
+            passed += 1
+    
+    return QualityReport(
+        confidence=round(LOCAL_CONFIDENCE_CAP * passed / len(LOCAL_CHECKS), 2),
+        missing_fields=missing_fields,
+        contradictions=[],
+        next_action="proceed" if not missing_fields else "ask_more",
+    )
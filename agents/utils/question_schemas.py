@@ -0,0 +1,136 @@
+"""
+質問設計エージェント用のデータスキーマ定義
+Question Design Agent - Data Schemas
+"""
+
+from typing import Optional
+from pydantic import BaseModel, Field
+
+from agents.utils.schemas import ProblemDiscoveryOutput, ProblemDiscoverySheet, ProjectMeta
+
+# 質問カテゴリ（5W1H＋感情）
+QUESTION_CATEGORIES = ("who", "when", "where", "what", "why", "how", "emotion")
+
+# 網羅性を判定する観点（qualityReport.coverage のキー）
+COVERAGE_ASPECTS = ("job", "context", "pain", "emotion")
+
+PRIORITIES = ("high", "medium", "low")
+
+
+# ==================== 入力スキーマ ====================
+
+class QuestionDesignInput(BaseModel):
+    """質問設計エージェントへの入力（Phase 1 の出力）"""
+    problem_statement: str = Field(description="Phase 1 で生成された課題文")
+    problem_discovery_sheet: Optional[ProblemDiscoverySheet] = Field(default=None, description="Phase 1 の構造化データ")
+    project_meta: Optional[ProjectMeta] = Field(default=None, description="プロジェクトメタ情報")
+    
+    @classmethod
+    def from_phase1(
+        cls,
+        output: ProblemDiscoveryOutput,
+        project_meta: Optional[ProjectMeta] = None,
+    ) -> "QuestionDesignInput":
+        """Phase 1 の出力から入力を作成"""
+        return cls(
+            problem_statement=output.problem_statement,
+            problem_discovery_sheet=output.problem_discovery_sheet,
+            project_meta=project_meta,
+        )
+
+
+# ==================== ギャップ ====================
+
+class Gap(BaseModel):
+    """Phase 1 出力の情報ギャップ（ローカルで検出）"""
+    field: str = Field(description="補完対象の Phase 1 フィールド（例: context.trigger）")
+    category: str = Field(description="対応する質問カテゴリ（who/when/where/what/why/how/emotion）")
+    aspect: str = Field(description="網羅性の観点（job/context/pain/emotion）")
+    kind: str = Field(default="missing", description="missing（欠落）/ unclear（曖昧）/ verify（仮説の検証）")
+    reason: str = Field(default="", description="ギャップの説明")
+    current: str = Field(default="", description="現在の値（プロンプトに含める関連フィールド）")
+    priority: str = Field(default="medium", description="優先度（high/medium/low）")
+
+
+# ==================== 出力スキーマ ====================
+
+class DesignedQuestion(BaseModel):
+    """質問シートの質問"""
+    question: str = Field(default="", description="質問文")
+    category: str = Field(default="what", description="カテゴリ（who/when/where/what/why/how/emotion）")
+    intent: str = Field(default="", description="質問の意図")
+    priority: str = Field(default="medium", description="優先度（high/medium/low）")
+    related_field: str = Field(default="", description="補完する Phase 1 のフィールド")
+
+
+class QuestionIntent(BaseModel):
+    """質問が明らかにするギャップと Phase 1 のフィールドの対応"""
+    target: str = Field(default="", description="この質問で明らかにする不足・不確かな点")
+    linked_phase1_field: str = Field(default="", description="対応する Phase 1 のフィールド")
+
+
+class Coverage(BaseModel):
+    """観点ごとの網羅性"""
+    job: bool = Field(default=False, description="job のギャップを補えているか")
+    context: bool = Field(default=False, description="context のギャップを補えているか")
+    pain: bool = Field(default=False, description="pain のギャップを補えているか")
+    emotion: bool = Field(default=False, description="感情・判断基準のギャップを補えているか")
+
+
+class QuestionQualityReport(BaseModel):
+    """質問シートの品質レポート（ローカルで判定）"""
+    confidence: float = Field(default=0.0, ge=0.0, le=1.0, description="信頼度（0.0-1.0）")
+    coverage: Coverage = Field(default_factory=Coverage, description="観点ごとの網羅性")
+    missing_fields: list[str] = Field(default_factory=list, description="質問で補えていないギャップのフィールド")
+    issues: list[str] = Field(default_factory=list, description="除外した質問・規則違反の説明")
+    next_action: str = Field(default="ask_user", description="次アクション（ask_user/proceed）")
+
+
+class QuestionDesignOutput(BaseModel):
+    """質問設計エージェントの出力"""
+    question_sheet: list[DesignedQuestion] = Field(default_factory=list, description="質問シート（最大10問）")
+    question_intent_map: list[QuestionIntent] = Field(
+        default_factory=list,
+        description="質問ごとの意図の対応（question_sheet と同じ順序）"
+    )
+    quality_report: QuestionQualityReport = Field(
+        default_factory=QuestionQualityReport,
+        description="品質レポート"
+    )
+    gaps: list[Gap] = Field(default_factory=list, description="検出した情報ギャップ（監査用）")
+
+
+# ==================== Firestore用変換 ====================
+
+class QuestionDesignFirestoreOutput(BaseModel):
+    """Firestore保存用のキャメルケース変換済み出力（{projectId}/phase/question_design）"""
+    
+    @classmethod
+    def from_output(cls, output: QuestionDesignOutput) -> dict:
+        """QuestionDesignOutputをFirestore保存用の辞書に変換"""
+        return {
+            "questionSheet": [
+                {
+                    "question": q.question,
+                    "category": q.category,
+                    "intent": q.intent,
+                    "priority": q.priority,
+                    "relatedField": q.related_field,
+                }
+                for q in output.question_sheet
+            ],
+            "questionIntentMap": [
+                {
+                    "target": i.target,
+                    "linkedPhase1Field": i.linked_phase1_field,
+                }
+                for i in output.question_intent_map
+            ],
+            "qualityReport": {
+                "confidence": output.quality_report.confidence,
+                "coverage": output.quality_report.coverage.model_dump(),
+                "missingFields": output.quality_report.missing_fields,
+                "issues": output.quality_report.issues,
+                "nextAction": output.quality_report.next_action,
+            },
+        }
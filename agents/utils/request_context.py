@@ -0,0 +1,78 @@
+"""
+リクエストコンテキスト（テナント・プロジェクト・優先レーン）
+Request Context propagated via contextvars
+
+LLM呼び出しのスケジューリングやトークン予算の計上に使う識別子を、
+関数引数を増やさずにエージェント内部まで伝搬する。
+"""
+
+import contextvars
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+from pydantic import BaseModel, Field
+
+# 優先レーン（上にあるほど優先）
+LANE_INTERACTIVE = "interactive"
+LANE_BATCH = "batch"
+
+
+class RequestContext(BaseModel):
+    """現在のリクエストの識別情報"""
+    tenant_id: Optional[str] = Field(default=None, description="テナント（企業）ID")
+    project_id: Optional[str] = Field(default=None, description="プロジェクトID")
+    lane: str = Field(default=LANE_INTERACTIVE, description="優先レーン（interactive/batch）")
+    
+    @property
+    def flow_key(self) -> str:
+        """
+        公平スケジューリングの単位（テナント → プロジェクト → default）
+        
+        (テナント, プロジェクト) の組ではなくテナント単位にしている。クォータと重みは
+        テナントとの契約単位で、プロジェクトごとに分けると、プロジェクトを多く開いた
+        テナントほど割り当てが増えてしまうため。テナントのないリクエストだけは
+        プロジェクト単位とし、同名のテナントと混ざらないよう "project:" を前置する。
+        """
+        if self.tenant_id:
+            return self.tenant_id
+        if self.project_id:
+            return f"project:{self.project_id}"
+        return "default"
+
+
+_current: contextvars.ContextVar[RequestContext] = contextvars.ContextVar(
+    "agents_request_context", default=RequestContext()
+)
+
+
+def current_request_context() -> RequestContext:
+    """現在のリクエストコンテキストを返す"""
+    return _current.get()
+
+
+@contextmanager
+def request_context(
+    tenant_id: Optional[str] = None,
+    project_id: Optional[str] = None,
+    lane: Optional[str] = None,
+) -> Iterator[RequestContext]:
+    """
+    with ブロック内のLLM呼び出しにテナント・プロジェクト・レーンを設定
+    
+    省略した項目は外側のコンテキストを引き継ぐ。
+    
+    Example:
+        with request_context(tenant_id="acme", lane=LANE_BATCH):
+            agent.run(input_data)
+    """
+    outer = _current.get()
+    ctx = RequestContext(
+        tenant_id=tenant_id if tenant_id is not None else outer.tenant_id,
+        project_id=project_id if project_id is not None else outer.project_id,
+        lane=lane or outer.lane,
+    )
+    token = _current.set(ctx)
+    try:
+        yield ctx
+    finally:
+        _current.reset(token)
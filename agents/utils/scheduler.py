@@ -0,0 +1,301 @@
+"""
+LLM呼び出しの重み付き公平スケジューラ
+Weighted Fair Scheduler for LLM Calls
+
+すべてのエージェント呼び出しが同じ Gemini クォータを先着順で奪い合うと、
+1テナントの一括投入の後ろに対話ユーザーが並んでしまう。
+本スケジューラは同時実行数（クォータ）の前段で以下を行う。
+
+- 優先レーン: interactive を batch より常に先に割り当てる
+- レーン内: テナント（なければプロジェクト）ごとのキューを重み付き公平に取り出す
+  （Start-time Fair Queuing: 仮想時刻が最小のフローから取り出す）
+- デッドラインまでに割り当てられなかった呼び出しはキューから外して DeadlineExceededError
+- レーンごとのキュー長・待ち時間をメトリクスとして公開
+"""
+
+import asyncio
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from typing import AsyncIterator, Iterator, Optional, Union
+
+from agents.utils.latency import Deadline, DeadlineExceededError, LatencyTracker
+from agents.utils.request_context import (
+    LANE_BATCH,
+    LANE_INTERACTIVE,
+    RequestContext,
+    current_request_context,
+)
+
+
+class _Waiter:
+    """割り当て待ちの呼び出し1件"""
+    
+    __slots__ = ("flow", "enqueued_at", "event", "loop", "future", "granted")
+    
+    def __init__(self, flow: str):
+        self.flow = flow
+        self.enqueued_at = time.monotonic()
+        self.event: Optional[threading.Event] = None
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.future: Optional[asyncio.Future] = None
+        self.granted = False
+    
+    def wake(self) -> None:
+        if self.event is not None:
+            self.event.set()
+        elif self.loop is not None and self.future is not None:
+            self.loop.call_soon_threadsafe(_resolve, self.future)
+
+
+# 待ちのないフローの仮想終了時刻を掃除するしきい値（件数がこれを超えたら掃除する）
+PRUNE_MIN_FLOWS = 64
+
+
+def _resolve(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+class _Lane:
+    """優先レーン1本分のキューと統計"""
+    
+    def __init__(self, name: str):
+        self.name = name
+        self.flows: dict[str, deque[_Waiter]] = {}
+        self.finish_tags: dict[str, float] = {}
+        self.virtual_time = 0.0
+        self.prune_at = PRUNE_MIN_FLOWS
+        self.depth = 0
+        self.enqueued = 0
+        self.dispatched = 0
+        self.waits = LatencyTracker(window=1000, min_samples=1)
+        self.max_wait = 0.0
+
+
+class FairScheduler:
+    """
+    重み付き公平スケジューラ
+    
+    Args:
+        max_concurrency: 同時に実行できるLLM呼び出し数（クォータ）
+        lanes: 優先度の高い順のレーン名
+        weights: テナント（フローキー）ごとの重み。大きいほど多く割り当てる
+        default_weight: weights にないフローの重み
+    
+    Example:
+        scheduler = FairScheduler(max_concurrency=4, weights={"acme": 2.0})
+        agent = ProblemDiscoveryAgent(scheduler=scheduler)
+        with request_context(tenant_id="acme", lane=LANE_BATCH):
+            agent.run(input_data)
+    """
+    
+    def __init__(
+        self,
+        max_concurrency: int = 4,
+        lanes: tuple[str, ...] = (LANE_INTERACTIVE, LANE_BATCH),
+        weights: dict[str, float] | None = None,
+        default_weight: float = 1.0,
+    ):
+        self.max_concurrency = max_concurrency
+        self.lane_order = lanes
+        self.weights = dict(weights or {})
+        self.default_weight = default_weight
+        self._lanes = {name: _Lane(name) for name in lanes}
+        self._lock = threading.Lock()
+        self._in_flight = 0
+    
+    # ---------- 公開API ----------
+    
+    @contextmanager
+    def slot(
+        self,
+        ctx: RequestContext | None = None,
+        deadline: Union[Deadline, float, None] = None,
+    ) -> Iterator[None]:
+        """
+        同期版: 実行枠を獲得してから with ブロックを実行
+        
+        deadline（Deadline または残り秒数）までに割り当てられなければ、
+        キューから外して DeadlineExceededError を送出する。
+        """
+        deadline = Deadline.coerce(deadline)
+        waiter = self._enqueue(ctx)
+        if not waiter.granted:
+            waiter.event.wait(deadline.remaining() if deadline is not None else None)
+            if self._withdraw(waiter):
+                raise DeadlineExceededError("LLM呼び出しの実行枠を待つ間にデッドラインを超過しました")
+        try:
+            yield
+        finally:
+            self._release()
+    
+    @asynccontextmanager
+    async def aslot(
+        self,
+        ctx: RequestContext | None = None,
+        deadline: Union[Deadline, float, None] = None,
+    ) -> AsyncIterator[None]:
+        """非同期版: 実行枠を獲得してから async with ブロックを実行"""
+        deadline = Deadline.coerce(deadline)
+        waiter = self._enqueue(ctx, loop=asyncio.get_running_loop())
+        if not waiter.granted:
+            try:
+                await asyncio.wait_for(
+                    asyncio.shield(waiter.future),
+                    deadline.remaining() if deadline is not None else None,
+                )
+            except asyncio.CancelledError:
+                self._cancel(waiter)
+                raise
+            except TimeoutError:
+                if self._withdraw(waiter):
+                    raise DeadlineExceededError("LLM呼び出しの実行枠を待つ間にデッドラインを超過しました")
+        try:
+            yield
+        finally:
+            self._release()
+    
+    def metrics(self) -> dict[str, dict[str, float]]:
+        """レーンごとのキュー長・待ち時間（秒）"""
+        with self._lock:
+            result = {}
+            for name, lane in self._lanes.items():
+                result[name] = {
+                    "queueDepth": lane.depth,
+                    "flows": sum(1 for q in lane.flows.values() if q),
+                    "enqueued": lane.enqueued,
+                    "dispatched": lane.dispatched,
+                    "waitP50": lane.waits.percentile(0.5) or 0.0,
+                    "waitP95": lane.waits.percentile(0.95) or 0.0,
+                    "waitMax": lane.max_wait,
+                }
+            result["_total"] = {"inFlight": self._in_flight, "maxConcurrency": self.max_concurrency}
+            return result
+    
+    def queue_depths(self) -> dict[str, dict[str, int]]:
+        """レーン × フローごとの待ち件数"""
+        with self._lock:
+            return {
+                name: {flow: len(q) for flow, q in lane.flows.items() if q}
+                for name, lane in self._lanes.items()
+            }
+    
+    # ---------- 内部処理 ----------
+    
+    def _lane_for(self, ctx: RequestContext) -> _Lane:
+        lane = self._lanes.get(ctx.lane)
+        # 未知のレーンは最も低い優先度として扱う
+        return lane or self._lanes[self.lane_order[-1]]
+    
+    def _enqueue(self, ctx: RequestContext | None, loop: asyncio.AbstractEventLoop | None = None) -> _Waiter:
+        ctx = ctx or current_request_context()
+        lane = self._lane_for(ctx)
+        waiter = _Waiter(ctx.flow_key)
+        if loop is None:
+            waiter.event = threading.Event()
+        else:
+            waiter.loop = loop
+            waiter.future = loop.create_future()
+        
+        with self._lock:
+            lane.enqueued += 1
+            if self._in_flight < self.max_concurrency and not any(l.depth for l in self._lanes.values()):
+                # 空きがあり待ちもなければ即時割り当て
+                self._grant(lane, waiter)
+                lane.virtual_time = max(lane.virtual_time, lane.finish_tags.get(waiter.flow, 0.0))
+                lane.finish_tags[waiter.flow] = lane.virtual_time + 1.0 / self._weight(waiter.flow)
+                self._prune(lane)
+                return waiter
+            lane.flows.setdefault(waiter.flow, deque()).append(waiter)
+            lane.depth += 1
+        return waiter
+    
+    def _weight(self, flow: str) -> float:
+        return max(1e-6, self.weights.get(flow, self.default_weight))
+    
+    def _grant(self, lane: _Lane, waiter: _Waiter) -> None:
+        """ロック保持中に呼ぶ"""
+        self._in_flight += 1
+        waiter.granted = True
+        lane.dispatched += 1
+        waited = time.monotonic() - waiter.enqueued_at
+        lane.waits.record(waited)
+        lane.max_wait = max(lane.max_wait, waited)
+    
+    def _release(self) -> None:
+        wake: list[_Waiter] = []
+        with self._lock:
+            self._in_flight -= 1
+            while self._in_flight < self.max_concurrency:
+                waiter = self._dequeue()
+                if waiter is None:
+                    break
+                wake.append(waiter)
+        for waiter in wake:
+            waiter.wake()
+    
+    def _dequeue(self) -> _Waiter | None:
+        """ロック保持中に呼ぶ。優先レーン順に、仮想開始時刻が最小のフローから取り出す"""
+        for name in self.lane_order:
+            lane = self._lanes[name]
+            if not lane.depth:
+                continue
+            best_flow, best_start = None, None
+            for flow, queue in lane.flows.items():
+                if not queue:
+                    continue
+                start = max(lane.finish_tags.get(flow, 0.0), lane.virtual_time)
+                if best_start is None or start < best_start:
+                    best_flow, best_start = flow, start
+            queue = lane.flows[best_flow]
+            waiter = queue.popleft()
+            if not queue:
+                del lane.flows[best_flow]
+            lane.depth -= 1
+            lane.virtual_time = best_start
+            lane.finish_tags[best_flow] = best_start + 1.0 / self._weight(best_flow)
+            self._grant(lane, waiter)
+            self._prune(lane)
+            return waiter
+        return None
+    
+    def _prune(self, lane: _Lane) -> None:
+        """
+        ロック保持中に呼ぶ。待ちのないフローのうち、仮想終了時刻が仮想時刻に
+        追い越されたものを捨てる（開始時刻は仮想時刻になるため、捨てても順序は変わらない）
+        
+        レーンに待ちがなければ混雑期間の終わりとみなし、仮想時刻を最大の終了時刻まで進める
+        （SFQ の定義どおり。待ちのない間に即時割り当てだけが続いても掃除できるようにする）。
+        フロー数が前回の掃除の2倍を超えたときだけ走査する（償却 O(1)）。
+        """
+        if len(lane.finish_tags) <= lane.prune_at:
+            return
+        if not lane.depth:
+            lane.virtual_time = max(lane.virtual_time, max(lane.finish_tags.values()))
+        lane.finish_tags = {
+            flow: tag for flow, tag in lane.finish_tags.items()
+            if tag > lane.virtual_time or flow in lane.flows
+        }
+        lane.prune_at = max(PRUNE_MIN_FLOWS, 2 * len(lane.finish_tags))
+    
+    def _withdraw(self, waiter: _Waiter) -> bool:
+        """割り当て前の待機をキューから外す。すでに割り当て済みなら False（枠はそのまま使う）"""
+        with self._lock:
+            if waiter.granted:
+                return False
+            for lane in self._lanes.values():
+                queue = lane.flows.get(waiter.flow)
+                if queue and waiter in queue:
+                    queue.remove(waiter)
+                    if not queue:
+                        del lane.flows[waiter.flow]
+                    lane.depth -= 1
+                    break
+            return True
+    
+    def _cancel(self, waiter: _Waiter) -> None:
+        """待機中にキャンセルされた呼び出しを取り除く（割り当て済みなら枠を返す）"""
+        if not self._withdraw(waiter):
+            self._release()
@@ -96,6 +96,14 @@ class FollowupQuestion(BaseModel):
     question: str = Field(default="", description="質問文")
     intent: str = Field(default="", description="質問の意図")
     type: str = Field(default="open", description="質問タイプ（open/closed/scale）")
+    target: str = Field(default="", description="回答で更新するシートのフィールド（例: pains[0].severity）")
+    options: list[str] = Field(default_factory=list, description="closed の選択肢（そのまま target に書き込める値）")
+
+
+class FollowupAnswer(BaseModel):
+    """追加質問への構造化回答"""
+    question_index: int = Field(ge=0, description="followupQuestions 内の質問の位置")
+    answer: str = Field(description="回答（scale は 1-5、closed は選択肢の文言または番号）")
 
 
 class QualityReport(BaseModel):
@@ -124,6 +132,10 @@ class ProblemDiscoveryOutput(BaseModel):
         default_factory=QualityReport,
         description="品質レポート"
     )
+    degradations: list[str] = Field(
+        default_factory=list,
+        description="レイテンシ予算のために適用した品質劣化（監査用）"
+    )
 
 
 # ==================== Firestore用変換 ====================
@@ -189,6 +201,8 @@ class FirestoreOutput(BaseModel):
                     "question": q.question,
                     "intent": q.intent,
                     "type": q.type,
+                    "target": q.target,
+                    "options": q.options,
                 }
                 for q in output.followup_questions
             ],
@@ -198,4 +212,40 @@ class FirestoreOutput(BaseModel):
                 "contradictions": output.quality_report.contradictions,
                 "nextAction": output.quality_report.next_action,
             },
+            "degradations": output.degradations,
         }
+
+
+# ==================== セッション状態 ====================
+
+def _compact(value):
+    """空文字・空リスト・空辞書を再帰的に取り除く"""
+    if isinstance(value, dict):
+        items = {k: _compact(v) for k, v in value.items()}
+        return {k: v for k, v in items.items() if v not in ("", [], {}, None)}
+    if isinstance(value, list):
+        return [_compact(v) for v in value]
+    return value
+
+
+class SessionState(BaseModel):
+    """
+    オーケストレーターのセッション状態（シリアライズ可能なスナップショット）
+    
+    ワーカーはこの状態だけを受け取って次のステップを実行できる。
+    JSON化は model_dump_json() / model_validate_json() を使う。
+    """
+    iteration: int = Field(default=0, description="実行済みのエージェント往復回数")
+    user_free_text: str = Field(default="", description="直近ターンのユーザー入力")
+    project_meta: Optional[ProjectMeta] = Field(default=None, description="プロジェクトメタ情報")
+    history: list[ConversationMessage] = Field(default_factory=list, description="会話履歴")
+    problem_statement: str = Field(default="", description="直近の problemStatement")
+    sheet: dict = Field(default_factory=dict, description="直近の problemDiscoverySheet（空値を除いたキャメルケース辞書）")
+    followup_questions: list[FollowupQuestion] = Field(default_factory=list, description="直近の追加質問")
+    quality_report: QualityReport = Field(default_factory=QualityReport, description="直近の品質レポート")
+    next_phase: str = Field(default="problem_discovery", description="次のフェーズ名")
+    
+    @staticmethod
+    def compact_sheet(output: ProblemDiscoveryOutput) -> dict:
+        """出力のシートを空値を除いたキャメルケース辞書に変換"""
+        return _compact(FirestoreOutput.from_output(output)["problemDiscoverySheet"])
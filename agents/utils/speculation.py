@@ -0,0 +1,195 @@
+"""
+ユーザーの回答待ち時間を使った投機実行
+Speculative Pre-computation of Follow-up Turns
+
+追加質問を表示してからユーザーが回答するまでの数十秒、ワーカーは何もしていない。
+選択肢の少ない closed 質問については、回答の候補ごとに次の抽出をバックグラウンドで
+先行実行しておき、実際の回答が候補と一致すればその結果を即座に返す。
+
+- 候補は closed 質問の選択肢の組み合わせ（選択肢の並び順に、上限件数・見積もりトークンまで）
+- 実際の回答と一致しなかった候補は破棄する（未開始のものは取り消し、実行中のものは結果を捨てる）
+- 保持するセッション数には上限があり、回答が届かなかったセッションは古いものから破棄する
+- 先行実行には締め切り（run_timeout）があり、回答待ちのターンが際限なく待たされることはない
+"""
+
+import hashlib
+import itertools
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Iterator, Optional
+
+from pydantic import BaseModel, Field
+
+from agents.utils.answers import match_option
+from agents.utils.schemas import FollowupAnswer, FollowupQuestion, SessionState
+
+# 回答候補のキー（(質問の位置, 選択肢) の組、質問の位置順）
+AnswerKey = tuple[tuple[int, str], ...]
+
+
+class SpeculationPolicy(BaseModel):
+    """投機実行の設定（1ターンあたりのコスト上限）"""
+    max_runs: int = Field(default=4, ge=0, description="1ターンあたりに先行実行する回答候補の上限件数")
+    max_tokens: Optional[int] = Field(
+        default=None, ge=0,
+        description="1ターンあたりの先行実行の見積もりトークン合計の上限（None なら件数のみで制限）"
+    )
+    max_options: int = Field(default=4, ge=2, description="選択肢がこれより多い closed 質問は投機しない")
+    max_workers: int = Field(default=4, ge=1, description="同時に実行する先行実行の数")
+    max_sessions: int = Field(default=64, ge=1, description="先行実行の結果を保持するセッション数の上限")
+    run_timeout: float = Field(
+        default=60.0, gt=0,
+        description="先行実行1件の締め切り（秒、開始待ちを含む）。過ぎた実行は打ち切り、通常どおり実行する"
+    )
+
+
+# ==================== 回答候補 ====================
+
+def candidate_answers(questions: list[FollowupQuestion], max_options: int) -> Iterator[list[FollowupAnswer]]:
+    """
+    closed 質問すべてに回答した場合の選択肢の組み合わせを、選択肢の並び順に列挙する
+    
+    選択肢が1つ以下、または max_options を超える closed 質問がある場合は投機しない
+    （open / scale 質問は候補に含めない）。
+    """
+    closed = [(i, q) for i, q in enumerate(questions) if q.type == "closed"]
+    if not closed or any(not 2 <= len(q.options) <= max_options for _, q in closed):
+        return iter(())
+    return (
+        [FollowupAnswer(question_index=i, answer=option) for (i, _), option in zip(closed, combo)]
+        for combo in itertools.product(*(q.options for _, q in closed))
+    )
+
+
+def answer_key(questions: list[FollowupQuestion], answers: Any) -> Optional[AnswerKey]:
+    """
+    回答を候補のキーに正規化する（番号・表記ゆれは選択肢に揃える）
+    
+    自由回答、closed 以外の質問への回答、選択肢に対応しない回答を含む場合は None。
+    """
+    if not isinstance(answers, list) or not answers:
+        return None
+    key = {}
+    for answer in answers:
+        if not 0 <= answer.question_index < len(questions):
+            return None
+        question = questions[answer.question_index]
+        option = match_option(answer.answer, question.options) if question.type == "closed" else None
+        if option is None:
+            return None
+        key[answer.question_index] = option
+    return tuple(sorted(key.items()))
+
+
+def state_key(state: SessionState) -> str:
+    """セッション状態の内容ハッシュ（同じ状態への回答だけを照合する）"""
+    return hashlib.sha256(state.model_dump_json().encode("utf-8")).hexdigest()
+
+
+# ==================== 先行実行の管理 ====================
+
+class Speculator:
+    """
+    回答候補ごとの先行実行を保持し、実際の回答と照合する
+    
+    Args:
+        policy: 投機実行の設定
+        name: スレッド名の接頭辞
+    """
+    
+    def __init__(self, policy: SpeculationPolicy | None = None, name: str = "speculation"):
+        self.policy = policy or SpeculationPolicy()
+        self._sessions: OrderedDict[str, dict[AnswerKey, tuple[Any, Future]]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=self.policy.max_workers, thread_name_prefix=name)
+        # 統計
+        self.started = 0
+        self.served = 0
+        self.discarded = 0
+        self.missed = 0
+        # served のうち、失敗した・予算内に終わらなかったため結果を使えなかった件数
+        self.failed = 0
+        self.late = 0
+    
+    def submit(self, session: str, key: AnswerKey, payload: Any, fn: Callable[[], Any]) -> Future:
+        """
+        回答候補の先行実行を開始する
+        
+        payload は照合時に結果と一緒に返す値（次のエージェント入力など）。
+        """
+        future = self._executor.submit(fn)
+        evicted: list[Future] = []
+        with self._lock:
+            runs = self._sessions.setdefault(session, {})
+            self._sessions.move_to_end(session)
+            runs[key] = (payload, future)
+            self.started += 1
+            while len(self._sessions) > self.policy.max_sessions:
+                _, stale = self._sessions.popitem(last=False)
+                evicted.extend(f for _, f in stale.values())
+        self._cancel(evicted)
+        return future
+    
+    def take(self, session: str, key: Optional[AnswerKey]) -> Optional[tuple[Any, Future]]:
+        """
+        実際の回答に一致する先行実行を取り出し、同じセッションの残りを破棄する
+        
+        Returns:
+            (payload, Future)。一致する候補がなければ None
+        """
+        with self._lock:
+            runs = self._sessions.pop(session, None)
+        if not runs:
+            return None
+        hit = runs.pop(key, None) if key is not None else None
+        with self._lock:
+            if hit is not None:
+                self.served += 1
+            else:
+                self.missed += 1
+        self._cancel([f for _, f in runs.values()])
+        return hit
+    
+    def record_unused(self, error: BaseException) -> None:
+        """
+        取り出した先行実行の結果を使えなかったことを記録する
+        
+        TimeoutError（待ちがターンの予算を超えた）は late、それ以外は failed に数える。
+        """
+        with self._lock:
+            if isinstance(error, TimeoutError):
+                self.late += 1
+            else:
+                self.failed += 1
+    
+    def pending(self, session: str) -> int:
+        """セッションで保持している先行実行の件数"""
+        with self._lock:
+            return len(self._sessions.get(session, {}))
+    
+    def close(self) -> None:
+        """保持している先行実行をすべて破棄して終了する"""
+        with self._lock:
+            futures = [f for runs in self._sessions.values() for _, f in runs.values()]
+            self._sessions.clear()
+        self._cancel(futures)
+        self._executor.shutdown(wait=False, cancel_futures=True)
+    
+    def stats(self) -> dict[str, int]:
+        return {
+            "started": self.started,
+            "served": self.served,
+            "discarded": self.discarded,
+            "missed": self.missed,
+            "failed": self.failed,
+            "late": self.late,
+            "sessions": len(self._sessions),
+        }
+    
+    def _cancel(self, futures: list[Future]) -> None:
+        """未開始のものは取り消す。実行中のものは止められないため、結果を捨てる"""
+        for future in futures:
+            future.cancel()
+        with self._lock:
+            self.discarded += len(futures)
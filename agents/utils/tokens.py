@@ -0,0 +1,295 @@
+"""
+トークン数の事前見積もりとトークン予算
+Pre-flight Token Estimation and Token Budgets
+
+LLMを呼ぶ前に、描画済みプロンプトと想定出力からトークン数を見積もり、
+テナント・プロジェクトごとの予算（TokenBudgetLedger）と照合する。
+予算を超える場合、エージェントは入力を縮めるか、理由を付けて拒否する。
+
+見積もりは文字種ごとの係数（日本語向けに調整）による。実測値があれば
+TokenEstimator.calibrate() で全体の倍率を合わせられる。
+"""
+
+import math
+import re
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Iterator, Optional
+
+from langchain_core.callbacks import UsageMetadataCallbackHandler
+from langchain_core.tracers.context import register_configure_hook
+from pydantic import BaseModel, Field
+
+from agents.utils.request_context import RequestContext, current_request_context
+
+# 入力の縮小（degradations に記録する名前）
+DEGRADE_META_TRIMMED = "project_meta_trimmed"
+DEGRADE_INPUT_TRUNCATED = "input_truncated"
+
+# 文字種ごとの1文字あたりトークン数（Gemini のトークナイザで日本語主体の文章を計測した目安）
+CHAR_CLASS_RATES: dict[str, float] = {
+    "kanji": 0.9,
+    "hiragana": 0.5,
+    "katakana": 0.6,
+    "ascii_word": 0.25,   # 英数字（おおむね4文字で1トークン）
+    "ascii_symbol": 0.5,  # JSONの括弧・引用符など
+    "space": 0.0,         # 空白・改行は前後のトークンに含まれる
+    "other": 1.0,         # 全角記号・絵文字など
+}
+
+_CHAR_CLASSES: dict[str, re.Pattern] = {
+    "kanji": re.compile(r"[㐀-䶿一-鿿豈-﫿々〆]"),
+    "hiragana": re.compile(r"[ぁ-ゟ]"),
+    "katakana": re.compile(r"[゠-ヿㇰ-ㇿｦ-ﾟ]"),
+    "ascii_word": re.compile(r"[A-Za-z0-9]"),
+    "ascii_symbol": re.compile(r"[!-/:-@\[-`{-~]"),
+    "space": re.compile(r"\s"),
+}
+
+
+class TokenEstimator:
+    """
+    文字種ごとの係数によるトークン数の見積もり
+    
+    Args:
+        rates: 文字種ごとの1文字あたりトークン数（省略時は CHAR_CLASS_RATES）
+        scale: 全体に掛ける倍率（calibrate() で実測に合わせる）
+    """
+    
+    def __init__(self, rates: Optional[dict[str, float]] = None, scale: float = 1.0):
+        self.rates = dict(rates or CHAR_CLASS_RATES)
+        self.scale = scale
+    
+    def _raw(self, text: str) -> float:
+        total = 0.0
+        classified = 0
+        for name, pattern in _CHAR_CLASSES.items():
+            count = len(pattern.findall(text))
+            total += count * self.rates[name]
+            classified += count
+        return total + (len(text) - classified) * self.rates["other"]
+    
+    def estimate(self, text: str) -> int:
+        """テキスト1件のトークン数（切り上げ、空でなければ最低1）"""
+        if not text:
+            return 0
+        return max(1, math.ceil(self._raw(text) * self.scale))
+    
+    def calibrate(self, samples: list[tuple[str, int]]) -> float:
+        """
+        (テキスト, 実測トークン数) の組から倍率を合わせ、新しい倍率を返す
+        
+        usage_metadata の input_tokens と描画済みプロンプトを渡す想定。
+        """
+        raw = sum(self._raw(text) for text, _ in samples)
+        actual = sum(tokens for _, tokens in samples)
+        if raw > 0 and actual > 0:
+            self.scale = actual / raw
+        return self.scale
+
+
+_default_estimator = TokenEstimator()
+
+
+def estimate_tokens(text: str) -> int:
+    """既定の係数でテキストのトークン数を見積もる"""
+    return _default_estimator.estimate(text)
+
+
+# ==================== トークン予算 ====================
+
+class TokenBudgetExceededError(RuntimeError):
+    """予算を超えるため、LLMを呼ばずに拒否したリクエスト"""
+    
+    def __init__(self, reason: str, scope: str, estimated: int, remaining: int):
+        super().__init__(reason)
+        self.reason = reason
+        self.scope = scope
+        self.estimated = estimated
+        self.remaining = remaining
+
+
+class TokenBudgetPolicy(BaseModel):
+    """事前見積もりと入力の縮小ルール"""
+    max_request_tokens: Optional[int] = Field(
+        default=None, ge=1,
+        description="1回の実行（全LLM呼び出しの入出力合計）の上限（None なら予算の残りだけで判定）",
+    )
+    extraction_output_tokens: int = Field(default=1200, description="抽出呼び出しの想定出力トークン数")
+    why_output_tokens: int = Field(default=250, description="Why深掘り1回の想定出力トークン数")
+    critic_output_tokens: int = Field(default=150, description="Critic呼び出しの想定出力トークン数")
+    min_history_messages: int = Field(default=0, description="縮小時にも残す直近の履歴件数")
+    meta_list_items: int = Field(default=3, description="縮小時に残す project_meta の各リストの件数")
+    meta_value_chars: int = Field(default=100, description="縮小時の project_meta の各値の最大文字数")
+    min_user_text_chars: int = Field(default=200, description="ユーザー記述をこれより短くはしない")
+
+
+class TokenReservation(BaseModel):
+    """予約済みのトークン（実行後に settle() で実績に置き換える）"""
+    scopes: list[str] = Field(default_factory=list, description="計上先（tenant:<id> / project:<id>）")
+    tokens: int = Field(default=0, description="予約したトークン数")
+    period: int = Field(default=0, description="計上した期間の番号")
+
+
+class TokenBudgetLedger:
+    """
+    テナント・プロジェクトごとのトークン使用量の台帳（スレッドセーフ）
+    
+    実行前に見積もりを reserve() で予約し、実行後に settle() で実績に置き換える。
+    同時実行でも予約分を含めて判定するため、予算を超えて使われることはない。
+    
+    Args:
+        tenant_limit: テナントごとの上限（None なら無制限）
+        project_limit: プロジェクトごとの上限（None なら無制限）
+        period_seconds: 予算の期間（秒）。指定時は期間ごとに使用量をリセット
+        limits: 個別の上限（"tenant:acme" / "project:p1" をキーに指定）
+    """
+    
+    def __init__(
+        self,
+        tenant_limit: Optional[int] = None,
+        project_limit: Optional[int] = None,
+        period_seconds: Optional[float] = None,
+        limits: Optional[dict[str, int]] = None,
+    ):
+        self.tenant_limit = tenant_limit
+        self.project_limit = project_limit
+        self.period_seconds = period_seconds
+        self.limits = dict(limits or {})
+        self._used: dict[tuple[str, int], int] = {}
+        self._lock = threading.Lock()
+    
+    def _period(self) -> int:
+        if not self.period_seconds:
+            return 0
+        return int(time.time() // self.period_seconds)
+    
+    def scopes(self, ctx: Optional[RequestContext] = None) -> list[str]:
+        """リクエストコンテキストの計上先（テナント → プロジェクト）"""
+        ctx = ctx or current_request_context()
+        scopes = []
+        if ctx.tenant_id:
+            scopes.append(f"tenant:{ctx.tenant_id}")
+        if ctx.project_id:
+            scopes.append(f"project:{ctx.project_id}")
+        return scopes
+    
+    def limit_of(self, scope: str) -> Optional[int]:
+        if scope in self.limits:
+            return self.limits[scope]
+        return self.tenant_limit if scope.startswith("tenant:") else self.project_limit
+    
+    def used(self, scope: str) -> int:
+        """現在の期間の使用量（予約分を含む）"""
+        with self._lock:
+            return self._used.get((scope, self._period()), 0)
+    
+    def remaining(self, ctx: Optional[RequestContext] = None) -> tuple[Optional[str], Optional[int]]:
+        """
+        最も残りの少ない計上先とその残りトークン数
+        
+        Returns:
+            (計上先, 残り)。上限のある計上先がなければ (None, None)
+        """
+        period = self._period()
+        tightest: tuple[Optional[str], Optional[int]] = (None, None)
+        with self._lock:
+            for scope in self.scopes(ctx):
+                limit = self.limit_of(scope)
+                if limit is None:
+                    continue
+                left = max(0, limit - self._used.get((scope, period), 0))
+                if tightest[1] is None or left < tightest[1]:
+                    tightest = (scope, left)
+        return tightest
+    
+    def reserve(self, tokens: int, ctx: Optional[RequestContext] = None) -> TokenReservation:
+        """
+        見積もりを予約する
+        
+        Raises:
+            TokenBudgetExceededError: いずれかの計上先で上限を超える場合
+        """
+        period = self._period()
+        scopes = self.scopes(ctx)
+        with self._lock:
+            if self.period_seconds:
+                # 過去の期間の記録を捨てる
+                for key in [key for key in self._used if key[1] != period]:
+                    del self._used[key]
+            for scope in scopes:
+                limit = self.limit_of(scope)
+                if limit is None:
+                    continue
+                left = limit - self._used.get((scope, period), 0)
+                if tokens > left:
+                    raise TokenBudgetExceededError(
+                        f"トークン予算を超過するため実行しません（{scope}: 見積もり {tokens} / 残り {max(0, left)}）",
+                        scope=scope,
+                        estimated=tokens,
+                        remaining=max(0, left),
+                    )
+            for scope in scopes:
+                self._used[(scope, period)] = self._used.get((scope, period), 0) + tokens
+        return TokenReservation(scopes=scopes, tokens=tokens, period=period)
+    
+    def settle(self, reservation: TokenReservation, actual: int) -> None:
+        """予約を実績のトークン数に置き換える"""
+        delta = actual - reservation.tokens
+        with self._lock:
+            for scope in reservation.scopes:
+                key = (scope, reservation.period)
+                if key in self._used:
+                    self._used[key] = max(0, self._used[key] + delta)
+    
+    def snapshot(self) -> dict[str, int]:
+        """現在の期間の計上先ごとの使用量"""
+        period = self._period()
+        with self._lock:
+            return {scope: used for (scope, p), used in self._used.items() if p == period}
+
+
+# ==================== 使用量の計測 ====================
+
+class UsageMeter(UsageMetadataCallbackHandler):
+    """チャットモデル呼び出しの使用量の集計に加え、呼び出しが始まったかを記録する"""
+    
+    run_inline = True
+    
+    def __init__(self) -> None:
+        super().__init__()
+        self.started = False
+    
+    def on_chat_model_start(self, *args: Any, **kwargs: Any) -> None:
+        self.started = True
+    
+    def on_llm_start(self, *args: Any, **kwargs: Any) -> None:
+        self.started = True
+    
+    @property
+    def total_tokens(self) -> int:
+        """集計済みの入出力トークン数の合計"""
+        return sum(m.get("total_tokens", 0) for m in self.usage_metadata.values())
+
+
+_usage_meter: ContextVar[Optional[UsageMeter]] = ContextVar("agents_usage_meter", default=None)
+register_configure_hook(_usage_meter, inheritable=True)
+
+
+@contextmanager
+def usage_meter() -> Iterator[UsageMeter]:
+    """
+    with ブロック内のチャットモデル呼び出しを計測する
+    
+    終了時は reset() ではなく外側の値を set() し直すため、非同期ジェネレーターの
+    yield をまたいで使い、別のコンテキストで閉じられても例外にならない。
+    """
+    meter = UsageMeter()
+    outer = _usage_meter.get()
+    _usage_meter.set(meter)
+    try:
+        yield meter
+    finally:
+        _usage_meter.set(outer)
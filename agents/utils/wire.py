@@ -0,0 +1,129 @@
+"""
+LLM出力の短縮ワイヤーフォーマット
+Compact Wire Format for LLM Output
+
+出力トークンは呼び出しレイテンシの大半を占めるため、LLMには短縮キー
+（および pains / currentSolutions の位置配列）で出力させ、
+ローカルで従来のキャメルケース構造に展開する。
+
+    {"ps": "...", "s": {"p": [["満員で操作できない", "...", 4, 5, "..."]]}}
+    → {"problemStatement": "...", "problemDiscoverySheet": {"pains": [{"pain": ..., "severity": 4, ...}]}}
+"""
+
+from typing import Any
+
+from agents.prompts.problem_discovery import (
+    COMPACT_OUTPUT_SCHEMA,
+    COMPACT_POSITIONAL_OUTPUT_SCHEMA,
+    OUTPUT_SCHEMA,
+)
+
+# ワイヤーフォーマット
+WIRE_JSON = "json"                              # 従来のキャメルケースJSON
+WIRE_COMPACT = "compact"                        # 短縮キー
+WIRE_COMPACT_POSITIONAL = "compact_positional"  # 短縮キー＋pains/currentSolutionsを位置配列で表現
+
+WIRE_FORMATS = (WIRE_JSON, WIRE_COMPACT, WIRE_COMPACT_POSITIONAL)
+
+# オブジェクト種別（親のキャメルケースキー）ごとの キャメルケース → 短縮キー
+SHORT_KEYS: dict[str, dict[str, str]] = {
+    "output": {
+        "problemStatement": "ps",
+        "problemDiscoverySheet": "s",
+        "followupQuestions": "fq",
+        "qualityReport": "qr",
+    },
+    "problemDiscoverySheet": {
+        "job": "j",
+        "context": "c",
+        "pains": "p",
+        "currentSolutions": "cs",
+        "unmetNeeds": "u",
+        "emotion": "em",
+        "successCriteria": "sc",
+        "assumptions": "as",
+        "unknowns": "uk",
+    },
+    "job": {"main": "m", "functional": "f", "emotional": "e", "social": "so"},
+    "context": {
+        "who": "w",
+        "when": "t",
+        "where": "wh",
+        "trigger": "tr",
+        "constraints": "cn",
+        "stakeholders": "sh",
+    },
+    "pains": {"pain": "p", "impact": "i", "severity": "sv", "frequency": "fr", "evidence": "ev"},
+    "currentSolutions": {"solution": "s", "whyChosen": "w", "dissatisfaction": "d"},
+    "unmetNeeds": {"need": "n", "whyDepth": "y"},
+    "emotion": {"feelings": "f", "momentOfTruth": "mt"},
+    "followupQuestions": {"question": "q", "intent": "i", "type": "t", "target": "tg", "options": "o"},
+    "qualityReport": {"confidence": "cf", "missingFields": "mf", "contradictions": "ct", "nextAction": "na"},
+}
+
+# 位置配列で表す配列要素のフィールド順
+POSITIONAL_FIELDS: dict[str, tuple[str, ...]] = {
+    "pains": ("pain", "impact", "severity", "frequency", "evidence"),
+    "currentSolutions": ("solution", "whyChosen", "dissatisfaction"),
+}
+
+_LONG_KEYS: dict[str, dict[str, str]] = {
+    kind: {short: long for long, short in keys.items()}
+    for kind, keys in SHORT_KEYS.items()
+}
+
+
+def schema_for(wire_format: str) -> str:
+    """ワイヤーフォーマットに対応する出力スキーマ（プロンプト埋め込み用）"""
+    if wire_format == WIRE_COMPACT:
+        return COMPACT_OUTPUT_SCHEMA
+    if wire_format == WIRE_COMPACT_POSITIONAL:
+        return COMPACT_POSITIONAL_OUTPUT_SCHEMA
+    return OUTPUT_SCHEMA
+
+
+def expand_compact(data: Any, kind: str = "output") -> Any:
+    """
+    短縮フォーマットをキャメルケース構造に展開
+    
+    キャメルケースのキーや未知のキーはそのまま残すため、
+    従来形式・混在した出力・生成途中の部分JSONにも適用できる。
+    """
+    if isinstance(data, list):
+        return [_expand_item(item, kind) for item in data]
+    if isinstance(data, dict):
+        long_keys = _LONG_KEYS.get(kind)
+        if long_keys is None:
+            return data
+        expanded = {}
+        for key, value in data.items():
+            long = long_keys.get(key, key)
+            expanded[long] = expand_compact(value, long)
+        return expanded
+    return data
+
+
+def _expand_item(item: Any, kind: str) -> Any:
+    """配列要素の展開（位置配列は対応するフィールド名の辞書に戻す）"""
+    fields = POSITIONAL_FIELDS.get(kind)
+    if fields is not None and isinstance(item, list):
+        return dict(zip(fields, item))
+    return expand_compact(item, kind)
+
+
+def to_compact(data: Any, positional: bool = False, kind: str = "output") -> Any:
+    """キャメルケース構造を短縮フォーマットに変換（expand_compact の逆変換）"""
+    if isinstance(data, list):
+        fields = POSITIONAL_FIELDS.get(kind) if positional else None
+        if fields is not None:
+            return [[item.get(f) for f in fields] if isinstance(item, dict) else item for item in data]
+        return [to_compact(item, positional, kind) for item in data]
+    if isinstance(data, dict):
+        short_keys = SHORT_KEYS.get(kind)
+        if short_keys is None:
+            return data
+        return {
+            short_keys.get(key, key): to_compact(value, positional, key)
+            for key, value in data.items()
+        }
+    return data